@@ -1,66 +1,61 @@
+"""
+Run columnflow stages for the datasets and shifts of a yaml config (see yamls/).
+
+The stages given with -f (default: "main" of the yaml) are expanded into a DAG of law commands:
+dataset level stages get one node per dataset (and per shift for the stages in ShiftedFuncs),
+plotting stages one node for all datasets, and each node waits for the nodes of the requested upstream stages. The nodes are
+launched as "law run" subprocesses with at most -j at a time (default: "workers" of the yaml).
+
+Every run writes to cmdlogs/<tag>/:
+  state.json   status, wall time and peak RSS of every node, used by --resume <tag> to skip the
+               nodes that already succeeded (the version of the first run is kept)
+  events.jsonl one json record per node start / end
+  <node>.log   stdout and stderr of the node
+
+--dry-run only prints the DAG and the commands, it needs neither law nor a grid proxy and writes
+nothing to cmdlogs/. The extras of the yaml are only passed to the plotting stages.
+
+  python cf_run.py -i yamls/2022PreEE_limited.yml -f SelectEvents,ReduceEvents -j 4
+  python cf_run.py -i yamls/2022PreEE_limited.yml -f SelectEvents,ReduceEvents --resume run3_2022PreEE_limited_20240901_101500
+"""
 import os
+import sys
+import json
+import time
 import yaml
-import argparse 
+import shlex
+import argparse
 import datetime
-import time
-import sys
 import logging
-from subprocess import Popen, PIPE
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 
-def setup_logger(log_file):
+def setup_logger(log_file=None):
     # Create a logger
     logger = logging.getLogger('main')
     logger.setLevel(logging.DEBUG)
 
-    # Create a file handler
-    filemode = 'a+'
-    file_handler = logging.FileHandler(log_file, mode=filemode)
-    file_handler.setLevel(logging.DEBUG)
-
     # Create a console handler
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)
+    console_handler.setLevel(logging.INFO)
 
-    # Create a formatter and add it to the file handler
+    # Create a formatter and add it to the console handler
     formatter = logging.Formatter('%(asctime)s,%(msecs)03d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s','%Y-%m-%d:%H:%M:%S')
-    file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
-
-    # Add the file handler to the logger
-    logger.addHandler(file_handler)
     logger.addHandler(console_handler)
 
-    return logger
-
-
-def runShellCmd(cmdList):
-    process = Popen(cmdList, stdout=PIPE, stderr=PIPE)
-    while True:
-        output = process.stdout.readline()
-        if process.poll() is not None:
-            break
-        if output:
-            print(output.strip().decode("utf-8"))
-    rc = process.poll()
+    # Create a file handler, not for dry runs
+    if log_file:
+        filemode = 'a+'
+        file_handler = logging.FileHandler(log_file, mode=filemode)
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
 
+    return logger
 
-def run_command(command, logger):
-    process = Popen([*command, 'color=always'], stdout=PIPE, stderr=PIPE, text=True, bufsize=1)
-
-    # Log and display output in real-time
-    with process.stdout, process.stderr:
-        for line in iter(process.stdout.readline, ''):
-            sys.stdout.write(line)
-            logger.debug(line.strip())
-
-        for line in iter(process.stderr.readline, ''):
-            sys.stderr.write(line)
-            logger.error(line.strip())
-    
-    process.wait()
 
-#from utilities import setup_logger, runShellCmd, run_command
 datetime_tag = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 ListOfMainFuncs = ['CalibrateEvents',
                    'SelectEvents',
@@ -72,155 +67,301 @@ ListOfMainFuncs = ['CalibrateEvents',
                    'PlotShiftedVariables1D', 'PlotShiftedVariables2D',
                    'UniteColumns']
 
-
-if not os.path.exists("cmdlogs"): os.mkdir("cmdlogs")
-else: print("logs exists")
-
-
-
-parser = argparse.ArgumentParser(description='Pre-Processing')
-parser.add_argument('-i',
-                    '--inconfig',
-                    type=str,
-                    required=True,
-                    help="cf.SelectEvents arguments")
-parser.add_argument('-f',
-                    '--func',
-                    type=str,
-                    required=True,
-                    help="e.g. SelectEvents")
-
-
-
-pargs = parser.parse_args()
-
-yml_config = None
-yml_config_file = pargs.inconfig
-
-with open(yml_config_file,'r') as conf:
-    yml_config = yaml.safe_load(conf)
-
-#main_func = yml_config.get("main")
-main_func = pargs.func
-assert main_func in ListOfMainFuncs, f"Error: {main_func} is wrong"
-
-era           = yml_config.get("era")
-run           = yml_config.get("run")
-postfix       = yml_config.get("postfix")
-islimited     = yml_config.get("limited")
-limit         = "limited" if islimited else "full"
-nworkers      = yml_config.get("workers")
-tasks_per_job = yml_config.get("tasks_per_job")
-
-#cmdfile = os.path.join(os.getcwd(),"cmdlogs",f"cmdlog_selectEvents_{datetime_tag}.sh")
-jobfile = os.path.join(os.getcwd(),"cmdlogs",f"joblog_run{run}_{era}{postfix}_{limit}_{main_func}_{datetime_tag}.log")
-logfile = os.path.join(os.getcwd(),"cmdlogs",f"cmdlog_run{run}_{era}{postfix}_{limit}_{main_func}_{datetime_tag}.log")
-logger  = setup_logger(logfile)
-
-
-logger.info(f"Yaml     : {yml_config_file}")
-logger.info(f"Execute  : cf.{main_func}")
-logger.info(f"Era      : {era}")
-logger.info(f"Run      : {run}")
-logger.info(f"Postfix  : {postfix}")
-logger.info(f"Limited? : {islimited}")
-logger.info(f"nWorkers : {nworkers}")
-logger.info(f"nTasks_per_job : {tasks_per_job}")
-
-wrapper   = yml_config.get("wrapper")
-logger.info(f"Wrapper  : {wrapper}")
-
-main_args = yml_config.get("args")
-config    = main_args.get("config")
-logger.info(f"Config   : {config}")
-
-dataset_list = main_args.get("datasets")
-if len(dataset_list) > 1 and wrapper == False:
-    logger.info(f"\tmore than one dataset, making wrapper True")
-    wrapper = True
-datasets  = ",".join(dataset_list)
-logger.info(f"datasets : {datasets}")
-
-processes = ",".join(main_args.get("processes"))
-logger.info(f"processes: {processes}")
-
-shiftList = main_args.get("shifts")
-shifts = ",".join(shiftList) if shiftList else ""
-logger.info(f"shifts: {shifts}")
-
-workflow  = main_args.get("workflow")
-logger.info(f"worklflow: {workflow}")
-
-branch    = main_args.get("branch")
-logger.info(f"branch   : {branch}")
-
-version   = main_args.get('version')
-if version.startswith("dummy"):
-    version = f"Run{run}_{era}{postfix}_{limit}_{datetime_tag}"
-logger.info(f"version  : {version}")
-
-extras = []
-if "extras" in list(main_args.keys()):
-    extras = [f"--{extra}" for extra in main_args.get("extras")]
-
-categories = ",".join(main_args.get("categories")) if "categories" in list(main_args.keys()) else None
-variables  = ",".join(main_args.get("variables")) if "variables" in list(main_args.keys()) else None
-
-cmd_list = [
-    "law", "run", f"cf.{main_func}",
-    "--config", config,
-    "--dataset", datasets,
-    "--workflow", workflow,
-    #"--branch", branch,
-    "--version", version,
-    #"&>", jobfile, '&'
-]
-
-#skip_wrapping = ((main_func == "PlotVariables1D") or (main_func == "PlotVariables2D")
-skip_wrapping = main_func.startswith("PlotVariables")
-shifts_val = "nominal,{"+f"{shifts}"+"}_{up,down}" if shiftList else "nominal"
-if wrapper:
-    if not skip_wrapping:
-        cmd_list = [
-            "law", "run", f"cf.{main_func}Wrapper",
-            "--config", config,
-            "--datasets", datasets,
-            f"--shifts", shifts_val,
-            f"--cf.{main_func}-workflow", workflow,
-            #f"--cf.{main_func}-branch", branch,
-            f"--cf.{main_func}-tasks-per-job", tasks_per_job,
-            f"--cf.{main_func}-pilot",
-            "--version", version,
-            "--workers", nworkers,
-            #f"--cf.{main_func}-log-file", jobfile,
-        ]
-        if main_func.startswith("CreateHistograms"):
-            cmd_list.append(f"--cf.{main_func}-variables")
-            cmd_list.append(variables)
+# upstream stages of each stage, only the requested ones become DAG edges,
+# law still resolves the full task requirements of each command itself
+StageRequires = {
+    'CalibrateEvents'        : [],
+    'SelectEvents'           : ['CalibrateEvents'],
+    'ReduceEvents'           : ['SelectEvents'],
+    'PlotCutFlow'            : ['SelectEvents'],
+    'ProduceColumns'         : ['ReduceEvents'],
+    'CreateHistograms'       : ['ProduceColumns', 'ReduceEvents'],
+    'PlotVariables1D'        : ['CreateHistograms'],
+    'PlotVariables2D'        : ['CreateHistograms'],
+    'PlotShiftedVariables1D' : ['CreateHistograms'],
+    'PlotShiftedVariables2D' : ['CreateHistograms'],
+    'UniteColumns'           : ['ProduceColumns', 'ReduceEvents'],
+}
+# stages running once for all datasets
+PlotFuncs = ['PlotCutFlow', 'PlotVariables1D', 'PlotVariables2D', 'PlotShiftedVariables1D', 'PlotShiftedVariables2D']
+# dataset level stages running once per shift, the others only run the nominal one, the yaml shifts
+# are weight shifts, which columnflow resolves to the nominal task for all other stages
+ShiftedFuncs = ['CreateHistograms']
+
+
+class Node:
+
+    def __init__(self, stage, dataset=None, shift=None, cmd=None):
+        self.stage = stage
+        self.dataset = dataset
+        self.shift = shift
+        self.cmd = cmd or []
+        self.requires = []
+
+    @property
+    def key(self):
+        return "__".join(p for p in [self.stage, self.dataset, self.shift] if p)
+
+
+def read_config(yml_config_file, run_tag=None, version=None):
+    with open(yml_config_file, 'r') as conf:
+        yml_config = yaml.safe_load(conf)
+    main_args = yml_config.get("args")
+
+    run     = yml_config.get("run")
+    era     = yml_config.get("era")
+    postfix = yml_config.get("postfix")
+    limit   = "limited" if yml_config.get("limited") else "full"
+    run_tag = run_tag or f"run{run}_{era}{postfix}_{limit}_{datetime_tag}"
+
+    if version is None:
+        version = main_args.get("version")
+        if version is None or str(version).startswith("dummy"):
+            version = f"Run{run}_{era}{postfix}_{limit}_{datetime_tag}"
+
+    shift_sources = main_args.get("shifts") or []
+    return {
+        "yaml"          : os.path.abspath(yml_config_file),
+        "main"          : yml_config.get("main"),
+        "run_tag"       : run_tag,
+        "workers"       : int(yml_config.get("workers") or 1),
+        "tasks_per_job" : yml_config.get("tasks_per_job"),
+        "config"        : main_args.get("config"),
+        "workflow"      : main_args.get("workflow") or "local",
+        "branch"        : main_args.get("branch"),
+        "version"       : str(version),
+        "datasets"      : main_args.get("datasets") or [],
+        "processes"     : main_args.get("processes") or [],
+        "categories"    : main_args.get("categories") or [],
+        "variables"     : main_args.get("variables") or [],
+        "shift_sources" : shift_sources,
+        "shifts"        : ["nominal"] + [f"{src}_{d}" for src in shift_sources for d in ["up", "down"]],
+        # each extra may hold a value, e.g. process-settings "h_ggf_tautau,unstack"
+        "extras"        : [arg for extra in main_args.get("extras") or [] for arg in shlex.split(f"--{extra}")],
+    }
+
+
+def build_command(stage, cfg, law_workers, dataset=None, shift=None):
+    cmd = [
+        "law", "run", f"cf.{stage}",
+        "--config", cfg["config"],
+        "--version", cfg["version"],
+        "--workers", law_workers,
+    ]
+    if stage in PlotFuncs:
+        cmd += ["--datasets", ",".join(cfg["datasets"])]
+        if cfg["processes"]:
+            cmd += ["--processes", ",".join(cfg["processes"])]
+        if stage != "PlotCutFlow":
+            cmd += ["--categories", ",".join(cfg["categories"]), "--variables", ",".join(cfg["variables"])]
+        if stage.startswith("PlotShifted"):
+            cmd += ["--shift-sources", ",".join(cfg["shift_sources"])]
+    else:
+        cmd += ["--dataset", dataset, "--workflow", cfg["workflow"]]
+        if shift:
+            cmd += ["--shift", shift]
+        if cfg["workflow"] != "local":
+            cmd += ["--pilot"]
+            if cfg["tasks_per_job"]:
+                cmd += ["--tasks-per-job", cfg["tasks_per_job"]]
+        if stage == "CreateHistograms" and cfg["variables"]:
+            cmd += ["--variables", ",".join(cfg["variables"])]
+    if stage in PlotFuncs:
+        cmd += cfg["extras"]
+    return [str(c) for c in cmd]
+
+
+def build_dag(stages, cfg, law_workers):
+    """
+    Nodes in topological order (stages in the order of ListOfMainFuncs)
+    """
+    nodes = {}
+    by_stage = {}
+    for stage in sorted(stages, key=ListOfMainFuncs.index):
+        if stage in PlotFuncs:
+            stage_nodes = [Node(stage, cmd=build_command(stage, cfg, law_workers))]
+        elif stage in ShiftedFuncs:
+            stage_nodes = [
+                Node(stage, dataset, shift, build_command(stage, cfg, law_workers, dataset, shift))
+                for dataset in cfg["datasets"]
+                # data has no shifts
+                for shift in (["nominal"] if dataset.startswith("data") else cfg["shifts"])
+            ]
+        else:
+            # no --shift, the task runs the nominal one
+            stage_nodes = [
+                Node(stage, dataset, cmd=build_command(stage, cfg, law_workers, dataset))
+                for dataset in cfg["datasets"]
+            ]
+        for node in stage_nodes:
+            for upstream in StageRequires[stage]:
+                for up in by_stage.get(upstream, []):
+                    # dataset level nodes only wait for their own dataset and shift, or for the
+                    # nominal node of a stage without shifts
+                    if node.dataset is None or (
+                        up.dataset == node.dataset and up.shift in (None, node.shift)
+                    ):
+                        node.requires.append(up.key)
+            nodes[node.key] = node
+        by_stage[stage] = stage_nodes
+    return nodes
+
+
+def run_node(node, log_path):
+    """
+    Runs the command of *node*, returns the exit code, wall time in s and peak RSS in MB
+    """
+    start = time.perf_counter()
+    with open(log_path, "a") as log:
+        log.write(f"# {' '.join(node.cmd)}\n")
+        log.flush()
+        proc = subprocess.Popen(node.cmd, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 returns the resource usage of the process tree, ru_maxrss is in kB on linux
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, time.perf_counter() - start, rusage.ru_maxrss / 1024.0
+
+
+class Runner:
+
+    def __init__(self, nodes, run_dir, jobs, logger, resume=False):
+        self.nodes = nodes
+        self.run_dir = run_dir
+        self.jobs = jobs
+        self.logger = logger
+        self.state_file = os.path.join(run_dir, "state.json")
+        self.events_file = os.path.join(run_dir, "events.jsonl")
+        self.state = {}
+        if resume and os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                self.state = json.load(f)["nodes"]
+
+    def record(self, event, node, **fields):
+        with open(self.events_file, "a") as f:
+            f.write(json.dumps({"time": time.time(), "event": event, "node": node.key, "stage": node.stage,
+                                "dataset": node.dataset, "shift": node.shift, **fields}) + "\n")
+
+    def save_state(self, meta):
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({**meta, "nodes": self.state}, f, indent=1)
+        os.replace(tmp, self.state_file)
+
+    def run(self, meta):
+        done = {key for key, s in self.state.items() if s.get("status") == "done"}
+        for key in sorted(done & set(self.nodes)):
+            self.logger.info(f"skipping {key}, done in a previous run")
+        pending = [key for key in self.nodes if key not in done]
+        failed = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                # nodes with a failed upstream node are skipped
+                for key in list(pending):
+                    if any(req in failed for req in self.nodes[key].requires):
+                        pending.remove(key)
+                        failed.add(key)
+                        self.state[key] = {"status": "skipped"}
+                        self.record("skip", self.nodes[key])
+                        self.logger.warning(f"skipping {key}, an upstream node failed")
+                ready = [key for key in pending if all(req in done for req in self.nodes[key].requires)]
+                for key in ready[:max(self.jobs - len(running), 0)]:
+                    pending.remove(key)
+                    node = self.nodes[key]
+                    self.record("start", node, cmd=node.cmd)
+                    self.logger.info(f"starting {key}")
+                    running[pool.submit(run_node, node, os.path.join(self.run_dir, f"{key}.log"))] = key
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    node = self.nodes[key]
+                    try:
+                        code, wall, rss = future.result()
+                    except OSError as e:
+                        code, wall, rss = -1, 0.0, 0.0
+                        self.logger.error(f"could not start {key}: {e}")
+                    status = "done" if code == 0 else "failed"
+                    (done if code == 0 else failed).add(key)
+                    self.state[key] = {"status": status, "returncode": code, "wall_s": round(wall, 2),
+                                       "peak_rss_mb": round(rss, 1), "cmd": node.cmd}
+                    self.record("end", node, status=status, returncode=code, wall_s=wall, peak_rss_mb=rss)
+                    log = self.logger.info if code == 0 else self.logger.error
+                    log(f"{status} {key} after {wall:.1f}s, peak RSS {rss:.0f} MB")
+                    self.save_state(meta)
+        self.save_state(meta)
+        return not failed
+
+    def report(self):
+        rows = {}
+        for key, node in self.nodes.items():
+            s = self.state.get(key, {})
+            row = rows.setdefault(node.stage, {"nodes": 0, "done": 0, "wall": 0.0, "max_wall": 0.0, "rss": 0.0})
+            row["nodes"] += 1
+            row["done"] += s.get("status") == "done"
+            row["wall"] += s.get("wall_s", 0.0)
+            row["max_wall"] = max(row["max_wall"], s.get("wall_s", 0.0))
+            row["rss"] = max(row["rss"], s.get("peak_rss_mb", 0.0))
+        self.logger.info(f"{'stage':<24s} {'done':>9s} {'wall [s]':>10s} {'max [s]':>9s} {'peak RSS [MB]':>14s}")
+        for stage, row in rows.items():
+            self.logger.info(f"{stage:<24s} {row['done']:>4d}/{row['nodes']:<4d} {row['wall']:>10.1f} "
+                             f"{row['max_wall']:>9.1f} {row['rss']:>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-i', '--inconfig', type=str, required=True, help="yaml config, see yamls/")
+    parser.add_argument('-f', '--func', type=str, help="comma separated stages, e.g. SelectEvents,ReduceEvents")
+    parser.add_argument('-j', '--jobs', type=int, help="concurrent law commands, default: workers of the yaml")
+    parser.add_argument('--law-workers', type=int, default=1, help="--workers of each law command")
+    parser.add_argument('--resume', type=str, help="tag of a previous run in cmdlogs/ to resume")
+    parser.add_argument('--dry-run', action="store_true", help="only print the DAG and commands")
+    pargs = parser.parse_args()
+
+    # the version and tag of a resumed run are kept
+    meta = {}
+    if pargs.resume:
+        with open(os.path.join("cmdlogs", pargs.resume, "state.json")) as f:
+            meta = json.load(f)
+    cfg = read_config(pargs.inconfig, run_tag=meta.get("run_tag"), version=meta.get("version"))
+
+    funcs = pargs.func or cfg["main"]
+    if not funcs:
+        parser.error("no stage given, use -f or set main in the yaml")
+    stages = funcs.split(",")
+    for stage in stages:
+        assert stage in ListOfMainFuncs, f"Error: {stage} is wrong"
+
+    run_dir = os.path.join(os.getcwd(), "cmdlogs", cfg["run_tag"])
+    if pargs.dry_run:
+        logger = setup_logger()
     else:
-        cmd_list = [
-            "law", "run", f"cf.{main_func}",
-            "--config", config,
-            "--datasets", datasets,
-            "--processes", processes,
-            f"--workflow", workflow,
-            f"--branch", branch,
-            "--version", version,
-            "--categories", categories,
-            "--variables", variables,
-            "--workers", nworkers,
-            "--pilot",
-            f"--log-file", jobfile,
-        ] + extras
-    
-cmd_list = [str(item) for item in cmd_list]
-cmd = " ".join(cmd_list)
-
-logger.info(f"CMD      : \n\n{cmd}\n")
-logger.info(f"Copy this line above, paste it and hit enter : BABUSHCHA !")
-
-#logger.info(f"writing CMD in {cmdfile}")
-#cmdf = open(cmdfile, 'w')
-#cmdf.write("#!/bin/sh\n\n")
-#cmdf.write(cmd + '\n')
-#cmdf.close()
+        os.makedirs(run_dir, exist_ok=True)
+        logger = setup_logger(os.path.join(run_dir, "runner.log"))
+
+    logger.info(f"Yaml     : {cfg['yaml']}")
+    logger.info(f"Stages   : {', '.join(stages)}")
+    logger.info(f"Config   : {cfg['config']}")
+    logger.info(f"Version  : {cfg['version']}")
+    logger.info(f"Datasets : {', '.join(cfg['datasets'])}")
+    logger.info(f"Shifts   : {', '.join(cfg['shifts'])}")
+
+    nodes = build_dag(stages, cfg, pargs.law_workers)
+    if pargs.dry_run:
+        for node in nodes.values():
+            requires = f"  (after {', '.join(node.requires)})" if node.requires else ""
+            print(f"[{node.key}]{requires}\n  {' '.join(node.cmd)}")
+        return 0
+
+    runner = Runner(nodes, run_dir, pargs.jobs or cfg["workers"], logger, resume=bool(pargs.resume))
+    meta = {"run_tag": cfg["run_tag"], "version": cfg["version"], "yaml": cfg["yaml"], "stages": stages}
+    ok = runner.run(meta)
+    runner.report()
+    logger.info(f"logs and state in {run_dir}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
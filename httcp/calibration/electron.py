@@ -12,6 +12,8 @@ from columnflow.production.cms.seeds import deterministic_seeds
 from columnflow.util import maybe_import, InsertableDict
 from columnflow.columnar_util import set_ak_column, flat_np_view
 
+from httcp.corrections import get_correction
+
 
 np = maybe_import("numpy")
 ak = maybe_import("awkward")
@@ -103,11 +105,5 @@ def electron_smearing_scaling_setup(
     reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    
-    correction_set = correctionlib.CorrectionSet.from_string(
-        bundle.files.electron_ss.load(formatter="gzip").decode("utf-8"),
-    )
-    self.electron_scaling_corrector = correction_set["Scale"] #self.config_inst.x.electron_sf.scale.corrector]
-    self.electron_smearing_corrector = correction_set["Smearing"] #self.config_inst.x.electron_sf.smearing.corrector]
+    self.electron_scaling_corrector = get_correction(bundle.files.electron_ss, "Scale") #self.config_inst.x.electron_sf.scale.corrector]
+    self.electron_smearing_corrector = get_correction(bundle.files.electron_ss, "Smearing") #self.config_inst.x.electron_sf.smearing.corrector]
@@ -10,7 +10,10 @@ import itertools
 from columnflow.calibration import Calibrator, calibrator
 from columnflow.production.cms.seeds import deterministic_seeds
 from columnflow.util import maybe_import, InsertableDict
-from columnflow.columnar_util import set_ak_column, flat_np_view
+from columnflow.columnar_util import set_ak_column
+
+from httcp.util import timing_metric
+from httcp.corrections import get_correction
 
 
 np = maybe_import("numpy")
@@ -18,6 +21,10 @@ ak = maybe_import("awkward")
 
 set_ak_column_f32 = functools.partial(set_ak_column, value_type=np.float32)
 
+# DeepTau working points used for the energy scale of each channel's taus
+# (mu-tau uses the e-tau ones)
+tes_channel_wps = {"mutau": "etau", "etau": "etau", "tautau": "tautau"}
+
 @calibrator(
     uses={f"Tau.{var}" for var in [
                 "pt","eta","mass", "decayMode", "genPartFlav"
@@ -32,86 +39,56 @@ set_ak_column_f32 = functools.partial(set_ak_column, value_type=np.float32)
     mc_only=True,
 )
 def tau_energy_scale(self: Calibrator, events: ak.Array, **kwargs) -> ak.Array:
-    start = time.time()
+    start = time.perf_counter()
     # fail when running on data
     if self.dataset_inst.is_data:
         raise ValueError("attempt to apply tau energy corrections in data")
     
-    # the correction tool only supports flat arrays, so convert inputs to flat np view first
-    pt = flat_np_view(events.Tau.pt, axis=1)
-    mass = flat_np_view(events.Tau.mass, axis=1)
-    abseta = flat_np_view(abs(events.Tau.eta), axis=1)
-    dm = flat_np_view(events.Tau.decayMode, axis=1)
-    match = flat_np_view(events.Tau.genPartFlav, axis=1)
+    # the correction tool only supports flat arrays, so convert inputs to flat np views once,
+    # all output columns are built from these buffers and the same offsets
+    counts  = ak.to_numpy(ak.num(events.Tau.pt, axis=1))
+    offsets = ak.index.Index64(np.concatenate([[0], np.cumsum(counts)]))
+    flat    = lambda arr: np.asarray(ak.flatten(arr, axis=1))
+    jagged  = lambda values: ak.Array(ak.contents.ListOffsetArray(offsets, ak.contents.NumpyArray(values)))
+
+    pt     = flat(events.Tau.pt)
+    mass   = flat(events.Tau.mass)
+    abseta = np.abs(flat(events.Tau.eta))
+    dm     = flat(events.Tau.decayMode)
+    match  = flat(events.Tau.genPartFlav)
     
     syst = "nom" # TODO define this systematics inside config file
     #Get working points of the DeepTau tagger
     deep_tau_tagger    = self.config_inst.x.deep_tau_tagger
+    deep_tau_info      = self.config_inst.x.deep_tau_info[deep_tau_tagger]
     #deep_tau = self.config_inst.x.deep_tau
-   
-    #Create get energy scale correction for each tau
-    tes_nom = np.ones_like(pt, dtype=np.float32)
+
     #Calculate tau ID scale factors for genuine taus
     # pt, eta, dm, genmatch, deep_tau_id, jet_wp, e_wp, syst
-
-    arr_shape = ak.num(events.Tau.pt, axis=1)
-        
     mask2prong = ((dm != 5) & (dm != 6))
-    tes_args = lambda events, mask, deep_tau_tagger, syst: (pt[mask],
-                                                            abseta[mask],
-                                                            dm[mask],
-                                                            match[mask],
-                                                            deep_tau_tagger,
-                                                            self.config_inst.x.deep_tau_info[deep_tau_tagger].vs_j["etau"],
-                                                            self.config_inst.x.deep_tau_info[deep_tau_tagger].vs_e["etau"],
-                                                            syst)
-    tes_nom[mask2prong] = self.tes_corrector.evaluate(*tes_args(events, mask2prong, deep_tau_tagger, syst))
-    tes_nom     = np.asarray(tes_nom)
-    tau_pt      = np.asarray(ak.flatten(events.Tau.pt))
-    tau_mass    = np.asarray(ak.flatten(events.Tau.mass))
-    
-    events = set_ak_column_f32(events, "Tau.pt_no_tes", ak.unflatten(tau_pt, arr_shape))
-    events = set_ak_column_f32(events, "Tau.mass_no_tes", ak.unflatten(tau_mass, arr_shape))
-
-    events = set_ak_column_f32(events, "Tau.pt_mutau", ak.unflatten(tau_pt * tes_nom, arr_shape))
-    events = set_ak_column_f32(events, "Tau.mass_mutau", ak.unflatten(tau_mass * tes_nom, arr_shape))
-
-    tes_args = lambda events, mask, deep_tau_tagger, syst: (pt[mask],
-                                                            abseta[mask],
-                                                            dm[mask],
-                                                            match[mask],
-                                                            deep_tau_tagger,
-                                                            self.config_inst.x.deep_tau_info[deep_tau_tagger].vs_j["etau"],
-                                                            self.config_inst.x.deep_tau_info[deep_tau_tagger].vs_e["etau"],
-                                                            syst)
-    tes_nom[mask2prong] = self.tes_corrector.evaluate(*tes_args(events, mask2prong, deep_tau_tagger, syst))
-    tes_nom     = np.asarray(tes_nom)
-    tau_pt      = np.asarray(ak.flatten(events.Tau.pt))
-    tau_mass    = np.asarray(ak.flatten(events.Tau.mass))
-
-    events = set_ak_column_f32(events, "Tau.pt_etau", ak.unflatten(tau_pt * tes_nom, arr_shape))
-    events = set_ak_column_f32(events, "Tau.mass_etau", ak.unflatten(tau_mass * tes_nom, arr_shape))
-
-
-    tes_args = lambda events, mask, deep_tau_tagger, syst: (pt[mask],
-                                                            abseta[mask],
-                                                            dm[mask],
-                                                            match[mask],
-                                                            deep_tau_tagger,
-                                                            self.config_inst.x.deep_tau_info[deep_tau_tagger].vs_j["tautau"],
-                                                            self.config_inst.x.deep_tau_info[deep_tau_tagger].vs_e["tautau"],
-                                                            syst)
-    tes_nom[mask2prong] = self.tes_corrector.evaluate(*tes_args(events, mask2prong, deep_tau_tagger, syst))
-    tes_nom     = np.asarray(tes_nom)
-    tau_pt      = np.asarray(ak.flatten(events.Tau.pt))
-    tau_mass    = np.asarray(ak.flatten(events.Tau.mass))
-
-    events = set_ak_column_f32(events, "Tau.pt_tautau", ak.unflatten(tau_pt * tes_nom, arr_shape))
-    events = set_ak_column_f32(events, "Tau.mass_tautau", ak.unflatten(tau_mass * tes_nom, arr_shape))
-
-    stop = time.time()
-    if self.config_inst.x.verbose.calibration.tau:
-        print(f"tau energy correction takes : {round((stop - start)/60.0, 3)} min")
+    tes_args = (pt[mask2prong], abseta[mask2prong], dm[mask2prong], match[mask2prong])
+
+    events = set_ak_column_f32(events, "Tau.pt_no_tes",   jagged(pt))
+    events = set_ak_column_f32(events, "Tau.mass_no_tes", jagged(mass))
+
+    # one evaluation per distinct (vs_jet, vs_e) working point pair, shared by the channels using it
+    tes_per_wps = {}
+    for channel, wp_channel in tes_channel_wps.items():
+        wps = (deep_tau_info.vs_j[wp_channel], deep_tau_info.vs_e[wp_channel])
+        if wps not in tes_per_wps:
+            #Create get energy scale correction for each tau
+            tes_nom = np.ones_like(pt, dtype=np.float32)
+            tes_nom[mask2prong] = self.tes_corrector.evaluate(*tes_args, deep_tau_tagger, *wps, syst)
+            tes_per_wps[wps] = tes_nom
+        tes_nom = tes_per_wps[wps]
+
+        events = set_ak_column_f32(events, f"Tau.pt_{channel}",   jagged(pt * tes_nom))
+        events = set_ak_column_f32(events, f"Tau.mass_{channel}", jagged(mass * tes_nom))
+
+    timing_metric("tau_energy_scale", start,
+                  verbose=self.config_inst.x.verbose.calibration.tau,
+                  ntaus=len(pt),
+                  nevaluations=len(tes_per_wps))
     
     return events
 
@@ -132,16 +109,10 @@ def tau_energy_scale_setup(
     reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    
-    correction_set = correctionlib.CorrectionSet.from_string(
-        #bundle.files.tau_correction.load(formatter="gzip").decode("utf-8"),
-        bundle.files.tau_sf.load(formatter="gzip").decode("utf-8"),
-    )
+    # shared with tau_weights, parsed once per process
     #tagger_name = self.config_inst.x.deep_tau.tagger
     tagger_name = self.config_inst.x.deep_tau_tagger
-    self.tes_corrector = correction_set["tau_energy_scale"]
+    self.tes_corrector = get_correction(bundle.files.tau_sf, "tau_energy_scale")
 
 
 @calibrator(
@@ -163,7 +134,7 @@ def insert_calibrated_taus(
       A difficult task to do. 
       Only needed if one wants to run all channles simultaneously
     """
-    start = time.time()
+    start = time.perf_counter()
 
     etau_id   = self.config_inst.get_channel("etau").id
     mutau_id  = self.config_inst.get_channel("mutau").id
@@ -258,8 +229,6 @@ def insert_calibrated_taus(
     events = set_ak_column_f32(events, "Tau.pt", tau_pt)
     events = set_ak_column_f32(events, "Tau.mass", tau_mass)
 
-    stop = time.time()
-    if self.config_inst.x.verbose.calibration.tau:
-        print(f"replacing raw taus by calibrated taus takes : {round((stop - start)/60.0, 3)} min")
+    timing_metric("insert_calibrated_taus", start, verbose=self.config_inst.x.verbose.calibration.tau)
     
     return events
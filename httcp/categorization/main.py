@@ -7,6 +7,8 @@ Main categories file for the Higgs CP analysis
 from columnflow.categorization import Categorizer, categorizer
 from columnflow.util import maybe_import
 
+from httcp.production.processes import region_bits_pass
+
 ak = maybe_import("awkward")
 
 
@@ -41,17 +43,17 @@ def cat_tautau(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array,
 # ---------------------------------------------------------- #
 #                          For nJets                         #
 # ---------------------------------------------------------- #
-@categorizer(uses={"has_0jet"})
+@categorizer(uses={"region_bits"})
 def cat_0j(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.has_0jet
+    return events, region_bits_pass(events.region_bits, ["has_0jet"])
 
-@categorizer(uses={"has_1jet"})
+@categorizer(uses={"region_bits"})
 def cat_1j(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.has_1jet
+    return events, region_bits_pass(events.region_bits, ["has_1jet"])
 
-@categorizer(uses={"has_2jet"})
+@categorizer(uses={"region_bits"})
 def cat_2j(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.has_2jet
+    return events, region_bits_pass(events.region_bits, ["has_2jet"])
 
 # ---------------------------------------------------------- #
 #                          For PhiCP                         #
@@ -59,190 +61,177 @@ def cat_2j(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.
 
 # for tau-tau
 # tau -> pi
-@categorizer(uses={"is_pi_1"})
+@categorizer(uses={"region_bits"})
 def cat_pi_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_pi_1
+    return events, region_bits_pass(events.region_bits, ["is_pi_1"])
 # tau -> rho
-@categorizer(uses={"is_rho_1"})
+@categorizer(uses={"region_bits"})
 def cat_rho_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_rho_1
+    return events, region_bits_pass(events.region_bits, ["is_rho_1"])
 #@categorizer(uses={"is_pi_1", "is_rho_1"})
 #def cat_pi_rho_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
 #    return events, (events.is_pi_1 | events.is_rho_1)
 # tau -> a1 (DM2)
-@categorizer(uses={"is_a1_1pr_2pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm2_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_1pr_2pi0_1
+    return events, region_bits_pass(events.region_bits, ["is_a1_1pr_2pi0_1"])
 # tau -> a1 (DM10)
-@categorizer(uses={"is_a1_3pr_0pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm10_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_3pr_0pi0_1
+    return events, region_bits_pass(events.region_bits, ["is_a1_3pr_0pi0_1"])
 # tau -> a1 (DM11)
-@categorizer(uses={"is_a1_3pr_1pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm11_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_3pr_1pi0_1
+    return events, region_bits_pass(events.region_bits, ["is_a1_3pr_1pi0_1"])
 
 
-@categorizer(uses={"channel_id", "is_real_1", "has_1jet", "is_rho_1", "is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_tautau_test11(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
     ch = self.config_inst.get_channel("tautau")
-    return events, (events["channel_id"] == ch.id) & events.is_real_1 & events.has_1jet & events.is_rho_1 & events.is_os & events.is_iso_1 & events.is_iso_2 & events.is_b_veto
+    return events, (events["channel_id"] == ch.id) & region_bits_pass(events.region_bits, ["is_real_1", "has_1jet", "is_rho_1", "is_os", "is_iso_1", "is_iso_2", "is_b_veto"])
 
 
 
 # ---------- >>> for e/mu-tauh
 # tau -> pi
-@categorizer(uses={"is_pi_2"})
+@categorizer(uses={"region_bits"})
 def cat_pi_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_pi_2
+    return events, region_bits_pass(events.region_bits, ["is_pi_2"])
 # tau -> rho
-@categorizer(uses={"is_rho_2"})
+@categorizer(uses={"region_bits"})
 def cat_rho_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_rho_2
+    return events, region_bits_pass(events.region_bits, ["is_rho_2"])
 # tau -> a1 (DM2)
-@categorizer(uses={"is_a1_1pr_2pi0_2"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm2_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_1pr_2pi0_2
+    return events, region_bits_pass(events.region_bits, ["is_a1_1pr_2pi0_2"])
 # tau -> a1 (DM10)
-@categorizer(uses={"is_a1_3pr_0pi0_2"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm10_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_3pr_0pi0_2
+    return events, region_bits_pass(events.region_bits, ["is_a1_3pr_0pi0_2"])
 # tau -> a1 (DM11)
-@categorizer(uses={"is_a1_3pr_1pi0_2"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm11_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_3pr_1pi0_2
+    return events, region_bits_pass(events.region_bits, ["is_a1_3pr_1pi0_2"])
 
 # IPSig
-@categorizer(uses={"is_ipsig_0to1_1"})
+@categorizer(uses={"region_bits"})
 def cat_ipsig_0to1_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_ipsig_0to1_1
-@categorizer(uses={"is_ipsig_0to1_1"})
+    return events, region_bits_pass(events.region_bits, ["is_ipsig_0to1_1"])
+@categorizer(uses={"region_bits"})
 def cat_ipsig_1toany_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ~events.is_ipsig_0to1_1
+    return events, region_bits_pass(events.region_bits, vetoed=["is_ipsig_0to1_1"])
 
 
 # ----- >>>> to make less combinatorics for tautau
-@categorizer(uses={"is_pi_1", "is_pi_2"})
+@categorizer(uses={"region_bits"})
 def cat_pi_pi(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_pi_1 & events.is_pi_2
+    return events, region_bits_pass(events.region_bits, ["is_pi_1", "is_pi_2"])
 # tau -> pi, tau -> rho, vice versa
-@categorizer(uses={"is_pi_1", "is_rho_2",
-                   "is_pi_2", "is_rho_1"})
+@categorizer(uses={"region_bits"})
 def cat_pi_rho(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_pi_1 & events.is_rho_2) | (events.is_pi_2 & events.is_rho_1))
+    return events, region_bits_pass(events.region_bits, ["is_pi_1", "is_rho_2"]) | region_bits_pass(events.region_bits, ["is_pi_2", "is_rho_1"])
 # tau -> pi, tau -> a1 DM2, vice versa
-@categorizer(uses={"is_pi_1", "is_a1_1pr_2pi0_2",
-                   "is_pi_2", "is_a1_1pr_2pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_pi_a1dm2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_pi_1 & events.is_a1_1pr_2pi0_2) | (events.is_pi_2 & events.is_a1_1pr_2pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_pi_1", "is_a1_1pr_2pi0_2"]) | region_bits_pass(events.region_bits, ["is_pi_2", "is_a1_1pr_2pi0_1"])
 # tau -> pi, tau -> a1 DM10, vice versa
-@categorizer(uses={"is_pi_1", "is_a1_3pr_0pi0_2",
-                   "is_pi_2", "is_a1_3pr_0pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_pi_a1dm10(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_pi_1 & events.is_a1_3pr_0pi0_2) | (events.is_pi_2 & events.is_a1_3pr_0pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_pi_1", "is_a1_3pr_0pi0_2"]) | region_bits_pass(events.region_bits, ["is_pi_2", "is_a1_3pr_0pi0_1"])
 # tau -> pi, tau -> a1 DM11, vice versa
-@categorizer(uses={"is_pi_1", "is_a1_3pr_1pi0_2",
-                   "is_pi_2", "is_a1_3pr_1pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_pi_a1dm11(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_pi_1 & events.is_a1_3pr_1pi0_2) | (events.is_pi_2 & events.is_a1_3pr_1pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_pi_1", "is_a1_3pr_1pi0_2"]) | region_bits_pass(events.region_bits, ["is_pi_2", "is_a1_3pr_1pi0_1"])
 # tau -> rho, tau -> rho
-@categorizer(uses={"is_rho_1", "is_rho_2"})
+@categorizer(uses={"region_bits"})
 def cat_rho_rho(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_rho_1 & events.is_rho_2
+    return events, region_bits_pass(events.region_bits, ["is_rho_1", "is_rho_2"])
 # tau -> rho, tau -> a1 DM2, vice versa
-@categorizer(uses={"is_rho_1", "is_a1_1pr_2pi0_2",
-                   "is_rho_2", "is_a1_1pr_2pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_rho_a1dm2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_rho_1 & events.is_a1_1pr_2pi0_2) | (events.is_rho_2 & events.is_a1_1pr_2pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_rho_1", "is_a1_1pr_2pi0_2"]) | region_bits_pass(events.region_bits, ["is_rho_2", "is_a1_1pr_2pi0_1"])
 # tau -> rho, tau -> a1 DM10, vice versa
-@categorizer(uses={"is_rho_1", "is_a1_3pr_0pi0_2",
-                   "is_rho_2", "is_a1_3pr_0pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_rho_a1dm10(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_rho_1 & events.is_a1_3pr_0pi0_2) | (events.is_rho_2 & events.is_a1_3pr_0pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_rho_1", "is_a1_3pr_0pi0_2"]) | region_bits_pass(events.region_bits, ["is_rho_2", "is_a1_3pr_0pi0_1"])
 # tau -> rho, tau -> a1 DM11, vice versa
-@categorizer(uses={"is_rho_1", "is_a1_3pr_1pi0_2",
-                   "is_rho_2", "is_a1_3pr_1pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_rho_a1dm11(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_rho_1 & events.is_a1_3pr_1pi0_2) | (events.is_rho_2 & events.is_a1_3pr_1pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_rho_1", "is_a1_3pr_1pi0_2"]) | region_bits_pass(events.region_bits, ["is_rho_2", "is_a1_3pr_1pi0_1"])
 # tau -> a1 DM2, tau -> a1 DM2
-@categorizer(uses={"is_a1_1pr_2pi0_1",
-                   "is_a1_1pr_2pi0_2"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm2_a1dm2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_1pr_2pi0_1 & events.is_a1_1pr_2pi0_2
+    return events, region_bits_pass(events.region_bits, ["is_a1_1pr_2pi0_1", "is_a1_1pr_2pi0_2"])
 # tau -> a1 DM2, tau -> a1 DM10, vice versa
-@categorizer(uses={"is_a1_1pr_2pi0_1", "is_a1_3pr_0pi0_2",
-                   "is_a1_1pr_2pi0_2", "is_a1_3pr_0pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm2_a1dm10(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_a1_1pr_2pi0_1 & events.is_a1_3pr_0pi0_2) | (events.is_a1_1pr_2pi0_2 & events.is_a1_3pr_0pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_a1_1pr_2pi0_1", "is_a1_3pr_0pi0_2"]) | region_bits_pass(events.region_bits, ["is_a1_1pr_2pi0_2", "is_a1_3pr_0pi0_1"])
 # tau -> a1 DM2, tau -> a1 DM11, vice versa
-@categorizer(uses={"is_a1_1pr_2pi0_1", "is_a1_3pr_1pi0_2",
-                   "is_a1_1pr_2pi0_2", "is_a1_3pr_1pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm2_a1dm11(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_a1_1pr_2pi0_1 & events.is_a1_3pr_1pi0_2) | (events.is_a1_1pr_2pi0_2 & events.is_a1_3pr_1pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_a1_1pr_2pi0_1", "is_a1_3pr_1pi0_2"]) | region_bits_pass(events.region_bits, ["is_a1_1pr_2pi0_2", "is_a1_3pr_1pi0_1"])
 # tau -> a1 DM10, tau -> a1 DM10
-@categorizer(uses={"is_a1_3pr_0pi0_1",
-                   "is_a1_3pr_0pi0_2"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm10_a1dm10(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_3pr_0pi0_1 & events.is_a1_3pr_0pi0_2
+    return events, region_bits_pass(events.region_bits, ["is_a1_3pr_0pi0_1", "is_a1_3pr_0pi0_2"])
 # tau -> a1 DM10, tau -> a1 DM11, vice versa
-@categorizer(uses={"is_a1_3pr_0pi0_1", "is_a1_3pr_1pi0_2",
-                   "is_a1_3pr_0pi0_2", "is_a1_3pr_1pi0_1"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm10_a1dm11(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ((events.is_a1_3pr_0pi0_1 & events.is_a1_3pr_1pi0_2) | (events.is_a1_3pr_0pi0_2 & events.is_a1_3pr_1pi0_1))
+    return events, region_bits_pass(events.region_bits, ["is_a1_3pr_0pi0_1", "is_a1_3pr_1pi0_2"]) | region_bits_pass(events.region_bits, ["is_a1_3pr_0pi0_2", "is_a1_3pr_1pi0_1"])
 # tau -> a1 DM11, tau -> a1 DM11
-@categorizer(uses={"is_a1_3pr_1pi0_1", 
-                   "is_a1_3pr_1pi0_2"})
+@categorizer(uses={"region_bits"})
 def cat_a1dm11_a1dm11(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_a1_3pr_1pi0_1 & events.is_a1_3pr_1pi0_2
+    return events, region_bits_pass(events.region_bits, ["is_a1_3pr_1pi0_1", "is_a1_3pr_1pi0_2"])
 
 
 # to know true or fake tau
-@categorizer(uses={"is_real_1"})
+@categorizer(uses={"region_bits"})
 def cat_real_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_real_1
-@categorizer(uses={"is_fake_1"})
+    return events, region_bits_pass(events.region_bits, ["is_real_1"])
+@categorizer(uses={"region_bits"})
 def cat_fake_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_fake_1
-@categorizer(uses={"is_real_2"})
+    return events, region_bits_pass(events.region_bits, ["is_fake_1"])
+@categorizer(uses={"region_bits"})
 def cat_real_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_real_2
-@categorizer(uses={"is_fake_2"})
+    return events, region_bits_pass(events.region_bits, ["is_real_2"])
+@categorizer(uses={"region_bits"})
 def cat_fake_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_fake_2
+    return events, region_bits_pass(events.region_bits, ["is_fake_2"])
 
 # TODO : need to fix this later
-@categorizer(uses={"channel_id","is_real_1"})
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_tautau_real_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
     ch = self.config_inst.get_channel("tautau")
     ch_mask = events["channel_id"] == ch.id
-    return events, ch_mask & events.is_real_1
-@categorizer(uses={"channel_id","is_fake_1"})
+    return events, ch_mask & region_bits_pass(events.region_bits, ["is_real_1"])
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_tautau_fake_1(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
     ch = self.config_inst.get_channel("tautau")
     ch_mask = events["channel_id"] == ch.id
-    return events, ch_mask & events.is_fake_1
+    return events, ch_mask & region_bits_pass(events.region_bits, ["is_fake_1"])
 
-@categorizer(uses={"channel_id","is_real_2"})
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_etau_real_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
     ch = self.config_inst.get_channel("etau")
     ch_mask = events["channel_id"] == ch.id
-    return events, ch_mask & events.is_real_2
-@categorizer(uses={"channel_id","is_fake_2"})
+    return events, ch_mask & region_bits_pass(events.region_bits, ["is_real_2"])
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_etau_fake_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
     ch = self.config_inst.get_channel("etau")
     ch_mask = events["channel_id"] == ch.id
-    return events, ch_mask & events.is_fake_2
+    return events, ch_mask & region_bits_pass(events.region_bits, ["is_fake_2"])
 
-@categorizer(uses={"channel_id","is_real_2"})
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_mutau_real_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
     ch = self.config_inst.get_channel("mutau")
     ch_mask = events["channel_id"] == ch.id
-    return events, ch_mask & events.is_real_2
-@categorizer(uses={"channel_id","is_fake_2"})
+    return events, ch_mask & region_bits_pass(events.region_bits, ["is_real_2"])
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_mutau_fake_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
     ch = self.config_inst.get_channel("mutau")
     ch_mask = events["channel_id"] == ch.id
-    return events, ch_mask & events.is_fake_2
+    return events, ch_mask & region_bits_pass(events.region_bits, ["is_fake_2"])
 
 
 # ---------------------------------------------------------- #
@@ -287,37 +276,37 @@ def cat_mutau_fake_2(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.
 # ##################################################################### #
 
 # A
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_ss_iso1_iso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ~events.is_os & events.is_iso_1 & events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, ["is_iso_1", "is_iso_2"], ["is_os"]) #& events.is_b_veto
 # B
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_ss_noniso1_iso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ~events.is_os & ~events.is_iso_1 & events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, ["is_iso_2"], ["is_os", "is_iso_1"]) #& events.is_b_veto
 # A0
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_ss_iso1_noniso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ~events.is_os & events.is_iso_1 & ~events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, ["is_iso_1"], ["is_os", "is_iso_2"]) #& events.is_b_veto
 # B0
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_ss_noniso1_noniso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ~events.is_os & ~events.is_iso_1 & ~events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, vetoed=["is_os", "is_iso_1", "is_iso_2"]) #& events.is_b_veto
 # D0
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_os_iso1_noniso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & events.is_iso_1 & ~events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_iso_1"], ["is_iso_2"]) #& events.is_b_veto
 # C0
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_os_noniso1_noniso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & ~events.is_iso_1 & ~events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, ["is_os"], ["is_iso_1", "is_iso_2"]) #& events.is_b_veto
 # D
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_os_iso1_iso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & events.is_iso_1 & events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_iso_1", "is_iso_2"]) #& events.is_b_veto
 # C
-@categorizer(uses={"is_os", "is_iso_1", "is_iso_2", "is_b_veto"})
+@categorizer(uses={"region_bits"})
 def cat_os_noniso1_iso2_bveto(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & ~events.is_iso_1 & events.is_iso_2 #& events.is_b_veto
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_iso_2"], ["is_iso_1"]) #& events.is_b_veto
 
 
 ## --- e/mutau --->>>
@@ -352,47 +341,47 @@ def cat_os_noniso1_iso2_bveto(self: Categorizer, events: ak.Array, **kwargs) ->
 # C   : e/mutau [os__noniso2__nobjet__lowmt]
 
 # A
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_ss_iso2_bveto_lowmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ~events.is_os & events.is_iso_2 & events.is_b_veto & events.is_low_mt 
+    return events, region_bits_pass(events.region_bits, ["is_iso_2", "is_b_veto", "is_low_mt"], ["is_os"])
 # B
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_ss_noniso2_bveto_lowmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, ~events.is_os & ~events.is_iso_2 & events.is_b_veto & events.is_low_mt 
+    return events, region_bits_pass(events.region_bits, ["is_b_veto", "is_low_mt"], ["is_os", "is_iso_2"])
 # A0
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_os_iso2_nobveto_lowmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & events.is_iso_2 & ~events.is_b_veto & events.is_low_mt 
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_iso_2", "is_low_mt"], ["is_b_veto"])
 # B0
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_os_noniso2_nobveto_lowmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & ~events.is_iso_2 & ~events.is_b_veto & events.is_low_mt 
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_low_mt"], ["is_iso_2", "is_b_veto"])
 # A1
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_os_iso2_bveto_highmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & events.is_iso_2 & events.is_b_veto & ~events.is_low_mt 
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_iso_2", "is_b_veto"], ["is_low_mt"])
 # B1
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_os_noniso2_bveto_highmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & ~events.is_iso_2 & events.is_b_veto & ~events.is_low_mt 
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_b_veto"], ["is_iso_2", "is_low_mt"])
 # D
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_os_iso2_bveto_lowmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & events.is_iso_2 & events.is_b_veto & events.is_low_mt 
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_iso_2", "is_b_veto", "is_low_mt"])
 # C
-@categorizer(uses={"is_os", "is_iso_2", "is_b_veto", "is_low_mt"})
+@categorizer(uses={"region_bits"})
 def cat_os_noniso2_bveto_lowmt(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, events.is_os & ~events.is_iso_2 & events.is_b_veto & events.is_low_mt
+    return events, region_bits_pass(events.region_bits, ["is_os", "is_b_veto", "is_low_mt"], ["is_iso_2"])
 
 
 
 # test
-@categorizer(uses={"channel_id", "has_0jet"})
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_tautau_0j(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, (events.channel_id == 4) & events.has_0jet
-@categorizer(uses={"channel_id", "has_1jet"})
+    return events, (events.channel_id == 4) & region_bits_pass(events.region_bits, ["has_0jet"])
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_tautau_1j(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, (events.channel_id == 4) & events.has_1jet
-@categorizer(uses={"channel_id", "has_2jet"})
+    return events, (events.channel_id == 4) & region_bits_pass(events.region_bits, ["has_1jet"])
+@categorizer(uses={"channel_id", "region_bits"})
 def cat_tautau_2j(self: Categorizer, events: ak.Array, **kwargs) -> tuple[ak.Array, ak.Array]:
-    return events, (events.channel_id == 4) & events.has_2jet
+    return events, (events.channel_id == 4) & region_bits_pass(events.region_bits, ["has_2jet"])
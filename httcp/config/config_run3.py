@@ -764,6 +764,11 @@ def add_config (ana: od.Analysis,
     # tau-id working points
     # --------------------------------------------------------------------------------------------- #
 
+    # polarimetric vector of a1 legs for the PV method:
+    #   "cleo" : PolarimetricA1 (CLEO 3-pion current)
+    #   "cv"   : PolarimetricA1Vectorized of PolarimetricA1CV (Phys.Rev.D 61 (2000) 012002 current)
+    cfg.x.a1_polarimetric_model = "cleo"
+
     cfg.x.deep_tau_tagger = "DeepTau2018v2p5"
     cfg.x.deep_tau_info = DotDict.wrap({
         "DeepTau2018v2p5": {
@@ -1153,14 +1158,8 @@ def add_config (ana: od.Analysis,
             "single_mu_triggered", "cross_mu_triggered",
             "cross_tau_triggered", "cross_tau_jet_triggered",
             # --- new for categorization --- #
-            "is_os", "is_iso_1", "is_iso_2", "is_low_mt", "is_b_veto",
-            "is_real_1", "is_real_2", "is_fake_1", "is_fake_2",
-            "is_lep_1", "is_pi_1", "is_pi_2", "is_rho_1", "is_rho_2",
-            "is_a1_1pr_2pi0_1", "is_a1_1pr_2pi0_2",
-            "is_a1_3pr_0pi0_1", "is_a1_3pr_0pi0_2",
-            "is_a1_3pr_1pi0_1", "is_a1_3pr_1pi0_2",
-            "is_ipsig_0to1_1",
-            "has_0jet", "has_1jet", "has_2jet",
+            # ABCD / DM / njet flags, see REGION_BITS in httcp/production/processes.py
+            "region_bits",
             #"LHE.NpLO", "LHE.NpNLO", "LHE.Vpt", "LHE.Njets",
         } | {
             f"GenPart.{var}" for var in [
@@ -1312,14 +1311,8 @@ def add_config (ana: od.Analysis,
             "single_mu_triggered", "cross_mu_triggered",
             "cross_tau_triggered", "cross_tau_jet_triggered",
             # --- new for categorization --- #
-            "is_os", "is_iso_1", "is_iso_2", "is_low_mt", "is_b_veto",
-            "is_real_1", "is_real_2", "is_fake_1", "is_fake_2",
-            "is_lep_1", "is_pi_1", "is_pi_2", "is_rho_1", "is_rho_2",
-            "is_a1_1pr_2pi0_1", "is_a1_1pr_2pi0_2",
-            "is_a1_3pr_0pi0_1", "is_a1_3pr_0pi0_2",
-            "is_a1_3pr_1pi0_1", "is_a1_3pr_1pi0_2",
-            "is_ipsig_0to1_1",
-            "has_0jet", "has_1jet", "has_2jet",
+            # ABCD / DM / njet flags, see REGION_BITS in httcp/production/processes.py
+            "region_bits",
             "PuppiMET.*", "Jet.*",
             "TauSpinner.*", "hcand.*", "hcandprod.*"
             "GenTau.*", "GenTauProd.*",
@@ -1354,6 +1347,7 @@ def add_config (ana: od.Analysis,
         },
         "production": {
             "main"                    : False,
+            "category_flow"           : False,
         },
     })
 
@@ -0,0 +1,251 @@
+# coding: utf-8
+
+"""
+Content-addressed cache of histogram hook outputs.
+
+The hooks in hist_hooks.py redo the full data - MC subtraction on every PlotVariables1D call, also
+when only the plot styling changed. Each hook call is keyed here by
+
+  - the hook name and the content hash of the module defining the hook (code changes invalidate),
+  - the process names and content hashes (axes + bin contents, flow included) of the input hists,
+  - the id, name, tags and qcd_group of every category on the category axes,
+
+and its outputs (the processes a hook adds or replaces, or the new dict it returns) are stored as
+compressed numpy arrays in <cache dir>/<key[:2]>/<key>.npz. Since the variable axis is part of the
+input hashes, one cache serves all variables and plot calls. Additional outputs such as the
+per-group qcd / ratio hists of apply_fake_factor_AB are stored as named artifacts of the same
+entry, see load_hook_artifacts, and handed to the store_artifacts callback of the hook whenever
+they are computed, i.e. on cache misses and with the cache disabled, not on cache hits.
+
+The cache directory is $HTTCP_HIST_HOOK_CACHE, or $CF_STORE_LOCAL/httcp_hist_hooks by default;
+HTTCP_HIST_HOOK_CACHE=0 disables the cache.
+"""
+
+from __future__ import annotations
+
+import os
+import io
+import json
+import pickle
+import hashlib
+import inspect
+import tempfile
+import functools
+
+import law
+import order as od
+
+from columnflow.util import maybe_import
+
+np = maybe_import("numpy")
+hist = maybe_import("hist")
+
+logger = law.logger.get_logger(__name__)
+
+# bump to invalidate all entries when the storage format changes
+CACHE_VERSION = 1
+
+# (source path, mtime_ns, size) -> digest
+_source_digests = {}
+
+
+def hook_cache_dir() -> str | None:
+    path = os.getenv("HTTCP_HIST_HOOK_CACHE", "")
+    if path.lower() in ("0", "false", "no", "off"):
+        return None
+    if not path or path.lower() in ("1", "true", "yes", "on"):
+        base = os.getenv("CF_STORE_LOCAL") or os.path.join(tempfile.gettempdir(), os.getenv("USER", "httcp"))
+        path = os.path.join(base, "httcp_hist_hooks")
+    return os.path.abspath(os.path.expandvars(os.path.expanduser(path)))
+
+
+def hist_digest(h: hist.Histogram) -> str:
+    """
+    Hash of the axes and the bin contents (flow bins included) of *h*
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(h.storage_type).encode())
+    for ax in h.axes:
+        digest.update(f"{type(ax).__name__}:{ax.name}:{ax.traits}".encode())
+        if isinstance(ax, (hist.axis.IntCategory, hist.axis.StrCategory)):
+            digest.update(json.dumps(list(ax)).encode())
+        else:
+            digest.update(np.ascontiguousarray(ax.edges, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(h.view(flow=True)).tobytes())
+    return digest.hexdigest()
+
+
+def source_digest(func) -> str:
+    path = inspect.getsourcefile(func)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _source_digests:
+        with open(path, "rb") as f:
+            _source_digests[key] = hashlib.blake2b(f.read(), digest_size=20).hexdigest()
+    return _source_digests[key]
+
+
+def hook_cache_key(config: od.Config, name: str, func, hists: dict) -> str:
+    category_ids = sorted({
+        int(cat_id)
+        for h in hists.values()
+        for cat_id in h.axes["category"]
+    })
+    categories = []
+    for cat_id in category_ids:
+        cat_inst = config.get_category(cat_id, default=None)
+        categories.append(cat_inst and [
+            cat_inst.id,
+            cat_inst.name,
+            sorted(cat_inst.tags),
+            cat_inst.x("qcd_group", None),
+        ])
+    payload = {
+        "version": CACHE_VERSION,
+        "config": config.name,
+        "hook": name,
+        "source": source_digest(func),
+        "hists": sorted((proc.name, hist_digest(h)) for proc, h in hists.items()),
+        "categories": categories,
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+
+def entry_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key[:2], f"{key}.npz")
+
+
+def _bytes_array(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def write_entry(path: str, meta: dict, outputs: dict, artifacts: dict) -> None:
+    """
+    Store the hists *outputs* (process name -> hist) and *artifacts* (name -> hist) with *meta*,
+    hists sharing the axes of the first one are restored from a single pickled empty template
+    """
+    arrays = {}
+    template = None
+    meta = dict(meta, outputs=list(outputs), artifacts=list(artifacts))
+    for kind, hists in [("out", outputs), ("art", artifacts)]:
+        for i, h in enumerate(hists.values()):
+            if template is None:
+                template = h
+                arrays["template"] = _bytes_array(pickle.dumps(h.copy().reset()))
+            elif h.axes != template.axes or h.storage_type != template.storage_type:
+                arrays[f"{kind}:{i}:template"] = _bytes_array(pickle.dumps(h.copy().reset()))
+            arrays[f"{kind}:{i}"] = np.asarray(h.view(flow=True))
+    arrays["meta"] = _bytes_array(json.dumps(meta).encode())
+
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+
+    # write to a temporary file first, concurrent plot tasks must never see partial entries
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"could not write histogram hook cache entry {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_entry(path: str) -> tuple[dict, dict, dict] | None:
+    """
+    meta, outputs and artifacts of the entry at *path*, None if missing or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes())
+            template = pickle.loads(data["template"].tobytes()) if "template" in data else None
+            restored = {}
+            for kind in ["out", "art"]:
+                restored[kind] = {}
+                for i, name in enumerate(meta["outputs" if kind == "out" else "artifacts"]):
+                    tpl_key = f"{kind}:{i}:template"
+                    tpl = pickle.loads(data[tpl_key].tobytes()) if tpl_key in data else template
+                    h = tpl.copy()
+                    h.view(flow=True)[...] = data[f"{kind}:{i}"]
+                    restored[kind][name] = h
+    except Exception as e:
+        logger.warning(f"ignoring unreadable histogram hook cache entry {path}: {e}")
+        return None
+    return meta, restored["out"], restored["art"]
+
+
+def load_hook_artifacts(path: str) -> dict[str, hist.Histogram]:
+    """
+    Artifacts (name -> hist) stored by a hook, e.g. the per-group qcd and ratio hists of
+    apply_fake_factor_AB; the entry path is logged when the artifacts are written
+    """
+    entry = read_entry(path)
+    if entry is None:
+        raise FileNotFoundError(f"no readable histogram hook cache entry at {path}")
+    return entry[2]
+
+
+def cached_hook(config: od.Config, name: str, func, with_artifacts: bool = False, store_artifacts=None):
+    """
+    Wraps the hook *func* (task, hists) into a cached one. With *with_artifacts*, *func* receives
+    a third argument, a dict it can fill with additional named hists to be stored in the entry.
+    *store_artifacts* (artifacts dict -> None) is called with the artifacts whenever they are
+    computed, cache hits keep them in the entry only.
+    """
+    def call(task, hists, artifacts):
+        return func(task, hists, artifacts) if with_artifacts else func(task, hists)
+
+    def store(artifacts):
+        if artifacts and store_artifacts is not None:
+            store_artifacts(artifacts)
+
+    @functools.wraps(func)
+    def hook(task, hists):
+        cache_dir = hook_cache_dir()
+        if not hists or cache_dir is None:
+            artifacts = {}
+            result = call(task, hists, artifacts)
+            store(artifacts)
+            return result
+
+        path = entry_path(cache_dir, hook_cache_key(config, name, func, hists))
+        entry = read_entry(path)
+        if entry is not None:
+            meta, outputs, _ = entry
+            logger.debug(f"using cached outputs of histogram hook {name} from {path}")
+            procs = {proc.name: proc for proc in hists}
+            outputs = {
+                procs.get(proc_name) or config.get_process(proc_name): h
+                for proc_name, h in outputs.items()
+            }
+            if meta["mode"] == "update":
+                hists.update(outputs)
+                return hists
+            return outputs
+
+        # remember the input objects to find the processes added or replaced by the hook
+        inputs = dict(hists)
+        artifacts = {}
+        result = call(task, hists, artifacts)
+        if result is hists:
+            mode = "update"
+            outputs = {proc: h for proc, h in result.items() if inputs.get(proc) is not h}
+        else:
+            mode = "new"
+            outputs = result
+        write_entry(
+            path,
+            {"hook": name, "mode": mode},
+            {proc.name: h for proc, h in outputs.items()},
+            artifacts,
+        )
+        if artifacts:
+            logger.info(f"stored {len(artifacts)} artifacts of histogram hook {name} in {path}")
+        store(artifacts)
+        return result
+
+    return hook
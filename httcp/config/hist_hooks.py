@@ -2,22 +2,30 @@
 
 """
 Histogram hooks.
+
+All hooks are configurations of one engine: the categories are grouped (by their qcd_group aux
+entry or by explicit DM x njet tags) into regions, the histograms of all groups are stacked into
+(region, group, shift, variable) arrays with a single gather, the estimates are computed once
+on these stacks with scinum array arithmetic (same uncertainty propagation as the former per-group
+loops) and written back through a category id -> axis index map.
 """
 
 from __future__ import annotations
 
+import os
+import pickle
+import functools
+import operator
 from collections import defaultdict
 
 import law
 import order as od
 import scinum as sn
-import json
-import pickle
-import numpy as np
-from collections import defaultdict
 
 from columnflow.util import maybe_import, DotDict
 
+from httcp.config.hist_hook_cache import cached_hook
+
 np = maybe_import("numpy")
 hist = maybe_import("hist")
 
@@ -26,322 +34,329 @@ hist = maybe_import("hist")
 logger = law.logger.get_logger(__name__)
 
 
-def add_hist_hooks(config: od.Config) -> None:
+# region name -> (required tags, vetoed tags) of its categories
+ABCD_REGIONS = {
+    "os_iso"    : ({"os", "iso"},    set()),
+    "os_noniso" : ({"os", "noniso"}, set()),
+    "ss_iso"    : ({"ss", "iso"},    set()),
+    "ss_noniso" : ({"ss", "noniso"}, set()),
+}
+ABCD_REGIONS_ISO1 = {
+    "os_iso"    : ({"os", "iso1"},    set()),
+    "os_noniso" : ({"os", "noniso1"}, set()),
+    "ss_iso"    : ({"ss", "iso1"},    set()),
+    "ss_noniso" : ({"ss", "noniso1"}, set()),
+}
+# fake factor application: C -> D (os) and B -> A (ss), the target region is always called os_iso
+FF_APPLY_REGIONS = {
+    "os_iso"    : ({"os", "iso1"},    {"noniso2"}),  # cat D
+    "os_noniso" : ({"os", "noniso1"}, {"noniso2"}),  # cat C
+}
+FF_APPLY_REGIONS_AB = {
+    "os_iso"    : ({"ss", "iso1"},    {"noniso2"}),  # cat A
+    "os_noniso" : ({"ss", "noniso1"}, {"noniso2"}),  # cat B
+}
+# one fake factor application group per decay mode and jet multiplicity
+FF_DMS   = ["tau1a1DM11", "tau1a1DM10", "tau1a1DM2", "tau1pi", "tau1rho"]
+FF_NJETS = ["has0j", "has1j", "has2j"]
+FF_APPLY_GROUPS = {
+    f"dm_{dm}_njet_{njet}": {dm, njet}
+    for dm in FF_DMS
+    for njet in FF_NJETS
+}
+# INDICATE WHICH CATEGORY TO CALCULATE THE INCLUSIVE FACTOR FOR ! e.g. "incl", "2j" ...
+# the etau group is a proxy for the combined etau + mutau + tautau group
+FF_INCL_CATEGORIES = ["incl"]
+FF_INCL_CHANNELS   = ["etau", "mutau", "tautau"]
+
+# the per-group qcd and ratio hists of apply_fake_factor_AB are artifacts of its hook cache entry
+# (see load_hook_artifacts), they are also pickled when they are computed if $HTTCP_FF_AB_OUTPUT is
+# set, with the layout of the former fixed output directory:
+#   qcd_<variable>_<group>.pkl                  qcd hist filled up to and including <group>
+#   Ratio/ratio_<variable>_<group>_<cat id>.pkl  data hist with data / mc in the os_iso category of <group>
+#   Ratio/RATIO_<variable>_inclusive.pkl         data / mc summed over all groups
+FF_AB_OUTPUT_PATH = os.getenv("HTTCP_FF_AB_OUTPUT") or None
+
+
+def store_ff_ab_outputs(artifacts: dict) -> None:
     """
-    Add histogram hooks to a configuration.
+    Pickles the artifacts of apply_fake_factor_AB to <FF_AB_OUTPUT_PATH>/<artifact name>.pkl, if
+    FF_AB_OUTPUT_PATH is set
     """
-    # helper to convert a histogram to a number object containing bin values and uncertainties
-    # from variances stored in an array of values
-    def hist_to_num(h: hist.Histogram, unc_name=str(sn.DEFAULT)) -> sn.Number:
-        return sn.Number(h.values(), {unc_name: h.variances()**0.5})
-
-    # helper to integrate values stored in an array based number object
-    def integrate_num(num: sn.Number, axis=None) -> sn.Number:
-        return sn.Number(
-            nominal=num.nominal.sum(axis=axis),
-            uncertainties={
-                unc_name: (
-                    (unc_values_up**2).sum(axis=axis)**0.5,
-                    (unc_values_down**2).sum(axis=axis)**0.5,
-                )
-                for unc_name, (unc_values_up, unc_values_down) in num.uncertainties.items()
-            },
-        )
+    if not FF_AB_OUTPUT_PATH:
+        return
+    for name, h in artifacts.items():
+        path = os.path.join(FF_AB_OUTPUT_PATH, f"{name}.pkl")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(h, f)
+    logger.info(f"stored {len(artifacts)} apply_fake_factor_AB hists in {FF_AB_OUTPUT_PATH}")
+
+
+# helper to integrate values stored in an array based number object
+def integrate_num(num: sn.Number, axis=None) -> sn.Number:
+    return sn.Number(
+        nominal=num.nominal.sum(axis=axis),
+        uncertainties={
+            unc_name: (
+                (unc_values_up**2).sum(axis=axis)**0.5,
+                (unc_values_down**2).sum(axis=axis)**0.5,
+            )
+            for unc_name, (unc_values_up, unc_values_down) in num.uncertainties.items()
+        },
+    )
 
-    def qcd_estimation(task, hists):
-        if not hists:
-            return hists
 
-        # get the qcd process
-        qcd_proc = config.get_process("qcd", default=None)
-        if not qcd_proc:
-            return hists
+def sum_hists(hists: list[hist.Histogram]) -> hist.Histogram:
+    return sum(hists[1:], hists[0].copy())
+
 
-        # extract all unique category ids and verify that the axis order is exactly
-        # "category -> shift -> variable" which is needed to insert values at the end
-        CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
-        category_ids = set()
-        for proc, h in hists.items():
-            # validate axes
-            assert len(h.axes) == 3
-            assert h.axes[CAT_AXIS].name == "category"
-            assert h.axes[SHIFT_AXIS].name == "shift"
-            # get the category axis
-            cat_ax = h.axes["category"]
-            for cat_index in range(cat_ax.size):
-                category_ids.add(cat_ax.value(cat_index))
-
-        # create qcd groups
-        qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
+def get_category_ids(hists: dict) -> set[int]:
+    """
+    All unique category ids, verifies that the axis order is exactly
+    "category -> shift -> variable" which is needed to insert values at the end
+    """
+    CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
+    category_ids = set()
+    for proc, h in hists.items():
+        # validate axes
+        assert len(h.axes) == 3
+        assert h.axes[CAT_AXIS].name == "category"
+        assert h.axes[SHIFT_AXIS].name == "shift"
+        # get the category axis
+        cat_ax = h.axes["category"]
+        for cat_index in range(cat_ax.size):
+            category_ids.add(cat_ax.value(cat_index))
+    return category_ids
+
+
+def get_category_index_map(h: hist.Histogram) -> dict[int, int]:
+    """
+    category id -> index on the category axis of *h*
+    """
+    cat_ax = h.axes["category"]
+    return {cat_ax.value(cat_index): cat_index for cat_index in range(cat_ax.size)}
+
+
+def build_groups(
+    config: od.Config,
+    category_ids: set[int],
+    regions: dict[str, tuple[set, set]],
+    groups: dict[str, set] | None = None,
+) -> dict[str, DotDict]:
+    """
+    Complete groups (one category per region) in order of appearance. The groups are given by the
+    qcd_group aux entry of the categories, or by *groups*: group name -> additionally required tags.
+    """
+    def region_of(cat_inst, extra_tags=set()):
+        for region, (tags, veto_tags) in regions.items():
+            if cat_inst.has_tag(tags | extra_tags, mode=all) and not (veto_tags and cat_inst.has_tag(veto_tags, mode=any)):
+                return region
+        return None
+
+    qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
+    if groups is None:
         for cat_id in category_ids:
             cat_inst = config.get_category(cat_id)
-            if cat_inst.has_tag({"os", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_iso = cat_inst
-            elif cat_inst.has_tag({"os", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_noniso = cat_inst
-            elif cat_inst.has_tag({"ss", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_iso = cat_inst
-            elif cat_inst.has_tag({"ss", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_noniso = cat_inst
-
-        # get complete qcd groups
-        complete_groups = [name for name, cats in qcd_groups.items() if len(cats) == 4]
-
-        # nothing to do if there are no complete groups
-        if not complete_groups:
-            return hists
+            region = region_of(cat_inst)
+            if region:
+                qcd_groups[cat_inst.x.qcd_group][region] = cat_inst
+    else:
+        for group_name, group_tags in groups.items():
+            for cat_id in category_ids:
+                cat_inst = config.get_category(cat_id)
+                region = region_of(cat_inst, group_tags)
+                if region:
+                    qcd_groups[group_name][region] = cat_inst
+
+    return {name: cats for name, cats in qcd_groups.items() if len(cats) == len(regions)}
+
+
+def stack_regions(
+    h: hist.Histogram,
+    groups: dict[str, DotDict],
+    regions: list[str],
+    kind: str,
+    missing_ok: bool = False,
+) -> dict[str, sn.Number]:
+    """
+    Number objects of shape (GROUP, SHIFT, VAR) per region, with one uncertainty "<region>_<kind>".
+    Categories that are missing on the axis of *h* are zero if *missing_ok*, an error otherwise.
+    """
+    cat_index = get_category_index_map(h)
+    # shape: (REGION, GROUP)
+    cat_ids = np.array([[group[region].id for group in groups.values()] for region in regions], dtype=np.int64)
+    idx = np.array([cat_index.get(cat_id, -1) for cat_id in cat_ids.flat], dtype=np.intp).reshape(cat_ids.shape)
+    missing = idx < 0
+    if missing.any() and not missing_ok:
+        raise KeyError(f"categories {cat_ids[missing].tolist()} not found on the category axis of {h}")
+
+    # one gather for all regions and groups, shapes: (REGION, GROUP, SHIFT, VAR)
+    values, variances = h.values()[idx], h.variances()[idx]
+    values[missing] = 0
+    variances[missing] = 0
+    return {
+        region: sn.Number(values[i], {f"{region}_{kind}": variances[i]**0.5})
+        for i, region in enumerate(regions)
+    }
 
-        # sum up mc and data histograms, stop early when empty
-        mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
-        data_hists = [h for p, h in hists.items() if p.is_data]
-        if not mc_hists or not data_hists:
-            return hists
-        mc_hist = sum(mc_hists[1:], mc_hists[0].copy())
-        data_hist = sum(data_hists[1:], data_hists[0].copy())
 
-        # start by copying the mc hist and reset it, then fill it at specific category slices
-        hists[qcd_proc] = qcd_hist = mc_hist.copy().reset()
-        for group_name in complete_groups:
-            group = qcd_groups[group_name]
-
-            # get the corresponding histograms and convert them to number objects,
-            # each one storing an array of values with uncertainties
-            # shapes: (SHIFT, VAR)
-            get_hist = lambda h, region_name: h[{"category": hist.loc(group[region_name].id)}]
-            os_noniso_mc = hist_to_num(get_hist(mc_hist, "os_noniso"), "os_noniso_mc")
-            ss_noniso_mc = hist_to_num(get_hist(mc_hist, "ss_noniso"), "ss_noniso_mc")
-            ss_iso_mc = hist_to_num(get_hist(mc_hist, "ss_iso"), "ss_iso_mc")
-            os_noniso_data = hist_to_num(get_hist(data_hist, "os_noniso"), "os_noniso_data")
-            ss_noniso_data = hist_to_num(get_hist(data_hist, "ss_noniso"), "ss_noniso_data")
-            ss_iso_data = hist_to_num(get_hist(data_hist, "ss_iso"), "ss_iso_data")
-
-            # estimate qcd shapes in the three sideband regions
-            # shapes: (SHIFT, VAR)
-            os_noniso_qcd = os_noniso_data - os_noniso_mc
-            ss_iso_qcd = ss_iso_data - ss_iso_mc
-            ss_noniso_qcd = ss_noniso_data - ss_noniso_mc
-
-            # get integrals in ss regions for the transfer factor
-            # shapes: (SHIFT,)
-            int_ss_iso = integrate_num(ss_iso_qcd, axis=1)
-            int_ss_noniso = integrate_num(ss_noniso_qcd, axis=1)
-
-            # complain about negative integrals
-            int_ss_iso_neg = int_ss_iso <= 0
-            int_ss_noniso_neg = int_ss_noniso <= 0
-            if int_ss_iso_neg.any():
-                shift_ids = list(map(mc_hist.axes["shift"].value, np.where(int_ss_iso_neg)[0]))
-                shifts = list(map(config.get_shift, shift_ids))
-                logger.warning(
-                    f"negative QCD integral in ss_iso region for group {group_name} and shifts: "
-                    f"{', '.join(map(str, shifts))}",
-                )
-            if int_ss_noniso_neg.any():
-                shift_ids = list(map(mc_hist.axes["shift"].value, np.where(int_ss_noniso_neg)[0]))
-                shifts = list(map(config.get_shift, shift_ids))
-                logger.warning(
-                    f"negative QCD integral in ss_noniso region for group {group_name} and shifts: "
-                    f"{', '.join(map(str, shifts))}",
-                )
-
-            # ABCD method
-            # shape: (SHIFT, VAR)
-            os_iso_qcd = os_noniso_qcd * ((int_ss_iso / int_ss_noniso)[:, None])
-
-            # combine uncertainties and store values in bare arrays
-            os_iso_qcd_values = os_iso_qcd()
-            os_iso_qcd_variances = os_iso_qcd(sn.UP, sn.ALL, unc=True)**2
-
-            # define uncertainties
-            unc_data = os_iso_qcd(sn.UP, ["os_noniso_data", "ss_iso_data", "ss_noniso_data"], unc=True)
-            unc_mc = os_iso_qcd(sn.UP, ["os_noniso_mc", "ss_iso_mc", "ss_noniso_mc"], unc=True)
-            unc_data_rel = abs(unc_data / os_iso_qcd_values)
-            unc_mc_rel = abs(unc_mc / os_iso_qcd_values)
-
-            # only keep the MC uncertainty if it is larger than the data uncertainty and larger than 15%
-            keep_variance_mask = (
-                np.isfinite(unc_mc_rel) &
-                (unc_mc_rel > unc_data_rel) &
-                (unc_mc_rel > 0.15)
+def fill_categories(
+    h: hist.Histogram,
+    cat_ids: list[int],
+    values: np.ndarray,
+    variances: np.ndarray | None = None,
+) -> None:
+    """
+    Insert (GROUP, SHIFT, VAR) values and variances at the categories *cat_ids* of *h*
+    """
+    cat_index = get_category_index_map(h)
+    missing = [cat_id for cat_id in cat_ids if cat_id not in cat_index]
+    if missing:
+        raise RuntimeError(
+            f"could not find index of bin on 'category' axis of histogram {h} "
+            f"for categories {missing}",
+        )
+    idx = np.array([cat_index[cat_id] for cat_id in cat_ids], dtype=np.intp)
+    h.view().value[idx, ...] = values
+    if variances is not None:
+        h.view().variance[idx, ...] = variances
+
+
+def warn_negative_integrals(config, h, groups, region, neg_mask) -> None:
+    # neg_mask: (GROUP, SHIFT)
+    for group_name, group_neg in zip(groups, neg_mask):
+        if group_neg.any():
+            shift_ids = list(map(h.axes["shift"].value, np.where(group_neg)[0]))
+            shifts = list(map(config.get_shift, shift_ids))
+            logger.warning(
+                f"negative QCD integral in {region} region for group {group_name} and shifts: "
+                f"{', '.join(map(str, shifts))}",
             )
-            os_iso_qcd_variances[keep_variance_mask] = unc_mc[keep_variance_mask]**2
-            os_iso_qcd_variances[~keep_variance_mask] = 0
-
-            # retro-actively set values to zero for shifts that had negative integrals
-            neg_int_mask = int_ss_iso_neg | int_ss_noniso_neg
-            os_iso_qcd_values[neg_int_mask] = 1e-5
-            os_iso_qcd_variances[neg_int_mask] = 0
-
-            # residual zero filling
-            zero_mask = os_iso_qcd_values <= 0
-            os_iso_qcd_values[zero_mask] = 1e-5
-            os_iso_qcd_variances[zero_mask] = 0
-
-            # insert values into the qcd histogram
-            cat_axis = qcd_hist.axes["category"]
-            for cat_index in range(cat_axis.size):
-                if cat_axis.value(cat_index) == group.os_iso.id:
-                    qcd_hist.view().value[cat_index, ...] = os_iso_qcd_values
-                    qcd_hist.view().variance[cat_index, ...] = os_iso_qcd_variances
-                    break
-            else:
-                raise RuntimeError(
-                    f"could not find index of bin on 'category' axis of qcd histogram {qcd_hist} "
-                    f"for category {group.os_iso}",
-                )
 
-        return hists
 
-    def qcd_inverted(task, hists):
-        if not hists:
-            return hists
+def abcd_estimate(config, mc_hist, data_hist, groups, shape, numerator, denominator):
+    """
+    ABCD estimate in the os_iso region of all groups: the data - mc shape of region *shape* scaled
+    by the ratio of the data - mc integrals in the regions *numerator* and *denominator*.
+    Returns values and variances of shape (GROUP, SHIFT, VAR).
+    """
+    regions = [shape, numerator, denominator]
+    mc = stack_regions(mc_hist, groups, regions, "mc")
+    data = stack_regions(data_hist, groups, regions, "data")
+
+    # estimate qcd shapes in the three sideband regions
+    # shapes: (GROUP, SHIFT, VAR)
+    qcd = {region: data[region] - mc[region] for region in regions}
+
+    # get integrals for the transfer factor
+    # shapes: (GROUP, SHIFT)
+    int_num = integrate_num(qcd[numerator], axis=-1)
+    int_den = integrate_num(qcd[denominator], axis=-1)
+
+    # complain about negative integrals
+    int_num_neg = int_num <= 0
+    int_den_neg = int_den <= 0
+    warn_negative_integrals(config, mc_hist, groups, numerator, int_num_neg)
+    warn_negative_integrals(config, mc_hist, groups, denominator, int_den_neg)
+
+    # ABCD method
+    # shape: (GROUP, SHIFT, VAR)
+    os_iso_qcd = qcd[shape] * ((int_num / int_den)[..., None])
+
+    # combine uncertainties and store values in bare arrays
+    os_iso_qcd_values = os_iso_qcd()
+    os_iso_qcd_variances = os_iso_qcd(sn.UP, sn.ALL, unc=True)**2
+
+    # define uncertainties
+    unc_data = os_iso_qcd(sn.UP, [f"{region}_data" for region in regions], unc=True)
+    unc_mc = os_iso_qcd(sn.UP, [f"{region}_mc" for region in regions], unc=True)
+    unc_data_rel = abs(unc_data / os_iso_qcd_values)
+    unc_mc_rel = abs(unc_mc / os_iso_qcd_values)
+
+    # only keep the MC uncertainty if it is larger than the data uncertainty and larger than 15%
+    keep_variance_mask = (
+        np.isfinite(unc_mc_rel) &
+        (unc_mc_rel > unc_data_rel) &
+        (unc_mc_rel > 0.15)
+    )
+    os_iso_qcd_variances[keep_variance_mask] = unc_mc[keep_variance_mask]**2
+    os_iso_qcd_variances[~keep_variance_mask] = 0
+
+    # retro-actively set values to zero for shifts that had negative integrals
+    neg_int_mask = int_num_neg | int_den_neg
+    os_iso_qcd_values[neg_int_mask] = 1e-5
+    os_iso_qcd_variances[neg_int_mask] = 0
+
+    # residual zero filling
+    zero_mask = os_iso_qcd_values <= 0
+    os_iso_qcd_values[zero_mask] = 1e-5
+    os_iso_qcd_variances[zero_mask] = 0
+
+    return os_iso_qcd_values, os_iso_qcd_variances
+
+
+def fake_factors(ss_iso_qcd: sn.Number, ss_noniso_qcd: sn.Number):
+    """
+    pt-dependent fake factor values and variances and the pt-independent one (first shift),
+    broadcast to the same (GROUP, SHIFT, VAR) shape for plotting
+    """
+    # calculate the pt-independent fake factor
+    int_ss_iso = integrate_num(ss_iso_qcd, axis=-1)
+    int_ss_noniso = integrate_num(ss_noniso_qcd, axis=-1)
+    fake_factor_int = (int_ss_iso / int_ss_noniso)[:, 0]
 
-        # get the qcd process
-        qcd_proc = config.get_process("qcd", default=None)
-        if not qcd_proc:
-            return hists
+    # calculate the pt-dependent fake factor
+    fake_factor = ss_iso_qcd / ss_noniso_qcd
+    fake_factor_values = np.nan_to_num(fake_factor())
+    fake_factor_variances = fake_factor(sn.UP, sn.ALL, unc=True)**2
 
-        # extract all unique category ids and verify that the axis order is exactly
-        # "category -> shift -> variable" which is needed to insert values at the end
-        CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
-        category_ids = set()
-        for proc, h in hists.items():
-            # validate axes
-            assert len(h.axes) == 3
-            assert h.axes[CAT_AXIS].name == "category"
-            assert h.axes[SHIFT_AXIS].name == "shift"
-            # get the category axis
-            cat_ax = h.axes["category"]
-            for cat_index in range(cat_ax.size):
-                category_ids.add(cat_ax.value(cat_index))
-
-        # create qcd groups
-        qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
-        for cat_id in category_ids:
-            cat_inst = config.get_category(cat_id)
-            if cat_inst.has_tag({"os", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_iso = cat_inst
-            elif cat_inst.has_tag({"os", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_noniso = cat_inst
-            elif cat_inst.has_tag({"ss", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_iso = cat_inst
-            elif cat_inst.has_tag({"ss", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_noniso = cat_inst
-
-        # get complete qcd groups
-        complete_groups = [name for name, cats in qcd_groups.items() if len(cats) == 4]
-
-        # nothing to do if there are no complete groups
-        if not complete_groups:
-            return hists
+    # change shape of fake_factor_int for plotting
+    fake_factor_int_values = np.broadcast_to(
+        np.reshape(fake_factor_int(), (-1, 1, 1)),
+        fake_factor_values.shape,
+    ).copy()
 
-        # sum up mc and data histograms, stop early when empty
-        mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
-        data_hists = [h for p, h in hists.items() if p.is_data]
-        if not mc_hists or not data_hists:
-            return hists
-        mc_hist = sum(mc_hists[1:], mc_hists[0].copy())
-        data_hist = sum(data_hists[1:], data_hists[0].copy())
+    return fake_factor_values, fake_factor_variances, fake_factor_int_values
 
-        # start by copying the mc hist and reset it, then fill it at specific category slices
-        hists[qcd_proc] = qcd_hist = mc_hist.copy().reset()
-        for group_name in complete_groups:
-            group = qcd_groups[group_name]
-
-            # get the corresponding histograms and convert them to number objects,
-            # each one storing an array of values with uncertainties
-            # shapes: (SHIFT, VAR)
-            get_hist = lambda h, region_name: h[{"category": hist.loc(group[region_name].id)}]
-            os_noniso_mc = hist_to_num(get_hist(mc_hist, "os_noniso"), "os_noniso_mc")
-            ss_noniso_mc = hist_to_num(get_hist(mc_hist, "ss_noniso"), "ss_noniso_mc")
-            ss_iso_mc = hist_to_num(get_hist(mc_hist, "ss_iso"), "ss_iso_mc")
-            os_noniso_data = hist_to_num(get_hist(data_hist, "os_noniso"), "os_noniso_data")
-            ss_noniso_data = hist_to_num(get_hist(data_hist, "ss_noniso"), "ss_noniso_data")
-            ss_iso_data = hist_to_num(get_hist(data_hist, "ss_iso"), "ss_iso_data")
-
-            # estimate qcd shapes in the three sideband regions
-            # shapes: (SHIFT, VAR)
-            os_noniso_qcd = os_noniso_data - os_noniso_mc
-            ss_iso_qcd = ss_iso_data - ss_iso_mc
-            ss_noniso_qcd = ss_noniso_data - ss_noniso_mc
-
-            # get integrals in ss regions for the transfer factor
-            # shapes: (SHIFT,)
-            int_ss_noniso = integrate_num(ss_noniso_qcd, axis=1)
-            int_os_noniso = integrate_num(os_noniso_qcd, axis=1)
-
-            # complain about negative integrals
-            int_ss_noniso_neg = int_ss_noniso <= 0
-            int_os_noniso_neg = int_os_noniso <= 0
-            if int_ss_noniso_neg.any():
-                shift_ids = list(map(mc_hist.axes["shift"].value, np.where(int_ss_noniso_neg)[0]))
-                shifts = list(map(config.get_shift, shift_ids))
-                logger.warning(
-                    f"negative QCD integral in ss_iso region for group {group_name} and shifts: "
-                    f"{', '.join(map(str, shifts))}",
-                )
-            if int_os_noniso_neg.any():
-                shift_ids = list(map(mc_hist.axes["shift"].value, np.where(int_os_noniso_neg)[0]))
-                shifts = list(map(config.get_shift, shift_ids))
-                logger.warning(
-                    f"negative QCD integral in ss_noniso region for group {group_name} and shifts: "
-                    f"{', '.join(map(str, shifts))}",
-                )
-
-            # ABCD method
-            # shape: (SHIFT, VAR)
-            os_iso_qcd = ss_iso_qcd * ((int_os_noniso / int_ss_noniso)[:, None])
-
-            # combine uncertainties and store values in bare arrays
-            os_iso_qcd_values = os_iso_qcd()
-            os_iso_qcd_variances = os_iso_qcd(sn.UP, sn.ALL, unc=True)**2
-
-            # define uncertainties
-            unc_data = os_iso_qcd(sn.UP, ["ss_iso_data", "os_noniso_data", "ss_noniso_data"], unc=True)
-            unc_mc = os_iso_qcd(sn.UP, ["ss_iso_mc", "os_noniso_mc", "ss_noniso_mc"], unc=True)
-            unc_data_rel = abs(unc_data / os_iso_qcd_values)
-            unc_mc_rel = abs(unc_mc / os_iso_qcd_values)
-
-            # only keep the MC uncertainty if it is larger than the data uncertainty and larger than 15%
-            keep_variance_mask = (
-                np.isfinite(unc_mc_rel) &
-                (unc_mc_rel > unc_data_rel) &
-                (unc_mc_rel > 0.15)
-            )
-            os_iso_qcd_variances[keep_variance_mask] = unc_mc[keep_variance_mask]**2
-            os_iso_qcd_variances[~keep_variance_mask] = 0
-
-            # retro-actively set values to zero for shifts that had negative integrals
-            neg_int_mask = int_os_noniso_neg | int_ss_noniso_neg
-            os_iso_qcd_values[neg_int_mask] = 1e-5
-            os_iso_qcd_variances[neg_int_mask] = 0
-
-            # residual zero filling
-            zero_mask = os_iso_qcd_values <= 0
-            os_iso_qcd_values[zero_mask] = 1e-5
-            os_iso_qcd_variances[zero_mask] = 0
-
-            # insert values into the qcd histogram
-            cat_axis = qcd_hist.axes["category"]
-            for cat_index in range(cat_axis.size):
-                if cat_axis.value(cat_index) == group.os_iso.id:
-                    qcd_hist.view().value[cat_index, ...] = os_iso_qcd_values
-                    qcd_hist.view().variance[cat_index, ...] = os_iso_qcd_variances
-                    break
-            else:
-                raise RuntimeError(
-                    f"could not find index of bin on 'category' axis of qcd histogram {qcd_hist} "
-                    f"for category {group.os_iso}",
-                )
 
-        return hists
+def fake_subtraction(mc_hist, data_hist, groups):
+    """
+    data - mc in the os_noniso region of all groups, missing categories count as empty.
+    Returns values and variances of shape (GROUP, SHIFT, VAR).
+    """
+    os_noniso_mc = stack_regions(mc_hist, groups, ["os_noniso"], "mc", missing_ok=True)["os_noniso"]
+    os_noniso_data = stack_regions(data_hist, groups, ["os_noniso"], "data", missing_ok=True)["os_noniso"]
 
-    def closure_test(task, hists):
+    ## DATA - MC of region C (FF are already apply to them)
+    fake_hist = os_noniso_data - os_noniso_mc
 
-        print("------------------------------------------")
-        print("------ Entering closure test hook --------")
-        print("------------------------------------------")
+    # combine uncertainties and store values in bare arrays
+    fake_hist_values = fake_hist()
+    fake_hist_variances = fake_hist(sn.UP, sn.ALL, unc=True)**2
+
+    # Guaranty positive values of fake_hist
+    neg_int_mask = fake_hist_values <= 0
+    fake_hist_values[neg_int_mask] = 1e-5
+    fake_hist_variances[neg_int_mask] = 0
+
+    return fake_hist_values, fake_hist_variances
 
+
+def mc_data_sums(hists):
+    # sum up mc and data histograms, None when either is empty
+    mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
+    data_hists = [h for p, h in hists.items() if p.is_data]
+    if not mc_hists or not data_hists:
+        return None
+    return sum_hists(mc_hists), sum_hists(data_hists)
+
+
+def add_hist_hooks(config: od.Config) -> None:
+    """
+    Add histogram hooks to a configuration.
+    """
+    def abcd_hook(hists, shape, numerator, denominator, inputs=mc_data_sums):
         if not hists:
             return hists
 
@@ -350,259 +365,62 @@ def add_hist_hooks(config: od.Config) -> None:
         if not qcd_proc:
             return hists
 
-        # extract all unique category ids and verify that the axis order is exactly
-        # "category -> shift -> variable" which is needed to insert values at the end
-        CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
-        category_ids = set()
-        for proc, h in hists.items():
-            # validate axes
-            assert len(h.axes) == 3
-            assert h.axes[CAT_AXIS].name == "category"
-            assert h.axes[SHIFT_AXIS].name == "shift"
-            # get the category axis
-            cat_ax = h.axes["category"]
-            for cat_index in range(cat_ax.size):
-                category_ids.add(cat_ax.value(cat_index))
-
-        # create qcd groups
-        qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
-        for cat_id in category_ids:
-            cat_inst = config.get_category(cat_id)
-            if cat_inst.has_tag({"os", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_iso = cat_inst
-            elif cat_inst.has_tag({"os", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_noniso = cat_inst
-            elif cat_inst.has_tag({"ss", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_iso = cat_inst
-            elif cat_inst.has_tag({"ss", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_noniso = cat_inst
-
-        # get complete qcd groups
-        complete_groups = [name for name, cats in qcd_groups.items() if len(cats) == 4]
-
-        # nothing to do if there are no complete groups
-        if not complete_groups:
+        # create qcd groups, nothing to do if there are no complete groups
+        groups = build_groups(config, get_category_ids(hists), ABCD_REGIONS)
+        if not groups:
             return hists
 
-        # sum up mc, use MC qcd as pseudo data and stop early when either is empty
-        mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal") and not p.has_tag("qcd")]
-        data_qcd_hists = [h for p, h in hists.items() if p.has_tag("qcd")]
-        if not mc_hists or not data_qcd_hists:
+        # stop early when mc or data is empty
+        sums = inputs(hists)
+        if sums is None:
             return hists
-        mc_hist = sum(mc_hists[1:], mc_hists[0].copy())
-        data_qcd_hists = sum(data_qcd_hists[1:], mc_hists[0].copy())
-        data_hist_tmp = data_qcd_hists + mc_hist
-
-        data_hists = [h for p, h in hists.items() if p.is_data]
-        data_hist = sum(data_hists[1:], data_hists[0].copy())
-        data_qcd_hist = data_hist.copy().reset()
-        data_qcd_hist.fill(data_hist_tmp)
-
-        print("")
-        print("mc_hist len: ", len(mc_hist))
-        print("data_qcd_hists len: ", len(data_qcd_hists))
-        print("data_qcd_hist len: ", len(data_qcd_hist))
-        print("")
-
-        # start by copying the mc hist and reset it, then fill it at specific category slices
+        mc_hist, data_hist = sums
+
+        # start by copying the mc hist and reset it, then fill it at the os_iso categories
         hists[qcd_proc] = qcd_hist = mc_hist.copy().reset()
-        for group_name in complete_groups:
-            group = qcd_groups[group_name]
-
-            # get the corresponding histograms and convert them to number objects,
-            # each one storing an array of values with uncertainties
-            # shapes: (SHIFT, VAR)
-            get_hist = lambda h, region_name: h[{"category": hist.loc(group[region_name].id)}]
-            os_noniso_mc = hist_to_num(get_hist(mc_hist, "os_noniso"), "os_noniso_mc")
-            ss_noniso_mc = hist_to_num(get_hist(mc_hist, "ss_noniso"), "ss_noniso_mc")
-            ss_iso_mc = hist_to_num(get_hist(mc_hist, "ss_iso"), "ss_iso_mc")
-            os_noniso_data = hist_to_num(get_hist(data_qcd_hist, "os_noniso"), "os_noniso_data")
-            ss_noniso_data = hist_to_num(get_hist(data_qcd_hist, "ss_noniso"), "ss_noniso_data")
-            ss_iso_data = hist_to_num(get_hist(data_qcd_hist, "ss_iso"), "ss_iso_data")
-
-            # estimate qcd shapes in the three sideband regions
-            # shapes: (SHIFT, VAR)
-            os_noniso_qcd = os_noniso_data - os_noniso_mc
-            ss_iso_qcd = ss_iso_data - ss_iso_mc
-            ss_noniso_qcd = ss_noniso_data - ss_noniso_mc
-
-            # get integrals in ss regions for the transfer factor
-            # shapes: (SHIFT,)
-            int_ss_iso = integrate_num(ss_iso_qcd, axis=1)
-            int_ss_noniso = integrate_num(ss_noniso_qcd, axis=1)
-
-            # complain about negative integrals
-            int_ss_iso_neg = int_ss_iso <= 0
-            int_ss_noniso_neg = int_ss_noniso <= 0
-            if int_ss_iso_neg.any():
-                shift_ids = list(map(mc_hist.axes["shift"].value, np.where(int_ss_iso_neg)[0]))
-                shifts = list(map(config.get_shift, shift_ids))
-                logger.warning(
-                    f"negative QCD integral in ss_iso region for group {group_name} and shifts: "
-                    f"{', '.join(map(str, shifts))}",
-                )
-            if int_ss_noniso_neg.any():
-                shift_ids = list(map(mc_hist.axes["shift"].value, np.where(int_ss_noniso_neg)[0]))
-                shifts = list(map(config.get_shift, shift_ids))
-                logger.warning(
-                    f"negative QCD integral in ss_noniso region for group {group_name} and shifts: "
-                    f"{', '.join(map(str, shifts))}",
-                )
-
-            # ABCD method
-            # shape: (SHIFT, VAR)
-            os_iso_qcd = os_noniso_qcd * ((int_ss_iso / int_ss_noniso)[:, None])
-
-            # combine uncertainties and store values in bare arrays
-            os_iso_qcd_values = os_iso_qcd()
-            os_iso_qcd_variances = os_iso_qcd(sn.UP, sn.ALL, unc=True)**2
-
-            # define uncertainties
-            unc_data = os_iso_qcd(sn.UP, ["os_noniso_data", "ss_iso_data", "ss_noniso_data"], unc=True)
-            unc_mc = os_iso_qcd(sn.UP, ["os_noniso_mc", "ss_iso_mc", "ss_noniso_mc"], unc=True)
-            unc_data_rel = abs(unc_data / os_iso_qcd_values)
-            unc_mc_rel = abs(unc_mc / os_iso_qcd_values)
-
-            # only keep the MC uncertainty if it is larger than the data uncertainty and larger than 15%
-            keep_variance_mask = (
-                np.isfinite(unc_mc_rel) &
-                (unc_mc_rel > unc_data_rel) &
-                (unc_mc_rel > 0.15)
-            )
-            os_iso_qcd_variances[keep_variance_mask] = unc_mc[keep_variance_mask]**2
-            os_iso_qcd_variances[~keep_variance_mask] = 0
-
-            # retro-actively set values to zero for shifts that had negative integrals
-            neg_int_mask = int_ss_iso_neg | int_ss_noniso_neg
-            os_iso_qcd_values[neg_int_mask] = 1e-5
-            os_iso_qcd_variances[neg_int_mask] = 0
-
-            # residual zero filling
-            zero_mask = os_iso_qcd_values <= 0
-            os_iso_qcd_values[zero_mask] = 1e-5
-            os_iso_qcd_variances[zero_mask] = 0
-
-            # insert values into the qcd histogram
-            cat_axis = qcd_hist.axes["category"]
-            for cat_index in range(cat_axis.size):
-                if cat_axis.value(cat_index) == group.os_iso.id:
-                    qcd_hist.view().value[cat_index, ...] = os_iso_qcd_values
-                    qcd_hist.view().variance[cat_index, ...] = os_iso_qcd_variances
-                    break
-            else:
-                raise RuntimeError(
-                    f"could not find index of bin on 'category' axis of qcd histogram {qcd_hist} "
-                    f"for category {group.os_iso}",
-                )
+        values, variances = abcd_estimate(config, mc_hist, data_hist, groups, shape, numerator, denominator)
+        fill_categories(qcd_hist, [group.os_iso.id for group in groups.values()], values, variances)
 
         return hists
 
-    # calculate the transfer factor for a chosen category and single decay channel (etau OR mutau OR tautau)
-    def fake_factor(task, hists):
-        if not hists:
-            return hists
-
-        # get dummy processes
-        factor_bin = config.get_process("qcd", default=None)
-        if not factor_bin:
-            return hists
+    def qcd_estimation(task, hists):
+        return abcd_hook(hists, "os_noniso", "ss_iso", "ss_noniso")
 
-        factor_int = config.get_process("dy", default=None)
-        if not factor_int:
-            return hists
+    def qcd_inverted(task, hists):
+        return abcd_hook(hists, "ss_iso", "os_noniso", "ss_noniso")
 
-        # extract all unique category ids and verify that the axis order is exactly
-        # "category -> shift -> variable" which is needed to insert values at the end
-        CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
-        category_ids = set()
-        for proc, h in hists.items():
-            # validate axes
-            assert len(h.axes) == 3
-            assert h.axes[CAT_AXIS].name == "category"
-            assert h.axes[SHIFT_AXIS].name == "shift"
-            # get the category axis
-            cat_ax = h.axes["category"]
-            for cat_index in range(cat_ax.size):
-                category_ids.add(cat_ax.value(cat_index))
-
-        # create qcd groups
-        qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
-        for cat_id in category_ids:
-            cat_inst = config.get_category(cat_id)
-            if cat_inst.has_tag({"os", "iso1"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_iso = cat_inst
-            elif cat_inst.has_tag({"os", "noniso1"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_noniso = cat_inst
-            elif cat_inst.has_tag({"ss", "iso1"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_iso = cat_inst
-            elif cat_inst.has_tag({"ss", "noniso1"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_noniso = cat_inst
-
-        # get complete qcd groups
-        complete_groups = [name for name, cats in qcd_groups.items() if len(cats) == 4]
-
-        # nothing to do if there are no complete groups
-        if not complete_groups:
-            return hists
+    def closure_test(task, hists):
 
-        # sum up mc and data histograms, stop early when empty
-        mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
-        data_hists = [h for p, h in hists.items() if p.is_data]
-        if not mc_hists or not data_hists:
-            return hists
-        mc_hist = sum(mc_hists[1:], mc_hists[0].copy())
-        data_hist = sum(data_hists[1:], data_hists[0].copy())
+        print("------------------------------------------")
+        print("------ Entering closure test hook --------")
+        print("------------------------------------------")
 
-        # start by copying the mc hist and reset it, then fill it at specific category slices
-        hists = {}
-        hists[factor_bin] = factor_hist = mc_hist.copy().reset()
-        hists[factor_int] = factor_hist_int = mc_hist.copy().reset()
-        for group_name in complete_groups:
-            group = qcd_groups[group_name]
-            # get the corresponding histograms and convert them to number objects,
-            # each one storing an array of values with uncertainties
-            # shapes: (SHIFT, VAR)
-            get_hist = lambda h, region_name: h[{"category": hist.loc(group[region_name].id)}]
-            ss_noniso_mc = hist_to_num(get_hist(mc_hist, "ss_noniso1"), "ss_noniso1_mc")
-            ss_iso_mc = hist_to_num(get_hist(mc_hist, "ss_iso1"), "ss_iso1_mc")
-            ss_noniso_data = hist_to_num(get_hist(data_hist, "ss_noniso1"), "ss_noniso1_data")
-            ss_iso_data = hist_to_num(get_hist(data_hist, "ss_iso1"), "ss_iso1_data")
-
-            # take the difference between data and MC in the control regions
-            ss_iso_qcd = ss_iso_data - ss_iso_mc
-            ss_noniso_qcd = ss_noniso_data - ss_noniso_mc
-
-            # calculate the pt-independent fake factor
-            int_ss_iso = integrate_num(ss_iso_qcd, axis=1)
-            int_ss_noniso = integrate_num(ss_noniso_qcd, axis=1)
-            fake_factor_int = (int_ss_iso / int_ss_noniso)[0, None]
-
-            # calculate the pt-dependent fake factor
-            fake_factor = (ss_iso_qcd / ss_noniso_qcd)[:, None]
-            fake_factor_values = np.squeeze(np.nan_to_num(fake_factor()), axis=0)
-            fake_factor_variances = fake_factor(sn.UP, sn.ALL, unc=True)**2
-
-            # change shape of fake_factor_int for plotting
-            fake_factor_int_values = fake_factor_values.copy()
-            fake_factor_int_values.fill(fake_factor_int()[0])
-
-            # insert values into the qcd histogram
-            cat_axis = factor_hist.axes["category"]
-            for cat_index in range(cat_axis.size):
-                if cat_axis.value(cat_index) == group.os_iso.id:
-                    factor_hist.view().value[cat_index, ...] = fake_factor_values
-                    factor_hist.view().variance[cat_index, ...] = fake_factor_variances
-                    factor_hist_int.view().value[cat_index, ...] = fake_factor_int_values
-                    break
-            else:
-                raise RuntimeError(
-                    f"could not find index of bin on 'category' axis of qcd histogram {factor_hist} "
-                    f"for category {group.os_iso}",
-                )
-        return hists
+        def closure_inputs(hists):
+            # sum up mc, use MC qcd as pseudo data and stop early when either is empty
+            mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal") and not p.has_tag("qcd")]
+            data_qcd_hists = [h for p, h in hists.items() if p.has_tag("qcd")]
+            if not mc_hists or not data_qcd_hists:
+                return None
+            mc_hist = sum_hists(mc_hists)
+            data_qcd_hists = sum(data_qcd_hists[1:], mc_hists[0].copy())
+            data_hist_tmp = data_qcd_hists + mc_hist
+
+            data_hist = sum_hists([h for p, h in hists.items() if p.is_data])
+            data_qcd_hist = data_hist.copy().reset()
+            data_qcd_hist.fill(data_hist_tmp)
+
+            print("")
+            print("mc_hist len: ", len(mc_hist))
+            print("data_qcd_hists len: ", len(data_qcd_hists))
+            print("data_qcd_hist len: ", len(data_qcd_hist))
+            print("")
+            return mc_hist, data_qcd_hist
+
+        return abcd_hook(hists, "os_noniso", "ss_iso", "ss_noniso", inputs=closure_inputs)
 
-    # calculate the transfer factor for a chosen category for all decay channels (etau AND muta AND tautau)
-    def fake_factor_incl(task, hists):
+    # calculate the transfer factor for a chosen category and single decay channel (etau OR mutau OR tautau)
+    # or for all decay channels combined (etau AND mutau AND tautau)
+    def fake_factor_hook(hists, regions, inclusive=False):
         if not hists:
             return hists
 
@@ -615,119 +433,58 @@ def add_hist_hooks(config: od.Config) -> None:
         if not factor_int:
             return hists
 
-        # extract all unique category ids and verify that the axis order is exactly
-        # "category -> shift -> variable" which is needed to insert values at the end
-        CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
-        category_ids = set()
-        for proc, h in hists.items():
-            # validate axes
-            assert len(h.axes) == 3
-            assert h.axes[CAT_AXIS].name == "category"
-            assert h.axes[SHIFT_AXIS].name == "shift"
-            # get the category axis
-            cat_ax = h.axes["category"]
-            for cat_index in range(cat_ax.size):
-                category_ids.add(cat_ax.value(cat_index))
-
-        # create qcd groups
-        qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
-        for cat_id in category_ids:
-            cat_inst = config.get_category(cat_id)
-            if cat_inst.has_tag({"os", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_iso = cat_inst
-            elif cat_inst.has_tag({"os", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].os_noniso = cat_inst
-            elif cat_inst.has_tag({"ss", "iso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_iso = cat_inst
-            elif cat_inst.has_tag({"ss", "noniso"}, mode=all):
-                qcd_groups[cat_inst.x.qcd_group].ss_noniso = cat_inst
-
-        # get complete qcd groups
-        complete_groups = [name for name, cats in qcd_groups.items() if len(cats) == 4]
-
-        # nothing to do if there are no complete groups
-        if not complete_groups:
+        # create qcd groups, nothing to do if there are no complete groups
+        groups = build_groups(config, get_category_ids(hists), regions)
+        if not groups:
             return hists
 
-        # sum up mc and data histograms, stop early when empty
-        mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
-        data_hists = [h for p, h in hists.items() if p.is_data]
-        if not mc_hists or not data_hists:
+        sums = mc_data_sums(hists)
+        if sums is None:
             return hists
-        mc_hist = sum(mc_hists[1:], mc_hists[0].copy())
-        data_hist = sum(data_hists[1:], data_hists[0].copy())
-
-        # start by copying the mc hist and reset it, then fill it at specific category slices
+        mc_hist, data_hist = sums
+
+        # take the difference between data and MC in the control regions
+        # shapes: (GROUP, SHIFT, VAR)
+        mc = stack_regions(mc_hist, groups, ["ss_iso", "ss_noniso"], "mc")
+        data = stack_regions(data_hist, groups, ["ss_iso", "ss_noniso"], "data")
+
+        if inclusive:
+            # the first channel group of each chosen category is a proxy for the channels combined,
+            # the other channel groups have no factor calculated
+            ks = [k for k in FF_INCL_CATEGORIES if f"{FF_INCL_CHANNELS[0]}__{k}" in groups]
+            targets = [f"{FF_INCL_CHANNELS[0]}__{k}" for k in ks]
+            group_index = {name: i for i, name in enumerate(groups)}
+            channel_idx = [
+                np.array([group_index[f"{channel}__{k}"] for k in ks], dtype=np.intp)
+                for channel in FF_INCL_CHANNELS
+            ]
+            # shapes: (CATEGORY, SHIFT, VAR)
+            combine = lambda num: functools.reduce(operator.add, [num[idx] for idx in channel_idx])
+            ss_iso_qcd = combine(data["ss_iso"]) - combine(mc["ss_iso"])
+            ss_noniso_qcd = combine(data["ss_noniso"]) - combine(mc["ss_noniso"])
+        else:
+            targets = list(groups)
+            ss_iso_qcd = data["ss_iso"] - mc["ss_iso"]
+            ss_noniso_qcd = data["ss_noniso"] - mc["ss_noniso"]
+
+        values, variances, int_values = fake_factors(ss_iso_qcd, ss_noniso_qcd)
+
+        # start by copying the mc hist and reset it, then fill it at the os_iso categories
         hists = {}
-        channels = {}
         hists[factor_bin] = factor_hist = mc_hist.copy().reset()
         hists[factor_int] = factor_hist_int = mc_hist.copy().reset()
-
-        for group_name in complete_groups:
-            group = qcd_groups[group_name]
-            # get the corresponding histograms and convert them to number objects,
-            # each one storing an array of values with uncertainties
-            # shapes: (SHIFT, VAR)
-            get_hist = lambda h, region_name: h[{"category": hist.loc(group[region_name].id)}]
-            ss_noniso_mc = hist_to_num(get_hist(mc_hist, "ss_noniso"), "ss_noniso_mc")
-            ss_iso_mc = hist_to_num(get_hist(mc_hist, "ss_iso"), "ss_iso_mc")
-            ss_noniso_data = hist_to_num(get_hist(data_hist, "ss_noniso"), "ss_noniso_data")
-            ss_iso_data = hist_to_num(get_hist(data_hist, "ss_iso"), "ss_iso_data")
-
-            channels[group_name] = {}
-            channels[group_name]["ss_iso_mc"] = ss_iso_mc
-            channels[group_name]["ss_noniso_mc"] = ss_noniso_mc
-            channels[group_name]["ss_iso_data"] = ss_iso_data
-            channels[group_name]["ss_noniso_data"] = ss_noniso_data
-
-        for group_name in complete_groups:
-            for k in ["incl"]:  # INDICATE WHICH CATEGORY TO CALCULATE THE FACTOR FOR ! e.g. "incl", "2j" ...
-                if group_name == f"etau__{k}":  # DUMMY CATEGORY! mutau and tautau categories will have no factor calculated and etau is a proxy for the incl/2j/... category chosen
-                    group = qcd_groups[group_name]
-
-                    ss_iso_mc = channels[f"etau__{k}"]["ss_iso_mc"] + channels[f"mutau__{k}"]["ss_iso_mc"] + channels[f"tautau__{k}"]["ss_iso_mc"]
-                    ss_noniso_mc = channels[f"etau__{k}"]["ss_noniso_mc"] + channels[f"mutau__{k}"]["ss_noniso_mc"] + channels[f"tautau__{k}"]["ss_noniso_mc"]
-                    ss_iso_data = channels[f"etau__{k}"]["ss_iso_data"] + channels[f"mutau__{k}"]["ss_iso_data"] + channels[f"tautau__{k}"]["ss_iso_data"]
-                    ss_noniso_data = channels[f"etau__{k}"]["ss_noniso_data"] + channels[f"mutau__{k}"]["ss_noniso_data"] + channels[f"tautau__{k}"]["ss_noniso_data"]
-
-                    # take the difference between data and MC in the control regions
-                    ss_iso_qcd = ss_iso_data - ss_iso_mc
-                    ss_noniso_qcd = ss_noniso_data - ss_noniso_mc
-
-                    # calculate the pt-independent fake factor
-                    int_ss_iso = integrate_num(ss_iso_qcd, axis=1)
-                    int_ss_noniso = integrate_num(ss_noniso_qcd, axis=1)
-                    fake_factor_int = (int_ss_iso / int_ss_noniso)[0, None]
-
-                    # calculate the pt-dependent fake factor
-                    fake_factor = (ss_iso_qcd / ss_noniso_qcd)[:, None]
-                    fake_factor_values = np.squeeze(np.nan_to_num(fake_factor()), axis=0)
-                    fake_factor_variances = fake_factor(sn.UP, sn.ALL, unc=True)**2
-
-                    # change shape of fake_factor_int for plotting
-                    fake_factor_int_values = fake_factor_values.copy()
-                    fake_factor_int_values.fill(fake_factor_int()[0])
-
-                    # insert values into the qcd histogram
-                    cat_axis = factor_hist.axes["category"]
-                    for cat_index in range(cat_axis.size):
-                        if cat_axis.value(cat_index) == group.os_iso.id:
-                            factor_hist.view().value[cat_index, ...] = fake_factor_values
-                            factor_hist.view().variance[cat_index, ...] = fake_factor_variances
-                            factor_hist_int.view().value[cat_index, ...] = fake_factor_int_values
-                            break
-                    else:
-                        raise RuntimeError(
-                            f"could not find index of bin on 'category' axis of qcd histogram {factor_hist} "
-                            f"for category {group.os_iso}",
-                        )
-        from IPython import embed
-        embed()
+        cat_ids = [groups[name].os_iso.id for name in targets]
+        fill_categories(factor_hist, cat_ids, values, variances)
+        fill_categories(factor_hist_int, cat_ids, int_values)
         return hists
 
-   
+    def fake_factor(task, hists):
+        return fake_factor_hook(hists, ABCD_REGIONS_ISO1)
+
+    def fake_factor_incl(task, hists):
+        return fake_factor_hook(hists, ABCD_REGIONS, inclusive=True)
 
-    def apply_fake_factor(task, hists):
+    def apply_fake_factor_hook(hists, regions, fill):
         # Check if histograms are available
         if not hists:
             print("no hists")
@@ -736,339 +493,98 @@ def add_hist_hooks(config: od.Config) -> None:
         # Get the qcd process
         qcd_proc = config.get_process("qcd", default=None)
         if not qcd_proc:
-            print("no fake") 
+            print("no fake")
             return hists
 
-        # extract all unique category ids and verify that the axis order is exactly
-        # "category -> shift -> variable" which is needed to insert values at the end
-        CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
-        category_ids = set()
-        for proc, h in hists.items():
-            # validate axes
-            assert len(h.axes) == 3
-            assert h.axes[CAT_AXIS].name == "category"
-            assert h.axes[SHIFT_AXIS].name == "shift"
-            # get the category axis
-            cat_ax = h.axes["category"]
-            for cat_index in range(cat_ax.size):
-                category_ids.add(cat_ax.value(cat_index))
-
-        # create qcd groups
-        qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
-
-        ### Create a QCD group ofr each DM and Njet category
-
-        dms = ["tau1a1DM11", "tau1a1DM10", "tau1a1DM2", "tau1pi", "tau1rho"]  # Decay modes
-        njets = ["has0j", "has1j", "has2j"]  # Jet multiplicity
-
-        # dms = ["tau1rho"]  # Decay modes
-        # njets = ["has0j"]  # Jet multiplicity
-
-        # Loop over all categories and create a QCD group for each DM and Njet category
-        for dm in dms:
-            for njet in njets:
-                for cat_id in category_ids:
-                    cat_inst = config.get_category(cat_id)
-                    if cat_inst.has_tag({"os", "iso1", njet, dm}, mode=all) and not cat_inst.has_tag("noniso2"): # cat D 
-                        qcd_groups[f"dm_{dm}_njet_{njet}"].os_iso = cat_inst
-                    elif cat_inst.has_tag({"os", "noniso1", njet, dm}, mode=all) and not cat_inst.has_tag("noniso2"): # cat C
-                        qcd_groups[f"dm_{dm}_njet_{njet}"].os_noniso = cat_inst
-                    #if cat_inst.has_tag({"os", "iso1", njet, dm}, mode=all) and not cat_inst.has_tag("iso2"): # cat D0 
-                    #    qcd_groups[f"dm_{dm}_njet_{njet}"].os_iso = cat_inst
-                    #elif cat_inst.has_tag({"os", "noniso1", njet, dm}, mode=all) and not cat_inst.has_tag("iso2"): # cat C0
-                    #    qcd_groups[f"dm_{dm}_njet_{njet}"].os_noniso = cat_inst
-   
-
-        # Get complete qcd groups
-        complete_groups = [name for name, cats in qcd_groups.items() if len(cats) == 2]
-    
-        # Nothing to do if there are no complete groups, you need C to apply Fake to D 
-        if not complete_groups:
+        # Create a QCD group for each DM and Njet category,
+        # you need C to apply Fake to D
+        groups = build_groups(config, get_category_ids(hists), regions, FF_APPLY_GROUPS)
+        if not groups:
             print("no complete groups")
             return hists
 
-        # Sum up mc and data histograms, stop early when empty
-        mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
-        data_hists = [h for p, h in hists.items() if p.is_data]
-        if not mc_hists or not data_hists:
+        sums = mc_data_sums(hists)
+        if sums is None:
             return hists
-        mc_hist = sum(mc_hists[1:], mc_hists[0].copy())
-        data_hist = sum(data_hists[1:], data_hists[0].copy())
-        
-        # Start by copying the data hist and reset it, then fill it at specific category slices
+        mc_hist, data_hist = sums
+
+        # Start by copying the data hist and reset it, then *fill* it at specific category slices
         hists[qcd_proc] = qcd_hist = data_hist.copy().reset()
-        for group_name in complete_groups:
-            group = qcd_groups[group_name]
-   
-            # Get the corresponding histograms of the id, if not present, create a zeroed histogram
-            get_hist = lambda h, region_name: (
-                h[{"category": hist.loc(group[region_name].id)}]
-                if group[region_name].id in h.axes["category"]
-                else hist.Hist(*[axis for axis in (h[{"category": [0]}] * 0).axes if axis.name != 'category'])
-            ) 
-
-            # Get the corresponding histograms and convert them to number objects,
-            os_noniso_mc  = hist_to_num(get_hist(mc_hist, "os_noniso"), "os_noniso_mc")
-            os_noniso_data = hist_to_num(get_hist(data_hist, "os_noniso"), "os_noniso_data")
-
-            ## DATA - MC of region C (FF are already apply to them)
-            fake_hist = os_noniso_data - os_noniso_mc
-
-            # combine uncertainties and store values in bare arrays
-            fake_hist_values = fake_hist()
-            fake_hist_variances = fake_hist(sn.UP, sn.ALL, unc=True)**2
-
-            # Guaranty positive values of fake_hist
-            neg_int_mask = fake_hist_values <= 0
-            fake_hist_values[neg_int_mask] = 1e-5
-            fake_hist_variances[neg_int_mask] = 0
-
-            ## Use fake_hist as qcd histogram for category D (os_iso)
-            cat_axis = qcd_hist.axes["category"]
-            for cat_index in range(cat_axis.size):
-                if cat_axis.value(cat_index) == group.os_iso.id:
-                    qcd_hist.view().value[cat_index, ...] = fake_hist_values
-                    qcd_hist.view().variance[cat_index, ...] = fake_hist_variances
-                    break
-            else:
-                raise RuntimeError(
-                    f"could not find index of bin on 'category' axis of qcd histogram {mc_hist} "
-                    f"for category {group.os_iso}",
-                )
+        values, variances = fake_subtraction(mc_hist, data_hist, groups)
+        fill(hists, groups, qcd_hist, data_hist, values, variances)
 
         return hists
 
+    def fill_os_iso(hists, groups, qcd_hist, data_hist, values, variances):
+        ## Use fake_hist as qcd histogram for category D (os_iso)
+        fill_categories(qcd_hist, [group.os_iso.id for group in groups.values()], values, variances)
 
+    def apply_fake_factor(task, hists):
+        return apply_fake_factor_hook(hists, FF_APPLY_REGIONS, fill_os_iso)
 
+    # ABB, the per-group qcd and ratio hists are artifacts of the cache entry, see store_ff_ab_outputs
+    def apply_fake_factor_AB(task, hists, artifacts):
+        fill = functools.partial(fill_os_iso_and_ratios, artifacts=artifacts)
+        return apply_fake_factor_hook(hists, FF_APPLY_REGIONS_AB, fill)
 
-    # ABB
-    def apply_fake_factor_AB(task, hists):
-        # Check if histograms are available
-        if not hists:
-            print("no hists")
-            return hists
+    def fill_os_iso_and_ratios(hists, groups, qcd_hist, data_hist, values, variances, artifacts):
+        cat_ids = [group.os_iso.id for group in groups.values()]
+        hname = qcd_hist.axes[2].name
 
-        # Get the qcd process
-        qcd_proc = config.get_process("qcd", default=None)
-        if not qcd_proc:
-            print("no fake") 
-            return hists
+        # fill all groups first, the mc sum includes the qcd histogram
+        fill_categories(qcd_hist, cat_ids, values, variances)
+        mc_hist_sum = sum_hists([h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")])
 
-        # extract all unique category ids and verify that the axis order is exactly
-        # "category -> shift -> variable" which is needed to insert values at the end
-        CAT_AXIS, SHIFT_AXIS, VAR_AXIS = range(3)
-        category_ids = set()
-        for proc, h in hists.items():
-            # validate axes
-            assert len(h.axes) == 3
-            assert h.axes[CAT_AXIS].name == "category"
-            assert h.axes[SHIFT_AXIS].name == "shift"
-            # get the category axis
-            cat_ax = h.axes["category"]
-            for cat_index in range(cat_ax.size):
-                category_ids.add(cat_ax.value(cat_index))
-
-        # create qcd groups
-        qcd_groups: dict[str, dict[str, od.Category]] = defaultdict(DotDict)
-
-        ### Create a QCD group ofr each DM and Njet category
-
-        dms = ["tau1a1DM11", "tau1a1DM10", "tau1a1DM2", "tau1pi", "tau1rho"]  # Decay modes
-        njets = ["has0j", "has1j", "has2j"]  # Jet multiplicity
-
-        # dms = ["tau1rho"]  # Decay modes
-        # njets = ["has0j"]  # Jet multiplicity
-
-        # Loop over all categories and create a QCD group for each DM and Njet category
-        for dm in dms:
-            for njet in njets:
-                for cat_id in category_ids:
-                    cat_inst = config.get_category(cat_id)
-                    if cat_inst.has_tag({"ss", "iso1", njet, dm}, mode=all) and not cat_inst.has_tag("noniso2"): # cat A 
-                        qcd_groups[f"dm_{dm}_njet_{njet}"].os_iso = cat_inst
-                    elif cat_inst.has_tag({"ss", "noniso1", njet, dm}, mode=all) and not cat_inst.has_tag("noniso2"): # cat B
-                        qcd_groups[f"dm_{dm}_njet_{njet}"].os_noniso = cat_inst
-                    #if cat_inst.has_tag({"os", "iso1", njet, dm}, mode=all) and not cat_inst.has_tag("iso2"): # cat D0 
-                    #    qcd_groups[f"dm_{dm}_njet_{njet}"].os_iso = cat_inst
-                    #elif cat_inst.has_tag({"os", "noniso1", njet, dm}, mode=all) and not cat_inst.has_tag("iso2"): # cat C0
-                    #    qcd_groups[f"dm_{dm}_njet_{njet}"].os_noniso = cat_inst
-                    # Ignore AB categories
-                    # elif cat_inst.has_tag({"ss", "iso1", njet, dm}, mode=all): # cat A
-                    #     qcd_groups[f"dm_{dm}_njet_{njet}"].ss_iso = cat_inst
-                    # elif cat_inst.has_tag({"ss", "noniso1", njet, dm}, mode=all):  # cat B
-                    #     qcd_groups[f"dm_{dm}_njet_{njet}"].ss_noniso = cat_inst 
-   
-
-        # Get complete qcd groups
-        complete_groups = [name for name, cats in qcd_groups.items() if len(cats) == 2]
-    
-        # Nothing to do if there are no complete groups, you need C to apply Fake to D 
-        if not complete_groups:
-            print("no complete groups")
-            return hists
+        # data / mc ratios in the os_iso regions of all groups
+        os_iso_mc = stack_regions(mc_hist_sum, groups, ["os_iso"], "mc", missing_ok=True)["os_iso"]
+        os_iso_data = stack_regions(data_hist, groups, ["os_iso"], "data", missing_ok=True)["os_iso"]
+        ratio = os_iso_data / os_iso_mc
 
-        # Sum up mc and data histograms, stop early when empty
-        mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
-        data_hists = [h for p, h in hists.items() if p.is_data]
-        if not mc_hists or not data_hists:
-            return hists
-        mc_hist = sum(mc_hists[1:], mc_hists[0].copy())
-        data_hist = sum(data_hists[1:], data_hists[0].copy())
-        
-        # Start by copying the data hist and reset it, then fill it at specific category slices
-        hists[qcd_proc] = qcd_hist = data_hist.copy().reset()
-        mc_hist_incl = mc_hist.copy().reset()
-        data_hist_incl = data_hist.copy().reset()
-        os_iso_mc_incl = None
-        os_iso_data_incl = None
-        for gidx, group_name in enumerate(complete_groups):
-            group = qcd_groups[group_name]
-   
-            # Get the corresponding histograms of the id, if not present, create a zeroed histogram
-            get_hist = lambda h, region_name: (
-                h[{"category": hist.loc(group[region_name].id)}]
-                if group[region_name].id in h.axes["category"]
-                else hist.Hist(*[axis for axis in (h[{"category": [0]}] * 0).axes if axis.name != 'category'])
-            ) 
-
-            # Get the corresponding histograms and convert them to number objects,
-            os_noniso_mc  = hist_to_num(get_hist(mc_hist, "os_noniso"), "os_noniso_mc")
-            os_noniso_data = hist_to_num(get_hist(data_hist, "os_noniso"), "os_noniso_data")
-
-            ## DATA - MC of region C (FF are already apply to them)
-            fake_hist = os_noniso_data - os_noniso_mc
-
-            # combine uncertainties and store values in bare arrays
-            fake_hist_values = fake_hist()
-            fake_hist_variances = fake_hist(sn.UP, sn.ALL, unc=True)**2
-
-            # Guaranty positive values of fake_hist
-            neg_int_mask = fake_hist_values <= 0
-            fake_hist_values[neg_int_mask] = 1e-5
-            fake_hist_variances[neg_int_mask] = 0
-
-            ## Use fake_hist as qcd histogram for category D (os_iso)
-            cat_axis = qcd_hist.axes["category"]
-            for cat_index in range(cat_axis.size):
-                if cat_axis.value(cat_index) == group.os_iso.id:
-                    qcd_hist.view().value[cat_index, ...] = fake_hist_values
-                    qcd_hist.view().variance[cat_index, ...] = fake_hist_variances
-                    break
-            else:
-                raise RuntimeError(
-                    f"could not find index of bin on 'category' axis of qcd histogram {mc_hist} "
-                    f"for category {group.os_iso}",
-                )
-
-            hname = qcd_hist.axes[2].name
-            path = "/eos/user/g/gsaha/CPinHToTauTauOutput/cf_store/analysis_httcp/cf.PlotVariables1D/QCD0"
-            with open(f"{path}/qcd_{hname}_{group_name}.pkl", "wb") as f:
-                pickle.dump(qcd_hist, f)
+        # combine uncertainties and store values in bare arrays
+        ratio_hist_values = ratio()
+        ratio_hist_variances = ratio(sn.UP, sn.ALL, unc=True)**2
 
-            # create a hist clone of the data_hist
-            ratio_hist = data_hist.copy()
+        # Guaranty positive values of the ratio
+        neg_int_mask = ratio_hist_values <= 0
+        ratio_hist_values[neg_int_mask] = 1e-5
+        ratio_hist_variances[neg_int_mask] = 0
 
-            # calultate sum_mc_hist
-            #for cat_index in range(cat_axis.size):
-            #    if cat_axis.value(cat_index) == group.os_iso.id:
-            mc_hists = [h for p, h in hists.items() if p.is_mc and not p.has_tag("signal")]
-            mc_hist_sum = sum(mc_hists[1:], mc_hists[0].copy())
-
-            mc_hist_incl = mc_hist_incl + mc_hist_sum.copy()
-            data_hist_incl = data_hist_incl + data_hist.copy()
-            
-            os_iso_mc  = hist_to_num(get_hist(mc_hist_sum, "os_iso"), "os_iso_mc")
-            os_iso_data = hist_to_num(get_hist(data_hist, "os_iso"), "os_iso_data")
-            #fake_iso_mc = hist_to_num(get_hist(qcd_hist, "os_iso"), "os_iso_mc")
-            #os_iso_mc_sum = sum(os_iso_mc, fake_iso_mc)
-
-            #from IPython import embed; embed()
-
-            #ratio = os_iso_data/os_iso_mc_sum
-            ratio = os_iso_data/os_iso_mc
-
-            #fake_hist = os_noniso_data - os_noniso_mc
-
-            # total MC
-            os_iso_mc_incl   = (os_iso_mc + os_iso_mc_incl) if gidx > 0 else os_iso_mc
-            os_iso_data_incl = (os_iso_data + os_iso_data_incl) if gidx > 0 else os_iso_data
-            
-            # combine uncertainties and store values in bare arrays
-            ratio_hist_values = ratio()
-            ratio_hist_variances = ratio(sn.UP, sn.ALL, unc=True)**2
-
-
-            # Guaranty positive values of fake_hist
-            neg_int_mask = ratio_hist_values <= 0
-            ratio_hist_values[neg_int_mask] = 1e-5
-            ratio_hist_variances[neg_int_mask] = 0
-
-            ## Use fake_hist as qcd histogram for category D (os_iso)
-            cat_axis = qcd_hist.axes["category"]
-            for cat_index in range(cat_axis.size):
-                if cat_axis.value(cat_index) == group.os_iso.id:
-                    ratio_hist.view().value[cat_index, ...] = ratio_hist_values
-                    ratio_hist.view().variance[cat_index, ...] = ratio_hist_variances
-                    break
-            else:
-                raise RuntimeError(
-                    f"could not find index of bin on 'category' axis of qcd histogram {mc_hist} "
-                    f"for category {group.os_iso}",
-                )
-            
-            path = f"{path}/Ratio"
-            # save the ratio in a pickle file
-            with open(f"{path}/ratio_{hname}_{group_name}_{group.os_iso.id}.pkl", "wb") as f:
-                pickle.dump(ratio_hist, f)
-
-        #from IPython import embed; embed()
-        #mc_hist_incl_values = mc_hist_incl()
-        #mc_hist_incl_variances = mc_hist_incl(sn.UP, sn.ALL, unc=True)**2
-        #data_hist_incl_values = data_hist_incl()
-        #data_hist_incl_variances = data_hist_incl(sn.UP, sn.ALL, unc=True)**2
+        # one qcd (filled up to this group) and one ratio hist per group
+        qcd_hist_partial = qcd_hist.copy().reset()
+        for gidx, (group_name, group) in enumerate(groups.items()):
+            fill_categories(qcd_hist_partial, cat_ids[gidx:gidx + 1], values[gidx:gidx + 1], variances[gidx:gidx + 1])
+            artifacts[f"qcd_{hname}_{group_name}"] = qcd_hist_partial.copy()
 
+            # create a hist clone of the data_hist
+            ratio_hist = data_hist.copy()
+            fill_categories(ratio_hist, cat_ids[gidx:gidx + 1], ratio_hist_values[gidx:gidx + 1], ratio_hist_variances[gidx:gidx + 1])
+            artifacts[f"Ratio/ratio_{hname}_{group_name}_{group.os_iso.id}"] = ratio_hist
 
+        # total data / MC
+        os_iso_mc_incl = functools.reduce(operator.add, [os_iso_mc[i] for i in range(len(groups))])
+        os_iso_data_incl = functools.reduce(operator.add, [os_iso_data[i] for i in range(len(groups))])
         incl_ratio = os_iso_data_incl/os_iso_mc_incl
 
         incl_ratio_hist_values = incl_ratio()
         incl_ratio_hist_variances = incl_ratio(sn.UP, sn.ALL, unc=True)**2
 
-        incl_ratio_hist = mc_hist_incl.copy().reset()
+        incl_ratio_hist = mc_hist_sum.copy().reset()
         incl_ratio_hist.view().value[0, ...] = incl_ratio_hist_values
         incl_ratio_hist.view().variance[0, ...] = incl_ratio_hist_variances
 
-        
-        #os_iso_mc_incl_hist_values = os_iso_mc_incl()
-        #os_iso_mc_incl_hist_variances = os_iso_mc_incl(sn.UP, sn.ALL, unc=True)**2
-        #os_iso_data_incl_hist_values = os_iso_data_incl()
-        #os_iso_data_incl_hist_variances = os_iso_data_incl(sn.UP, sn.ALL, unc=True)**2
-
-        #os_iso_mc_incl_hist = mc_hist_incl.copy().reset()
-        #os_iso_data_incl_hist = mc_hist_incl.copy().reset()
+        artifacts[f"Ratio/RATIO_{hname}_inclusive"] = incl_ratio_hist
 
-        #os_iso_mc_incl_hist.view().value[0, ...] = os_iso_mc_incl_hist_values
-        #os_iso_mc_incl_hist.view().variance[0, ...] = os_iso_mc_incl_hist_variances
-        #os_iso_data_incl_hist.view().value[0, ...] = os_iso_data_incl_hist_values
-        #os_iso_data_incl_hist.view().variance[0, ...] = os_iso_data_incl_hist_variances
-        
 
-        #with open(f"{path}/MC_{hname}_inclusive.pkl", "wb") as f:
-        #    pickle.dump(os_iso_mc_incl_hist, f) #mc_hist_incl, f)
-        with open(f"{path}/RATIO_{hname}_inclusive.pkl", "wb") as f:
-            pickle.dump(incl_ratio_hist, f) #data_hist_incl, f)
-
-        
-                
-        return hists
-    
-    
 
     config.x.hist_hooks = {
-        "qcd": qcd_estimation,
-        "qcd_inverted": qcd_inverted,
-        "fake_factor": fake_factor,
-        "fake_factor_incl": fake_factor_incl,
-        "closure": closure_test,
-        "apply_fake_factor": apply_fake_factor,
-        "apply_fake_factor_AB": apply_fake_factor_AB
+        "qcd": cached_hook(config, "qcd", qcd_estimation),
+        "qcd_inverted": cached_hook(config, "qcd_inverted", qcd_inverted),
+        "fake_factor": cached_hook(config, "fake_factor", fake_factor),
+        "fake_factor_incl": cached_hook(config, "fake_factor_incl", fake_factor_incl),
+        "closure": cached_hook(config, "closure", closure_test),
+        "apply_fake_factor": cached_hook(config, "apply_fake_factor", apply_fake_factor),
+        "apply_fake_factor_AB": cached_hook(
+            config, "apply_fake_factor_AB", apply_fake_factor_AB,
+            with_artifacts=True, store_artifacts=store_ff_ab_outputs,
+        ),
     }
@@ -0,0 +1,131 @@
+# coding: utf-8
+
+"""
+Process-wide registry of parsed correctionlib objects.
+
+The calibrator / producer setups used to gunzip and parse their json files independently,
+several of them the same file (e.g. tau_sf for the tau energy scale and the tau weights) in the
+same worker. Here every file is parsed once per process and content, keyed by its absolute path
+and the sha256 of its content; the corrections are handed out by (path, hash, name) so that all
+setups share the same objects:
+
+  from httcp.corrections import get_correction
+  self.tes_corrector = get_correction(bundle.files.tau_sf, "tau_energy_scale")
+
+With persist=True (or HTTCP_CORRECTION_CACHE=1 in the environment), the decompressed json is also
+written next to the input as <file>.<hash>.json, so that later workers on the same bundle skip the
+gunzip. correctionlib objects themselves cannot be serialized in a pre-parsed form, so this is the
+closest persistent form; the file is reused only if the hash of the input still matches.
+"""
+
+from __future__ import annotations
+
+import os
+import gzip
+import hashlib
+import threading
+
+import law
+
+from columnflow.util import maybe_import
+
+correctionlib = maybe_import("correctionlib")
+
+logger = law.logger.get_logger(__name__)
+
+# (abspath, sha256) -> CorrectionSet, (abspath, sha256, name) -> Correction
+_correction_sets = {}
+_corrections = {}
+# (abspath, mtime_ns, size) -> sha256, to hash every file only once
+_file_hashes = {}
+_lock = threading.RLock()
+
+
+def _patch_call() -> None:
+    # the correctors are called like functions in some producers
+    highlevel = correctionlib.highlevel
+    if highlevel.Correction.__call__ is not highlevel.Correction.evaluate:
+        highlevel.Correction.__call__ = highlevel.Correction.evaluate
+
+
+def correction_file_path(target) -> str:
+    """
+    Absolute path of a law file target (e.g. bundle.files.tau_sf) or of a path string
+    """
+    path = getattr(target, "abspath", None) or getattr(target, "path", target)
+    return os.path.abspath(os.path.expandvars(os.path.expanduser(str(path))))
+
+
+def correction_file_hash(path: str) -> str:
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if key not in _file_hashes:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            _file_hashes[key] = digest.hexdigest()
+        return _file_hashes[key]
+
+
+def _read_json(path: str, sha: str, persist: bool) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:2] != b"\x1f\x8b":
+        return data.decode("utf-8")
+
+    cache_path = f"{path}.{sha[:16]}.json"
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return f.read().decode("utf-8")
+
+    data = gzip.decompress(data)
+    if persist:
+        # write to a temporary file first, concurrent workers must never see partial files
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.debug(f"could not persist decompressed corrections to {cache_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return data.decode("utf-8")
+
+
+def load_correction_set(target, persist: bool | None = None):
+    """
+    Parsed correctionlib.highlevel.CorrectionSet of a (possibly gzipped) json file,
+    shared by all callers in the process as long as the file content does not change.
+    """
+    if persist is None:
+        persist = os.getenv("HTTCP_CORRECTION_CACHE", "0").lower() in ("1", "true", "yes")
+    path = correction_file_path(target)
+    sha = correction_file_hash(path)
+    with _lock:
+        if (path, sha) not in _correction_sets:
+            _patch_call()
+            _correction_sets[(path, sha)] = correctionlib.CorrectionSet.from_string(_read_json(path, sha, persist))
+            logger.debug(f"parsed correction set {path} ({sha[:16]})")
+        return _correction_sets[(path, sha)]
+
+
+def get_correction(target, name: str, persist: bool | None = None):
+    """
+    Correction *name* of the json file *target*, see load_correction_set
+    """
+    path = correction_file_path(target)
+    sha = correction_file_hash(path)
+    with _lock:
+        if (path, sha, name) not in _corrections:
+            _corrections[(path, sha, name)] = load_correction_set(path, persist=persist)[name]
+        return _corrections[(path, sha, name)]
+
+
+def clear_correction_cache() -> None:
+    with _lock:
+        _correction_sets.clear()
+        _corrections.clear()
+        _file_hashes.clear()
@@ -0,0 +1,375 @@
+# coding: utf-8
+
+"""
+Struct-of-arrays four-vectors on flat float64 buffers.
+
+A light-weight alternative to the coffea vector behaviors for hot producers and selectors:
+the components are plain numpy arrays and jagged collections are kept as one flat buffer
+together with the offsets of their axis=1 list structure. The formulas are the ones of
+coffea.nanoevents.methods.vector, so both paths give the same numbers and can be mixed
+via LorentzVectorArray.from_awkward / to_awkward.
+
+  p4     = LorentzVectorArray.from_awkward(events.hcand)   # flat, offsets of events.hcand
+  h1, h2 = p4.take(p4.offsets[:-1]), p4.take(p4.offsets[:-1] + 1)
+  zmf    = (h1 + h2).boostvec
+  dr     = h1.delta_r(h2)
+  h1_zmf = h1.boost(-zmf)
+"""
+
+from columnflow.util import maybe_import
+
+np = maybe_import("numpy")
+ak = maybe_import("awkward")
+coffea = maybe_import("coffea")
+maybe_import("coffea.nanoevents.methods.vector")
+
+
+def delta_phi(phi1, phi2):
+    """
+    phi1 - phi2 in [-pi, pi)
+    """
+    return (phi1 - phi2 + np.pi) % (2 * np.pi) - np.pi
+
+
+def delta_r(eta1, phi1, eta2, phi2):
+    return np.hypot(eta1 - eta2, delta_phi(phi1, phi2))
+
+
+def get_offsets(array) -> np.ndarray:
+    """
+    Offsets of the axis=1 lists of an awkward array
+    """
+    counts = np.asarray(ak.num(array, axis=1), dtype=np.int64)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def _flat(array) -> np.ndarray:
+    if isinstance(array, ak.Array):
+        array = ak.flatten(array, axis=None) if array.ndim > 1 else array
+        return np.asarray(ak.to_numpy(array), dtype=np.float64)
+    return np.asarray(array, dtype=np.float64)
+
+
+def _layout(flat: np.ndarray, offsets) -> ak.Array:
+    if offsets is None:
+        return ak.Array(flat)
+    return ak.Array(
+        ak.contents.ListOffsetArray(ak.index.Index64(offsets), ak.contents.NumpyArray(flat))
+    )
+
+
+class ThreeVectorArray:
+    """
+    Cartesian three-vectors, x, y, z are flat numpy arrays of the same length
+    """
+    __slots__ = ("x", "y", "z", "offsets")
+
+    def __init__(self, x, y, z, offsets=None):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def rho2(self):
+        return self.x * self.x + self.y * self.y + self.z * self.z
+
+    @property
+    def rho(self):
+        return np.sqrt(self.rho2)
+
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def cross(self, other):
+        return ThreeVectorArray(
+            self.y * other.z - self.z * other.y,
+            self.z * other.x - self.x * other.z,
+            self.x * other.y - self.y * other.x,
+            self.offsets,
+        )
+
+    @property
+    def unit(self):
+        return self / self.rho
+
+    def __add__(self, other):
+        return ThreeVectorArray(self.x + other.x, self.y + other.y, self.z + other.z, self.offsets)
+
+    def __sub__(self, other):
+        return ThreeVectorArray(self.x - other.x, self.y - other.y, self.z - other.z, self.offsets)
+
+    def __neg__(self):
+        return ThreeVectorArray(-self.x, -self.y, -self.z, self.offsets)
+
+    def __mul__(self, other):
+        return ThreeVectorArray(self.x * other, self.y * other, self.z * other, self.offsets)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return self * (1 / other)
+
+    def take(self, idx):
+        return ThreeVectorArray(self.x[idx], self.y[idx], self.z[idx])
+
+    def to_awkward(self) -> ak.Array:
+        return ak.zip(
+            {c: _layout(getattr(self, c), self.offsets) for c in ("x", "y", "z")},
+            with_name="ThreeVector",
+            behavior=coffea.nanoevents.methods.vector.behavior,
+        )
+
+
+class LorentzVectorArray:
+    """
+    Four-vectors on flat float64 numpy arrays, offsets (optional) describe the jagged structure they
+    were taken from. When built from pt, eta, phi, mass those are kept and the cartesian components
+    are only computed (once) when needed, as for coffea's PtEtaPhiMLorentzVector
+    """
+    __slots__ = ("offsets", "_cart", "_polar")
+
+    def __init__(self, x, y, z, t, offsets=None):
+        self._cart = (x, y, z, t)
+        self._polar = None
+        self.offsets = offsets
+
+    @classmethod
+    def from_ptetaphim(cls, pt, eta, phi, mass, offsets=None):
+        obj = cls.__new__(cls)
+        obj._cart = None
+        obj._polar = tuple(_flat(c) for c in (pt, eta, phi, mass))
+        obj.offsets = offsets
+        return obj
+
+    @classmethod
+    def from_awkward(cls, array: ak.Array):
+        """
+        From an awkward collection with either pt/eta/phi/mass or x/y/z/t fields, flattened
+        along axis=1 if jagged
+        """
+        offsets = get_offsets(array) if array.ndim > 1 else None
+        if "pt" in array.fields:
+            mass = array.mass if "mass" in array.fields else ak.zeros_like(array.pt)
+            return cls.from_ptetaphim(array.pt, array.eta, array.phi, mass, offsets)
+        return cls(*(_flat(array[c]) for c in ("x", "y", "z", "t")), offsets)
+
+    def _cartesian(self):
+        if self._cart is None:
+            pt, eta, phi, mass = self._polar
+            rho = pt * np.cosh(eta)
+            self._cart = (pt * np.cos(phi), pt * np.sin(phi), pt * np.sinh(eta), np.hypot(rho, mass))
+        return self._cart
+
+    def __len__(self):
+        return len((self._polar or self._cart)[0])
+
+    @property
+    def counts(self):
+        return None if self.offsets is None else np.diff(self.offsets)
+
+    # -- components -- #
+    @property
+    def x(self):
+        return self._cartesian()[0]
+
+    @property
+    def y(self):
+        return self._cartesian()[1]
+
+    @property
+    def z(self):
+        return self._cartesian()[2]
+
+    @property
+    def t(self):
+        return self._cartesian()[3]
+
+    px = x
+    py = y
+    pz = z
+    energy = t
+
+    @property
+    def pt2(self):
+        return self.x * self.x + self.y * self.y
+
+    @property
+    def pt(self):
+        return self._polar[0] if self._polar else np.sqrt(self.pt2)
+
+    @property
+    def eta(self):
+        return self._polar[1] if self._polar else np.arcsinh(self.z / self.pt)
+
+    @property
+    def phi(self):
+        return self._polar[2] if self._polar else np.arctan2(self.y, self.x)
+
+    @property
+    def rho2(self):
+        return self.pt2 + self.z * self.z
+
+    @property
+    def rho(self):
+        if self._polar:
+            return self._polar[0] * np.cosh(self._polar[1])
+        return np.sqrt(self.rho2)
+
+    @property
+    def mass2(self):
+        if self._polar:
+            return self._polar[3] * self._polar[3]
+        return self.t * self.t - self.x * self.x - self.y * self.y - self.z * self.z
+
+    @property
+    def mass(self):
+        return self._polar[3] if self._polar else np.sqrt(self.mass2)
+
+    @property
+    def pvec(self):
+        return ThreeVectorArray(self.x, self.y, self.z, self.offsets)
+
+    @property
+    def boostvec(self):
+        """
+        x, y, z divided by t, the unit vector where |t| <= rho, as in coffea
+        """
+        rho = self.rho
+        with np.errstate(divide="ignore"):
+            scale = np.where(rho == 0, 0, np.where(np.abs(self.t) <= rho, 1 / rho, 1 / self.t))
+        return self.pvec * scale
+
+    # -- arithmetic -- #
+    def __add__(self, other):
+        return LorentzVectorArray(self.x + other.x, self.y + other.y, self.z + other.z, self.t + other.t, self.offsets)
+
+    def __sub__(self, other):
+        return LorentzVectorArray(self.x - other.x, self.y - other.y, self.z - other.z, self.t - other.t, self.offsets)
+
+    def __neg__(self):
+        return LorentzVectorArray(-self.x, -self.y, -self.z, -self.t, self.offsets)
+
+    def __mul__(self, other):
+        return LorentzVectorArray(self.x * other, self.y * other, self.z * other, self.t * other, self.offsets)
+
+    __rmul__ = __mul__
+
+    def dot(self, other):
+        """
+        Spatial dot product, as LorentzVector.dot in coffea, see minkowski_dot for the four-vector one
+        """
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def minkowski_dot(self, other):
+        return self.t * other.t - self.x * other.x - self.y * other.y - self.z * other.z
+
+    def cross(self, other):
+        return self.pvec.cross(other.pvec if isinstance(other, LorentzVectorArray) else other)
+
+    @property
+    def unit(self):
+        return self.pvec.unit
+
+    def delta_phi(self, other):
+        return delta_phi(self.phi, other.phi)
+
+    def delta_r(self, other):
+        return delta_r(self.eta, self.phi, other.eta, other.phi)
+
+    def boost(self, other: ThreeVectorArray):
+        """
+        Lorentz boost by the three-vector *other*, same convention as coffea: use the negative of
+        the boostvec to go to the rest frame
+        """
+        b2 = other.rho2
+        mask = b2 == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gamma = (1 - b2) ** (-0.5)
+            gamma2 = np.where(mask, 0, (gamma - 1) / np.where(mask, 1, b2))
+        bp = self.dot(other)
+        v = other * (gamma2 * bp) + other * (self.t * gamma)
+        return LorentzVectorArray(self.x + v.x, self.y + v.y, self.z + v.z, gamma * (self.t + bp), self.offsets)
+
+    # -- structure -- #
+    def take(self, idx):
+        """
+        Subset / reorder by flat indices, the result has no offsets
+        """
+        out = LorentzVectorArray.__new__(LorentzVectorArray)
+        out._cart = None if self._cart is None else tuple(c[idx] for c in self._cart)
+        out._polar = None if self._polar is None else tuple(c[idx] for c in self._polar)
+        out.offsets = None
+        return out
+
+    def repeat(self, counts):
+        """
+        Broadcast one vector per event to a jagged structure with *counts* entries per event
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        out = self.take(np.repeat(np.arange(len(self)), counts))
+        out.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return out
+
+    def to_awkward(self, with_name: str = "LorentzVector") -> ak.Array:
+        """
+        Back to an awkward array with coffea behavior, jagged if offsets are set
+        """
+        if with_name == "PtEtaPhiMLorentzVector":
+            fields = dict(zip(("pt", "eta", "phi", "mass"), (self.pt, self.eta, self.phi, self.mass)))
+        else:
+            fields = {c: getattr(self, c) for c in ("x", "y", "z", "t")}
+        return ak.zip(
+            {name: _layout(val, self.offsets) for name, val in fields.items()},
+            with_name=with_name,
+            behavior=coffea.nanoevents.methods.vector.behavior,
+        )
+
+
+def pair_indices(offsets1: np.ndarray, offsets2: np.ndarray) -> tuple:
+    """
+    Flat indices (i1, i2) of all pairs of objects of two collections within the same event,
+    ordered as coffea's metric_table, i.e. events -> objects of 1 -> objects of 2
+    Also returns the offsets of the inner (objects of 2) lists
+    """
+    n1 = np.diff(offsets1)
+    n2 = np.diff(offsets2)
+    # number of partners of each object of the first collection
+    npairs = np.repeat(n2, n1)
+    inner_offsets = np.zeros(len(npairs) + 1, dtype=np.int64)
+    np.cumsum(npairs, out=inner_offsets[1:])
+    i1 = np.repeat(np.arange(len(npairs), dtype=np.int64) + offsets1[0], npairs)
+    start2 = np.repeat(offsets2[:-1], n1)
+    i2 = np.repeat(start2 - inner_offsets[:-1], npairs) + np.arange(inner_offsets[-1], dtype=np.int64)
+    return i1, i2, inner_offsets
+
+
+def metric_table(v1: LorentzVectorArray, v2: LorentzVectorArray, metric=None) -> ak.Array:
+    """
+    Jagged events * var * var table of *metric* (delta_r by default) between all objects of *v1*
+    and *v2* per event, same as v1.metric_table(v2) with coffea behaviors but without building
+    the cartesian product of records
+    """
+    if v1.offsets is None or v2.offsets is None:
+        raise ValueError("metric_table needs jagged LorentzVectorArrays (offsets set)")
+    i1, i2, inner_offsets = pair_indices(v1.offsets, v2.offsets)
+    if metric is None:
+        # only gather what delta_r needs
+        values = delta_r(v1.eta[i1], v1.phi[i1], v2.eta[i2], v2.phi[i2])
+    else:
+        values = metric(v1.take(i1), v2.take(i2))
+    outer_offsets = v1.offsets - v1.offsets[0]
+    return ak.Array(
+        ak.contents.ListOffsetArray(
+            ak.index.Index64(outer_offsets),
+            ak.contents.ListOffsetArray(
+                ak.index.Index64(inner_offsets),
+                ak.contents.NumpyArray(np.asarray(values)),
+            ),
+        ),
+    )
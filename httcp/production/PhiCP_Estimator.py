@@ -4,8 +4,10 @@ from columnflow.util import maybe_import
 np = maybe_import("numpy")
 ak = maybe_import("awkward")
 coffea = maybe_import("coffea")
+maybe_import("coffea.nanoevents.methods.vector")
 
 from httcp.production.PolarimetricA1 import PolarimetricA1
+from httcp.production.PolarimetricA1CV import PolarimetricA1Vectorized
 
 
 def GetPhiCP(
@@ -46,19 +48,69 @@ def GetPhiCP(
                                                method_leg1,
                                                method_leg2, 
                                                mode_leg1,
-                                               mode_leg2)
-    phicp = ak.values_astype(ComputeAcopAngle(phicp_input_vec_dict), np.float32)
-    phicp = ak.enforce_type(phicp, "var * float32")
-    
+                                               mode_leg2,
+                                               a1_model=kwars.get("a1_model", "cleo"))
+    return _toPhiCP(ComputeAcopAngle(phicp_input_vec_dict))
+
+
+def GetPhiCPMethods(
+        p4hcandinfodict: dict,
+        method_pairs: list,
+        mode_leg1: str,
+        mode_leg2: str,
+        a1_model: str = "cleo",
+) -> dict:
+    """
+    Inputs:
+      p4hcandinfodict : hcand dict, all events having the same decay modes
+      method_pairs    : list of (method_leg1, method_leg2) e.g. [("IP", "PV"), ("PV", "PV")]
+      mode_leg1       : "e/mu/pi/rho/a1"
+      mode_leg2       : "pi/rho/a1"
+      a1_model        : polarimetric vector of the a1 legs, "cleo" (PolarimetricA1) or "cv" (PolarimetricA1Vectorized)
+    Output:
+      {(method_leg1, method_leg2) : PhiCP array}, same values as GetPhiCP for each pair
+    Steps:
+      The un-boosted vectors of a leg are prepared once per method and shared by all pairs using it,
+      the ZMF boost is computed once per pair
+    """
+    legs = {}
+    for method_leg1, method_leg2 in method_pairs:
+        if (1, method_leg1) not in legs:
+            legs[(1, method_leg1)] = _prepareVecs(p4hcandinfodict["p4h1"],
+                                                  p4hcandinfodict["p4h1pi"],
+                                                  p4hcandinfodict["p4h1pi0"],
+                                                  method_leg1, mode_leg1)
+        if (2, method_leg2) not in legs:
+            legs[(2, method_leg2)] = _prepareVecs(p4hcandinfodict["p4h2"],
+                                                  p4hcandinfodict["p4h2pi"],
+                                                  p4hcandinfodict["p4h2pi0"],
+                                                  method_leg2, mode_leg2)
+
+    phicp = {}
+    for method_leg1, method_leg2 in method_pairs:
+        vecs = _boostLegs(p4hcandinfodict,
+                          legs[(1, method_leg1)],
+                          legs[(2, method_leg2)],
+                          method_leg1, method_leg2,
+                          mode_leg1, mode_leg2,
+                          a1_model=a1_model)
+        phicp[(method_leg1, method_leg2)] = _toPhiCP(ComputeAcopAngle(vecs))
+
     return phicp
 
 
+def _toPhiCP(acop: ak.Array) -> ak.Array:
+    phicp = ak.values_astype(acop, np.float32)
+    return ak.enforce_type(phicp, "var * float32")
+
+
 def PrepareVecsForPhiCP(
         p4hcandinfodict: dict, 
         method_leg1: str, 
         method_leg2: str, 
         mode_leg1: str, 
-        mode_leg2: str
+        mode_leg2: str,
+        a1_model: str = "cleo",
 ) -> dict:
     """
     Inputs:
@@ -94,20 +146,47 @@ def PrepareVecsForPhiCP(
     p4h2pi  = p4hcandinfodict["p4h2pi"]
     p4h2pi0 = p4hcandinfodict["p4h2pi0"]
     
-    _P1, _R1, _y1, _c1 = _prepareVecs(p4h1, p4h1pi, p4h1pi0, method_leg1, mode_leg1)
-    _P2, _R2, _y2, _c2 = _prepareVecs(p4h2, p4h2pi, p4h2pi0, method_leg2, mode_leg2)
+    leg1 = _prepareVecs(p4h1, p4h1pi, p4h1pi0, method_leg1, mode_leg1)
+    leg2 = _prepareVecs(p4h2, p4h2pi, p4h2pi0, method_leg2, mode_leg2)
+
+    return _boostLegs(p4hcandinfodict, leg1, leg2, method_leg1, method_leg2, mode_leg1, mode_leg2, a1_model=a1_model)
+
+
+def _boostLegs(
+        p4hcandinfodict: dict,
+        leg1: tuple,
+        leg2: tuple,
+        method_leg1: str,
+        method_leg2: str,
+        mode_leg1: str,
+        mode_leg2: str,
+        a1_model: str = "cleo",
+) -> dict:
+    """
+    Boost the prepared vectors of both legs (output of _prepareVecs) to the ZMF
+    and return the input dict of ComputeAcopAngle
+    """
+    p4h1    = p4hcandinfodict["p4h1"]
+    p4h1pi  = p4hcandinfodict["p4h1pi"]
+    p4h1pi0 = p4hcandinfodict["p4h1pi0"]
+    p4h2    = p4hcandinfodict["p4h2"]
+    p4h2pi  = p4hcandinfodict["p4h2pi"]
+    p4h2pi0 = p4hcandinfodict["p4h2pi0"]
+
+    _P1, _R1, _y1, _c1 = leg1
+    _P2, _R2, _y2, _c2 = leg2
 
     # Get the boost vector
     boostv = _getBoost(_P1, _P2)
 
     # Boost the vectors
     if method_leg1 == "PV":
-      P1, R1, y1 = _boostVec_and_PV(boostv, _P1, _y1, method_leg1, mode_leg1, p4h1, p4h1pi, p4h1pi0)
+      P1, R1, y1 = _boostVec_and_PV(boostv, _P1, _y1, method_leg1, mode_leg1, p4h1, p4h1pi, p4h1pi0, a1_model)
     else:
       P1, R1, y1 = _boostVecs(boostv, _P1, _R1, _y1, method_leg1, mode_leg1)
 
     if method_leg2 == "PV":
-      P2, R2, y2 = _boostVec_and_PV(boostv, _P2, _y2, method_leg2, mode_leg2, p4h2, p4h2pi, p4h2pi0)
+      P2, R2, y2 = _boostVec_and_PV(boostv, _P2, _y2, method_leg2, mode_leg2, p4h2, p4h2pi, p4h2pi0, a1_model)
     else:
       P2, R2, y2 = _boostVecs(boostv, _P2, _R2, _y2, method_leg2, mode_leg2)
 
@@ -125,7 +204,8 @@ def _boostVec_and_PV(
         mode_leg: str,
         p4_hcand: ak.Array,
         p4_hcand_pi: ak.Array,
-        p4_hcand_pi0: ak.Array
+        p4_hcand_pi0: ak.Array,
+        a1_model: str = "cleo",
 ) -> tuple[ak.Array, ak.Array, ak.Array]:
     """
     Boost the vectors and calculate the polarimetric vector
@@ -146,12 +226,27 @@ def _boostVec_and_PV(
         os_pi_HRF   = p4_hcand_pi[:, 0:1].boost(boostv.negative())
         ss1_pi_HRF  = p4_hcand_pi[:, 1:2].boost(boostv.negative()) 
         ss2_pi_HRF  = p4_hcand_pi[:, 2:3].boost(boostv.negative()) 
-        a1pol       = PolarimetricA1(P,
-                                     os_pi_HRF,
-                                     ss1_pi_HRF,
-                                     ss2_pi_HRF,
-                                     p4_hcand.charge)
-        R = -a1pol.PVC().pvec #.pvec #.unit
+        if a1_model == "cv":
+            # flat (N, 3) vector of the vectorised CV model, back to the layout of P
+            a1pol = PolarimetricA1Vectorized(P,
+                                             os_pi_HRF,
+                                             ss1_pi_HRF,
+                                             ss2_pi_HRF,
+                                             p4_hcand.charge)
+            pv = a1pol.PVC()
+            counts = ak.num(P, axis=1)
+            R = -ak.zip(
+                {c: ak.unflatten(pv[:, i], counts) for i, c in enumerate("xyz")},
+                with_name="ThreeVector",
+                behavior=coffea.nanoevents.methods.vector.behavior,
+            )
+        else:
+            a1pol       = PolarimetricA1(P,
+                                         os_pi_HRF,
+                                         ss1_pi_HRF,
+                                         ss2_pi_HRF,
+                                         p4_hcand.charge)
+            R = -a1pol.PVC().pvec #.pvec #.unit
     else:
         raise RuntimeError(f"Wrong mode: {mode_leg}")
 
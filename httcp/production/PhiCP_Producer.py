@@ -8,7 +8,7 @@ from typing import Optional
 from columnflow.production import Producer, producer
 from columnflow.util import maybe_import
 
-from httcp.production.PhiCP_Estimator import GetPhiCP
+from httcp.production.PhiCP_Estimator import GetPhiCPMethods
 from httcp.production.angular_features import ProduceDetCosPsi, ProduceGenCosPsi
 from columnflow.columnar_util import EMPTY_FLOAT, Route, set_ak_column, optional_column as optional
 
@@ -21,6 +21,71 @@ logger = law.logger.get_logger(__name__)
 
 
 
+# decay mode of the hcand leg -> mode used in GetPhiCP
+# DM2 is treated as rho and DM11 as a1
+DM_MODES = {
+    -1 : "e",
+    -2 : "mu",
+     0 : "pi",
+     1 : "rho",
+     2 : "rho",
+    10 : "a1",
+    11 : "a1",
+}
+
+MODES = ("e", "mu", "pi", "rho", "a1")
+
+# modes accepted on each leg by a method
+LEG1_MODES = {"IP": ("e", "mu", "pi"), "DP": ("rho", "a1"), "PV": ("pi", "rho", "a1")}
+LEG2_MODES = {"IP": ("pi",),           "DP": ("rho", "a1"), "PV": ("pi", "rho", "a1")}
+
+# output name -> (method_leg1, method_leg2)
+PHICP_METHODS = {
+    "IPIP" : ("IP", "IP"),
+    "DPDP" : ("DP", "DP"),
+    "PVPV" : ("PV", "PV"),
+    "IPDP" : ("IP", "DP"),
+    "IPPV" : ("IP", "PV"),
+}
+
+
+def _mode_index(dm: np.ndarray) -> np.ndarray:
+    """
+    Index in MODES of each decay mode, -1 if not used for PhiCP
+    """
+    mode_idx = np.full(len(dm), -1, dtype=np.int64)
+    for _dm, mode in DM_MODES.items():
+        mode_idx[dm == _dm] = MODES.index(mode)
+    return mode_idx
+
+
+def _mode_groups(code: np.ndarray) -> list:
+    """
+    Split the event indices by the (mode_leg1, mode_leg2) code with a single sort,
+    indices within a group stay in ascending order
+    """
+    if len(code) == 0:
+        return []
+    order = np.argsort(code, kind="stable")
+    _, starts = np.unique(code[order], return_index=True)
+    return np.split(order, starts[1:])
+
+
+def _scatter_phicp(nevents: int, pieces: list) -> ak.Array:
+    """
+    Put the PhiCP of each group back to the position of its events,
+    events without any group get an empty list
+    """
+    empty = ak.unflatten(np.zeros(0, dtype=np.float32), np.zeros(1, dtype=np.int64))
+    if not pieces:
+        return ak.to_packed(empty[np.zeros(nevents, dtype=np.int64)])
+    idx = np.concatenate([group_idx for group_idx, _ in pieces])
+    values = ak.concatenate([phicp for _, phicp in pieces] + [empty], axis=0)
+    pos = np.full(nevents, len(idx), dtype=np.int64)
+    pos[idx] = np.arange(len(idx))
+    return ak.to_packed(values[pos])
+
+
 @producer(
     uses={
         "channel_id",
@@ -40,231 +105,51 @@ def ProducePhiCP(
         **kwargs,
 ) -> tuple[ak.Array,ak.Array,ak.Array,ak.Array,ak.Array]:
 
-    PrepareP4 = lambda p4dict, mask : {key: ak.where(mask, val, val[:,:0]) for key, val in p4dict.items()}
-
-    is_e      = lambda leg: ak.fill_none(ak.firsts(leg.decayMode == -1, axis=1), False)
-    is_mu     = lambda leg: ak.fill_none(ak.firsts(leg.decayMode == -2, axis=1), False)
-    is_pi     = lambda leg: ak.fill_none(ak.firsts(leg.decayMode ==  0, axis=1), False)
-    is_rho    = lambda leg: ak.fill_none(ak.firsts(leg.decayMode ==  1, axis=1), False)
-    is_a1DM2  = lambda leg: ak.fill_none(ak.firsts(leg.decayMode ==  2, axis=1), False)
-    is_a1DM10 = lambda leg: ak.fill_none(ak.firsts(leg.decayMode == 10, axis=1), False)
-    is_a1DM11 = lambda leg: ak.fill_none(ak.firsts(leg.decayMode == 11, axis=1), False)
-    is_a1     = is_a1DM10 # for now
-
     p4h1      = p4hcandinfo["p4h1"]
     p4h2      = p4hcandinfo["p4h2"]
 
     # energy split mask
     #esplit_h1 = ak.fill_none(ak.firsts(energy_split_h1 > 0.2, axis=1))
     #esplit_h2 = ak.fill_none(ak.firsts(energy_split_h2 > 0.2, axis=1))
-    
-    # etau
-    mask_e_pi      = is_e(p4h1)   &   is_pi(p4h2)
-    mask_e_rho     = is_e(p4h1)   &   is_rho(p4h2)
-    mask_e_a1DM2   = is_e(p4h1)   &   is_a1DM2(p4h2)
-    mask_e_a1DM10  = is_e(p4h1)   &   is_a1DM10(p4h2)
-    mask_e_a1DM11  = is_e(p4h1)   &   is_a1DM11(p4h2)
-
-
-    # mutau
-    mask_mu_pi     = is_mu(p4h1)  &   is_pi(p4h2)
-    mask_mu_rho    = is_mu(p4h1)  &   is_rho(p4h2)
-    mask_mu_a1DM2  = is_mu(p4h1)  &   is_a1DM2(p4h2)
-    mask_mu_a1DM10 = is_mu(p4h1)  &   is_a1DM10(p4h2)
-    mask_mu_a1DM11 = is_mu(p4h1)  &   is_a1DM11(p4h2)    
-
-
-    # tautau
-    mask_pi_pi   = is_pi(p4h1)  &   is_pi(p4h2)
-
-    mask_pi_rho  = is_pi(p4h1)  &   is_rho(p4h2)
-    mask_rho_pi  = is_rho(p4h1) &   is_pi(p4h2)
-
-    mask_pi_a1DM2   = is_pi(p4h1)  &   is_a1DM2(p4h2)
-    mask_pi_a1DM10  = is_pi(p4h1)  &   is_a1DM10(p4h2)
-    mask_pi_a1DM11  = is_pi(p4h1)  &   is_a1DM11(p4h2)
-    mask_a1DM2_pi   = is_a1DM2(p4h1)  &   is_pi(p4h2)
-    mask_a1DM10_pi  = is_a1DM10(p4h1) &   is_pi(p4h2)
-    mask_a1DM11_pi  = is_a1DM11(p4h1) &   is_pi(p4h2)
-
-    mask_rho_rho    = is_rho(p4h1) &   is_rho(p4h2)
-
-    mask_rho_a1DM2  = is_rho(p4h1) &   is_a1DM2(p4h2)
-    mask_rho_a1DM10 = is_rho(p4h1) &   is_a1DM10(p4h2)
-    mask_rho_a1DM11 = is_rho(p4h1) &   is_a1DM11(p4h2)
-    mask_a1DM2_rho  = is_a1DM2(p4h1)   &   is_rho(p4h2)
-    mask_a1DM10_rho = is_a1DM10(p4h1)  &   is_rho(p4h2)
-    mask_a1DM11_rho = is_a1DM11(p4h1)  &   is_rho(p4h2)
-    
-    mask_a1DM2_a1DM2    = is_a1DM2(p4h1)  &  is_a1DM2(p4h2)
-    mask_a1DM2_a1DM10   = is_a1DM2(p4h1)  &  is_a1DM10(p4h2)
-    mask_a1DM10_a1DM2   = is_a1DM10(p4h1) &  is_a1DM2(p4h2)
-    mask_a1DM2_a1DM11   = is_a1DM2(p4h1)  &  is_a1DM11(p4h2)
-    mask_a1DM11_a1DM2   = is_a1DM11(p4h1) &  is_a1DM2(p4h2)    
 
-    mask_a1DM10_a1DM10   = is_a1DM10(p4h1) &  is_a1DM10(p4h2)
-    mask_a1DM10_a1DM11   = is_a1DM10(p4h1) &  is_a1DM11(p4h2)
-    mask_a1DM11_a1DM10   = is_a1DM11(p4h1) &  is_a1DM10(p4h2)
+    # decay modes of both legs, events without hcand are not in any group
+    dm1 = np.asarray(ak.fill_none(ak.firsts(p4h1.decayMode, axis=1), -99), dtype=np.int64)
+    dm2 = np.asarray(ak.fill_none(ak.firsts(p4h2.decayMode, axis=1), -99), dtype=np.int64)
+    mode1 = _mode_index(dm1)
+    mode2 = _mode_index(dm2)
+    code = np.where((mode1 >= 0) & (mode2 >= 0), mode1 * len(MODES) + mode2, -1)
 
-    mask_a1DM11_a1DM11   = is_a1DM11(p4h1) &  is_a1DM11(p4h2)
-    
-    # GetPhiCP
+    # GetPhiCPMethods
     # Inputs:
-    #   masked dict of p4hcand
-    #   leg1_method, leg2_method
-    #   leg1_mode,lmeg2_mode
-
-    dummyPhiCP = ak.values_astype(events.event[:,None][:,:0], np.float32)
-
-
-    ##################################################################################
-    #                                      IPIP                                      #
-    #                        Only possible for (e/mu/pi)-pi                          #
-    ##################################################################################
-    logger.info("IP-IP")
-    
-    PhiCP_IPIP = ak.where(mask_e_pi,    GetPhiCP(PrepareP4(p4hcandinfo, mask_e_pi   ), "IP", "IP", "e",   "pi" ), dummyPhiCP)
-    PhiCP_IPIP = ak.where(mask_mu_pi,   GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_pi  ), "IP", "IP", "mu",  "pi" ), PhiCP_IPIP)
-    PhiCP_IPIP = ak.where(mask_pi_pi,   GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_pi  ), "IP", "IP", "pi",  "pi" ), PhiCP_IPIP)
-
-
-
-    
-    ##################################################################################
-    #                                       DPDP                                     #
-    #                    Only possible for (rho/a1)-(rho/a1) channel                 #
-    ##################################################################################
-    logger.info("DP-DP")
-    
-    # -- rho-rho
-    PhiCP_DPDP = ak.where(mask_rho_rho,    GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_rho    ), "DP", "DP", "rho", "rho"), dummyPhiCP)
-    # -- rho-a1
-    PhiCP_DPDP = ak.where(mask_rho_a1DM2,  GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_a1DM2  ), "DP", "DP", "rho", "rho"), PhiCP_DPDP) # DM2 -> DM1
-    PhiCP_DPDP = ak.where(mask_rho_a1DM10, GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_a1DM10 ), "DP", "DP", "rho", "a1" ), PhiCP_DPDP)
-    PhiCP_DPDP = ak.where(mask_rho_a1DM11, GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_a1DM11 ), "DP", "DP", "rho", "a1" ), PhiCP_DPDP) # DM11 -> DM10
-    # -- a1-rho
-    PhiCP_DPDP = ak.where(mask_a1DM2_rho,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_rho  ), "DP", "DP", "rho", "rho"), PhiCP_DPDP) # DM2 -> DM1 
-    PhiCP_DPDP = ak.where(mask_a1DM10_rho, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_rho ), "DP", "DP", "a1",  "rho"), PhiCP_DPDP) 
-    PhiCP_DPDP = ak.where(mask_a1DM11_rho, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_rho ), "DP", "DP", "a1",  "rho"), PhiCP_DPDP) # DM11 -> DM10
-    # -- a1-a1
-    PhiCP_DPDP = ak.where(mask_a1DM2_a1DM2,   GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_a1DM2  ), "DP", "DP", "rho", "rho" ), PhiCP_DPDP) # DM2 -> DM1 
-    PhiCP_DPDP = ak.where(mask_a1DM2_a1DM10,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_a1DM10 ), "DP", "DP", "rho", "a1"  ), PhiCP_DPDP) # DM2 -> DM1
-    PhiCP_DPDP = ak.where(mask_a1DM10_a1DM2,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_a1DM2 ), "DP", "DP", "a1", "rho"  ), PhiCP_DPDP) # DM2 -> DM1 
-    PhiCP_DPDP = ak.where(mask_a1DM2_a1DM11,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_a1DM11 ), "DP", "DP", "rho",  "a1" ), PhiCP_DPDP) # DM2 -> DM1, DM11 -> DM10
-    PhiCP_DPDP = ak.where(mask_a1DM11_a1DM2,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_a1DM2 ), "DP", "DP", "a1",  "rho" ), PhiCP_DPDP) # DM2 -> DM1, DM11 -> DM10 
-    PhiCP_DPDP = ak.where(mask_a1DM10_a1DM10, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_a1DM10), "DP", "DP", "a1",   "a1" ), PhiCP_DPDP) 
-    PhiCP_DPDP = ak.where(mask_a1DM10_a1DM11, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_a1DM11), "DP", "DP", "a1",   "a1" ), PhiCP_DPDP) # DM11 -> DM10
-    PhiCP_DPDP = ak.where(mask_a1DM11_a1DM10, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_a1DM10), "DP", "DP", "a1",   "a1" ), PhiCP_DPDP) # DM11 -> DM10
-    PhiCP_DPDP = ak.where(mask_a1DM11_a1DM11, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_a1DM11), "DP", "DP", "a1",   "a1" ), PhiCP_DPDP) # DM11 -> DM10
-    
+    #   dict of p4hcand for the events of one (mode_leg1, mode_leg2) group
+    #   list of (leg1_method, leg2_method)
+    #   leg1_mode, leg2_mode
+    phicp_pieces = {name: [] for name in PHICP_METHODS}
+    for idx in _mode_groups(code):
+        if code[idx[0]] < 0:
+            continue
+        mode_leg1, mode_leg2 = MODES[mode1[idx[0]]], MODES[mode2[idx[0]]]
+        names = [name for name, (method_leg1, method_leg2) in PHICP_METHODS.items()
+                 if mode_leg1 in LEG1_MODES[method_leg1] and mode_leg2 in LEG2_MODES[method_leg2]]
+        if not names:
+            continue
+        logger.info(f"{mode_leg1}-{mode_leg2} : {len(idx)} events : {', '.join(names)}")
+
+        p4hcandinfo_group = {key: val[idx] for key, val in p4hcandinfo.items()}
+        phicp_group = GetPhiCPMethods(p4hcandinfo_group,
+                                      [PHICP_METHODS[name] for name in names],
+                                      mode_leg1,
+                                      mode_leg2,
+                                      a1_model=self.config_inst.x("a1_polarimetric_model", "cleo"))
+        for name in names:
+            phicp_pieces[name].append((idx, phicp_group[PHICP_METHODS[name]]))
+
+    PhiCP_IPIP = _scatter_phicp(len(code), phicp_pieces["IPIP"])
+    PhiCP_DPDP = _scatter_phicp(len(code), phicp_pieces["DPDP"])
+    PhiCP_PVPV = _scatter_phicp(len(code), phicp_pieces["PVPV"])
+    PhiCP_IPDP = _scatter_phicp(len(code), phicp_pieces["IPDP"])
+    PhiCP_IPPV = _scatter_phicp(len(code), phicp_pieces["IPPV"])
 
-    
-
-    ##################################################################################
-    #                                      PVPVP                                     #
-    #                         Only possible for tau-tau channel                      #
-    ##################################################################################
-    logger.info("PV-PV")
-    
-    # -- pi-pi
-    PhiCP_PVPV = ak.where(mask_pi_pi,   GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_pi  ), "PV", "PV", "pi",  "pi" ), dummyPhiCP)
-    # -- pi-rho
-    PhiCP_PVPV = ak.where(mask_pi_rho,  GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_rho ), "PV", "PV", "pi",  "rho"), PhiCP_PVPV)
-    # -- rho-pi
-    PhiCP_PVPV = ak.where(mask_rho_pi,  GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_pi ), "PV", "PV", "rho", "pi" ), PhiCP_PVPV)
-    # -- rho-rho
-    PhiCP_PVPV = ak.where(mask_rho_rho, GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_rho), "PV", "PV", "rho", "rho"), PhiCP_PVPV)
-    # -- pi-a1
-    PhiCP_PVPV = ak.where(mask_pi_a1DM2,   GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM2  ), "PV", "PV", "pi",  "rho"), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_pi_a1DM10,  GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM10 ), "PV", "PV", "pi",  "a1" ), PhiCP_PVPV)
-    PhiCP_PVPV = ak.where(mask_pi_a1DM11,  GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM11 ), "PV", "PV", "pi",  "a1" ), PhiCP_PVPV) # DM11 -> DM10
-    # -- a1-pi
-    PhiCP_PVPV = ak.where(mask_a1DM2_pi,   GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_pi  ), "PV", "PV", "rho", "pi" ), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM10_pi,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_pi ), "PV", "PV", "a1",  "pi" ), PhiCP_PVPV)
-    PhiCP_PVPV = ak.where(mask_a1DM11_pi,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_pi ), "PV", "PV", "a1",  "pi" ), PhiCP_PVPV) # DM11 -> DM10
-    # -- rho-a1
-    PhiCP_PVPV = ak.where(mask_rho_a1DM2,  GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_a1DM2 ), "PV", "PV", "rho", "rho"), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_rho_a1DM10, GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_a1DM10), "PV", "PV", "rho", "a1" ),  PhiCP_PVPV)
-    PhiCP_PVPV = ak.where(mask_rho_a1DM11, GetPhiCP(PrepareP4(p4hcandinfo, mask_rho_a1DM11), "PV", "PV", "rho", "a1" ),  PhiCP_PVPV) # DM11 -> DM10
-    # -- a1-rho
-    PhiCP_PVPV = ak.where(mask_a1DM2_rho,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_rho ), "PV", "PV", "rho", "rho"), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM10_rho, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_rho), "PV", "PV", "a1",  "rho"), PhiCP_PVPV)
-    PhiCP_PVPV = ak.where(mask_a1DM11_rho, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_rho), "PV", "PV", "a1",  "rho"), PhiCP_PVPV) # DM11 -> DM10
-    # -- a1-a1
-    PhiCP_PVPV = ak.where(mask_a1DM2_a1DM2,  GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_a1DM2 ), "PV", "PV", "rho", "rho" ), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM2_a1DM10, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_a1DM10), "PV", "PV", "rho",  "a1" ), PhiCP_PVPV) # DM11 -> DM10
-    PhiCP_PVPV = ak.where(mask_a1DM10_a1DM2, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_a1DM2), "PV", "PV", "a1",  "rho" ), PhiCP_PVPV) # DM11 -> DM10
-    PhiCP_PVPV = ak.where(mask_a1DM2_a1DM11, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM2_a1DM11), "PV", "PV", "rho",  "a1" ), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM11_a1DM2, GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_a1DM2), "PV", "PV", "a1",  "rho" ), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM10_a1DM10,GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_a1DM10),"PV", "PV",  "a1",  "a1" ), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM10_a1DM11,GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM10_a1DM11),"PV", "PV",  "a1",  "a1" ), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM11_a1DM10,GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_a1DM10),"PV", "PV",  "a1",  "a1" ), PhiCP_PVPV) # DM2 -> DM1
-    PhiCP_PVPV = ak.where(mask_a1DM11_a1DM11,GetPhiCP(PrepareP4(p4hcandinfo, mask_a1DM11_a1DM11),"PV", "PV",  "a1",  "a1" ), PhiCP_PVPV) # DM2 -> DM1
-    
-
-
-
-    ##################################################################################
-    #                                      IPDP                                      #
-    #                   Only possible for (e/mu/pi)-(rho/a1) channel                 #
-    ##################################################################################
-    logger.info("IP-DP")
-    
-    # -- e-rho
-    PhiCP_IPDP = ak.where(mask_e_rho,    GetPhiCP(PrepareP4(p4hcandinfo, mask_e_rho    ), "IP", "DP", "e",   "rho"), dummyPhiCP)
-    # -- e-a1
-    PhiCP_IPDP = ak.where(mask_e_a1DM2,  GetPhiCP(PrepareP4(p4hcandinfo, mask_e_a1DM2  ), "IP", "DP", "e",   "rho"), PhiCP_IPDP) # treat DM2 as rho
-    PhiCP_IPDP = ak.where(mask_e_a1DM10, GetPhiCP(PrepareP4(p4hcandinfo, mask_e_a1DM10 ), "IP", "DP", "e",   "a1" ), PhiCP_IPDP) 
-    PhiCP_IPDP = ak.where(mask_e_a1DM11, GetPhiCP(PrepareP4(p4hcandinfo, mask_e_a1DM11 ), "IP", "DP", "e",   "a1" ), PhiCP_IPDP) # treat DM11 as a1
-    # -- mu-rho
-    PhiCP_IPDP = ak.where(mask_mu_rho,   GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_rho   ), "IP", "DP", "mu",  "rho"), PhiCP_IPDP)
-    # -- mu-a1
-    PhiCP_IPDP = ak.where(mask_mu_a1DM2, GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_a1DM2 ), "IP", "DP", "mu",  "rho"), PhiCP_IPDP) # treat DM2 as rho
-    PhiCP_IPDP = ak.where(mask_mu_a1DM10,GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_a1DM10), "IP", "DP", "mu",  "a1" ), PhiCP_IPDP)
-    PhiCP_IPDP = ak.where(mask_mu_a1DM11,GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_a1DM11), "IP", "DP", "mu",  "a1" ), PhiCP_IPDP) # treat DM11 as a1
-    # -- pi-rho
-    PhiCP_IPDP = ak.where(mask_pi_rho,   GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_rho   ), "IP", "DP", "pi",  "rho"), PhiCP_IPDP)
-    # -- pi-a1
-    PhiCP_IPDP = ak.where(mask_pi_a1DM2, GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM2 ), "IP", "DP", "pi",  "rho"), PhiCP_IPDP) # treat DM2 as rho  
-    PhiCP_IPDP = ak.where(mask_pi_a1DM10,GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM10), "IP", "DP", "pi",  "a1" ), PhiCP_IPDP)
-    PhiCP_IPDP = ak.where(mask_pi_a1DM11,GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM11), "IP", "DP", "pi",  "a1" ), PhiCP_IPDP) # treat DM11 as a1 
-
-
-
-    
-    ##################################################################################
-    #                                      IPPV                                      #
-    #                Only possible for (e/mu/pi)-(pi/rho/a1) channel                 #
-    ##################################################################################
-    logger.info("IP-PV")
-    
-    # -- e-pi
-    PhiCP_IPPV = ak.where(mask_e_pi,    GetPhiCP(PrepareP4(p4hcandinfo, mask_e_pi    ), "IP", "PV", "e",  "pi"),   dummyPhiCP)    
-    # -- e-rho
-    PhiCP_IPPV = ak.where(mask_e_rho,   GetPhiCP(PrepareP4(p4hcandinfo, mask_e_rho   ), "IP", "PV", "e",   "rho"), PhiCP_IPPV)
-    # -- e-a1
-    PhiCP_IPPV = ak.where(mask_e_a1DM2, GetPhiCP(PrepareP4(p4hcandinfo, mask_e_a1DM2 ), "IP", "PV", "e",   "rho"), PhiCP_IPPV) # treat DM2 as rho
-    PhiCP_IPPV = ak.where(mask_e_a1DM10,GetPhiCP(PrepareP4(p4hcandinfo, mask_e_a1DM10), "IP", "PV", "e",   "a1" ), PhiCP_IPPV)
-    PhiCP_IPPV = ak.where(mask_e_a1DM11,GetPhiCP(PrepareP4(p4hcandinfo, mask_e_a1DM11), "IP", "PV", "e",   "a1" ), PhiCP_IPPV) # treat DM11 as a1 
-    # -- mu-pi
-    PhiCP_IPPV = ak.where(mask_mu_pi,   GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_pi   ), "IP", "PV", "mu",  "pi"),  PhiCP_IPPV)
-    # -- mu-rho
-    PhiCP_IPPV = ak.where(mask_mu_rho,  GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_rho ), "IP", "PV", "mu",  "rho"), PhiCP_IPPV)
-    # -- mu-a1
-    PhiCP_IPPV = ak.where(mask_mu_a1DM2, GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_a1DM2 ),"IP", "PV", "mu",  "rho"), PhiCP_IPPV) # treat DM2 as rho
-    PhiCP_IPPV = ak.where(mask_mu_a1DM10,GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_a1DM10),"IP", "PV", "mu",  "a1"),  PhiCP_IPPV)
-    PhiCP_IPPV = ak.where(mask_mu_a1DM11,GetPhiCP(PrepareP4(p4hcandinfo, mask_mu_a1DM11),"IP", "PV", "mu",  "a1"),  PhiCP_IPPV) # treat DM11 as a1
-    # -- pi-pi
-    PhiCP_IPPV = ak.where(mask_pi_pi,    GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_pi ), "IP", "PV", "pi",  "pi"), PhiCP_IPPV)        
-    # -- pi-rho
-    PhiCP_IPPV = ak.where(mask_pi_rho,  GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_rho ), "IP", "PV", "pi",  "rho"), PhiCP_IPPV)
-    # -- pi-a1
-    PhiCP_IPPV = ak.where(mask_pi_a1DM2,GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM2  ), "IP", "PV", "pi",  "rho" ), PhiCP_IPPV) # treat DM2 as rho
-    PhiCP_IPPV = ak.where(mask_pi_a1DM10,GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM10), "IP", "PV", "pi",  "a1" ),  PhiCP_IPPV)
-    PhiCP_IPPV = ak.where(mask_pi_a1DM11,GetPhiCP(PrepareP4(p4hcandinfo, mask_pi_a1DM11), "IP", "PV", "pi",  "a1" ),  PhiCP_IPPV) # treat DM11 as a1
-
-    
-    
     return events, PhiCP_IPIP, PhiCP_DPDP, PhiCP_PVPV, PhiCP_IPDP, PhiCP_IPPV
 
 
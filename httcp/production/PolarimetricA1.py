@@ -6,6 +6,8 @@ ak     = maybe_import("awkward")
 coffea = maybe_import("coffea")
 
 from httcp.production.TComplex import TComplex
+from httcp.production.PolarimetricA1Kernels import f3pi_factors, get_bt_couplings
+from columnflow.columnar_util import flat_np_view
 #from IPython import embed
 
 
@@ -20,10 +22,15 @@ class PolarimetricA1:
                  p4_os_pi  : ak.Array,
                  p4_ss1_pi : ak.Array,
                  p4_ss2_pi : ak.Array,
-                 taucharge : ak.Array) -> None:
+                 taucharge : ak.Array,
+                 backend   : str = "numba") -> None:
         """
         Calculate Polarimetric vector for tau to a1 decay
         All the vectors in the arguments must be wrt the rest frame
+        backend: evaluation of the 3-pion form factor
+          "numba"   : fused per-event loop, compiled if numba is available, NumPy otherwise
+          "numpy"   : fused NumPy evaluation on flat buffers
+          "awkward" : the TComplex chain of F3PI / BWIGML / FA1A1P
         """
 
         self.p4_tau         =  p4_tau       # tau
@@ -55,6 +62,7 @@ class PolarimetricA1:
         self.SIGN           = -taucharge
         self.doSystematic   =  False
         self.systType       =  "UP"
+        self.backend        =  backend
 
 
     def PVC(self) -> ak.Array:
@@ -80,9 +88,12 @@ class PolarimetricA1:
         vec2 = getvec(a1, q3, q1)
         vec3 = getvec(a1, q1, q2)
         
-        F1 = TComplex(self.COEF1)*self.F3PI(1, a1.mass2, s1, s2)
-        F2 = TComplex(self.COEF2)*self.F3PI(2, a1.mass2, s2, s1)
-        F3 = TComplex(self.COEF3)*self.F3PI(3, a1.mass2, s3, s1)
+        if self.backend == "awkward":
+            F1 = TComplex(self.COEF1)*self.F3PI(1, a1.mass2, s1, s2)
+            F2 = TComplex(self.COEF2)*self.F3PI(2, a1.mass2, s2, s1)
+            F3 = TComplex(self.COEF3)*self.F3PI(3, a1.mass2, s3, s1)
+        else:
+            F1, F2, F3 = self.F3PIFactors(a1.mass2, s1, s2, s3)
 
         HADCUR = []
 
@@ -110,6 +121,42 @@ class PolarimetricA1:
         return out
 
     
+    def BTScale(self) -> float:
+        """
+            Scale of the systematic variation of the BT couplings
+        """
+        scale = 0.0
+        if self.doSystematic:
+            if self.systType == "UP":
+                scale = 1
+            elif self.systType == "DOWN":
+                scale = -1
+        return scale
+
+
+    def F3PIFactors(self,
+                    QQ: ak.Array,
+                    s1: ak.Array,
+                    s2: ak.Array,
+                    s3: ak.Array):
+        """
+            COEF1*F3PI(1), COEF2*F3PI(2) and COEF3*F3PI(3) from the fused kernel
+            evaluated on the flat buffers, returned as TComplex with the layout of QQ
+        """
+        # IDK = 1 as in F3PI
+        masses = (self.mpi0, self.mpi0, self.mpi)
+        F = f3pi_factors(flat_np_view(QQ, axis=None),
+                         flat_np_view(s1, axis=None),
+                         flat_np_view(s2, axis=None),
+                         flat_np_view(s3, axis=None),
+                         get_bt_couplings(self.BTScale()),
+                         (self.COEF1, self.COEF2, self.COEF3),
+                         masses,
+                         backend=self.backend)
+
+        return [TComplex.from_complex(np.ascontiguousarray(F[:, k]), QQ) for k in range(3)]
+
+
     def F3PI(self,
              IFORM: float,
              QQ: ak.Array,
@@ -151,31 +198,9 @@ class PolarimetricA1:
         M3SQ = M3*M3
         
         
-        # parameter varioation for
-        # systematics from https://arxiv.org/pdf/hep-ex/9902022.pdf
-        db2, dph2 = 0.094, 0.253
-        db3, dph3 = 0.094, 0.104
-        db4, dph4 = 0.296, 0.170
-        db5, dph5 = 0.167, 0.104
-        db6, dph6 = 0.284, 0.036
-        db7, dph7 = 0.148, 0.063
-
-        scale = 0.0
-        if self.doSystematic:
-            if self.systType == "UP":
-                scale = 1
-            elif self.systType == "DOWN":
-                scale = -1
-                
         # Breit-Wigner functions with isotropic decay angular distribution
-        # Real part must be equal to one, stupid polar implemenation in root
-        BT1 = TComplex(1., 0.)
-        BT2 = TComplex(0.12  + scale*db2, 0.) * TComplex(1, (0.99   +  scale*dph2)*np.pi, True)
-        BT3 = TComplex(0.37  + scale*db3, 0.) * TComplex(1, (-0.15  +  scale*dph3)*np.pi, True)
-        BT4 = TComplex(0.87  + scale*db4, 0.) * TComplex(1, (0.53   +  scale*dph4)*np.pi, True)
-        BT5 = TComplex(0.71  + scale*db5, 0.) * TComplex(1, (0.56   +  scale*dph5)*np.pi, True)
-        BT6 = TComplex(2.10  + scale*db6, 0.) * TComplex(1, (0.23   +  scale*dph6)*np.pi, True)
-        BT7 = TComplex(0.77  + scale*db7, 0.) * TComplex(1, (-0.54  +  scale*dph7)*np.pi, True)
+        # couplings and their variations for systematics from https://arxiv.org/pdf/hep-ex/9902022.pdf
+        BT1, BT2, BT3, BT4, BT5, BT6, BT7 = [TComplex(bt.real, bt.imag) for bt in get_bt_couplings(self.BTScale())]
 
         F3PIFactor = None
         
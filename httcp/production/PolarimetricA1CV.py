@@ -29,8 +29,6 @@ class PolarimetricA1:
           returns:
             None
         """
-        print("Configure PolarimetricA1 : Start")
-
         self.P   = p4_tau
         self.p1  = p4_os_pi
         self.p2  = p4_ss1_pi
@@ -149,11 +147,9 @@ class PolarimetricA1:
         #print(f"J[1]: {J[1].Re()}, {J[1].Im()}, {type(J[1].Im())}")
         
         Pi  = self.comp_Pi(J, N)
-        print(f" >>> Pi: {Pi}")
         
         # charge
         Pi5 = self.comp_Pi5(J, N)
-        print(f" >>> Pi5: {Pi5}")
         
         # CV: Standard Model value, cf. text following Eq. (3.15) in Comput.Phys.Commun. 64 (1991) 275
         gammaVA = 1.0
@@ -165,14 +161,9 @@ class PolarimetricA1:
         #elif  self.taucharge == -1: sign = +1.
         #else: assert False
 
-        print(f"sign: {sign}")
         
         omega = P.dot(Pi - sign*gammaVA*Pi5)
-        print(f"omega: {omega}, {type(omega)}")
 
-        print(f"1./(omega*self.m_tau): {1./(omega*self.m_tau)}")
-        print(f"np.power(self.m_tau, 2)*(Pi5 - sign*gammaVA*Pi): {np.power(self.m_tau, 2)*(Pi5 - sign*gammaVA*Pi)}")
-        print(f"P.dot(Pi5 - sign*gammaVA*Pi)*P: {P.dot(Pi5 - sign*gammaVA*Pi)*P}")
         
         #P = setp4("LorentzVector", P.px, P.py, P.pz, P.energy)
         P = ak.zip(
@@ -189,7 +180,6 @@ class PolarimetricA1:
         
         #H = (1./(omega*P.mass))*(np.power(P.mass, 2)*(Pi5 - sign*gammaVA*Pi) - P.dot(Pi5 - sign*gammaVA*Pi)*P)
         H = (1./(omega*self.m_tau))*(np.power(self.m_tau, 2)*(Pi5 - sign*gammaVA*Pi) - P.dot(Pi5 - sign*gammaVA*Pi)*P)
-        print(f"H: {H}, {type(H)}")
         
         #retVal = H.pvec.unit
         #retVal = H.pvec
@@ -217,8 +207,6 @@ class PolarimetricA1:
         Return:
           Awkward array of TComplex objects
         """
-        print(" --- comp_J --- ")
-        print(f" p1: {p1}, {p1.type}")
         q1 = p2 - p3
         q2 = p3 - p1
         q3 = p1 - p2
@@ -286,39 +274,32 @@ class PolarimetricA1:
         # ----------------------------------------------------------------------------------------------------------------- #
         # ----------------------------------------------------- j [0] ----------------------------------------------------- #
         # ----------------------------------------------------------------------------------------------------------------- #
-        print(" ----------------------------------------------------- j [0] ----------------------------------------------------- ")
         #j[0] = T@(self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s1, m2, m3, 1)*cq1 - self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s2, m1, m3, 1)*cq2)
         #j[1] = T@(self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s1, m2, m3, 1)*cq1 - self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s2, m1, m3, 1)*cq2)
         j01   = self.get_compJ_comps(self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s1, m2, m3, 1), cq1)
         j02   = self.get_compJ_comps(self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s2, m1, m3, 1), cq2)
         j0    = j01 - j02
-        print(f"j0: {j0}")
         j[0]  = T@j0
         #j[0] = self.get_mult_comps(T, j0)
-        print(f"j[0]: {j[0]}, {j[0].shape}")
 
         # ----------------------------------------------------------------------------------------------------------------- #
         # ----------------------------------------------------- j [1] ----------------------------------------------------- #
         # ----------------------------------------------------------------------------------------------------------------- #
-        print(" ----------------------------------------------------- j [1] ----------------------------------------------------- ")
         j11   = self.get_compJ_comps(self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s1, m2, m3, 1), cq1)
         j12   = self.get_compJ_comps(self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s2, m1, m3, 1), cq2)
         j1    = j11 - j12
         #j1   = self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s1, m2, m3, 1)*cq1 - self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s2, m1, m3, 1)*cq2
         #j[1] = np.sum(T * j1.T, axis=1)
         j[1] = T@j1
-        print(f"j[1]: {j[1]}, {j[1].shape}")
         
         # ----------------------------------------------------------------------------------------------------------------- #
         # ----------------------------------------------------- j [2] ----------------------------------------------------- #
         # ----------------------------------------------------------------------------------------------------------------- #
-        print(" ----------------------------------------------------- j [2] ----------------------------------------------------- ")
         aXq1 = ak.to_numpy(a.dot(q1))
-        print(f"aXq1: {aXq1}")
         cQ1 = self.convert_to_cLorentzVector(Q1)
         
         aXq2 = ak.to_numpy(a.dot(q2))
-        print(f"aXq2: {aXq2}")        
+        #print(f"aXq2: {aXq2}")        
         cQ2 = self.convert_to_cLorentzVector(Q2)
         
         #j[2] = T@(aXq1*self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s1, m2, m3, 1)*cQ1 - aXq2*self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s2, m1, m3, 1)*cQ2)
@@ -331,12 +312,10 @@ class PolarimetricA1:
 
         j2    = j21 - j22
         j[2]  = T@j2
-        print(f"j[2]: {j[2]}, {j[2].shape}")
 
         # ----------------------------------------------------------------------------------------------------------------- #
         # ----------------------------------------------------- j [3] ----------------------------------------------------- #
         # ----------------------------------------------------------------------------------------------------------------- #
-        print(" ----------------------------------------------------- j [3] ----------------------------------------------------- ")
         j31  = self.get_compJ_comps(self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s1, m2, m3, 1), cQ1)
         j31  = self.get_mult_arrs(j31, aXq1)
 
@@ -347,13 +326,11 @@ class PolarimetricA1:
         j3   = j31 - j32
         #j[3] = np.sum(T * j3.T, axis=1)
         j[3] = T@j3
-        print(f"j[3]: {j[3]}, {j[3].shape}")
         
 
         # ----------------------------------------------------------------------------------------------------------------- #
         # ----------------------------------------------------- j [4] ----------------------------------------------------- #
         # ----------------------------------------------------------------------------------------------------------------- #
-        print(" ----------------------------------------------------- j [4] ----------------------------------------------------- ")
         aXq3 = ak.to_numpy(a.dot(q3))
         cq3 = self.convert_to_cLorentzVector(q3)
         q3Xq3 = ak.to_numpy(q3.mass2)
@@ -368,28 +345,23 @@ class PolarimetricA1:
         j4   = self.get_compJ_comps(j4a, j4b)
         #j[4] = np.sum(T * j4.T, axis=1)
         j[4] = T@j4
-        print(f"j[4]: {j[4]}, {j[4].shape}")
 
 
         # ----------------------------------------------------------------------------------------------------------------- #
         # ----------------------------------------------------- j [5] ----------------------------------------------------- #
         # ----------------------------------------------------------------------------------------------------------------- #
-        print(" ----------------------------------------------------- j [5] ----------------------------------------------------- ")
         cQ3  = self.convert_to_cLorentzVector(Q3)
         j5   = self.get_compJ_comps(self.BreitWigner(self.m0_sigma, self.Gamma0_sigma, s3, m1, m2, 0), cQ3)
         #j[5] = np.sum(T * j5.T, axis=1)[:,:,np.newaxis]
         j[5] = T@j5 
-        print(f"j[5]: {j[5]}, {j[5].shape}")
 
         
         # ----------------------------------------------------------------------------------------------------------------- #
         # ----------------------------------------------------- j [6] ----------------------------------------------------- #
         # ----------------------------------------------------------------------------------------------------------------- #
-        print(" ----------------------------------------------------- j [6] ----------------------------------------------------- ")
         j6   = self.get_compJ_comps(self.BreitWigner(self.m0_f0, self.Gamma0_f0, s3, m1, m2, 0), cQ3)
         #j[6] = np.sum(T * j6.T, axis=1)[:,:,np.newaxis]
         j[6] = T@j6
-        print(f"j[6]: {j[6]}, {j[6].shape}")
 
 
         #print("sdcdsc", j[6] + j[5])
@@ -451,11 +423,9 @@ class PolarimetricA1:
         BW : numpy array of TComplex
              [[TC], [TC], [TC], [TC], ...., [TC]]
         """
-        print(" --- get_compJ_comps --- ")
         comp = np.zeros(4, dtype=TComplex)
         for i in range(cLV.shape[0]):
             comp[i] = BW * cLV[i]
-        print(comp)
         return comp
 
     
@@ -467,22 +437,13 @@ class PolarimetricA1:
              each entry: TC -> [[10.1], [2.5], [3.4], ...., [12.7]]
         """
         import copy
-        print(" --- get_compJ_comps --- ")
 
         TcLV = np.zeros(4, dtype=TComplex)
         for i in range(4):
-            print(i)
             TcLVi = np.zeros(4, dtype=TComplex)
             for j in range(4):
-                print(f"j: {j}")
-                print(T[i][j])
-                print(T[i][j].Re(), T[i][j].Im())
-                print(cLV[i])
-                print(cLV[i].Re(), cLV[i].Im())
                 TcLV0[i] = T[i][j]*cLV[i]
-                print(TcLV0[i])
             TcLVi = np.sum(TcLV, axis=1)
-            print(TcLVi)
             TcLV[i] = copy.deepcopy(TcLVi)
 
         return TcLV
@@ -494,7 +455,6 @@ class PolarimetricA1:
           p four-vector [ak.Array]
           return: cLorentzVector(p)
         """
-        print(" --- convert_to_cLorentzVector --- ")
         #vec = ak.zip(
         #    {
         #        "x": TComplex(p.x),
@@ -511,7 +471,6 @@ class PolarimetricA1:
         #vec = ak.Array(vec)
         #vec = ak.from_regular(vec)
         #vec = vec[:,np.newaxis]
-        print(f" >>> {vec}, {type(vec)}")
         return vec
 
 
@@ -590,7 +549,6 @@ class PolarimetricA1:
           N: awkward array of LorentzVector
              ak.Array([{x:,y:,z:,t:},....]) 
         """
-        print("  --- comp_Pi --- ")
         # LV -> complex LV
         # Now same as J
         cN = self.convert_to_cLorentzVector(N) 
@@ -613,11 +571,9 @@ class PolarimetricA1:
         
         cLV = (self.mult_arr_cLV(JstarXN,J) + self.mult_arr_cLV(JXN,Jstar) - self.mult_arr_cLV(JstarXJ,cN))*2.0
 
-        print(f" >>> cLV: {cLV}")
         
         #retVal = self.convert_to_LorentzVector(2.*(JstarXN*J + JXN*Jstar - JstarXJ*cN))
         retVal = self.convert_to_LorentzVector(cLV)
-        print(f" >>> retVal: {retVal}")
         return retVal
 
 
@@ -636,7 +592,6 @@ class PolarimetricA1:
           N: awkward array of LorentzVector
              ak.Array([{x:,y:,z:,t:},....]) 
         """
-        print("  --- comp_Pi 5 --- ")
         cN = self.convert_to_cLorentzVector(N)
         Jstar = self.star(J)
 
@@ -688,7 +643,6 @@ class PolarimetricA1:
             with_name="LorentzVector",
             behavior=coffea.nanoevents.methods.vector.behavior,            
         )
-        print(f"retVal: {retVal}")
         return retVal
 
 
@@ -797,7 +751,6 @@ class PolarimetricA1:
         return:
           Array of TComplex objects [awkward or numpy??? probably should be numpy :| ]
         """
-        print(" --- BreitWigner --- ")
         num = -np.power(m0, 2)
         real = si + num
         imag = self.Gamma(m0, Gamma0, si, mj, mk, L)*m0
@@ -819,7 +772,6 @@ class PolarimetricA1:
 
 
     def Gamma_a1(self, s: ak.Array) -> ak.Array:
-        print(f"s: {s}")
         
         mask1       = (s - self.Gamma_a1_vs_s[0][0]) <= 0
         #print(f"mask1: {mask1}")
@@ -841,25 +793,17 @@ class PolarimetricA1:
         gammaS = ak.from_regular(gammaS)
         gammaL = ak.from_regular(gammaL)
         gammaR = ak.from_regular(gammaR)
-        print(gammaS, gammaL, gammaR)
         
         diffLS = gammaS - gammaL
-        print(f"diffLS: {diffLS}")
         mask_low  = diffLS >= 0.0
         mask_high = diffLS <= 0.0
-        print(f"mask_low: {mask_low}")
-        print(f"mask_high: {mask_high}")
         
         idx_low    = ak.local_index(gammaL)[mask_low][:,-1:]
         idx_high   = ak.local_index(gammaL)[mask_high][:,0:1]
-        print(f"idx_low: {idx_low}, {idx_low.type}")
-        print(f"idx_high: {idx_high}, {idx_high.type}")
 
         
         #print(idx_low[:,-1:])
         #print(idx_high[:,0:1])
-        print(gammaL[idx_low])
-        print(gammaL[idx_high])
         
         #s_lo = gammaL[idx_low][:,-1][:,None]
         #s_hi = gammaL[idx_high][:,1][:,None]
@@ -880,10 +824,8 @@ class PolarimetricA1:
         #print(ak.min(ak.num(Gamma_lo, axis=1)), ak.sum(ak.num(Gamma_lo, axis=1)), Gamma_lo[1816], Gamma_lo[7363])
         #print(ak.min(ak.num(Gamma_hi, axis=1)), ak.sum(ak.num(Gamma_hi, axis=1)), Gamma_hi[1816], Gamma_hi[7363])
 
-        print(ak.argsort(ak.num(s_hi, axis=1), ascending=True))
         
         #print((ak.to_numpy(s)).shape, (ak.to_numpy(s_lo)).shape, (ak.to_numpy(s_hi)).shape)
-        print(s.type, s_lo.type, s_hi.type)
         
         retVal = ak.where(mask1,
                           mask1result,
@@ -893,7 +835,6 @@ class PolarimetricA1:
                                    )
                           )
 
-        print(retVal)
         return retVal
 
 
@@ -909,3 +850,228 @@ class PolarimetricA1:
 
         retVal = TComplex(num, 0.)/denom
         return retVal
+
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+#                                   Vectorised NumPy engine for the a1 polarimetric vector                              #
+# ------------------------------------------------------------------------------------------------------------------- #
+# All four-vectors are (N, 4) float64 / complex128 arrays in the (x, y, z, t) ordering used by get_component above.
+
+def to_xyzt(p: ak.Array) -> np.ndarray:
+    """
+      Flatten an awkward array of Lorentz vectors to a (N, 4) float64 array in (x, y, z, t) ordering
+    """
+    return np.stack(
+        [np.asarray(flat_np_view(p[c], axis=None), dtype=np.float64) for c in ("x", "y", "z", "t")],
+        axis=-1,
+    )
+
+
+def mdot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+      Minkowski product a^{mu} g_{mu,nu} b^{nu} of two (N, 4) arrays (no complex conjugation)
+    """
+    return a[..., 3]*b[..., 3] - a[..., 0]*b[..., 0] - a[..., 1]*b[..., 1] - a[..., 2]*b[..., 2]
+
+
+def dot3(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+      Product of the spatial components of two (N, 4) arrays, which is what LorentzVector.dot of coffea
+      (inherited from ThreeVector) computes in PolarimetricA1 above
+    """
+    return a[..., 0]*b[..., 0] + a[..., 1]*b[..., 1] + a[..., 2]*b[..., 2]
+
+
+class PolarimetricA1Vectorized(PolarimetricA1):
+    def __init__(
+            self,
+            p4_tau: ak.Array,
+            p4_os_pi: ak.Array, p4_ss1_pi: ak.Array, p4_ss2_pi: ak.Array,
+            taucharge: ak.Array,
+            decayChannel: Optional[str]="k3ChargedPi"
+    ) -> None:
+        """
+          Same physics as PolarimetricA1, but J, Pi, Pi5 and H are computed as (N, 4) complex128 arrays
+          with einsum contractions instead of per-component TComplex objects.
+          args:
+            p4_tau, p4_os_pi, p4_ss1_pi, p4_ss2_pi : awkward array of lorentz vectors (N taus in total)
+            taucharge : awkward array with the same layout as p4_tau
+            decayChannel : "k3ChargedPi" or "kChargedPi2NeutralPi"
+          returns:
+            None
+        """
+        # constants (masses, widths, Gamma_a1_vs_s, beta moduli and phases) are shared with PolarimetricA1
+        super().__init__(p4_tau, p4_os_pi, p4_ss1_pi, p4_ss2_pi, taucharge, decayChannel)
+
+        self.beta = np.array(self.beta_moduli)*np.exp(1j*np.pi*np.array(self.beta_phases))
+        self.g = np.array(self.g, dtype=np.float64)
+        # Levi-Civita tensor restricted to nu, rho, sigma in 1..3, the index range summed over in
+        # PolarimetricA1.comp_Pi5, so that both engines give the same Pi5
+        self.epsilon = np.array(
+            [[[[self.get_epsilon(mu, nu, rho, sigma) if min(nu, rho, sigma) > 0 else 0.0
+                for sigma in range(4)] for rho in range(4)] for nu in range(4)] for mu in range(4)]
+        )
+
+        Gamma_a1_vs_s = np.array(self.Gamma_a1_vs_s)
+        self.Gamma_a1_s = Gamma_a1_vs_s[:, 0]
+        self.Gamma_a1_val = Gamma_a1_vs_s[:, 1]
+
+
+    def PVC(self) -> np.ndarray:
+        """
+          returns:
+            flat (N, 3) array with the spatial components of the polarimetric vector H
+        """
+        P  = to_xyzt(self.P)
+        p1 = to_xyzt(self.p1)
+        p2 = to_xyzt(self.p2)
+        p3 = to_xyzt(self.p3)
+        tauc = np.asarray(flat_np_view(self.taucharge, axis=None))
+
+        return self.polarimetric_vector(P, p1, p2, p3, tauc)
+
+
+    def polarimetric_vector(
+            self,
+            P: np.ndarray,
+            p1: np.ndarray, p2: np.ndarray, p3: np.ndarray,
+            tauc: np.ndarray,
+    ) -> np.ndarray:
+        """
+          args:
+            P, p1, p2, p3 : (N, 4) arrays of tau, os-pion, ss1-pion and ss2-pion in (x, y, z, t) ordering
+            tauc : (N,) array of tau charges
+          returns:
+            (N, 3) polarimetric vector
+        """
+        N = P - (p1 + p2 + p3)
+
+        J   = self.comp_J(p1, p2, p3)
+        Pi  = self.comp_Pi(J, N)
+        Pi5 = self.comp_Pi5(J, N)
+
+        # CV: Standard Model value, cf. text following Eq. (3.15) in Comput.Phys.Commun. 64 (1991) 275
+        gammaVA = 1.0
+        # CV: sign of terms proportional to gammaVA differs for tau+ and tau-,
+        #     cf. text following Eq. (3.16) in Comput.Phys.Commun. 64 (1991) 275
+        sign = np.where(tauc > 0, -1.0, 1.0)[:, None]
+
+        # P.dot(...) of PolarimetricA1.PVC are products of the spatial components, see dot3
+        omega = dot3(P, Pi - sign*gammaVA*Pi5)
+        v = Pi5 - sign*gammaVA*Pi
+        H = (np.power(self.m_tau, 2)*v - dot3(P, v)[:, None]*P)/(omega*self.m_tau)[:, None]
+
+        return H[:, :3]
+
+
+    def comp_J(self, p1: np.ndarray, p2: np.ndarray, p3: np.ndarray) -> np.ndarray:
+        """
+          Hadronic current J_{mu} according to Eq. (A2) in Phys.Rev.D 61 (2000) 012002
+          returns:
+            (N, 4) complex128 array
+        """
+        if self.decayChannel == "k3ChargedPi":
+            m1, m2, m3 = self.m_chargedPi, self.m_chargedPi, self.m_chargedPi
+        elif self.decayChannel == "kChargedPi2NeutralPi":
+            m1, m2, m3 = self.m_neutralPi, self.m_neutralPi, self.m_chargedPi
+        else:
+            raise RuntimeError(f"Error in <PolarimetricA1Vectorized::comp_J>: Invalid parameter 'decayChannel' = {self.decayChannel}")
+
+        q1 = p2 - p3
+        q2 = p3 - p1
+        q3 = p1 - p2
+
+        h1 = p2 + p3
+        Q1 = h1 - p1
+        s1 = mdot(h1, h1)
+        h2 = p1 + p3
+        Q2 = h2 - p2
+        s2 = mdot(h2, h2)
+        h3 = p1 + p2
+        Q3 = h3 - p3
+        s3 = mdot(h3, h3)
+
+        a = p1 + p2 + p3
+        s = mdot(a, a)
+
+        # T^{mu,nu} = g^{mu,nu} - a^{mu}a^{nu}/a^2, cf. text following Eq. (A2) in Phys.Rev.D 61 (2000) 012002
+        ga = a*np.diagonal(self.g)
+        T = self.g[None, :, :] - np.einsum("nm,nk->nmk", ga, ga)/s[:, None, None]
+
+        BW_rho770_1  = self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s1, m2, m3, 1)[:, None]
+        BW_rho770_2  = self.BreitWigner(self.m0_rho770,  self.Gamma0_rho770,  s2, m1, m3, 1)[:, None]
+        BW_rho1450_1 = self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s1, m2, m3, 1)[:, None]
+        BW_rho1450_2 = self.BreitWigner(self.m0_rho1450, self.Gamma0_rho1450, s2, m1, m3, 1)[:, None]
+
+        # a.dot(q1) etc. of PolarimetricA1.comp_J are products of the spatial components, see dot3
+        aXq1 = dot3(a, q1)[:, None]
+        aXq2 = dot3(a, q2)[:, None]
+        aXq3 = dot3(a, q3)[:, None]
+        q3Xq3 = mdot(q3, q3)[:, None]
+        h3Xa = dot3(h3, a)[:, None]
+
+        # amplitudes for individual resonances according to Eq. (A3) in Phys.Rev.D 61 (2000) 012002
+        j = np.empty((self.numResonances,) + a.shape, dtype=np.complex128)
+        j[0] = BW_rho770_1*q1 - BW_rho770_2*q2
+        j[1] = BW_rho1450_1*q1 - BW_rho1450_2*q2
+        j[2] = aXq1*BW_rho770_1*Q1 - aXq2*BW_rho770_2*Q2
+        j[3] = aXq1*BW_rho1450_1*Q1 - aXq2*BW_rho1450_2*Q2
+        j[4] = self.BreitWigner(self.m0_f2, self.Gamma0_f2, s3, m1, m2, 2)[:, None]*(aXq3*q3 - (q3Xq3/3.)*(a - (h3Xa/s3[:, None])*h3))
+        j[5] = self.BreitWigner(self.m0_sigma, self.Gamma0_sigma, s3, m1, m2, 0)[:, None]*Q3
+        j[6] = self.BreitWigner(self.m0_f0, self.Gamma0_f0, s3, m1, m2, 0)[:, None]*Q3
+
+        # T is common to all resonances: sum_i beta_i T j_i = T (sum_i beta_i j_i)
+        retVal = np.einsum("nmk,nk->nm", T, np.einsum("r,rnk->nk", self.beta, j))
+        retVal = retVal*self.BreitWigner_a1(s)[:, None]
+
+        # CV: multiply with metric tensor in order to transform J^{mu} into J_{mu}
+        return retVal*np.diagonal(self.g)
+
+
+    def comp_Pi(self, J: np.ndarray, N: np.ndarray) -> np.ndarray:
+        """
+          Pi^{mu} = 2 Re[(J*.N) J^{mu} + (J.N) J*^{mu} - (J*.J) N^{mu}]
+          returns:
+            (N, 4) float64 array
+        """
+        Jstar = np.conj(J)
+
+        JstarXN = mdot(Jstar, N)[:, None]
+        JXN     = mdot(J, N)[:, None]
+        JstarXJ = mdot(Jstar, J)[:, None]
+
+        return np.real(2.0*(JstarXN*J + JXN*Jstar - JstarXJ*N))
+
+
+    def comp_Pi5(self, J: np.ndarray, N: np.ndarray) -> np.ndarray:
+        """
+          Pi5^{mu} = 2 Im[g^{mu,mu} epsilon^{mu,nu,rho,sigma} J*_{nu} J_{rho} N_{sigma}],
+          with nu, rho, sigma summed over 1..3 as in PolarimetricA1.comp_Pi5
+          returns:
+            (N, 4) float64 array
+        """
+        vProd = np.einsum("mnrs,in,ir,is->im", self.epsilon, np.conj(J), J, N)
+        return 2.0*np.imag(vProd*np.diagonal(self.g))
+
+
+    def BreitWigner(self, m0, Gamma0, si, mj, mk, L) -> np.ndarray:
+        """
+          Breit-Wigner function of intermediate rho(770), rho(1450), f2(1270), sigma, and f0(1370) resonances,
+          given by top line of Eq. (A7) in Phys.Rev.D 61 (2000) 012002
+          returns:
+            (N,) complex128 array
+        """
+        num = -np.power(m0, 2)
+        return num/((si + num) + 1j*self.Gamma(m0, Gamma0, si, mj, mk, L)*m0)
+
+
+    def Gamma_a1(self, s: np.ndarray) -> np.ndarray:
+        # linear interpolation of Fig. 9 (b) of Phys.Rev.D 61 (2000) 012002, constant outside of the table
+        return np.interp(s, self.Gamma_a1_s, self.Gamma_a1_val)
+
+
+    def BreitWigner_a1(self, s: np.ndarray) -> np.ndarray:
+        m = self.m_a1(s)
+        num = -np.power(m, 2)
+        return num/((s - np.power(m, 2)) + 1j*self.m0_a1*self.Gamma_a1(s))
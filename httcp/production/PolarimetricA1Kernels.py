@@ -0,0 +1,262 @@
+# coding: utf-8
+"""
+Fused kernels for the CLEO 3-pion form factor used in PolarimetricA1
+  F3PI, BWIGML, GetWGS, FA1A1P and WGA1 are evaluated in a single pass over flat float64 buffers.
+  If numba is importable, the per-event loop is compiled, otherwise a NumPy implementation is used.
+  Ref: Phys.Rev.D 61 (2000) 012002, https://arxiv.org/pdf/hep-ex/9902022.pdf
+"""
+
+import math
+
+from columnflow.util import maybe_import
+
+np = maybe_import("numpy")
+
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    numba = None
+    HAS_NUMBA = False
+
+
+# masses and widths of the intermediate resonances [GeV]
+MRO = 0.7743
+GRO = 0.1491
+MRP = 1.370
+GRP = 0.386
+MF2 = 1.275
+GF2 = 0.185
+MF0 = 1.186
+GF0 = 0.350
+MSG = 0.860
+GSG = 0.880
+
+# moduli and phases [units of pi] of the BT1 ... BT7 couplings
+# and their variations for systematics from https://arxiv.org/pdf/hep-ex/9902022.pdf
+BT_MODULI  = (1.0,  0.12,  0.37,  0.87,  0.71,  2.10,  0.77)
+BT_PHASES  = (0.0,  0.99, -0.15,  0.53,  0.56,  0.23, -0.54)
+BT_DMODULI = (0.0, 0.094, 0.094, 0.296, 0.167, 0.284, 0.148)
+BT_DPHASES = (0.0, 0.253, 0.104, 0.170, 0.104, 0.036, 0.063)
+
+
+def get_bt_couplings(scale: float = 0.0) -> "np.ndarray":
+    """
+    BT1 ... BT7 as complex128 array
+    scale: 0 for nominal, +1 / -1 for up / down variation
+    """
+    moduli = np.array(BT_MODULI) + scale * np.array(BT_DMODULI)
+    phases = np.array(BT_PHASES) + scale * np.array(BT_DPHASES)
+    bt = moduli * np.exp(1j * phases * np.pi)
+    # BT1 is fixed to one without any variation
+    bt[0] = 1.0 + 0.0j
+    return bt
+
+
+# ------------------------------------------------------------------------------------------------ #
+#                                       scalar (numba) kernel                                      #
+# ------------------------------------------------------------------------------------------------ #
+
+def _bwigml(S, M, G, m1, m2, L):
+    # L-wave Breit-Wigner with isotropic decay angular distribution
+    MP = (m1 + m2)**2
+    MM = (m1 - m2)**2
+    MSQ = M*M
+    WGS = 0.0
+    if S > MP:
+        W = math.sqrt(S)
+        QS = math.sqrt(abs((S - MP) * (S - MM))) / W
+        QM = math.sqrt(abs((MSQ - MP) * (MSQ - MM))) / M
+        WGS = G * (MSQ / W) * (QS / QM)**(2 * L + 1)
+    return MSQ / complex(MSQ - S, -WGS)
+
+
+def _wga1_poly(S, STH, Q0, Q1, Q2, P0, P1, P2, P3, P4):
+    if S < STH:
+        return 0.0
+    if S > STH and S < 0.823:
+        D = S - STH
+        return Q0 * D*D*D * (1.0 + Q1 * D + Q2 * D*D)
+    return P0 + P1*S + P2*S*S + P3*S*S*S + P4*S*S*S*S
+
+
+def _fa1a1p(XMSQ):
+    # mass-dependent M*Gamma of a1 through its decays to 3pi and K*K
+    MK1SQ = (0.894 + 0.496)**2
+    MK2SQ = (0.894 - 0.496)**2
+    C3PI = 0.2384*0.2384
+    CKST = 4.7621*4.7621*C3PI
+    WG3PIC = _wga1_poly(XMSQ, 0.1753, 5.80900, -3.00980, 4.57920,
+                        -13.91400, 27.67900, -13.39300, 3.19240, -0.10487)
+    WG3PIN = _wga1_poly(XMSQ, 0.1676, 6.28450, -2.95950, 4.33550,
+                        -15.41100, 32.08800, -17.66600, 4.93550, -0.37498)
+    GKST = 0.0
+    if XMSQ > MK1SQ:
+        GKST = math.sqrt((XMSQ - MK1SQ) * (XMSQ - MK2SQ)) / (2.0 * XMSQ)
+    GF = C3PI * (WG3PIC + WG3PIN) + CKST * GKST
+
+    XM1SQ = 1.275000**2
+    GG1 = 1.275000*0.700/(1.3281*0.806)
+    # BET = 0: the a1' contribution does not enter
+    return -XM1SQ / complex(XMSQ - XM1SQ, GG1 * GF)
+
+
+def _f3pi_12(QQ, S1, S2, BT, M1, M2, M3):
+    M1SQ = M1*M1
+    M2SQ = M2*M2
+    M3SQ = M3*M3
+    S3 = QQ - S1 - S2 + M1SQ + M2SQ + M3SQ
+    F134 = -(1 / 3.) * ((S3 - M3SQ) - (S1 - M1SQ))
+    F150 = (1 / 18.) * (QQ - M3SQ + S3) * (2*M1SQ + 2*M2SQ - S3) / S3
+    F167 = (2 / 3.)
+    return (BT[0] * _bwigml(S1, MRO, GRO, M2, M3, 1)
+            + BT[1] * _bwigml(S1, MRP, GRP, M2, M3, 1)
+            + BT[2] * F134 * _bwigml(S2, MRO, GRO, M3, M1, 1)
+            + BT[3] * F134 * _bwigml(S2, MRP, GRP, M3, M1, 1)
+            + BT[4] * F150 * _bwigml(S3, MF2, GF2, M1, M2, 2)
+            + BT[5] * F167 * _bwigml(S3, MSG, GSG, M1, M2, 0)
+            + BT[6] * F167 * _bwigml(S3, MF0, GF0, M1, M2, 0))
+
+
+def _f3pi_3(QQ, S3, S1, BT, M1, M2, M3):
+    M1SQ = M1*M1
+    M2SQ = M2*M2
+    M3SQ = M3*M3
+    S2 = QQ - S3 - S1 + M1SQ + M2SQ + M3SQ
+    F34A = (1 / 3.) * ((S2 - M2SQ) - (S3 - M3SQ))
+    F34B = (1 / 3.) * ((S3 - M3SQ) - (S1 - M1SQ))
+    F35 = -(1 / 2.) * ((S1 - M1SQ) - (S2 - M2SQ))
+    return (BT[2] * (F34A * _bwigml(S1, MRO, GRO, M2, M3, 1) + F34B * _bwigml(S2, MRO, GRO, M3, M1, 1))
+            + BT[3] * (F34A * _bwigml(S1, MRP, GRP, M2, M3, 1) + F34B * _bwigml(S2, MRP, GRP, M3, M1, 1))
+            + BT[4] * F35 * _bwigml(S3, MF2, GF2, M1, M2, 2))
+
+
+def _f3pi_factors_loop(QQ, s1, s2, s3, BT, COEF, M1, M2, M3, out):
+    for i in range(QQ.shape[0]):
+        FA1 = _fa1a1p(QQ[i])
+        out[i, 0] = COEF[0] * _f3pi_12(QQ[i], s1[i], s2[i], BT, M1, M2, M3) * FA1
+        out[i, 1] = COEF[1] * _f3pi_12(QQ[i], s2[i], s1[i], BT, M1, M2, M3) * FA1
+        out[i, 2] = COEF[2] * _f3pi_3(QQ[i], s3[i], s1[i], BT, M1, M2, M3) * FA1
+    return out
+
+
+if HAS_NUMBA:
+    _bwigml = numba.njit(cache=True)(_bwigml)
+    _wga1_poly = numba.njit(cache=True)(_wga1_poly)
+    _fa1a1p = numba.njit(cache=True)(_fa1a1p)
+    _f3pi_12 = numba.njit(cache=True)(_f3pi_12)
+    _f3pi_3 = numba.njit(cache=True)(_f3pi_3)
+    _f3pi_factors_loop = numba.njit(cache=True)(_f3pi_factors_loop)
+
+
+# ------------------------------------------------------------------------------------------------ #
+#                                     vectorised (numpy) kernel                                    #
+# ------------------------------------------------------------------------------------------------ #
+
+def _bwigml_np(S, M, G, m1, m2, L):
+    MP = (m1 + m2)**2
+    MM = (m1 - m2)**2
+    MSQ = M*M
+    above = S > MP
+    W = np.sqrt(np.where(above, S, MP + 1.0))
+    QS = np.sqrt(np.abs((S - MP) * (S - MM))) / W
+    QM = np.sqrt(np.abs((MSQ - MP) * (MSQ - MM))) / M
+    WGS = np.where(above, G * (MSQ / W) * np.power(QS / QM, 2 * L + 1), 0.0)
+    return MSQ / ((MSQ - S) - 1j * WGS)
+
+
+def _wga1_poly_np(S, STH, Q0, Q1, Q2, P0, P1, P2, P3, P4):
+    D = S - STH
+    low = Q0 * D*D*D * (1.0 + Q1 * D + Q2 * D*D)
+    high = P0 + P1*S + P2*S*S + P3*S*S*S + P4*S*S*S*S
+    return np.where(S < STH, 0.0, np.where((S > STH) & (S < 0.823), low, high))
+
+
+def _fa1a1p_np(XMSQ):
+    MK1SQ = (0.894 + 0.496)**2
+    MK2SQ = (0.894 - 0.496)**2
+    C3PI = 0.2384*0.2384
+    CKST = 4.7621*4.7621*C3PI
+    WG3PIC = _wga1_poly_np(XMSQ, 0.1753, 5.80900, -3.00980, 4.57920,
+                           -13.91400, 27.67900, -13.39300, 3.19240, -0.10487)
+    WG3PIN = _wga1_poly_np(XMSQ, 0.1676, 6.28450, -2.95950, 4.33550,
+                           -15.41100, 32.08800, -17.66600, 4.93550, -0.37498)
+    above = XMSQ > MK1SQ
+    GKST = np.where(above, np.sqrt(np.abs((XMSQ - MK1SQ) * (XMSQ - MK2SQ))) / (2.0 * XMSQ), 0.0)
+    GF = C3PI * (WG3PIC + WG3PIN) + CKST * GKST
+
+    XM1SQ = 1.275000**2
+    GG1 = 1.275000*0.700/(1.3281*0.806)
+    return -XM1SQ / ((XMSQ - XM1SQ) + 1j * GG1 * GF)
+
+
+def _f3pi_factors_np(QQ, s1, s2, s3, BT, COEF, M1, M2, M3, out):
+    M1SQ = M1*M1
+    M2SQ = M2*M2
+    M3SQ = M3*M3
+    MSQSUM = M1SQ + M2SQ + M3SQ
+
+    FA1 = _fa1a1p_np(QQ)
+
+    # IFORM = 1 and 2
+    for k, (S1, S2) in enumerate(((s1, s2), (s2, s1))):
+        S3 = QQ - S1 - S2 + MSQSUM
+        F134 = -(1 / 3.) * ((S3 - M3SQ) - (S1 - M1SQ))
+        F150 = (1 / 18.) * (QQ - M3SQ + S3) * (2*M1SQ + 2*M2SQ - S3) / S3
+        F167 = (2 / 3.)
+        out[:, k] = COEF[k] * FA1 * (
+            BT[0] * _bwigml_np(S1, MRO, GRO, M2, M3, 1)
+            + BT[1] * _bwigml_np(S1, MRP, GRP, M2, M3, 1)
+            + BT[2] * F134 * _bwigml_np(S2, MRO, GRO, M3, M1, 1)
+            + BT[3] * F134 * _bwigml_np(S2, MRP, GRP, M3, M1, 1)
+            + BT[4] * F150 * _bwigml_np(S3, MF2, GF2, M1, M2, 2)
+            + BT[5] * F167 * _bwigml_np(S3, MSG, GSG, M1, M2, 0)
+            + BT[6] * F167 * _bwigml_np(S3, MF0, GF0, M1, M2, 0)
+        )
+
+    # IFORM = 3
+    S3, S1 = s3, s1
+    S2 = QQ - S3 - S1 + MSQSUM
+    F34A = (1 / 3.) * ((S2 - M2SQ) - (S3 - M3SQ))
+    F34B = (1 / 3.) * ((S3 - M3SQ) - (S1 - M1SQ))
+    F35 = -(1 / 2.) * ((S1 - M1SQ) - (S2 - M2SQ))
+    out[:, 2] = COEF[2] * FA1 * (
+        BT[2] * (F34A * _bwigml_np(S1, MRO, GRO, M2, M3, 1) + F34B * _bwigml_np(S2, MRO, GRO, M3, M1, 1))
+        + BT[3] * (F34A * _bwigml_np(S1, MRP, GRP, M2, M3, 1) + F34B * _bwigml_np(S2, MRP, GRP, M3, M1, 1))
+        + BT[4] * F35 * _bwigml_np(S3, MF2, GF2, M1, M2, 2)
+    )
+    return out
+
+
+def f3pi_factors(
+        QQ: "np.ndarray",
+        s1: "np.ndarray",
+        s2: "np.ndarray",
+        s3: "np.ndarray",
+        BT: "np.ndarray",
+        COEF: tuple,
+        masses: tuple,
+        backend: str = "numba",
+) -> "np.ndarray":
+    """
+    Evaluate COEF_k * F3PI(k) * FA1A1P for k = 1, 2, 3 on flat float64 buffers
+    Inputs:
+      QQ, s1, s2, s3 : 1D arrays of a1 and pion-pair invariant masses squared
+      BT             : complex128 array of the seven resonance couplings, see get_bt_couplings
+      COEF           : (COEF1, COEF2, COEF3)
+      masses         : (M1, M2, M3) pion masses
+      backend        : "numba" or "numpy", "numba" falls back to "numpy" if numba is not available
+    Output:
+      (N, 3) complex128 array with F1, F2, F3
+    """
+    QQ, s1, s2, s3 = (np.ascontiguousarray(x, dtype=np.float64) for x in (QQ, s1, s2, s3))
+    BT = np.ascontiguousarray(BT, dtype=np.complex128)
+    COEF = np.asarray(COEF, dtype=np.float64)
+    out = np.empty((QQ.shape[0], 3), dtype=np.complex128)
+    M1, M2, M3 = (float(m) for m in masses)
+
+    if backend == "numba" and HAS_NUMBA:
+        return _f3pi_factors_loop(QQ, s1, s2, s3, BT, COEF, M1, M2, M3, out)
+    elif backend in ("numba", "numpy"):
+        return _f3pi_factors_np(QQ, s1, s2, s3, BT, COEF, M1, M2, M3, out)
+    raise ValueError(f"unknown backend {backend}, choose from numba / numpy")
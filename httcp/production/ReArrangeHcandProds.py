@@ -12,6 +12,13 @@ ak = maybe_import("awkward")
 coffea = maybe_import("coffea")
 maybe_import("coffea.nanoevents.methods.nanoaod")
 
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    numba = None
+    HAS_NUMBA = False
+
 
 
 def convert_to_coffea_p4(zipped_item, typetag : Optional[str]="PtEtaPhiMLorentzVector"):
@@ -23,17 +30,132 @@ def convert_to_coffea_p4(zipped_item, typetag : Optional[str]="PtEtaPhiMLorentzV
 
 def getMaxEtaTauStrip(pt):
     temp = 0.20 * np.power(pt, -0.66)
-    ref1 = ak.where(temp > 0.15, 0.15, temp)
-    ref2 = ak.where(ref1 > 0.05, ref1, 0.05)
+    ref1 = np.where(temp > 0.15, 0.15, temp)
+    ref2 = np.where(ref1 > 0.05, ref1, 0.05)
     return ref2
 
 def getMaxPhiTauStrip(pt):
     temp = 0.35 * np.power(pt, -0.71)
-    ref1 = ak.where(temp > 0.30, 0.30, temp)
-    ref2 = ak.where(ref1 > 0.05, ref1, 0.05)
+    ref1 = np.where(temp > 0.30, 0.30, temp)
+    ref2 = np.where(ref1 > 0.05, ref1, 0.05)
     return ref2
 
 
+def _best_pi0_pairs(offsets, x, y, z, t, mass, window, best_a, best_b):
+    # per photon group (offsets into the pt ordered flat buffer): positions (a, b) of the pair with
+    # the mass closest to *mass* within *window*, first in combinations order on ties, -1 if none,
+    # in the precision of the coffea vectors of the photons (nan masses for m^2 < 0 as in coffea)
+    for i in range(len(offsets) - 1):
+        best = np.float32(np.inf)
+        for a in range(offsets[i], offsets[i + 1] - 1):
+            for b in range(a + 1, offsets[i + 1]):
+                px, py, pz, e = x[a] + x[b], y[a] + y[b], z[a] + z[b], t[a] + t[b]
+                val = np.abs(np.float32(np.sqrt(e * e - px * px - py * py - pz * pz)) - mass)
+                if val < window and val < best:
+                    best, best_a[i], best_b[i] = val, a - offsets[i], b - offsets[i]
+    return best_a, best_b
+
+
+def _best_pi0_pairs_np(offsets, x, y, z, t, mass, window, best_a, best_b):
+    # same as _best_pi0_pairs, vectorised over the groups per pair of positions
+    counts = np.diff(offsets)
+    best = np.full(len(counts), np.inf, dtype=np.float32)
+    for a in range(counts.max(initial=0) - 1):
+        for b in range(a + 1, counts.max()):
+            sel = np.flatnonzero(counts > b)
+            ia, ib = offsets[sel] + a, offsets[sel] + b
+            px, py, pz, e = x[ia] + x[ib], y[ia] + y[ib], z[ia] + z[ib], t[ia] + t[ib]
+            with np.errstate(invalid="ignore"):
+                val = np.abs(np.sqrt(e * e - px * px - py * py - pz * pz) - mass)
+            better = (val < window) & (val < best[sel])
+            sel = sel[better]
+            best[sel], best_a[sel], best_b[sel] = val[better], a, b
+    return best_a, best_b
+
+
+if HAS_NUMBA:
+    _best_pi0_pairs = numba.njit(cache=True)(_best_pi0_pairs)
+else:
+    _best_pi0_pairs = _best_pi0_pairs_np
+
+
+def reconstructPi0Strip(
+        hcandp4,
+        photons,
+        pi0RecoM: Optional[float] = 0.136,
+        pi0RecoW: Optional[float] = 0.013,
+):
+    """
+    "simpleMB" pi0 per event (0 or 1) from the photons of one hcand leg (events * photons, all of
+    the tau of the first hcand of the event, so the event offsets are the offsets per tauIdx):
+      - strip photons: within the eta / phi strip window (of the photon pt) around the hcand,
+      - one strip photon: that photon,
+      - more: the photon pair with the mass closest to pi0RecoM within 2 * pi0RecoW, the first of
+        the pt ordered combinations on ties, else the leading strip photon.
+    Works on the flat, pt ordered photon buffer: the windows are computed once per photon and the
+    best pair is searched per tau by _best_pi0_pairs without a pair table, so memory is linear in
+    the number of photons. The arithmetic is done in the precision of the photons (float32 for nano).
+    """
+    photons = ak.with_name(photons, "PtEtaPhiMLorentzVector")
+    photons = photons[ak.argsort(photons.pt, axis=1, ascending=False)]
+    counts  = ak.to_numpy(ak.num(photons.pt, axis=1))
+    flat    = ak.flatten(photons, axis=1)
+
+    # strip photons, around the first hcand of the event
+    has_hcand = ak.to_numpy(ak.num(hcandp4.pt, axis=1) > 0)
+    hcand     = ak.flatten(hcandp4[:, :1], axis=1)
+    hcand     = convert_to_coffea_p4({
+        f: np.repeat(ak.to_numpy(hcand[f]), counts[has_hcand])
+        for f in ["pt", "eta", "phi", "mass"]
+    })
+    on_hcand  = np.repeat(has_hcand, counts)
+    photon    = convert_to_coffea_p4({f: flat[f][on_hcand] for f in ["pt", "eta", "phi", "mass"]})
+    is_strip  = np.zeros(len(flat), dtype=bool)
+    is_strip[on_hcand] = ak.to_numpy(
+        (np.abs(photon.eta - hcand.eta) < getMaxEtaTauStrip(photon.pt))
+        & (np.abs(photon.delta_phi(hcand)) < getMaxPhiTauStrip(photon.pt))
+    )
+    strip        = flat[is_strip]
+    strip_counts = np.bincount(np.repeat(np.arange(len(counts)), counts)[is_strip], minlength=len(counts))
+    offsets      = np.append(0, np.cumsum(strip_counts))
+
+    # best pair per tau
+    x, y, z, t = (ak.to_numpy(getattr(strip, f)) for f in ["px", "py", "pz", "energy"])
+    dtype      = x.dtype.type
+    best_a, best_b = _best_pi0_pairs(
+        offsets, x, y, z, t, dtype(pi0RecoM), dtype(2 * pi0RecoW),
+        np.full(len(counts), -1, dtype=np.int64), np.full(len(counts), -1, dtype=np.int64),
+    )
+
+    # pi0 four-momentum: the best pair, else the leading strip photon
+    has_pi0 = strip_counts > 0
+    lead    = offsets[:-1][has_pi0]
+    is_pair = best_a[has_pi0] >= 0
+    ia, ib  = lead + np.maximum(best_a[has_pi0], 0), lead + np.maximum(best_b[has_pi0], 0)
+    p4      = convert_to_coffea_p4(
+        {
+            c: np.where(is_pair, v[ia] + v[ib], v[lead])
+            for c, v in [("x", x), ("y", y), ("z", z), ("t", t)]
+        },
+        typetag = "LorentzVector",
+    )
+    lead    = strip[lead]
+
+    n_pi0 = has_pi0.astype(np.int64)
+    return convert_to_coffea_p4({
+        name: ak.unflatten(val, n_pi0)
+        for name, val in {
+            "pt"    : p4.pt,
+            "eta"   : p4.eta,
+            "phi"   : p4.phi,
+            "mass"  : 0.135 * ak.ones_like(lead.pt),
+            "pdgId" : ak.values_astype(111 * ak.ones_like(lead.pt), "int64"),
+            "charge": ak.values_astype(ak.zeros_like(lead.pt), "int32"),
+            "tauIdx": lead.tauIdx,
+        }.items()
+    })
+
+
 def reconstructPi0(
         hcandp4,
         photons,
@@ -72,106 +194,7 @@ def reconstructPi0(
         })
         
     elif method == "simpleMB":
-        pi0RecoM = 0.136 #approximate pi0 peak from fits in PF paper
-        pi0RecoW = 0.013 
-
-        pdgid_pi0  = ak.values_astype(111 * ak.ones_like(photons.pt), "int64")
-        mass_pi0   = 0.135 * ak.ones_like(photons.pt)
-        charge_pi0 = ak.values_astype(ak.zeros_like(photons.pt), "int32")
-        tauidx_pi0 = photons.tauIdx
-
-        #has_atleast_one_photon = ak.num(photons.pt, axis=1) > 0
-        #hcandp4 = ak.where(has_atleast_one_photon, hcandp4, hcandp4[:,:0])
-        
-        #photons_p4 = ak.where(has_atleast_one_photon,
-        #                      photons[:,0:1],
-        #                      photons[:,:0])
-        
-        #deta_photons_hcand = (photons_p4).metric_table(hcandp4, metric = lambda a,b: np.abs(a.eta - b.eta))
-        #dphi_photons_hcand = (photons_p4).metric_table(hcandp4, metric = lambda a,b: np.abs(a.delta_phi(b)))
-
-        deta_photons_hcand = ak.firsts((photons).metric_table(hcandp4, metric = lambda a,b: np.abs(a.eta - b.eta)), axis=-1)
-        dphi_photons_hcand = ak.firsts((photons).metric_table(hcandp4, metric = lambda a,b: np.abs(a.delta_phi(b))), axis=-1)
-        
-        #maxeta_photons = getMaxEtaTauStrip(photons_p4.pt)
-        #maxphi_photons = getMaxPhiTauStrip(photons_p4.pt)
-
-        maxeta_photons = getMaxEtaTauStrip(photons.pt)
-        maxphi_photons = getMaxPhiTauStrip(photons.pt)
-
-        mask_photons = ((np.abs(deta_photons_hcand) < maxeta_photons)
-                        & (np.abs(dphi_photons_hcand) < maxphi_photons))
-
-        mass_pi0 = mass_pi0[mask_photons][:,:1]
-        charge_pi0 = charge_pi0[mask_photons][:,:1]
-        tauidx_pi0 = tauidx_pi0[mask_photons][:,:1]
-        pdgid_pi0  = pdgid_pi0[mask_photons][:,:1]
-        
-        strip_photons_p4 = convert_to_coffea_p4(
-            {
-                "pt"   : photons.pt[mask_photons],
-                "eta"  : photons.eta[mask_photons],
-                "phi"  : photons.phi[mask_photons],
-                "mass" : photons.mass[mask_photons],
-            }
-        )
-
-
-        has_one_photon = ak.num(strip_photons_p4.pt, axis=1) == 1
-        
-        strip_photons_p4_pair = ak.combinations(strip_photons_p4, 2, axis=1)
-        strip_photons_p4_pair_0, strip_photons_p4_pair_1 = ak.unzip(strip_photons_p4_pair)
-        strip_photons_mass = (strip_photons_p4_pair_0 + strip_photons_p4_pair_1).mass
-        mass_val = np.abs(strip_photons_mass - pi0RecoM)
-        mass_sorted_idx = ak.argsort(mass_val, axis=1)
-        strip_photons_p4_pair_sorted = strip_photons_p4_pair[mass_sorted_idx]
-        mass_mask = mass_val < 2 * pi0RecoW
-        evt_mask_no_pair = ak.sum(mass_mask, axis=1) == 0
-        strip_photons_p4_pair_sorted_pass_mass = strip_photons_p4_pair_sorted[mass_mask]
-        strip_photons_p4_mass_selected = ak.concatenate([strip_photons_p4_pair_sorted_pass_mass["0"][:,:1],
-                                                         strip_photons_p4_pair_sorted_pass_mass["1"][:,:1]], axis=1)
-
-        sel_strip_photons_p4 = ak.where(has_one_photon,
-                                        strip_photons_p4,
-                                        ak.where(evt_mask_no_pair,
-                                                 strip_photons_p4[:,:1],
-                                                 strip_photons_p4_mass_selected)
-                                    )
-        
-        #from IPython import embed; embed()
-        #sel_strip_pizero_p4 = ak.from_regular(ak.sum(sel_strip_photons_p4, axis=-1)[:,None])
-
-        
-        dummy = sel_strip_photons_p4.px[:,:0]
-        _mask = ak.num(sel_strip_photons_p4.px, axis=1) > 0
-        
-        px = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.px, axis=1), 0.0)[:,None])
-        px = ak.where(_mask, px, dummy)
-        py = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.py, axis=1), 0.0)[:,None])
-        py = ak.where(_mask, py, dummy)
-        pz = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.pz, axis=1), 0.0)[:,None])
-        pz = ak.where(_mask, pz, dummy)
-        energy = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.energy, axis=1), 0.0)[:,None])
-        energy = ak.where(_mask, energy, dummy)
-        
-        p4 = convert_to_coffea_p4(
-            {
-                "x": px, "y": py, "z": pz, "t": energy,
-            },
-            typetag = "LorentzVector",
-        )
-        
-        p4_pi0 = convert_to_coffea_p4(
-            {
-                "pt": p4.pt,
-                "eta": p4.eta,
-                "phi": p4.phi,
-                "mass": mass_pi0,
-                "pdgId": pdgid_pi0,
-                "charge": charge_pi0,
-                "tauIdx": tauidx_pi0,
-            }
-        )
+        p4_pi0 = reconstructPi0Strip(hcandp4, photons)
 
     return p4_pi0
 
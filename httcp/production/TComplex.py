@@ -1,6 +1,7 @@
 import os
 
 from columnflow.util import maybe_import
+from columnflow.columnar_util import flat_np_view, layout_ak_array
 np = maybe_import("numpy")
 ak = maybe_import("awkward")
 
@@ -10,173 +11,199 @@ class TComplex:
         """
            Mimicing ROOT TComplex class
            this re or im can be any numbers / arrays ( awkward, numpy )
+           Internally, the value is a single complex128 numpy array: awkward inputs are stored as a flat
+           view together with the awkward array they came from, which is used to restore the layout in Re() / Im()
         """
-
+        self.layout = None
         if isinstance(re, ak.Array):
-            if isinstance(im, (int, float)):
-                im = im * ak.ones_like(re)
-        elif isinstance(re, np.ndarray):
-            if isinstance(im, (int, float)):
-                im = im * np.ones_like(re)
-                
-        self.set_complex_numbers(re, im, polar)
-
-        
-    def set_complex_numbers(self, re, im, polar):        
+            self.layout = re
+        elif isinstance(im, ak.Array):
+            self.layout = im
+
+        re = self._to_np(re)
+        im = self._to_np(im)
+        if self.layout is not None:
+            size = len(self._to_np(self.layout))
+            re = self._flat_like(re, size)
+            im = self._flat_like(im, size)
+
         if polar:
-            if isinstance(re, (int, float)):
-                if re < 0:
-                    print("Warning: Modulo of a complex number should be >= 0, taking the absolute value.")
-                    re = np.abs(re)
-                self.fRe = re * np.cos(im)
-                self.fIm = re * np.sin(im)
-            elif isinstance(re, ak.Array):
-                self.fRe = ak.where(re < 0, np.abs(re) * np.cos(im), re * np.cos(im))
-                self.fIm = ak.where(re < 0, np.abs(re) * np.sin(im), re * np.sin(im))
-            elif isinstance(re, np.ndarray):
-                self.fRe = np.where(re < 0, np.abs(re) * np.cos(im), re * np.cos(im))
-                self.fIm = np.where(re < 0, np.abs(re) * np.sin(im), re * np.sin(im))
+            self.z = np.abs(re) * np.exp(1j * im)
+        elif np.ndim(re) == 0 and np.ndim(im) == 0:
+            self.z = complex(re, im)
+        elif np.ndim(im) == 0 and im == 0:
+            self.z = np.asarray(re, dtype=np.complex128)
+        else:
+            self.z = re + 1j * im
+
+
+    @classmethod
+    def from_complex(cls, z, layout=None):
+        """
+           Wrap an existing complex128 array (flat if layout is an awkward array) without copying it
+        """
+        obj = cls.__new__(cls)
+        obj.z = z
+        obj.layout = layout
+        return obj
+
+
+    @staticmethod
+    def _to_np(x):
+        if isinstance(x, ak.Array):
+            return np.asarray(flat_np_view(x, axis=None))
+        return x
+
+
+    @staticmethod
+    def _flat_like(x, size):
+        # numpy arrays holding the same elements as a flat awkward view, e.g. (N, 1) vs var * float64
+        if np.ndim(x) > 1 and np.size(x) == size:
+            return np.reshape(x, -1)
+        return x
+
+
+    @staticmethod
+    def _to_ak(z, layout):
+        if layout is None:
+            return z
+        if layout.ndim == 1:
+            return ak.Array(np.asarray(z))
+        return layout_ak_array(np.ascontiguousarray(z), layout)
+
+
+    def _restore(self, x):
+        return self._to_ak(x, self.layout)
+
+
+    def _binary(self, other, op):
+        if isinstance(other, TComplex):
+            z_other, layout_other = other.z, other.layout
+        elif isinstance(other, ak.Array):
+            z_other, layout_other = self._to_np(other), other
+        elif isinstance(other, (int, float, complex, np.ndarray, np.number)):
+            z_other, layout_other = other, None
         else:
-            self.fRe = re
-            self.fIm = im
+            raise TypeError(f"Unsupported type for complex arithmetic: {type(other)}")
+
+        z_self, layout = self.z, self.layout
+        if layout is None and layout_other is None:
+            return TComplex.from_complex(op(z_self, z_other))
+        if layout is None:
+            layout = layout_other
+
+        # flat buffers describing the same elements: plain numpy arithmetic
+        size = len(self._to_np(layout))
+        z_self = self._flat_like(z_self, size)
+        z_other = self._flat_like(z_other, size)
+        if (np.ndim(z_self) == 0 or np.size(z_self) == size) and (np.ndim(z_other) == 0 or np.size(z_other) == size):
+            return TComplex.from_complex(op(z_self, z_other), layout)
+
+        # different structures, let awkward broadcast them
+        res = op(self._to_ak(self.z, self.layout), self._to_ak(z_other, layout_other))
+        return TComplex.from_complex(np.asarray(flat_np_view(res, axis=None)), res)
+
 
     def Re(self):
-        return self.fRe
+        return self._restore(np.real(self.z))
 
     def Im(self):
-        return self.fIm
+        return self._restore(np.imag(self.z))
 
     def Rho(self):
-        return np.sqrt(self.fRe**2 + self.fIm**2)
+        return self._restore(np.abs(self.z))
 
     def Rho2(self):
-        return self.fRe**2 + self.fIm**2
+        return self._restore(np.real(self.z)**2 + np.imag(self.z)**2)
 
     def Theta(self):
-        if isinstance(self.fRe, (int, float)):
-            return np.arctan2(self.fIm, self.fRe) if (self.fIm or self.fRe) else 0
-
-        elif isinstance(self.fRe, np.ndarray):
-            dummy = np.zeros_like(self.fRe)
-            return np.where(mask, np.arctan2(self.fIm, self.fRe), dummy)
-        elif isinstance(self.fRe, ak.Array):
-            dummy = ak.zeros_like(self.fRe)
-            return ak.where(mask, np.arctan2(self.fIm, self.fRe), dummy)
-        else:
-            raise RuntimeError("no specific type")
+        return self._restore(np.angle(self.z))
+
+    def _unary(self, func):
+        return TComplex.from_complex(func(self.z), self.layout)
 
     def Sqrt(self):
-        rho = np.sqrt(self.Rho())
-        theta = 0.5 * self.Theta()
-        return TComplex(rho * np.cos(theta), rho * np.sin(theta), polar=True)
+        return self._unary(np.sqrt)
 
     def Exp(self):
-        return TComplex(np.exp(self.fRe), self.fIm, polar=True)
+        return self._unary(np.exp)
 
     def Log(self):
-        return TComplex(0.5 * np.log(self.Rho2()), self.Theta())
+        return self._unary(np.log)
 
     def Sin(self):
-        return TComplex(np.sin(self.fRe) * np.cosh(self.fIm), np.cos(self.fRe) * np.sinh(self.fIm), polar=True)
+        return self._unary(np.sin)
 
     def Cos(self):
-        return TComplex(np.cos(self.fRe) * np.cosh(self.fIm), -np.sin(self.fRe) * np.sinh(self.fIm), polar=True)
+        return self._unary(np.cos)
 
     def Tan(self):
-        cc = self.Cos()
-        return self.Sin() * cc.Conjugate() / cc.Rho2()
+        return self._unary(np.tan)
 
     def ASin(self):
-        return -TComplex.I() * TComplex.Log(TComplex.I() * self + np.sign(1., self.Im()) * TComplex.Sqrt(1. - self**2))
+        return self._unary(np.arcsin)
 
     def ACos(self):
-        return -TComplex.I() * TComplex.Log(self + np.sign(1., self.Im()) * TComplex.Sqrt(self**2 - 1.))
+        return self._unary(np.arccos)
 
     def ATan(self):
-        return -0.5 * TComplex.I() * TComplex.Log((1. + TComplex.I() * self) / (1. - TComplex.I() * self))
+        return self._unary(np.arctan)
 
     def SinH(self):
-        return TComplex(np.sinh(self.fRe) * np.cos(self.fIm), np.cosh(self.fRe) * np.sin(self.fIm), polar=True)
+        return self._unary(np.sinh)
 
     def CosH(self):
-        return TComplex(np.cosh(self.fRe) * np.cos(self.fIm), np.sinh(self.fRe) * np.sin(self.fIm), polar=True)
+        return self._unary(np.cosh)
 
     def TanH(self):
-        cc = self.CosH()
-        return self.SinH() * cc.Conjugate() / cc.Rho2()
+        return self._unary(np.tanh)
 
     def ASinH(self):
-        return TComplex.Log(self + np.sign(1., self.Im()) * TComplex.Sqrt(self**2 + 1.))
+        return self._unary(np.arcsinh)
 
     def ACosH(self):
-        return TComplex.Log(self + np.sign(1., self.Im()) * TComplex.Sqrt(self**2 - 1.))
+        return self._unary(np.arccosh)
 
     def ATanH(self):
-        return 0.5 * TComplex.Log((1. + self) / (1. - self))
+        return self._unary(np.arctanh)
 
     def Conjugate(self):
-        return TComplex(self.fRe, -self.fIm)
+        return self._unary(np.conj)
 
     def __mul__(self, other):
-        if isinstance(other, TComplex):
-            return TComplex(self.fRe * other.fRe - self.fIm * other.fIm, self.fRe * other.fIm + self.fIm * other.fRe)
-        elif isinstance(other, (int, float, np.ndarray, ak.Array)):
-            return TComplex(self.fRe * other, self.fIm * other)
-        else:
-            raise TypeError(f"Unsupported type for multiplication: {type(other)}")
+        return self._binary(other, lambda a, b: a * b)
 
     def __rmul__(self, other):
         return self.__mul__(other)
 
-    
     def __add__(self, other):
-        if isinstance(other, TComplex):
-            return TComplex(self.fRe + other.fRe, self.fIm + other.fIm)
-        elif isinstance(other, (int, float, np.ndarray, ak.Array)):
-            return TComplex(self.fRe + other, self.fIm)
-        else:
-            raise TypeError(f"Unsupported type for addition: {type(other)}")
+        return self._binary(other, lambda a, b: a + b)
 
     def __radd__(self, other):
         return self.__add__(other)
 
-        
     def __truediv__(self, other):
-        if isinstance(other, TComplex):
-            rho2 = other.Rho2()
-            return TComplex((self.fRe * other.fRe + self.fIm * other.fIm) / rho2,
-                            (-self.fRe * other.fIm + self.fIm * other.fRe) / rho2)
-        elif isinstance(other, (int, float, np.ndarray, ak.Array)):
-            return TComplex(self.fRe / other, self.fIm / other)
-        else:
-            raise TypeError(f"Unsupported type for division: {type(other)}")
+        return self._binary(other, lambda a, b: a / b)
+
+    def __rtruediv__(self, other):
+        return self._binary(other, lambda a, b: b / a)
 
     def __sub__(self, other):
-        if isinstance(other, TComplex):
-            return TComplex(self.fRe - other.fRe, self.fIm - other.fIm)
-        elif isinstance(other, (int, float, np.ndarray, ak.Array)):
-            return TComplex(self.fRe - other, self.fIm)
-        else:
-            raise TypeError(f"Unsupported type for subtraction: {type(other)}")
+        return self._binary(other, lambda a, b: a - b)
+
+    def __rsub__(self, other):
+        return self._binary(other, lambda a, b: b - a)
 
     def __neg__(self):
-        return TComplex(-self.fRe, -self.fIm)
+        return self._unary(np.negative)
 
     def __pos__(self):
         return self
 
     def __pow__(self, other):
-        if isinstance(other, TComplex):
-            lrho = np.log(self.Rho())
-            theta = self.Theta()
-            return TComplex(np.exp(lrho * other.fRe - theta * other.fIm), lrho * other.fIm + theta * other)
+        return self._binary(other, lambda a, b: a ** b)
 
     def __iadd__(self, other):
-        if isinstance(other, TComplex):
-            self.fRe += other.fRe
-            self.fIm += other.fIm
-        elif isinstance(other, (int, float, np.array, ak.Array)):
-            self.fRe += other
-        else:
-            raise TypeError(f"Unsupported type for addition: {type(other)}")
+        res = self.__add__(other)
+        self.z, self.layout = res.z, res.layout
         return self
@@ -0,0 +1,137 @@
+# coding: utf-8
+
+"""
+Fused category ids: every atomic categorizer used by the leaf categories is evaluated once into a
+bit of per-event uint64 words, the leaf category ids are then looked up per distinct bit pattern.
+Same output as columnflow's category_ids producer (category_ids of all passed leaf categories, in
+the order of config.get_leaf_categories()), but the per-event cost scales with the number of
+atomic categorizers instead of the number of leaf categories.
+"""
+
+import law
+
+from columnflow.production import Producer, producer
+from columnflow.categorization import Categorizer
+from columnflow.util import maybe_import
+from columnflow.columnar_util import set_ak_column
+
+np = maybe_import("numpy")
+ak = maybe_import("awkward")
+
+
+logger = law.logger.get_logger(__name__)
+
+
+def category_bits(masks: list, n_events: int) -> np.ndarray:
+    """
+    Pack the event masks of the atomic categorizers into (events, words) uint64, mask i is bit
+    i % 64 of word i // 64, missing values count as False
+    """
+    n_words = max(1, (len(masks) + 63) // 64)
+    bits = np.zeros((n_events, n_words), dtype=np.uint64)
+    for i, mask in enumerate(masks):
+        mask = np.asarray(ak.to_numpy(ak.fill_none(mask, False)), dtype=bool)
+        bits[:, i // 64] |= mask.astype(np.uint64) << np.uint64(i % 64)
+    return bits
+
+
+def leaf_requirements(leaf_atoms: list[list[int]], n_atoms: int) -> np.ndarray:
+    """
+    (leaves, words) uint64 bits of the atomic categorizers each leaf category requires
+    """
+    n_words = max(1, (n_atoms + 63) // 64)
+    required = np.zeros((len(leaf_atoms), n_words), dtype=np.uint64)
+    for leaf, atoms in enumerate(leaf_atoms):
+        for i in atoms:
+            required[leaf, i // 64] |= np.uint64(1) << np.uint64(i % 64)
+    return required
+
+
+def category_ids_from_bits(
+        bits: np.ndarray,
+        required: np.ndarray,
+        leaf_ids: np.ndarray,
+        block_size: int = 2 ** 24,
+) -> ak.Array:
+    """
+    events * var int64 ids of the leaf categories whose *required* bits are all set in *bits*, in
+    leaf order. The leaves are only tested once per distinct bit pattern, *block_size* bounds the
+    number of (pattern, leaf, word) tests done at once.
+    """
+    if bits.shape[1] == 1:
+        patterns, inverse = np.unique(bits[:, 0], return_inverse=True)
+        patterns = patterns[:, None]
+    else:
+        patterns, inverse = np.unique(bits, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    # (patterns, leaves) tests, in blocks of patterns to bound the memory
+    block = max(1, block_size // max(1, required.size))
+    pattern_rows, leaf_idx = [], []
+    for start in range(0, len(patterns), block):
+        chunk = patterns[start:start + block, None, :]
+        rows, idx = np.nonzero(np.all((chunk & required[None]) == required[None], axis=-1))
+        pattern_rows.append(rows + start)
+        leaf_idx.append(idx)
+    pattern_rows = np.concatenate(pattern_rows or [np.zeros(0, dtype=np.int64)])
+    leaf_idx = np.concatenate(leaf_idx or [np.zeros(0, dtype=np.int64)])
+    pattern_ids = ak.unflatten(
+        np.asarray(leaf_ids, dtype=np.int64)[leaf_idx],
+        np.bincount(pattern_rows, minlength=len(patterns)),
+    )
+    return pattern_ids[inverse]
+
+
+@producer(
+    produces={"category_ids"},
+)
+def fused_category_ids(
+        self: Producer,
+        events: ak.Array,
+        **kwargs,
+) -> ak.Array:
+    """
+    Assigns each event the ids of all leaf categories it passes, see the module docstring
+    """
+    masks = []
+    for categorizer in self.atomic_categorizers:
+        events, mask = self[categorizer](events, **kwargs)
+        masks.append(mask)
+
+    category_ids = category_ids_from_bits(category_bits(masks, len(events)), self.leaf_required_bits, self.leaf_ids)
+    events = set_ak_column(events, "category_ids", category_ids, value_type=np.int64)
+
+    return events
+
+
+@fused_category_ids.init
+def fused_category_ids_init(self: Producer) -> None:
+    # atomic categorizers in order of first use, and those each leaf category needs,
+    # leaf selections are treated as lists of categorizers as in columnflow's category_ids
+    self.atomic_categorizers = []
+    leaf_atoms = []
+    leaf_ids = []
+    for cat_inst in self.config_inst.get_leaf_categories():
+        atoms = []
+        for sel in law.util.flatten(law.util.make_list(cat_inst.selection)):
+            if Categorizer.derived_by(sel):
+                categorizer = sel
+            elif Categorizer.has_cls(sel):
+                categorizer = Categorizer.get_cls(sel)
+            else:
+                raise Exception(
+                    f"selection '{sel}' of category '{cat_inst.name}' cannot be resolved to an "
+                    "existing Categorizer object",
+                )
+            if categorizer not in self.atomic_categorizers:
+                self.atomic_categorizers.append(categorizer)
+                self.uses.add(categorizer)
+            atoms.append(self.atomic_categorizers.index(categorizer))
+        leaf_atoms.append(atoms)
+        leaf_ids.append(cat_inst.id)
+
+    self.leaf_ids = np.array(leaf_ids, dtype=np.int64)
+    self.leaf_required_bits = leaf_requirements(leaf_atoms, len(self.atomic_categorizers))
+    logger.debug(
+        f"{len(leaf_ids)} leaf categories from {len(self.atomic_categorizers)} atomic categorizers",
+    )
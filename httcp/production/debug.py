@@ -1,119 +1,185 @@
+"""
+Category flow of the region bits for debugging: every event gets one integer code
+(truth x region x DM of tau 1 x DM of tau 2), all flow counts come from a single np.bincount of
+the codes. The flow is printed as a rich tree and logged as one json line.
+"""
+
+import json
+
+import law
+
 from columnflow.util import maybe_import
 
+np = maybe_import("numpy")
 ak = maybe_import("awkward")
 
 from rich.console import Console
 from rich.tree import Tree
 
+from httcp.production.processes import REGION_BITS
 
-def leptau_category_flow(tag, events):
-    flowdict = {}
-    
-    flowdict["tau is real"] = events.is_real_2
-    flowdict["tau is fake"] = events.is_fake_2
-    
-    flowdict["A  : is_ss + is_iso_2    + is_b_veto + is_low_mt "]  = ~events.is_os & events.is_iso_2 & events.is_b_veto & events.is_low_mt
-    flowdict["B  : is_ss + is_noniso_2 + is_b_veto + is_low_mt "]  = ~events.is_os & ~events.is_iso_2 & events.is_b_veto & events.is_low_mt
-    flowdict["A0 : is_os + is_iso_2    + has_b     + is_low_mt "]  = events.is_os & events.is_iso_2 & ~events.is_b_veto & events.is_low_mt
-    flowdict["B0 : is_os + is_noniso_2 + has_b     + is_low_mt "]  = events.is_os & ~events.is_iso_2 & ~events.is_b_veto & events.is_low_mt
-    flowdict["A1 : is_os + is_iso_2    + is_b_veto + is_high_mt"]  = events.is_os & events.is_iso_2 & events.is_b_veto & ~events.is_low_mt
-    flowdict["B1 : is_os + is_noniso_2 + is_b_veto + is_high_mt"]  = events.is_os & ~events.is_iso_2 & events.is_b_veto & ~events.is_low_mt
-    flowdict["D  : is_os + is_iso_2    + is_b_veto + is_low_mt "]  = events.is_os & events.is_iso_2 & events.is_b_veto & events.is_low_mt
-    flowdict["C  : is_os + is_noniso_2 + is_b_veto + is_low_mt "]  = events.is_os & ~events.is_iso_2 & events.is_b_veto & events.is_low_mt
-    
-    flowdict["DM = 0 "]  = events.is_pi_2
-    flowdict["DM = 1 "]  = events.is_rho_2
-    flowdict["DM = 2 "]  = events.is_a1_1pr_2pi0_2
-    flowdict["DM = 10"]  = events.is_a1_3pr_0pi0_2
-    flowdict["DM = 11"]  = events.is_a1_3pr_1pi0_2
-    
-    
-    root = Tree(f"[yellow]{tag} : {ak.count(events.event)}")
-    
-    for a in ["tau is real", "tau is fake"]:
-        _temp = root.add(f"[cyan]{a} : {ak.sum(flowdict[a])}")
-        for b in ["A  : is_ss + is_iso_2    + is_b_veto + is_low_mt ",
-                  "B  : is_ss + is_noniso_2 + is_b_veto + is_low_mt ",
-                  "A0 : is_os + is_iso_2    + has_b     + is_low_mt ",
-                  "B0 : is_os + is_noniso_2 + has_b     + is_low_mt ",
-                  "A1 : is_os + is_iso_2    + is_b_veto + is_high_mt",
-                  "B1 : is_os + is_noniso_2 + is_b_veto + is_high_mt",
-                  "D  : is_os + is_iso_2    + is_b_veto + is_low_mt ",
-                  "C  : is_os + is_noniso_2 + is_b_veto + is_low_mt "]:
-            _temp2 = _temp.add(f"[green]{b} : {ak.sum(flowdict[a] & flowdict[b])}")
-            for c in ["DM = 0 ", "DM = 1 ", "DM = 2 ", "DM = 10", "DM = 11"]:
-                _temp2.add(f"[bright_white]{c} : {ak.sum(flowdict[a] & flowdict[b] & flowdict[c])}")
-    return root
 
+logger = law.logger.get_logger(__name__)
 
-def tautau_category_flow(tag, events):
-    flowdict = {}
-    
-    flowdict["leading tau is real"] = events.is_real_1
-    flowdict["leading tau is fake"] = events.is_fake_1
-    
-    flowdict["A  : is_ss + is_iso_1    + is_iso_2    + is_b_veto"] = ~events.is_os & events.is_iso_1 & events.is_iso_2 & events.is_b_veto
-    flowdict["B  : is_ss + is_noniso_1 + is_iso_2    + is_b_veto"] = ~events.is_os & ~events.is_iso_1 & events.is_iso_2 & events.is_b_veto
-    flowdict["A0 : is_ss + is_noniso_1 + is_noniso_2 + is_b_veto"] = ~events.is_os & events.is_iso_1 & ~events.is_iso_2 & events.is_b_veto	
-    flowdict["B0 : is_ss + is_noniso_1 + is_noniso_2 + is_b_veto"] = ~events.is_os & ~events.is_iso_1 & ~events.is_iso_2 & events.is_b_veto
-    flowdict["D0 : is_os + is_iso_1    + is_noniso_2 + is_b_veto"] = events.is_os & events.is_iso_1 & ~events.is_iso_2 & events.is_b_veto
-    flowdict["C0 : is_os + is_noniso_1 + is_noniso_2 + is_b_veto"] = events.is_os & ~events.is_iso_1 & ~events.is_iso_2 & events.is_b_veto
-    flowdict["D  : is_os + is_iso_1    + is_iso_2    + is_b_veto"] = events.is_os & events.is_iso_1 & events.is_iso_2 & events.is_b_veto
-    flowdict["C  : is_os + is_noniso_1 + is_iso_2    + is_b_veto"] = events.is_os & ~events.is_iso_1 & events.is_iso_2 & events.is_b_veto
-    
-    flowdict["DM1 = 0"]     = events.is_pi_1
-    flowdict["DM1 = 1"]     = events.is_rho_1
-    flowdict["DM1 = 2"]     = events.is_a1_1pr_2pi0_1
-    flowdict["DM1 = 10"]    = events.is_a1_3pr_0pi0_1
-    flowdict["DM1 = 11"]    = events.is_a1_3pr_1pi0_1
-    flowdict["DMs = 0-0"]   = events.is_pi_1 & events.is_pi_2
-    flowdict["DMs = 0-1"]   = ((events.is_pi_1 & events.is_rho_2) | (events.is_pi_2 & events.is_rho_1))
-    flowdict["DMs = 0-2"]   = ((events.is_pi_1 & events.is_a1_1pr_2pi0_2) | (events.is_pi_2 & events.is_a1_1pr_2pi0_1))
-    flowdict["DMs = 0-10"]  = ((events.is_pi_1 & events.is_a1_3pr_0pi0_2) | (events.is_pi_2 & events.is_a1_3pr_0pi0_1))
-    flowdict["DMs = 0-11"]  = ((events.is_pi_1 & events.is_a1_3pr_1pi0_2) | (events.is_pi_2 & events.is_a1_3pr_1pi0_1))
-    flowdict["DMs = 1-1"]   = events.is_rho_1 & events.is_rho_2
-    flowdict["DMs = 1-2"]   = ((events.is_rho_1 & events.is_a1_1pr_2pi0_2) | (events.is_rho_2 & events.is_a1_1pr_2pi0_1))
-    flowdict["DMs = 1-10"]  = ((events.is_rho_1 & events.is_a1_3pr_0pi0_2) | (events.is_rho_2 & events.is_a1_3pr_0pi0_1))
-    flowdict["DMs = 1-11"]  = ((events.is_rho_1 & events.is_a1_3pr_1pi0_2) | (events.is_rho_2 & events.is_a1_3pr_1pi0_1))
-    flowdict["DMs = 2-2"]   = events.is_a1_1pr_2pi0_1 & events.is_a1_1pr_2pi0_2
-    flowdict["DMs = 2-10"]  = ((events.is_a1_1pr_2pi0_1 & events.is_a1_3pr_0pi0_2) | (events.is_a1_1pr_2pi0_2 & events.is_a1_3pr_0pi0_1))
-    flowdict["DMs = 2-11"]  = ((events.is_a1_1pr_2pi0_1 & events.is_a1_3pr_1pi0_2) | (events.is_a1_1pr_2pi0_2 & events.is_a1_3pr_1pi0_1))
-    flowdict["DMs = 10-10"] = events.is_a1_3pr_0pi0_1 & events.is_a1_3pr_0pi0_2
-    flowdict["DMs = 10-11"] = ((events.is_a1_3pr_0pi0_1 & events.is_a1_3pr_1pi0_2) | (events.is_a1_3pr_0pi0_2 & events.is_a1_3pr_1pi0_1))
-    flowdict["DMs = 11-11"] = events.is_a1_3pr_1pi0_1 & events.is_a1_3pr_1pi0_2
-    
-    root = Tree(f"[yellow]{tag} : {ak.count(events.event)}")
-    
-    for a in ["leading tau is real", "leading tau is fake"]:
-        _temp = root.add(f"[cyan]{a} : {ak.sum(flowdict[a])}")
-        for b in ["A  : is_ss + is_iso_1    + is_iso_2    + is_b_veto",
-                  "B  : is_ss + is_noniso_1 + is_iso_2    + is_b_veto",
-                  "A0 : is_ss + is_noniso_1 + is_noniso_2 + is_b_veto",
-                  "B0 : is_ss + is_noniso_1 + is_noniso_2 + is_b_veto",
-                  "C0 : is_os + is_noniso_1 + is_noniso_2 + is_b_veto",
-                  "D0 : is_os + is_iso_1    + is_noniso_2 + is_b_veto",
-                  "C  : is_os + is_noniso_1 + is_iso_2    + is_b_veto",
-                  "D  : is_os + is_iso_1    + is_iso_2    + is_b_veto",
-                  ]:
-            _temp2 = _temp.add(f"[green]{b} : {ak.sum(flowdict[a] & flowdict[b])}")
-            for c in ["DM1 = 0", "DM1 = 1", "DM1 = 2", "DM1 = 10", "DM1 = 11",
-                      "DMs = 0-0", "DMs = 0-1", "DMs = 0-2", "DMs = 0-10", "DMs = 0-11",
-                      "DMs = 1-1", "DMs = 1-2", "DMs = 1-10", "DMs = 1-11",
-                      "DMs = 2-2", "DMs = 2-10", "DMs = 2-11",
-                      "DMs = 10-10", "DMs = 10-11",
-                      "DMs = 11-11"]:
-                _temp2.add(f"[bright_white]{c} : {ak.sum(flowdict[a] & flowdict[b] & flowdict[c])}")
+
+# tau decay modes and the region flag prefix of each, the flags are suffixed by _1 / _2
+DECAY_MODES = [
+    (0, "is_pi"),
+    (1, "is_rho"),
+    (2, "is_a1_1pr_2pi0"),
+    (10, "is_a1_3pr_0pi0"),
+    (11, "is_a1_3pr_1pi0"),
+]
+
+# truth levels: (label, flag)
+LEPTAU_TRUTH = [
+    ("tau is real", "is_real_2"),
+    ("tau is fake", "is_fake_2"),
+]
+TAUTAU_TRUTH = [
+    ("leading tau is real", "is_real_1"),
+    ("leading tau is fake", "is_fake_1"),
+]
+
+# regions: (label, required flags, vetoed flags), mutually exclusive
+LEPTAU_REGIONS = [
+    ("A  : is_ss + is_iso_2    + is_b_veto + is_low_mt ", ["is_iso_2", "is_b_veto", "is_low_mt"], ["is_os"]),
+    ("B  : is_ss + is_noniso_2 + is_b_veto + is_low_mt ", ["is_b_veto", "is_low_mt"], ["is_os", "is_iso_2"]),
+    ("A0 : is_os + is_iso_2    + has_b     + is_low_mt ", ["is_os", "is_iso_2", "is_low_mt"], ["is_b_veto"]),
+    ("B0 : is_os + is_noniso_2 + has_b     + is_low_mt ", ["is_os", "is_low_mt"], ["is_iso_2", "is_b_veto"]),
+    ("A1 : is_os + is_iso_2    + is_b_veto + is_high_mt", ["is_os", "is_iso_2", "is_b_veto"], ["is_low_mt"]),
+    ("B1 : is_os + is_noniso_2 + is_b_veto + is_high_mt", ["is_os", "is_b_veto"], ["is_iso_2", "is_low_mt"]),
+    ("D  : is_os + is_iso_2    + is_b_veto + is_low_mt ", ["is_os", "is_iso_2", "is_b_veto", "is_low_mt"], []),
+    ("C  : is_os + is_noniso_2 + is_b_veto + is_low_mt ", ["is_os", "is_b_veto", "is_low_mt"], ["is_iso_2"]),
+]
+TAUTAU_REGIONS = [
+    ("A  : is_ss + is_iso_1    + is_iso_2    + is_b_veto", ["is_iso_1", "is_iso_2", "is_b_veto"], ["is_os"]),
+    ("B  : is_ss + is_noniso_1 + is_iso_2    + is_b_veto", ["is_iso_2", "is_b_veto"], ["is_os", "is_iso_1"]),
+    ("A0 : is_ss + is_iso_1    + is_noniso_2 + is_b_veto", ["is_iso_1", "is_b_veto"], ["is_os", "is_iso_2"]),
+    ("B0 : is_ss + is_noniso_1 + is_noniso_2 + is_b_veto", ["is_b_veto"], ["is_os", "is_iso_1", "is_iso_2"]),
+    ("C0 : is_os + is_noniso_1 + is_noniso_2 + is_b_veto", ["is_os", "is_b_veto"], ["is_iso_1", "is_iso_2"]),
+    ("D0 : is_os + is_iso_1    + is_noniso_2 + is_b_veto", ["is_os", "is_iso_1", "is_b_veto"], ["is_iso_2"]),
+    ("C  : is_os + is_noniso_1 + is_iso_2    + is_b_veto", ["is_os", "is_iso_2", "is_b_veto"], ["is_iso_1"]),
+    ("D  : is_os + is_iso_1    + is_iso_2    + is_b_veto", ["is_os", "is_iso_1", "is_iso_2", "is_b_veto"], []),
+]
+
+
+def _lookup(bits: np.ndarray, names: list[str], value) -> np.ndarray:
+    """
+    value(set of flags) per event, evaluated once per combination of the flags *names*
+    """
+    table = np.array([
+        value({name for i, name in enumerate(names) if k >> i & 1})
+        for k in range(2 ** len(names))
+    ], dtype=np.int64)
+    idx = np.zeros(len(bits), dtype=np.uint32)
+    for i, name in enumerate(names):
+        idx |= ((bits >> np.uint32(REGION_BITS[name])) & np.uint32(1)) << np.uint32(i)
+    return table[idx]
+
+
+def flow_counts(region_bits: ak.Array, truth: list, regions: list) -> np.ndarray:
+    """
+    Event counts (truth code, region, DM index of tau 1, DM index of tau 2) with a single bincount.
+    The truth code has bit i set if the flag of truth level i is set, region len(regions) and DM
+    index len(DECAY_MODES) collect the events in none of them.
+    """
+    bits = np.asarray(ak.to_numpy(region_bits), dtype=np.uint32)
+    n_truth, n_regions, n_dms = 2 ** len(truth), len(regions) + 1, len(DECAY_MODES) + 1
+
+    truth_code = _lookup(bits, [flag for _, flag in truth], lambda on: sum(
+        1 << i for i, (_, flag) in enumerate(truth) if flag in on
+    ))
+
+    region_flags = sorted({flag for _, req, veto in regions for flag in req + veto})
+    region_idx = _lookup(bits, region_flags, lambda on: next(
+        (i for i, (_, req, veto) in enumerate(regions) if set(req) <= on and not set(veto) & on),
+        len(regions),
+    ))
+
+    dm_idx = []
+    for tau in (1, 2):
+        dm_flags = [f"{prefix}_{tau}" for _, prefix in DECAY_MODES]
+        dm_idx.append(_lookup(bits, dm_flags, lambda on: next(
+            (i for i, flag in enumerate(dm_flags) if flag in on),
+            len(DECAY_MODES),
+        )))
+
+    code = ((truth_code * n_regions + region_idx) * n_dms + dm_idx[0]) * n_dms + dm_idx[1]
+    counts = np.bincount(code, minlength=n_truth * n_regions * n_dms * n_dms)
+    return counts.reshape(n_truth, n_regions, n_dms, n_dms)
+
+
+def _flow(counts: np.ndarray, truth: list, regions: list, dm_counts) -> dict:
+    """
+    Nested flow {truth label: {"count", "regions": {region label: {"count", "decay_modes"}}}},
+    *dm_counts* maps the (DM 1, DM 2) counts of a region to {label: count}
+    """
+    flow = {}
+    for i, (a, _) in enumerate(truth):
+        per_truth = counts[[t for t in range(len(counts)) if t >> i & 1]].sum(axis=0)
+        flow[a] = {"count": int(per_truth.sum()), "regions": {}}
+        for j, (b, _, _) in enumerate(regions):
+            flow[a]["regions"][b] = {
+                "count": int(per_truth[j].sum()),
+                "decay_modes": {c: int(n) for c, n in dm_counts(per_truth[j]).items()},
+            }
+    return flow
+
+
+def _tree(tag: str, n_events: int, flow: dict) -> Tree:
+    root = Tree(f"[yellow]{tag} : {n_events}")
+    for a, per_truth in flow.items():
+        _temp = root.add(f"[cyan]{a} : {per_truth['count']}")
+        for b, per_region in per_truth["regions"].items():
+            _temp2 = _temp.add(f"[green]{b} : {per_region['count']}")
+            for c, n in per_region["decay_modes"].items():
+                _temp2.add(f"[bright_white]{c} : {n}")
     return root
 
 
+def leptau_dm_counts(dm_counts: np.ndarray) -> dict:
+    # decay mode of the tau (2nd candidate)
+    per_dm = dm_counts.sum(axis=0)
+    return {f"DM = {dm:<2d}": per_dm[i] for i, (dm, _) in enumerate(DECAY_MODES)}
+
+
+def tautau_dm_counts(dm_counts: np.ndarray) -> dict:
+    # decay mode of the leading tau, then unordered decay mode pairs
+    per_dm1 = dm_counts.sum(axis=1)
+    counts = {f"DM1 = {dm}": per_dm1[i] for i, (dm, _) in enumerate(DECAY_MODES)}
+    for i, (dm1, _) in enumerate(DECAY_MODES):
+        for j, (dm2, _) in enumerate(DECAY_MODES[i:], i):
+            counts[f"DMs = {dm1}-{dm2}"] = dm_counts[i, j] + (dm_counts[j, i] if i != j else 0)
+    return counts
+
+
+def leptau_category_flow(tag, events):
+    counts = flow_counts(events.region_bits, LEPTAU_TRUTH, LEPTAU_REGIONS)
+    flow = _flow(counts, LEPTAU_TRUTH, LEPTAU_REGIONS, leptau_dm_counts)
+    return _tree(tag, len(events), flow), flow
+
+
+def tautau_category_flow(tag, events):
+    counts = flow_counts(events.region_bits, TAUTAU_TRUTH, TAUTAU_REGIONS)
+    flow = _flow(counts, TAUTAU_TRUTH, TAUTAU_REGIONS, tautau_dm_counts)
+    return _tree(tag, len(events), flow), flow
 
 
 def category_flow(tag, events):
+    """
+    Prints the flow of the *events* (only region_bits is needed) of channel *tag* and logs it as a
+    json line {"metric": "category_flow", "channel": ..., "events": ..., "flow": ...}
+    """
     # Create a console object
     console = Console(record=True)
     if tag == "etau" or tag == "mutau":
-        root = leptau_category_flow(tag, events)
+        root, flow = leptau_category_flow(tag, events)
     elif tag == "tautau":
-        root = tautau_category_flow(tag, events)
-        
+        root, flow = tautau_category_flow(tag, events)
+
     console.print(root)
+
+    record = {"metric": "category_flow", "channel": tag, "events": len(events), "flow": flow}
+    logger.info(json.dumps(record))
+    return record
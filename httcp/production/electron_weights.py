@@ -10,6 +10,7 @@ from columnflow.columnar_util import optional_column as optional
 from columnflow.util import maybe_import, safe_div, InsertableDict
 
 from httcp.util import get_trigger_id_map
+from httcp.corrections import get_correction
 
 ak     = maybe_import("awkward")
 np     = maybe_import("numpy")
@@ -113,13 +114,8 @@ def electron_trigger_weights_setup(
         reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    correction_set = correctionlib.CorrectionSet.from_string(
-        bundle.files.electron_trig_sf.load(formatter="gzip").decode("utf-8"),
-    )
     corrector_name, self.year, self.wp = self.get_electron_config()
-    self.sf_corrector = correction_set[corrector_name]
+    self.sf_corrector = get_correction(bundle.files.electron_trig_sf, corrector_name)
 
 
 # ################################################## #
@@ -194,13 +190,5 @@ def electron_xtrigger_weights_setup(
         reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    #correction_set = correctionlib.CorrectionSet.from_string(
-    #    bundle.files.electron_xtrig_sf.load(formatter="gzip").decode("utf-8"),
-    #)
-    correction_set = correctionlib.CorrectionSet.from_file(
-        bundle.files.electron_xtrig_sf.path,
-    )    
     corrector_name, self.year, self.wp = self.get_electron_config()
-    self.sf_corrector = correction_set[corrector_name]
+    self.sf_corrector = get_correction(bundle.files.electron_xtrig_sf, corrector_name)
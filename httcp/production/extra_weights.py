@@ -6,6 +6,8 @@ from columnflow.columnar_util import set_ak_column, has_ak_column, EMPTY_FLOAT,
 from columnflow.production.util import attach_coffea_behavior
 
 from httcp.util import get_trigger_id_map
+from httcp.corrections import get_correction
+from httcp.production.processes import region_bits_pass
 
 ak     = maybe_import("awkward")
 np     = maybe_import("numpy")
@@ -109,13 +111,7 @@ def zpt_reweight_setup(
     reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    
-    correction_set = correctionlib.CorrectionSet.from_string(
-        bundle.files.zpt_rewt_v1_sf.load(formatter="gzip").decode("utf-8"),
-    )
-    self.zpt_corrector    = correction_set["zptreweight"]
+    self.zpt_corrector    = get_correction(bundle.files.zpt_rewt_v1_sf, "zptreweight")
 
 
 
@@ -181,13 +177,7 @@ def zpt_reweight_v2_setup(
     reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    
-    correction_set = correctionlib.CorrectionSet.from_string(
-        bundle.files.zpt_rewt_v2_sf.load(formatter="gzip").decode("utf-8"),
-    )
-    self.zpt_corrector    = correction_set["DY_pTll_reweighting"]
+    self.zpt_corrector    = get_correction(bundle.files.zpt_rewt_v2_sf, "DY_pTll_reweighting")
 
 
 
@@ -202,6 +192,7 @@ def zpt_reweight_v2_setup(
     uses={
         "channel_id",
         "category_ids",
+        "region_bits",
         "hcand.pt", "hcand.decayMode", "n_jet",
         "met_var_qcd_h1",
     },
@@ -220,27 +211,10 @@ def ff_weight(
     # Leading candidate
     hcand1 = events.hcand[:,0] 
 
-    is_B = (
-        (events.channel_id == 4)
-        & ~events.is_os
-        & events.is_real_1
-        & events.is_iso_2
-        & ~events.is_iso_1
-    )
-    is_C0 = (
-        (events.channel_id == 4)
-        & events.is_os
-        & events.is_real_1
-        & ~events.is_iso_2
-        & ~events.is_iso_1
-    )
-    is_C = (
-        (events.channel_id == 4)
-        & events.is_os
-        & events.is_real_1
-        & events.is_iso_2
-        & ~events.is_iso_1
-    )
+    is_tautau = events.channel_id == 4
+    is_B = is_tautau & region_bits_pass(events.region_bits, ["is_real_1", "is_iso_2"], ["is_os", "is_iso_1"])
+    is_C0 = is_tautau & region_bits_pass(events.region_bits, ["is_os", "is_real_1"], ["is_iso_2", "is_iso_1"])
+    is_C = is_tautau & region_bits_pass(events.region_bits, ["is_os", "is_real_1", "is_iso_2"], ["is_iso_1"])
 
     is_B_category = ak.to_numpy(is_B)
     is_C0_category = ak.to_numpy(is_C0)
@@ -309,22 +283,11 @@ def ff_weight_setup(
     reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
+    self.ff_corrector = get_correction(bundle.files.tautau_ff, "fake_factors_fit")
 
-    correction_set = correctionlib.CorrectionSet.from_file(
-        bundle.files.tautau_ff.path,
-    ) 
-    self.ff_corrector = correction_set["fake_factors_fit"]
-
-    correction_set_0 = correctionlib.CorrectionSet.from_file(
-        bundle.files.tautau_ff0.path,
-    )
-    self.ff0_corrector = correction_set["fake_factors_fit"]
+    # FIXME: taken from tautau_ff as before, tautau_ff0 is not used
+    self.ff0_corrector = get_correction(bundle.files.tautau_ff, "fake_factors_fit")
 
     # extrapolation correction on FF
-    ext_correction_set = correctionlib.CorrectionSet.from_file(
-        bundle.files.tautau_ext_corr.path,
-    )
-    self.ext_corrector = ext_correction_set["extrapolation_correction"]
+    self.ext_corrector = get_correction(bundle.files.tautau_ext_corr, "extrapolation_correction")
     
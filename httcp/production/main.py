@@ -9,7 +9,6 @@ import law
 import order as od
 from typing import Optional
 from columnflow.production import Producer, producer
-from columnflow.production.categories import category_ids
 from columnflow.production.normalization import normalization_weights
 from columnflow.production.normalization import stitched_normalization_weights
 
@@ -26,7 +25,6 @@ from columnflow.util import maybe_import
 from columnflow.columnar_util import EMPTY_FLOAT, Route, set_ak_column
 from columnflow.columnar_util import optional_column as optional
 
-from columnflow.config_util import get_events_from_categories
 #from httcp.production.PhiCPNeutralPion import PhiCPNPMethod
 from httcp.production.ReArrangeHcandProds import reArrangeDecayProducts, reArrangeGenDecayProducts
 from httcp.production.PhiCP_Producer import ProduceDetPhiCP, ProduceGenPhiCP
@@ -42,6 +40,7 @@ from httcp.production.dilepton_features import hcand_mass, mT, rel_charge #TODO:
 #from httcp.production.weights import tau_weight
 from httcp.production.sample_split import split_dy
 from httcp.production.processes import build_abcd_masks
+from httcp.production.categories import fused_category_ids
 
 from httcp.production.columnvalid import make_column_valid
 
@@ -166,7 +165,7 @@ def hcand_features(
         #IF_DATASET_IS_DY(zpt_reweight_v2),
         hcand_features,
         hcand_mass,
-        category_ids,
+        fused_category_ids,
         build_abcd_masks,
         "channel_id",
         ff_weight,
@@ -198,7 +197,7 @@ def hcand_features(
         hcand_mass,
         #"channel_id",
         #"trigger_ids",
-        category_ids,
+        fused_category_ids,
         build_abcd_masks,
         ff_weight,
     },
@@ -213,31 +212,20 @@ def main(self: Producer, events: ak.Array, **kwargs) -> ak.Array:
 
     logger.warning("NO b-veto cut for tautau categories : Imperial")
     events = self[build_abcd_masks](events, **kwargs)
-    # building category ids
-    events, category_ids_debug_dict = self[category_ids](events, debug=False, **kwargs)
+    # building category ids, all atomic categorizers once
+    events = self[fused_category_ids](events, **kwargs)
 
     events = self[hcand_features](events, **kwargs)       
     
-    # debugging categories
-    if self.config_inst.x.verbose.production.main:
+    # debugging categories, cheap enough to stay enabled in production runs
+    verbose = self.config_inst.x.verbose.production
+    if verbose.main or verbose.get("category_flow", False):
         from httcp.production.debug import category_flow
-        #print(category_ids_debug_dict)
-        od_cats_in_config = self.config_inst.categories
-        cat_etau = [cat for cat in od_cats_in_config if cat.name == "etau"][0]
-        etau_events = get_events_from_categories(events, cat_etau)
-        logger.info(f"Analysis : etau")
-        category_flow("etau", etau_events)
-
-        cat_mutau = [cat for cat in od_cats_in_config if cat.name == "mutau"][0]
-        mutau_events = get_events_from_categories(events, cat_mutau)
-        logger.info(f"Analysis : mutau")
-        category_flow("mutau", mutau_events)
-
-        cat_tautau = [cat for cat in od_cats_in_config if cat.name == "tautau"][0]
-        tautau_events = get_events_from_categories(events, cat_tautau)
-        logger.info(f"Analysis : tautau")
-        category_flow("tautau", tautau_events)
-        
+        for ch_name in ["etau", "mutau", "tautau"]:
+            ch = self.config_inst.get_channel(ch_name)
+            logger.info(f"Analysis : {ch_name}")
+            category_flow(ch_name, events[events.channel_id == ch.id])
+
 
     if self.dataset_inst.is_mc:
         # allow stitching is applicable only when datasets are DY or wjets, only if the stitching booleans are true in config
@@ -10,6 +10,7 @@ from columnflow.columnar_util import set_ak_column, EMPTY_FLOAT, Route, flat_np_
 from columnflow.columnar_util import optional_column as optional
 
 from httcp.util import get_trigger_id_map
+from httcp.corrections import get_correction
 
 ak     = maybe_import("awkward")
 np     = maybe_import("numpy")
@@ -160,15 +161,5 @@ def muon_xtrigger_weights_setup(
     reader_targets: InsertableDict,
 ) -> None:
     bundle = reqs["external_files"]
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    #json_data = bundle.files.muon_xtrig_sf.load()
-    #correction_set = correctionlib.CorrectionSet.from_string(
-    #    bundle.files.muon_xtrig_sf.load(),
-    #)
-    #correction_set = orrectionlib.CorrectionSet(json_data)
-    correction_set = correctionlib.CorrectionSet.from_file(
-        bundle.files.muon_xtrig_sf.path,
-    )
     corrector_name, self.year = self.get_muon_config()
-    self.sf_corrector = correction_set[corrector_name]
+    self.sf_corrector = get_correction(bundle.files.muon_xtrig_sf, corrector_name)
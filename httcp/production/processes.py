@@ -31,19 +31,36 @@ set_ak_column_i64 = functools.partial(set_ak_column, value_type=np.int64)
 # ################################# #
 #            ABCD masks             #
 # ################################# #
-@producer(
-    uses={
-        "channel_id",
-        "hcand.*",
-        "Jet.pt", "bJet.pt",
-        IF_RUN2("MET.pt", "MET.phi"),
-        IF_RUN3("PuppiMET.pt", "PuppiMET.phi"),
-    },
-    produces={
-        "is_os",
-        "is_b_veto",
-        "is_low_mt",
-        "is_lep_1",
+
+# bit layout of the region_bits column written by build_abcd_masks, flag -> bit
+#   0 : is_os              opposite sign pair
+#   1 : is_b_veto          no b-tagged jet
+#   2 : is_low_mt          mT(h1, MET) < 50
+#   3 : is_lep_1           leading candidate is an e or mu
+#   4 : is_iso_1           leading tau passes the vs-jet WP (tautau only)
+#   5 : is_iso_2           sub-leading tau passes the vs-jet WP of the channel
+#   6 : is_real_1          genuine leading candidate (always set for data)
+#   7 : is_real_2          genuine sub-leading tau (always set for data)
+#   8 : is_fake_1          jet -> leading candidate fake (always set for data)
+#   9 : is_fake_2          jet -> sub-leading tau fake (always set for data)
+#  10 : is_pi_1            leading tau DM 0
+#  11 : is_pi_2            sub-leading tau DM 0
+#  12 : is_rho_1           leading tau DM 1
+#  13 : is_rho_2           sub-leading tau DM 1
+#  14 : is_a1_1pr_2pi0_1   leading tau DM 2
+#  15 : is_a1_1pr_2pi0_2   sub-leading tau DM 2
+#  16 : is_a1_3pr_0pi0_1   leading tau DM 10
+#  17 : is_a1_3pr_0pi0_2   sub-leading tau DM 10
+#  18 : is_a1_3pr_1pi0_1   leading tau DM 11
+#  19 : is_a1_3pr_1pi0_2   sub-leading tau DM 11
+#  20 : is_ipsig_0to1_1    |IPsig| of the leading candidate < 1
+#  21 : has_0jet           0 jets
+#  22 : has_1jet           1 jet
+#  23 : has_2jet           >= 2 jets
+# new flags are appended, bits of existing flags must not change
+REGION_BITS = {
+    name: bit for bit, name in enumerate([
+        "is_os", "is_b_veto", "is_low_mt", "is_lep_1",
         "is_iso_1", "is_iso_2",
         "is_real_1", "is_real_2",
         "is_fake_1", "is_fake_2",
@@ -53,7 +70,65 @@ set_ak_column_i64 = functools.partial(set_ak_column, value_type=np.int64)
         "is_a1_3pr_0pi0_1", "is_a1_3pr_0pi0_2",
         "is_a1_3pr_1pi0_1", "is_a1_3pr_1pi0_2",
         "is_ipsig_0to1_1",
-        "has_0jet","has_1jet","has_2jet",
+        "has_0jet", "has_1jet", "has_2jet",
+    ])
+}
+
+
+def region_bits_mask(*names: str) -> np.uint32:
+    """
+    uint32 with the bits of the flags *names* set
+    """
+    mask = 0
+    for name in names:
+        mask |= 1 << REGION_BITS[name]
+    return np.uint32(mask)
+
+
+def encode_region_bits(flags: dict, n_events: int) -> np.ndarray:
+    """
+    Packs the event masks *flags* (flag name -> mask, missing values count as False) into uint32
+    region bits
+    """
+    bits = np.zeros(n_events, dtype=np.uint32)
+    for name, mask in flags.items():
+        mask = np.asarray(ak.to_numpy(ak.fill_none(mask, False)), dtype=bool)
+        bits |= mask.astype(np.uint32) << np.uint32(REGION_BITS[name])
+    return bits
+
+
+def decode_region_bits(bits: ak.Array, *names: str) -> dict[str, np.ndarray]:
+    """
+    Boolean event masks of the flags *names* (all flags if empty) from the region bits, the same
+    as the former boolean columns of build_abcd_masks
+    """
+    bits = np.asarray(ak.to_numpy(bits), dtype=np.uint32)
+    return {
+        name: (bits & region_bits_mask(name)) != 0
+        for name in (names or REGION_BITS)
+    }
+
+
+def region_bits_pass(bits: ak.Array, required=(), vetoed=()) -> np.ndarray:
+    """
+    Event mask of all flags *required* set and all flags *vetoed* unset, e.g. the same sign
+    iso-iso region: region_bits_pass(events.region_bits, ["is_iso_1", "is_iso_2"], ["is_os"])
+    """
+    bits = np.asarray(ak.to_numpy(bits), dtype=np.uint32)
+    required = region_bits_mask(*required)
+    return (bits & (required | region_bits_mask(*vetoed))) == required
+
+
+@producer(
+    uses={
+        "channel_id",
+        "hcand.*",
+        "Jet.pt", "bJet.pt",
+        IF_RUN2("MET.pt", "MET.phi"),
+        IF_RUN3("PuppiMET.pt", "PuppiMET.phi"),
+    },
+    produces={
+        "region_bits",
     },
     exposed=False,
 )
@@ -195,39 +270,36 @@ def build_abcd_masks(
     has_2jet = ak.num(events.Jet.pt, axis=1) >= 2
 
 
-    # set columns
-    events = set_ak_column(events, "is_os",     is_os)
-    events = set_ak_column(events, "is_iso_1",  is_iso_1)
-    events = set_ak_column(events, "is_iso_2",  is_iso_2)
-    events = set_ak_column(events, "is_real_1", is_real_1)
-    events = set_ak_column(events, "is_real_2", is_real_2)
-    # real and fake are the same for the data
-    events = set_ak_column(events, "is_fake_1", is_fake_1)
-    events = set_ak_column(events, "is_fake_2", is_fake_2)
-    # mt
-    events = set_ak_column(events, "is_low_mt", is_low_mt)
-    # bveto
-    events = set_ak_column(events, "is_b_veto", is_b_veto)
-    # for CP categories
-    events = set_ak_column(events, "is_lep_1",   is_lep_1)
-    events = set_ak_column(events, "is_pi_1",   is_pi_1)
-    events = set_ak_column(events, "is_pi_2",   is_pi_2)
-    events = set_ak_column(events, "is_rho_1",  is_rho_1)
-    events = set_ak_column(events, "is_rho_2",  is_rho_2)
-    events = set_ak_column(events, "is_a1_1pr_2pi0_1",  is_a1_1pr_2pi0_1)
-    events = set_ak_column(events, "is_a1_1pr_2pi0_2",  is_a1_1pr_2pi0_2)
-    events = set_ak_column(events, "is_a1_3pr_0pi0_1",  is_a1_3pr_0pi0_1)
-    events = set_ak_column(events, "is_a1_3pr_0pi0_2",  is_a1_3pr_0pi0_2)
-    events = set_ak_column(events, "is_a1_3pr_1pi0_1",  is_a1_3pr_1pi0_1)
-    events = set_ak_column(events, "is_a1_3pr_1pi0_2",  is_a1_3pr_1pi0_2)
-
-    events = set_ak_column(events, "is_ipsig_0to1_1", is_ipsig_0to1_1)
-
-    events = set_ak_column(events, "has_0jet", has_0jet)
-    events = set_ak_column(events, "has_1jet", has_1jet)
-    events = set_ak_column(events, "has_2jet", has_2jet)
-    
-    
-    
+    # set columns, all flags packed into the bits of one uint32 column, see REGION_BITS
+    flags = {
+        "is_os": is_os,
+        "is_b_veto": is_b_veto,
+        "is_low_mt": is_low_mt,
+        "is_lep_1": is_lep_1,
+        "is_iso_1": is_iso_1,
+        "is_iso_2": is_iso_2,
+        # real and fake are the same for the data
+        "is_real_1": is_real_1,
+        "is_real_2": is_real_2,
+        "is_fake_1": is_fake_1,
+        "is_fake_2": is_fake_2,
+        # for CP categories
+        "is_pi_1": is_pi_1,
+        "is_pi_2": is_pi_2,
+        "is_rho_1": is_rho_1,
+        "is_rho_2": is_rho_2,
+        "is_a1_1pr_2pi0_1": is_a1_1pr_2pi0_1,
+        "is_a1_1pr_2pi0_2": is_a1_1pr_2pi0_2,
+        "is_a1_3pr_0pi0_1": is_a1_3pr_0pi0_1,
+        "is_a1_3pr_0pi0_2": is_a1_3pr_0pi0_2,
+        "is_a1_3pr_1pi0_1": is_a1_3pr_1pi0_1,
+        "is_a1_3pr_1pi0_2": is_a1_3pr_1pi0_2,
+        "is_ipsig_0to1_1": is_ipsig_0to1_1,
+        "has_0jet": has_0jet,
+        "has_1jet": has_1jet,
+        "has_2jet": has_2jet,
+    }
+    events = set_ak_column(events, "region_bits", encode_region_bits(flags, len(events)), value_type=np.uint32)
+
     return events
 
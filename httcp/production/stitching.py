@@ -0,0 +1,148 @@
+# coding: utf-8
+
+"""
+Dense lookup index of the stitching process ids, shared by the DY and W process id producers.
+
+The (njets, pt) ranges of the leaf processes are compiled into sorted bin edges per variable and a
+small int64 table of process ids per elementary (njets, pt) cell, so that the lookup is two
+np.searchsorted and one fancy indexing, together with the outlier flags of the dataset's own process.
+
+  index = StitchingIndex.from_processes(self.dy_leaf_processes, process_inst, use_pt=True)
+  process_ids, njets_outliers, pt_outliers = index(njets, pt)
+"""
+
+from typing import Optional
+
+from columnflow.util import maybe_import
+
+np = maybe_import("numpy")
+ak = maybe_import("awkward")
+
+
+NJetsRange = tuple[int, int]
+PtRange = tuple[float, float]
+
+
+def _in_range(value, value_range) -> bool:
+    return value_range[0] <= value < value_range[1]
+
+
+class StitchingIndex:
+    """
+    Process id of the leaf process (id 0 if none) of each event from its number of jets and, if the
+    leaves are binned in it (*use_pt*), its pt (di-lepton pt of the LHE record). *leaves* is a list
+    of (njets_range, pt_range or None, process_id), ranges are [min, max).
+
+    Ids follow the bin keys of the former scipy.sparse lookup table: njets bin of the last njets
+    range (ordered by their lower edge) containing the value, pt bin of the last pt range of the
+    njets ranges containing the value, the id of the last leaf with that key.
+    *njets_range* / *pt_range* are the ranges of the process of the dataset, values outside are
+    flagged as outliers.
+    """
+
+    def __init__(
+        self,
+        leaves: list[tuple[NJetsRange, Optional[PtRange], int]],
+        njets_range: Optional[NJetsRange] = None,
+        pt_range: Optional[PtRange] = None,
+        use_pt: Optional[bool] = True,
+    ):
+        self.use_pt = use_pt
+
+        # njets ranges in order of their lower edge, each with its pt ranges in the same order,
+        # one njets range per leaf without pt binning
+        ranges: list[tuple[NJetsRange, list[PtRange]]] = []
+        grouped: dict[NJetsRange, list[PtRange]] = {}
+        for nj, pt, _ in leaves:
+            if not use_pt:
+                ranges.append((tuple(nj), []))
+            elif tuple(nj) not in grouped:
+                grouped[tuple(nj)] = []
+                ranges.append((tuple(nj), grouped[tuple(nj)]))
+            if use_pt and pt is not None:
+                grouped[tuple(nj)].append(tuple(pt))
+        self.ranges = [
+            (nj, sorted(pts, key=lambda pt: pt[0]))
+            for nj, pts in sorted(ranges, key=lambda r: r[0][0])
+        ]
+
+        # reference keys (njets bin, pt bin), 0 means no bin
+        table = {}
+        for nj, pt, process_id in leaves:
+            # pt of leaves without pt binning is -1, as float32 as the LHE values
+            table[self.key(nj[0], float(np.float32(pt[0] if pt is not None else -1)))] = process_id
+
+        # bin edges, elementary interval k is [edges[k - 1], edges[k]), 0 and len(edges) are outside
+        self.njets_edges = np.unique(np.array(
+            [e for nj, _ in self.ranges for e in nj] + list(njets_range or ()),
+            dtype=np.float64,
+        ))
+        self.pt_edges = np.unique(np.array(
+            [e for _, pts in self.ranges for pt in pts for e in pt] + list(pt_range or ()),
+            dtype=np.float64,
+        ))
+
+        # each interval is represented by its lower edge, -inf for the one below all edges
+        njets_reps = [-np.inf] + list(self.njets_edges)
+        pt_reps = [-np.inf] + list(self.pt_edges)
+        self.table = np.array(
+            [[table.get(self.key(nj, pt), 0) for pt in pt_reps] for nj in njets_reps],
+            dtype=np.int64,
+        )
+
+        # outlier flags per interval
+        self.njets_outliers = np.array(
+            [njets_range is not None and not _in_range(nj, njets_range) for nj in njets_reps],
+            dtype=bool,
+        )
+        self.pt_outliers = np.array(
+            [pt_range is not None and not _in_range(pt, pt_range) for pt in pt_reps],
+            dtype=bool,
+        )
+
+    @classmethod
+    def from_processes(
+        cls,
+        leaf_processes,
+        process_inst=None,
+        use_pt: Optional[bool] = True,
+    ) -> "StitchingIndex":
+        """
+        Index of the *leaf_processes* (njets and, with *use_pt*, ptll aux), with the outliers of
+        *process_inst*
+        """
+        leaves = [
+            (proc.x.njets, proc.x("ptll", None) if use_pt else None, proc.id)
+            for proc in leaf_processes
+        ]
+        njets_range = process_inst.x("njets", None) if process_inst is not None else None
+        pt_range = process_inst.x("ptll", None) if process_inst is not None and use_pt else None
+        return cls(leaves, njets_range, pt_range, use_pt)
+
+    def key(self, njets, pt) -> tuple[int, int]:
+        """
+        (njets bin, pt bin) of a single value, as the former key function
+        """
+        nj_bin, pt_bin = 0, 0
+        for i, (nj_range, pt_ranges) in enumerate(self.ranges, 1):
+            if _in_range(njets, nj_range):
+                nj_bin = i
+                for j, pt_range in enumerate(pt_ranges, 1):
+                    if _in_range(pt, pt_range):
+                        pt_bin = j
+        return nj_bin, (pt_bin if self.use_pt else 0)
+
+    def __call__(
+        self,
+        njets: ak.Array,
+        pt: Optional[ak.Array] = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Process ids and the njets and pt outlier masks of the events
+        """
+        nj_idx = np.searchsorted(self.njets_edges, np.asarray(njets), side="right")
+        pt_idx = (
+            np.zeros_like(nj_idx) if pt is None
+            else np.searchsorted(self.pt_edges, np.asarray(pt), side="right")
+        )
+        return self.table[nj_idx, pt_idx], self.njets_outliers[nj_idx], self.pt_outliers[pt_idx]
@@ -13,18 +13,14 @@ from columnflow.util import maybe_import, InsertableDict
 from columnflow.columnar_util import set_ak_column
 
 from httcp.util import transverse_mass, IF_RUN2, IF_RUN3, IF_DATASET_IS_DY,IF_DATASET_IS_W
+from httcp.production.stitching import StitchingIndex
 
 np = maybe_import("numpy")
 ak = maybe_import("awkward")
-sp = maybe_import("scipy")
-maybe_import("scipy.sparse")
 
 
 logger = law.logger.get_logger(__name__)
 
-NJetsRange = tuple[int, int]
-PtRange = tuple[float, float]
-
 set_ak_column_i64 = functools.partial(set_ak_column, value_type=np.int64)
 
 
@@ -57,26 +53,25 @@ def process_ids_w(self: Producer, events: ak.Array, **kwargs) -> ak.Array:
     #njets = events.LHE.NpNLO
     njets = events.LHE.Njets
 
-    outliers_mask = events.event < 0 # all False
+    # lookup the id and the outliers in one go
+    process_ids, njets_outliers, _ = self.stitching_index(njets)
+    outliers_mask = njets_outliers
+
     # raise a warning if a datasets was already created for a specific "bin" (leaf process),
     # but actually does not fit
-    njets_range = process_inst.x("njets", None)
-    if njets_range is not None:
-        outliers = (njets < njets_range[0]) | (njets >= njets_range[1])
-        outliers_mask = (outliers_mask | outliers)
-        if ak.any(outliers):
-            logger.warning(
-                f"dataset {self.dataset_inst.name} is meant to contain njet values in the range "
-                f"[{njets_range[0]}, {njets_range[0]}), but found {ak.sum(outliers)} events "
-                "outside this range",
-            )
-
-    # lookup the id and check for invalid values
-    process_ids = np.squeeze(np.asarray(self.id_table[self.key_func(njets)].todense()))
+    if njets_outliers.any():
+        njets_range = process_inst.x.njets
+        logger.warning(
+            f"dataset {self.dataset_inst.name} is meant to contain njet values in the range "
+            f"[{njets_range[0]}, {njets_range[1]}), but found {np.count_nonzero(njets_outliers)} events "
+            "outside this range",
+        )
+
+    # check for invalid values
     invalid_mask = process_ids == 0
-    if ak.any(invalid_mask):
+    if invalid_mask.any():
         raise ValueError(
-            f"found {sum(invalid_mask)} w events that could not be assigned to a process",
+            f"found {np.count_nonzero(invalid_mask)} w events that could not be assigned to a process",
         )
 
     # store them
@@ -92,47 +87,12 @@ def process_ids_w_setup(
     inputs: dict,
     reader_targets: InsertableDict,
 ) -> None:
-    # define stitching ranges for the DY datasets covered by this producer's dy_inclusive_dataset
-    stitching_ranges: list[NJetsRange] = []
-    for proc in self.w_leaf_processes:
-        logger.warning(f"proc : {proc}")
-        njets = proc.x.njets
-        stitching_ranges.append(njets)
-
-    # sort by the first element of the ptll range
-    sorted_stitching_ranges: list[NJetsRange] = [
-        nj_range for nj_range in sorted(stitching_ranges, key=lambda nj_range: nj_range[0])
-    ]
-
-    # define a key function that maps njets and pt to a unique key for use in a lookup table
-    def key_func(njets):
-        # potentially convert single values into arrays
-        single = False
-        if isinstance(njets, int):
-            njets = np.array([njets], dtype=np.int32)
-            single = True
-
-        # map into bins (index 0 means no binning)
-        nj_bins = np.zeros(len(njets), dtype=np.int32)
-        for nj_bin, nj_range in enumerate(sorted_stitching_ranges, 1):
-            # nj_bin
-            nj_mask = (nj_range[0] <= njets) & (njets < nj_range[1])
-            nj_bins[nj_mask] = nj_bin
-
-        return nj_bins[0] if single else nj_bins
-
-    self.key_func = key_func
-
-    # define the lookup table
-    max_nj_bin = len(sorted_stitching_ranges)
-
-    self.id_table = sp.sparse.lil_matrix((max_nj_bin + 1,1), dtype=np.int64)
-
-    # fill it
-    for proc in self.w_leaf_processes:
-        key = key_func(proc.x.njets[0])
-        self.id_table[key] = proc.id
-    logger.info(f"id_table : \n{self.id_table}")
+    # dense (njets) lookup of the w leaf process ids, with the outliers of the dataset's process
+    self.stitching_index = StitchingIndex.from_processes(
+        self.w_leaf_processes,
+        self.dataset_inst.processes.get_first(),
+        use_pt=False,
+    )
 
 
 # ################################## #
@@ -162,26 +122,25 @@ def process_ids_dy(self: Producer, events: ak.Array, **kwargs) -> ak.Array:
     # get the number of nlo jets and the di-lepton pt
     njets = events.LHE.Njets
 
-    outliers_mask = events.event < 0 # all False
+    # lookup the id and the outliers in one go
+    process_ids, njets_outliers, _ = self.stitching_index(njets)
+    outliers_mask = njets_outliers
+
     # raise a warning if a datasets was already created for a specific "bin" (leaf process),
     # but actually does not fit
-    njets_range = process_inst.x("njets", None)
-    if njets_range is not None:
-        outliers = (njets < njets_range[0]) | (njets >= njets_range[1])
-        outliers_mask = (outliers_mask | outliers)
-        if ak.any(outliers):
-            logger.warning(
-                f"dataset {self.dataset_inst.name} is meant to contain njet values in the range "
-                f"[{njets_range[0]}, {njets_range[0]}), but found {ak.sum(outliers)} events "
-                "outside this range",
-            )
-
-    # lookup the id and check for invalid values
-    process_ids = np.squeeze(np.asarray(self.id_table[self.key_func(njets)].todense()))
+    if njets_outliers.any():
+        njets_range = process_inst.x.njets
+        logger.warning(
+            f"dataset {self.dataset_inst.name} is meant to contain njet values in the range "
+            f"[{njets_range[0]}, {njets_range[1]}), but found {np.count_nonzero(njets_outliers)} events "
+            "outside this range",
+        )
+
+    # check for invalid values
     invalid_mask = process_ids == 0
-    if ak.any(invalid_mask):
+    if invalid_mask.any():
         raise ValueError(
-            f"found {sum(invalid_mask)} dy events that could not be assigned to a process",
+            f"found {np.count_nonzero(invalid_mask)} dy events that could not be assigned to a process",
         )
 
     # store them
@@ -197,44 +156,9 @@ def process_ids_dy_setup(
     inputs: dict,
     reader_targets: InsertableDict,
 ) -> None:
-    # define stitching ranges for the DY datasets covered by this producer's dy_inclusive_dataset
-    stitching_ranges: list[NJetsRange] = []
-    for proc in self.dy_leaf_processes:
-        logger.warning(f"proc : {proc}")
-        njets = proc.x.njets
-        stitching_ranges.append(njets)
-
-    # sort by the first element of the ptll range
-    sorted_stitching_ranges: list[NJetsRange] = [
-        nj_range for nj_range in sorted(stitching_ranges, key=lambda nj_range: nj_range[0])
-    ]
-
-    # define a key function that maps njets and pt to a unique key for use in a lookup table
-    def key_func(njets):
-        # potentially convert single values into arrays
-        single = False
-        if isinstance(njets, int):
-            njets = np.array([njets], dtype=np.int32)
-            single = True
-
-        # map into bins (index 0 means no binning)
-        nj_bins = np.zeros(len(njets), dtype=np.int32)
-        for nj_bin, nj_range in enumerate(sorted_stitching_ranges, 1):
-            # nj_bin
-            nj_mask = (nj_range[0] <= njets) & (njets < nj_range[1])
-            nj_bins[nj_mask] = nj_bin
-
-        return nj_bins[0] if single else nj_bins
-
-    self.key_func = key_func
-
-    # define the lookup table
-    max_nj_bin = len(sorted_stitching_ranges)
-
-    self.id_table = sp.sparse.lil_matrix((max_nj_bin + 1,1), dtype=np.int64)
-
-    # fill it
-    for proc in self.dy_leaf_processes:
-        key = key_func(proc.x.njets[0])
-        self.id_table[key] = proc.id
-    #logger.info(f"id_table : \n{self.id_table}")
+    # dense (njets) lookup of the dy leaf process ids, with the outliers of the dataset's process
+    self.stitching_index = StitchingIndex.from_processes(
+        self.dy_leaf_processes,
+        self.dataset_inst.processes.get_first(),
+        use_pt=False,
+    )
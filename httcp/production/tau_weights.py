@@ -9,6 +9,7 @@ from columnflow.columnar_util import optional_column as optional
 from columnflow.util import maybe_import, safe_div, InsertableDict
 
 from httcp.util import get_trigger_id_map
+from httcp.corrections import load_correction_set, get_correction
 
 ak     = maybe_import("awkward")
 np     = maybe_import("numpy")
@@ -167,6 +168,23 @@ def tau_weights(self: Producer, events: ak.Array, do_syst: bool, **kwargs) -> ak
     trig_eff_eval_args = lambda mask, type, discr, node, syst: (pt[mask], dm[mask], type, discr, node, syst)
 
 
+    # partition of the flat tau buffer by channel, done once per chunk; each corrector is then
+    # evaluated once per (channel, shift) on the taus of that channel only and the results are
+    # scattered back by index, instead of evaluating all channel WPs on all taus and picking
+    # with ak.where (taus of events in other channels get the tautau WPs, as before)
+    channel_partition = {
+        "etau"   : channel_id_flat == ch_etau.id,
+        "mutau"  : channel_id_flat == ch_mutau.id,
+    }
+    channel_partition["tautau"] = ~(channel_partition["etau"] | channel_partition["mutau"])
+
+    def evaluate_per_channel(sf, mask, corrector, get_args):
+        for channel, channel_mask in channel_partition.items():
+            idx = np.flatnonzero(mask & channel_mask)
+            if len(idx) > 0:
+                sf[idx] = corrector.evaluate(*get_args(idx, channel))
+
+
     shifts = ["nom"]
     if  do_syst:
         shifts=[*shifts,"up", "down"]
@@ -210,26 +228,20 @@ def tau_weights(self: Producer, events: ak.Array, do_syst: bool, **kwargs) -> ak
         if self.config_inst.campaign.x.run == 3:
             e_mask = e_mask & (events.Tau.decayModeHPS != 5) & (events.Tau.decayModeHPS != 6)
         e_mask = flat_np_view(e_mask, axis=1)
-        ch_id_e_mask = channel_id_flat[e_mask]
-        sf_values[the_shift][e_mask] = ak.where(ch_id_e_mask == ch_etau.id,
-                                                self.id_vs_e_corrector.evaluate(*args_vs_e(e_mask, wp_config["vs_e"]["etau"], the_shift)),
-                                                ak.where(ch_id_e_mask == ch_mutau.id,
-                                                         self.id_vs_e_corrector.evaluate(*args_vs_e(e_mask, wp_config["vs_e"]["mutau"], the_shift)),
-                                                         self.id_vs_e_corrector.evaluate(*args_vs_e(e_mask, wp_config["vs_e"]["tautau"], the_shift))))
-
-        if do_syst:
+        evaluate_per_channel(sf_values[the_shift], e_mask, self.id_vs_e_corrector,
+                             lambda idx, ch: args_vs_e(idx, wp_config["vs_e"][ch], the_shift))
+
+        if do_syst and the_shift != "nom":
             # --->>> electron fakes -> split into 2 eta regions [up/down only]
+            # single and cross triggered taus use the same WP: one evaluation for all regions
+            e_trig_mask = e_mask & (single_e_triggered | (cross_e_triggered & ~single_e_triggered))
+            sf_e_trig = sf_nom.copy()
+            sf_e_trig[e_trig_mask] = self.id_vs_e_corrector.evaluate(*args_vs_e(e_trig_mask, wp_config["vs_e"]["etau"], the_shift))
             for region, region_mask in [
                     ("barrel", (abseta < 1.5)),
                     ("endcap", (abseta >= 1.5)),
             ]:
-                if the_shift == "nom": continue
-                sf_values_e[the_shift] = sf_nom.copy()
-                e_single_region_mask = e_mask & single_e_triggered & region_mask
-                e_cross_region_mask = e_mask & cross_e_triggered & ~single_e_triggered & region_mask
-                
-                sf_values_e[the_shift][e_single_region_mask] = self.id_vs_e_corrector.evaluate(*args_vs_e(e_single_region_mask, wp_config["vs_e"]["etau"], the_shift))
-                sf_values_e[the_shift][e_cross_region_mask] = self.id_vs_e_corrector.evaluate(*args_vs_e(e_cross_region_mask, wp_config["vs_e"]["etau"], the_shift))
+                sf_values_e[the_shift] = np.where(region_mask, sf_e_trig, sf_nom)
                 
                 wt_name = f"tau_weight_e_{region}" if the_shift == "nom" else f"tau_weight_e_{region}_{the_shift}"
                 events = set_ak_column(events, wt_name, reduce_mul(sf_values_e[the_shift]), value_type=np.float32)
@@ -247,15 +259,14 @@ def tau_weights(self: Producer, events: ak.Array, do_syst: bool, **kwargs) -> ak
         
         mu_mask = ((events.Tau.genPartFlav == tau_part_flav["prompt_mu"]) | (events.Tau.genPartFlav == tau_part_flav["tau->mu"]))
         mu_mask = flat_np_view(mu_mask, axis=1)
-        ch_id_mu_mask = channel_id_flat[mu_mask]
-        sf_values[the_shift][mu_mask] = ak.where(ch_id_mu_mask == ch_etau.id,
-                                                 self.id_vs_mu_corrector.evaluate(*args_vs_mu(mu_mask, wp_config["vs_m"]["etau"], the_shift)),
-                                                 ak.where(ch_id_mu_mask == ch_mutau.id,
-                                                          self.id_vs_mu_corrector.evaluate(*args_vs_mu(mu_mask, wp_config["vs_m"]["mutau"], the_shift)),
-                                                          self.id_vs_mu_corrector.evaluate(*args_vs_mu(mu_mask, wp_config["vs_m"]["tautau"], the_shift))))
-
-        if do_syst:
+        evaluate_per_channel(sf_values[the_shift], mu_mask, self.id_vs_mu_corrector,
+                             lambda idx, ch: args_vs_mu(idx, wp_config["vs_m"][ch], the_shift))
+
+        if do_syst and the_shift != "nom":
             # --->>> muon fakes -> split into 5 eta regions [up/down]
+            mu_trig_mask = mu_mask & (single_mu_triggered | (cross_mu_triggered & ~single_mu_triggered))
+            sf_mu_trig = sf_nom.copy()
+            sf_mu_trig[mu_trig_mask] = self.id_vs_mu_corrector.evaluate(*args_vs_mu(mu_trig_mask, wp_config["vs_m"]["etau"], the_shift))
             for region, region_mask in [
                     ("0p0To0p4", (abseta < 0.4)),
                     ("0p4To0p8", ((abseta >= 0.4) & (abseta < 0.8))),
@@ -263,14 +274,9 @@ def tau_weights(self: Producer, events: ak.Array, do_syst: bool, **kwargs) -> ak
                     ("1p2To1p7", ((abseta >= 1.2) & (abseta < 1.7))),
                     ("1p7To2p3", (abseta >= 1.7)),
             ]:
-                if the_shift == "nom": continue
-                sf_values_mu[the_shift] = sf_nom.copy()
-                mu_single_region_mask = mu_mask & single_mu_triggered & region_mask
-                mu_cross_region_mask = mu_mask & cross_mu_triggered & ~single_mu_triggered & region_mask
-                
-                sf_values_mu[the_shift][mu_single_region_mask] = self.id_vs_mu_corrector.evaluate(*args_vs_mu(mu_single_region_mask, wp_config["vs_m"]["etau"], the_shift))
-                sf_values_mu[the_shift][mu_cross_region_mask] = self.id_vs_mu_corrector.evaluate(*args_vs_mu(mu_cross_region_mask, wp_config["vs_m"]["etau"], the_shift))
+                sf_values_mu[the_shift] = np.where(region_mask, sf_mu_trig, sf_nom)
                 
+                # FIXME: filled from sf_values_e (last e region), kept as is, sf_values_mu is not used
                 wt_name = f"tau_weight_mu_{region}" if the_shift == "nom" else f"tau_weight_mu_{region}_{the_shift}"
                 events = set_ak_column(events, wt_name, reduce_mul(sf_values_e[the_shift]), value_type=np.float32)
                 
@@ -286,43 +292,15 @@ def tau_weights(self: Producer, events: ak.Array, do_syst: bool, **kwargs) -> ak
         ##############################################################
         tau_mask = dm_mask & (events.Tau.genPartFlav == tau_part_flav["tau_had"])
         tau_mask = flat_np_view(tau_mask, axis=1)
-        ch_id_tau_mask = channel_id_flat[tau_mask]
-        sf_values[the_shift][tau_mask] = ak.where(ch_id_tau_mask == ch_etau.id,
-                                                  self.id_vs_jet_corrector.evaluate(*args_vs_jet(tau_mask,
-                                                                                                 wp_config["vs_j"]["etau"],
-                                                                                                 wp_config["vs_e"]["etau"],
-                                                                                                 the_shift)),
-                                                  ak.where(ch_id_tau_mask == ch_mutau.id,
-                                                           self.id_vs_jet_corrector.evaluate(*args_vs_jet(tau_mask,
-                                                                                                          wp_config["vs_j"]["mutau"],
-                                                                                                          wp_config["vs_e"]["mutau"],
-                                                                                                          the_shift)),
-                                                           self.id_vs_jet_corrector.evaluate(*args_vs_jet(tau_mask,
-                                                                                                          wp_config["vs_j"]["tautau"],
-                                                                                                          wp_config["vs_e"]["tautau"],
-                                                                                                          the_shift))))
-
-        if do_syst:
+        evaluate_per_channel(sf_values[the_shift], tau_mask, self.id_vs_jet_corrector,
+                             lambda idx, ch: args_vs_jet(idx, wp_config["vs_j"][ch], wp_config["vs_e"][ch], the_shift))
+
+        if do_syst and the_shift != "nom":
             # --->>> genuine taus for DM 0, 1, 10 [only up/down variations]
+            # same inputs, WPs and shift as above, so the values are taken from sf_values
             for idm in [0, 1, 10]:
-                if the_shift == "nom": continue
-                sf_values_dm[the_shift] = sf_nom.copy()
                 tau_dmX_mask = tau_mask & (dm == idm)
-                ch_id_tau_dmX_mask = channel_id_flat[tau_dmX_mask]
-                sf_values_dm[the_shift][tau_dmX_mask] = ak.where(ch_id_tau_dmX_mask == ch_etau.id,
-                                                                 self.id_vs_jet_corrector.evaluate(*args_vs_jet(tau_dmX_mask,
-                                                                                                                wp_config["vs_j"]["etau"],
-                                                                                                                wp_config["vs_e"]["etau"],
-                                                                                                                the_shift)),
-                                                                 ak.where(ch_id_tau_dmX_mask == ch_mutau.id,
-                                                                          self.id_vs_jet_corrector.evaluate(*args_vs_jet(tau_dmX_mask,
-                                                                                                                         wp_config["vs_j"]["mutau"],
-                                                                                                                         wp_config["vs_e"]["mutau"],
-                                                                                                                         the_shift)),
-                                                                          self.id_vs_jet_corrector.evaluate(*args_vs_jet(tau_dmX_mask,
-                                                                                                                         wp_config["vs_j"]["tautau"],
-                                                                                                                         wp_config["vs_e"]["tautau"],
-                                                                                                                         the_shift))))
+                sf_values_dm[the_shift] = np.where(tau_dmX_mask, sf_values[the_shift], sf_nom)
                 
                 wt_name = f"tau_weight_jet_dm{idm}" if the_shift == "nom" else f"tau_weight_jet_dm{idm}_{the_shift}"
                 events = set_ak_column(events, wt_name, reduce_mul(sf_values_dm[the_shift]), value_type=np.float32)
@@ -435,12 +413,8 @@ def tau_weights_requires(self: Producer, reqs: dict) -> None:
 def tau_weights_setup(self: Producer, reqs: dict, inputs: dict, reader_targets: InsertableDict) -> None:
     bundle = reqs["external_files"]
 
-    # create the trigger and id correctors
-    import correctionlib
-    correctionlib.highlevel.Correction.__call__ = correctionlib.highlevel.Correction.evaluate
-    correction_set = correctionlib.CorrectionSet.from_string(
-        self.get_tau_file(bundle.files).load(formatter="gzip").decode("utf-8"),
-    )
+    # create the trigger and id correctors, the tau file is shared with tau_energy_scale
+    correction_set = load_correction_set(self.get_tau_file(bundle.files))
     tagger_name = self.get_tau_tagger()
     # id
     self.id_vs_jet_corrector = correction_set[f"{tagger_name}VSjet"]
@@ -449,10 +423,7 @@ def tau_weights_setup(self: Producer, reqs: dict, inputs: dict, reader_targets:
     # trigger
     self.trig_corrector = correction_set["tau_trigger"]
 
-    correction_set_jetleg = correctionlib.CorrectionSet.from_file(
-        self.get_jetleg_file(bundle.files),
-    )
-    self.trig_jetleg_corrector = correction_set_jetleg["jetlegSFs"]
+    self.trig_jetleg_corrector = get_correction(self.get_jetleg_file(bundle.files), "jetlegSFs")
 
     # check versions
     assert self.id_vs_jet_corrector.version in (0, 1, 2, 3)
@@ -34,11 +34,10 @@ def get_event_level_eff(events, results):
                             tablefmt="pretty")
     logger.info(f"---> Efficiencies of individual selections: \n{indiv_table_}")
 
-    comb_selections_ = np.array(comb_selections_)
-    comb_selections_counts_ = comb_selections_[:,1]
-    comb_den_ = np.array([init] + comb_selections_counts_[:-1].tolist())
-    rel_eff_ = np.round(np.asarray(comb_selections_counts_, float)/np.asarray(comb_den_, float), decimals=3)
-    comb_selections_ = np.concatenate([comb_selections_, rel_eff_[:,None]], axis=1).tolist()
+    comb_selections_counts_ = np.array([row[1] for row in comb_selections_], dtype=float)
+    comb_den_ = np.concatenate([[init], comb_selections_counts_[:-1]])
+    rel_eff_ = np.round(comb_selections_counts_/comb_den_, decimals=3)
+    comb_selections_ = [row + [eff] for row, eff in zip(comb_selections_, rel_eff_)]
     comb_table_ = tabulate(comb_selections_,
                            comb_headers_,
                            tablefmt="pretty")
@@ -101,7 +100,6 @@ def debug_main(events, results, triggers, **kwargs):
     
     from tabulate import tabulate        
     # trigger details
-    trigger_names = results.aux["trigger_names"]
     trigger_ids   = results.aux["trigger_ids"]
     
     #HLT_names = [trigger.name for trigger in self.config_inst.x.triggers]
@@ -0,0 +1,203 @@
+# coding: utf-8
+
+"""
+Generic lepton pair builder behind the etau, mutau and tautau selections:
+channel specific tau id requirements, pair preselection, pair ranking, trigger object matching
+and the choice of the best matched pair
+"""
+
+from typing import Optional
+from columnflow.selection import Selector, SelectionResult
+from columnflow.util import maybe_import
+
+from httcp.util import trigger_object_matching_sparse
+from httcp.selection.trigger import TRIGGER_TYPE_CODES, trigger_type_mask, trigger_type_bits
+
+np = maybe_import("numpy")
+ak = maybe_import("awkward")
+
+
+def channel_taus(
+        self: Selector,
+        taus: ak.Array,
+        channel: str,
+) -> ak.Array:
+    """
+    *taus* passing the vs e and vs mu working points of *channel*, with the channel specific
+    pt and mass (pt_{channel}, mass_{channel} from the tau energy scale) as pt and mass on MC
+    """
+    tau_tagger      = self.config_inst.x.deep_tau_tagger
+    tau_tagger_wps  = self.config_inst.x.deep_tau_info[tau_tagger].wp
+    vs_e_wp         = self.config_inst.x.deep_tau_info[tau_tagger].vs_e[channel]
+    vs_mu_wp        = self.config_inst.x.deep_tau_info[tau_tagger].vs_m[channel]
+
+    is_good_tau     = (
+        (taus.idDeepTau2018v2p5VSe   >= tau_tagger_wps.vs_e[vs_e_wp])
+        & (taus.idDeepTau2018v2p5VSmu  >= tau_tagger_wps.vs_m[vs_mu_wp])
+    )
+    taus = taus[is_good_tau]
+
+    if self.dataset_inst.is_mc:
+        taus = ak.without_field(taus, "pt")
+        taus = ak.with_field(taus, taus[f"pt_{channel}"], "pt")
+        taus = ak.without_field(taus, "mass")
+        taus = ak.with_field(taus, taus[f"mass_{channel}"], "mass")
+
+    return taus
+
+
+def pair_ranks(
+        pairs: ak.Array,
+        sort_keys: list[tuple[str, str, bool]],
+) -> ak.Array:
+    """
+    Rank of each pair within its event (0: best) in the lexicographic order of *sort_keys*,
+    (leg, field, ascending) with the leading key first, e.g. iso1, pt1, iso2, pt2.
+    One stable np.lexsort over the flat pair buffer with the event index as most significant key,
+    so exact ties keep the pair order.
+    """
+    counts = ak.to_numpy(ak.num(pairs, axis=1))
+    starts = np.cumsum(counts) - counts
+    keys = []
+    for leg, field, ascending in reversed(sort_keys):
+        values = ak.to_numpy(ak.flatten(pairs[leg][field], axis=1)).astype(np.float64)
+        keys.append(values if ascending else -values)
+    keys.append(np.repeat(np.arange(len(counts)), counts))
+    order = np.lexsort(keys)
+
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - np.repeat(starts, counts)
+    return ak.unflatten(ranks, counts)
+
+
+def best_pair(
+        pairs: ak.Array,
+        ranks: ak.Array,
+        mask: ak.Array,
+) -> ak.Array:
+    """
+    The pair of lowest rank among the ones passing *mask*, as a list of one or zero pairs per event
+    """
+    best = ak.argmin(ak.where(mask, ranks, np.iinfo(np.int64).max), axis=1, keepdims=True)
+    is_best = ak.fill_none((ak.local_index(ranks, axis=1) == best) & mask, False)
+    return pairs[is_best]
+
+
+def match_trigobjs(
+        pairs: ak.Array,
+        trigger_results: SelectionResult,
+        single_types: tuple[str, ...] = (),
+        cross_types: tuple[str, ...] = (),
+        symmetric: Optional[bool] = False,
+) -> tuple[ak.Array, ak.Array, np.ndarray]:
+    """
+    Trigger object matching of all *pairs* to the fired triggers of *single_types* (first leg only)
+    and *cross_types* (first leg to leg 1 and second leg to leg 2, or also swapped if *symmetric*).
+
+    Without *symmetric* (e/mu + tau): a pair matches if its first leg matches the first fired single
+    trigger, or, if no pair of the event does, if both legs match the first fired cross trigger.
+    The trigger ids and types are those of all fired triggers of the channel (single ones first)
+    in events with at least one pair.
+    With *symmetric* (tau + tau): a pair matches if it matches any of the fired cross triggers,
+    the trigger ids and types are kept in events with at least one matched pair only.
+
+    Returns the per pair match mask, the trigger ids and the trigger type bits.
+    """
+    # extract the trigger names, types & others from trigger_results.x (aux)
+    trigger_ids           = trigger_results.x.trigger_ids
+    trigger_types         = trigger_results.x.trigger_types
+    leg1_minpt            = trigger_results.x.leg1_minpt
+    leg2_minpt            = trigger_results.x.leg2_minpt
+    leg1_maxeta           = trigger_results.x.leg1_maxeta
+    leg2_maxeta           = trigger_results.x.leg2_maxeta
+    leg1_matched_trigobjs = trigger_results.x.leg1_matched_trigobjs
+    leg2_matched_trigobjs = trigger_results.x.leg2_matched_trigobjs
+
+    def of_types(types):
+        is_type = trigger_types < 0
+        for t in types:
+            is_type = is_type | (trigger_types == TRIGGER_TYPE_CODES[t])
+        return is_type
+
+    # event level: any trigger of the channel fired, from the trigger type bits
+    has_triggers_evt_level = (trigger_results.x.trigger_type_bits & trigger_type_mask(*single_types, *cross_types)) != 0
+    has_pairs = ak.fill_none(ak.num(pairs, axis=1) > 0, False) & has_triggers_evt_level
+    lep1, lep2 = pairs["0"], pairs["1"]
+
+    def match_legs(leps, trig_mask, leg):
+        # pairs * triggers of trig_mask
+        minpt, maxeta, trigobjs = (
+            (leg1_minpt, leg1_maxeta, leg1_matched_trigobjs) if leg == 1
+            else (leg2_minpt, leg2_maxeta, leg2_matched_trigobjs)
+        )
+        return trigger_object_matching_sparse(leps, trigobjs[trig_mask], minpt[trig_mask], maxeta[trig_mask], True)
+
+    if symmetric:
+        # triggers of the channel in events with pairs
+        trig_mask = of_types(cross_types) & has_pairs
+        pass_legs = (
+            (match_legs(lep1, trig_mask, 1) & match_legs(lep2, trig_mask, 2))
+            | (match_legs(lep1, trig_mask, 2) & match_legs(lep2, trig_mask, 1))
+        )
+        matched = ak.fill_none(ak.any(pass_legs, axis=-1), False)
+        keep = ak.any(matched, axis=1)
+        ids = trigger_ids[trig_mask]
+        types = trigger_types[trig_mask]
+        # ids and types only where a pair matched
+        ids = ids[ak.broadcast_arrays(keep, ids)[0]]
+        types = types[ak.broadcast_arrays(keep, types)[0]]
+    else:
+        single_mask = of_types(single_types) & has_pairs
+        cross_mask = of_types(cross_types) & has_pairs
+        # the first fired trigger of each kind decides
+        single_matched = ak.fill_none(ak.firsts(match_legs(lep1, single_mask, 1), axis=-1), False)
+        cross_matched = ak.fill_none(ak.firsts(
+            match_legs(lep1, cross_mask, 1) & match_legs(lep2, cross_mask, 2),
+            axis=-1,
+        ), False)
+        matched = ak.where(ak.any(single_matched, axis=1), single_matched, cross_matched)
+        ids = ak.concatenate([trigger_ids[single_mask], trigger_ids[cross_mask]], axis=1)
+        types = ak.concatenate([trigger_types[single_mask], trigger_types[cross_mask]], axis=1)
+
+    return matched, ak.values_astype(ids, "int64"), trigger_type_bits(types)
+
+
+def build_lepton_pair(
+        channel: str,
+        pairs: ak.Array,
+        preselection: dict[str, ak.Array],
+        sort_keys: list[tuple[str, str, bool]],
+        trigger_results: SelectionResult,
+        single_types: tuple[str, ...] = (),
+        cross_types: tuple[str, ...] = (),
+        symmetric: Optional[bool] = False,
+) -> tuple[SelectionResult, ak.Array, ak.Array, np.ndarray]:
+    """
+    Best trigger matched pair of *pairs* (events * pairs * ("0", "1")) of *channel* passing all
+    *preselection* cuts (per pair masks, in order), best in the order of *sort_keys*, see pair_ranks.
+    Returns the per pair selection steps as aux, the pair as a list [leg1, leg2] (empty without
+    matched pair), the trigger ids and the trigger type bits, see match_trigobjs.
+    """
+    good_pair_mask = pairs["0"].rawIdx >= 0
+    pair_selection_steps = {}
+    pair_selection_steps[f"{channel}_starts_with"] = good_pair_mask
+    for cut in preselection.keys():
+        good_pair_mask = good_pair_mask & preselection[cut]
+        pair_selection_steps[cut] = good_pair_mask
+
+    good_pair_mask = ak.fill_none(good_pair_mask, False)
+    pairs = pairs[good_pair_mask]
+    pair_selection_steps[f"{channel}_before_trigger_matching"] = pairs["0"].pt >= 0.0
+
+    # rank all pairs in one go, the trigger matching does not depend on the order
+    ranks = pair_ranks(pairs, sort_keys)
+    matched, trigIds, trigTypeBits = match_trigobjs(pairs, trigger_results, single_types, cross_types, symmetric)
+    pair_selection_steps[f"{channel}_after_trigger_matching"] = pairs["0"].pt[matched] >= 0.0
+
+    lep1, lep2 = ak.unzip(best_pair(pairs, ranks, matched))
+    # rebuild the pair with the best one only
+    leps_pair = ak.concatenate([lep1, lep2], axis=1)
+
+    return SelectionResult(
+        aux = pair_selection_steps,
+    ), leps_pair, trigIds, trigTypeBits
@@ -4,6 +4,8 @@
 Exemplary selection methods.
 """
 
+import time
+
 import law
 
 from typing import Optional
@@ -23,10 +25,10 @@ from columnflow.production.util import attach_coffea_behavior
 
 from columnflow.util import maybe_import
 from columnflow.columnar_util import optional_column as optional
-from columnflow.columnar_util import EMPTY_FLOAT, Route, set_ak_column
+from columnflow.columnar_util import EMPTY_FLOAT, Route, set_ak_column, has_ak_column
 
 from httcp.selection.physics_objects import *
-from httcp.selection.trigger import trigger_selection
+from httcp.selection.trigger import trigger_selection, trigger_type_mask
 from httcp.selection.lepton_pair_etau import etau_selection
 from httcp.selection.lepton_pair_mutau import mutau_selection
 from httcp.selection.lepton_pair_tautau import tautau_selection
@@ -44,6 +46,7 @@ from httcp.production.extra_weights import scale_mc_weight
 from httcp.production.dilepton_features import hcand_mass, mT, rel_charge #TODO: rename mutau_vars -> dilepton_vars
 
 from httcp.util import filter_by_triggers, get_objs_p4, trigger_object_matching_deep, IF_DATASET_IS_DY, IF_DATASET_IS_W, IF_DATASET_IS_SIGNAL
+from httcp.util import take_events, scatter_events, timing_metric
 
 from httcp.selection.debug import debug_main
 
@@ -113,115 +116,17 @@ def get_2n_pairs(etau_indices_pair,
     return has_at_least_one_pair    
 
     
-# exposed selectors
-# (those that can be invoked from the command line)
-@selector(
-    uses={
-        "event",
-        # selectors / producers called within _this_ selector
-        attach_coffea_behavior,
-        json_filter, 
-        met_filters, 
-        scale_mc_weight, 
-        process_ids,
-        trigger_selection,
-        IF_DATASET_IS_DY(genZ_selection),
-        muon_selection, 
-        electron_selection, 
-        tau_selection, 
-        jet_selection,
-        etau_selection, 
-        mutau_selection, 
-        tautau_selection, 
-        get_categories,
-        extra_lepton_veto, 
-        double_lepton_veto, 
-        match_trigobj,
-        increment_stats, 
-        custom_increment_stats,
-        higgscand,
-        gentau_selection,
-        higgscandprod,
-        rel_charge,
-        #category_ids,
-        #build_abcd_masks,
-    },
-    produces={
-        # selectors / producers whose newly created columns should be kept
-        scale_mc_weight, 
-        trigger_selection,
-        IF_DATASET_IS_DY(genZ_selection),
-        muon_selection, 
-        electron_selection, 
-        tau_selection, 
-        jet_selection,
-        etau_selection, 
-        mutau_selection, 
-        tautau_selection, 
-        get_categories, 
-        process_ids,
-        extra_lepton_veto, 
-        double_lepton_veto, 
-        match_trigobj,
-        higgscandprod,
-        gentau_selection,
-        rel_charge,
-        #category_ids,
-        increment_stats, 
-        custom_increment_stats,
-        #"trigger_ids",
-        "single_triggered",
-        "cross_triggered",
-        "single_e_triggered",
-        "single_mu_triggered",
-        "cross_e_triggered",
-        "cross_mu_triggered",
-        "cross_tau_triggered",
-        "cross_tau_jet_triggered",
-        #build_abcd_masks,
-    },
-    exposed=True,
-)
-def main(
+def object_selection(
     self: Selector,
     events: ak.Array,
-    stats: defaultdict,
+    results: SelectionResult,
+    trigger_results: SelectionResult,
     **kwargs,
 ) -> tuple[ak.Array, SelectionResult]:
-    
-    # ensure coffea behaviors are loaded
-    events = self[attach_coffea_behavior](events, **kwargs)
-
-    # prepare the selection results that are updated at every step
-    results = SelectionResult()
-
-    # add the mc weight --> need to move to calibration main?
-    if self.dataset_inst.is_mc:
-        events = self[scale_mc_weight](events, **kwargs)
-
-    ##################################### NEW ######################################
-    results += SelectionResult(steps={"starts_with": np.ones(len(events), dtype=bool)})
-    ##################################### NEW ######################################
-        
-    # filter bad data events according to golden lumi mask
-    if self.dataset_inst.is_data:
-        events, json_filter_results = self[json_filter](events, **kwargs)
-        results += json_filter_results
-    else:
-        results += SelectionResult(steps={"json": np.ones(len(events), dtype=bool)})
-
-    # met filter selection
-    events, met_filter_results = self[met_filters](events, **kwargs)
-    results += met_filter_results
-
-    # trigger selection
-    events, trigger_results = self[trigger_selection](events, **kwargs)
-    results += trigger_results
-
-    # Get genZ collection for Zpt reweighting
-    if self.dataset_inst.has_tag("is_dy"):
-        events = self[genZ_selection](events, **kwargs)
-        
+    """
+    Object, pair and higgs candidate stages of the main selector, called with the main selector as
+    *self*, either on all events or on the events passing the prefilter (staged mode)
+    """
     # electron selection
     # e.g. ele_idx: [ [], [0,1], [], [], [1,2] ] 
     events, ele_results, good_ele_indices, veto_ele_indices, dlveto_ele_indices = self[electron_selection](events,
@@ -239,7 +144,7 @@ def main(
 
 
     # tau selection
-    # three times for three channels
+    # all three channels at once on MC
     # e.g. tau_idx: [ [1], [0,1], [1,2], [], [0,1] ]
     good_tau_indices = None
     good_tau_indices_mutau = None
@@ -247,10 +152,15 @@ def main(
     good_tau_indices_tautau= None
 
     if self.dataset_inst.is_mc:
-        events, tau_results, good_tau_indices_mutau = self[tau_selection](events, "mutau",  call_force=True, **kwargs)
+        # one pass, only the pt ordering is channel specific
+        events, tau_results, good_tau_indices_ch = self[tau_selection](events,
+                                                                       ("mutau", "etau", "tautau"),
+                                                                       call_force=True,
+                                                                       **kwargs)
         results += tau_results
-        _, _, good_tau_indices_etau           = self[tau_selection](events, "etau",   call_force=True, **kwargs)
-        _, _, good_tau_indices_tautau         = self[tau_selection](events, "tautau", call_force=True, **kwargs)
+        good_tau_indices_mutau  = good_tau_indices_ch["mutau"]
+        good_tau_indices_etau   = good_tau_indices_ch["etau"]
+        good_tau_indices_tautau = good_tau_indices_ch["tautau"]
     else:
         events, tau_results, good_tau_indices = self[tau_selection](events, call_force=True, **kwargs)
         results += tau_results
@@ -263,7 +173,7 @@ def main(
 
         
     # e-tau pair i.e. hcand selection
-    etau_results, etau_pair, etau_trig_ids, etau_trig_types = self[etau_selection](events,
+    etau_results, etau_pair, etau_trig_ids, etau_trig_type_bits = self[etau_selection](events,
                                                                                    good_ele_indices,
                                                                                    good_tau_indices_etau if self.dataset_inst.is_mc else good_tau_indices,
                                                                                    trigger_results,
@@ -272,7 +182,7 @@ def main(
     results += etau_results
 
     # mu-tau pair i.e. hcand selection
-    mutau_results, mutau_pair, mutau_trig_ids, mutau_trig_types = self[mutau_selection](events,
+    mutau_results, mutau_pair, mutau_trig_ids, mutau_trig_type_bits = self[mutau_selection](events,
                                                                                         good_muon_indices,
                                                                                         good_tau_indices_mutau if self.dataset_inst.is_mc else good_tau_indices,
                                                                                         trigger_results,
@@ -281,7 +191,7 @@ def main(
     results += mutau_results
 
     # tau-tau pair i.e. hcand selection
-    tautau_results, tautau_pair, tautau_trig_ids,tautau_trig_types = self[tautau_selection](events,
+    tautau_results, tautau_pair, tautau_trig_ids,tautau_trig_type_bits = self[tautau_selection](events,
                                                                                             good_tau_indices_tautau if self.dataset_inst.is_mc else good_tau_indices,
                                                                                             trigger_results,
                                                                                             call_force=True,
@@ -336,18 +246,19 @@ def main(
     events = set_ak_column(events, "trigger_ids", trigger_ids)
     """
     
-    trigger_types = ak.concatenate([etau_trig_types, mutau_trig_types, tautau_trig_types], axis=1)
+    # types of the triggers kept by the pair selections, one bit per type
+    trigger_type_bits = etau_trig_type_bits | mutau_trig_type_bits | tautau_trig_type_bits
 
 
     # ele
-    single_e_triggered = ak.any(trigger_types == 'single_e', axis=1)
-    cross_e_triggered  = ak.any(trigger_types == 'cross_e_tau', axis=1)
+    single_e_triggered = (trigger_type_bits & trigger_type_mask("single_e")) != 0
+    cross_e_triggered  = (trigger_type_bits & trigger_type_mask("cross_e_tau")) != 0
     # mu
-    single_mu_triggered = ak.any(trigger_types == 'single_mu', axis=1)
-    cross_mu_triggered = ak.any(trigger_types == 'cross_mu_tau', axis=1)
+    single_mu_triggered = (trigger_type_bits & trigger_type_mask("single_mu")) != 0
+    cross_mu_triggered = (trigger_type_bits & trigger_type_mask("cross_mu_tau")) != 0
     # tau
-    cross_tau_triggered = ak.any(trigger_types == 'cross_tau_tau', axis=1)
-    cross_tau_jet_triggered = ak.any(trigger_types == 'cross_tau_tau_jet', axis=1)
+    cross_tau_triggered = (trigger_type_bits & trigger_type_mask("cross_tau_tau")) != 0
+    cross_tau_jet_triggered = (trigger_type_bits & trigger_type_mask("cross_tau_tau_jet")) != 0
 
     events = set_ak_column(events, "single_e_triggered", single_e_triggered)
     events = set_ak_column(events, "single_mu_triggered", single_mu_triggered)
@@ -421,6 +332,217 @@ def main(
             events, gentau_results = self[gentau_selection](events, True)
             results += gentau_results
 
+    return events, results
+
+
+# columns set by object_selection itself
+TRIGGER_FLAG_COLUMNS = [
+    "single_e_triggered", "single_mu_triggered",
+    "cross_e_triggered", "cross_mu_triggered", "cross_tau_triggered", "cross_tau_jet_triggered",
+    "single_triggered", "cross_triggered",
+]
+
+# selectors called in object_selection, their columns are scattered back in staged mode
+OBJECT_STAGE_SELECTORS = [
+    electron_selection, muon_selection, tau_selection, double_lepton_veto,
+    etau_selection, mutau_selection, tautau_selection, get_categories,
+    extra_lepton_veto, higgscand, higgscandprod, jet_selection, gentau_selection,
+]
+
+
+def object_stage_columns(self: Selector) -> list[Route]:
+    if getattr(self, "_object_stage_columns", None) is None:
+        columns = {Route(column) for column in TRIGGER_FLAG_COLUMNS}
+        for func in OBJECT_STAGE_SELECTORS:
+            if self.has_dep(func):
+                columns |= {Route(column) for column in self[func].produced_columns}
+        self._object_stage_columns = sorted(columns, key=str)
+    return self._object_stage_columns
+
+
+def staged_object_selection(
+    self: Selector,
+    events: ak.Array,
+    results: SelectionResult,
+    trigger_results: SelectionResult,
+    **kwargs,
+) -> tuple[ak.Array, SelectionResult, int]:
+    """
+    object_selection on the events passing all steps so far (json, met filters, trigger) with at
+    least two leptons (electrons, muons and taus, every pair needs two), scattered back to all events.
+    For these events, the produced columns, objects and steps are the same as with object_selection.
+    The skipped events never pass: their columns are zero or empty and their steps False, except for
+    the dilepton veto which is True if it cannot fail (at most one electron or muon), so that the
+    event mask and the cumulative cutflow are unchanged; only single step and n-1 counts of the
+    skipped events differ. The number of processed events is returned as well.
+    """
+    n = len(events)
+    n_light = ak.num(events.Electron, axis=1) + ak.num(events.Muon, axis=1)
+    has_two_leptons = ak.to_numpy((n_light + ak.num(events.Tau, axis=1)) >= 2)
+    prefilter = np.asarray(reduce(and_, results.steps.values())) & has_two_leptons
+    index = np.flatnonzero(prefilter)
+    if len(index) == n:
+        events, results = object_selection(self, events, results, trigger_results, **kwargs)
+        return events, results, n
+
+    # without any surviving event, the first one is processed anyway to know the output types
+    sub_index = index if len(index) else np.arange(1)
+    sub_events = events[sub_index]
+    sub_results = SelectionResult(steps=take_events(results.steps, sub_index, n))
+    sub_trigger_results = SelectionResult(
+        steps=take_events(trigger_results.steps, sub_index, n),
+        aux=take_events(trigger_results.aux, sub_index, n),
+    )
+    sub_events, sub_results = object_selection(self, sub_events, sub_results, sub_trigger_results, **kwargs)
+
+    # scatter the produced columns back, new fields of existing collections (e.g. Tau.rawIdx) need
+    # the list structure of the skipped events
+    skipped = ~prefilter
+    for route in object_stage_columns(self):
+        if not has_ak_column(sub_events, route):
+            continue
+        collection = route.fields[0]
+        fill_like = events[collection][skipped] if len(route.fields) > 1 and collection in events.fields else None
+        events = set_ak_column(events, route, scatter_events(route.apply(sub_events), index, n, fill_like=fill_like))
+
+    steps = {
+        name: scatter_events(np.asarray(step), index, n)
+        for name, step in sub_results.steps.items()
+        if name not in results.steps
+    }
+    if "dilepton_veto" in steps:
+        steps["dilepton_veto"][skipped] = ak.to_numpy(n_light[skipped] < 2)
+    results += SelectionResult(
+        steps=steps,
+        objects=scatter_events(sub_results.objects, index, n),
+        aux=scatter_events(sub_results.aux, index, n),
+    )
+
+    return events, results, len(index)
+
+
+# exposed selectors
+# (those that can be invoked from the command line)
+@selector(
+    uses={
+        "event",
+        # selectors / producers called within _this_ selector
+        attach_coffea_behavior,
+        json_filter, 
+        met_filters, 
+        scale_mc_weight, 
+        process_ids,
+        trigger_selection,
+        IF_DATASET_IS_DY(genZ_selection),
+        muon_selection, 
+        electron_selection, 
+        tau_selection, 
+        jet_selection,
+        etau_selection, 
+        mutau_selection, 
+        tautau_selection, 
+        get_categories,
+        extra_lepton_veto, 
+        double_lepton_veto, 
+        match_trigobj,
+        increment_stats, 
+        custom_increment_stats,
+        higgscand,
+        gentau_selection,
+        higgscandprod,
+        rel_charge,
+        #category_ids,
+        #build_abcd_masks,
+    },
+    produces={
+        # selectors / producers whose newly created columns should be kept
+        scale_mc_weight, 
+        trigger_selection,
+        IF_DATASET_IS_DY(genZ_selection),
+        muon_selection, 
+        electron_selection, 
+        tau_selection, 
+        jet_selection,
+        etau_selection, 
+        mutau_selection, 
+        tautau_selection, 
+        get_categories, 
+        process_ids,
+        extra_lepton_veto, 
+        double_lepton_veto, 
+        match_trigobj,
+        higgscandprod,
+        gentau_selection,
+        rel_charge,
+        #category_ids,
+        increment_stats, 
+        custom_increment_stats,
+        #"trigger_ids",
+        "single_triggered",
+        "cross_triggered",
+        "single_e_triggered",
+        "single_mu_triggered",
+        "cross_e_triggered",
+        "cross_mu_triggered",
+        "cross_tau_triggered",
+        "cross_tau_jet_triggered",
+        #build_abcd_masks,
+    },
+    exposed=True,
+    # run the object stages on the events passing the event level steps only, see main_staged
+    staged=False,
+)
+def main(
+    self: Selector,
+    events: ak.Array,
+    stats: defaultdict,
+    **kwargs,
+) -> tuple[ak.Array, SelectionResult]:
+    
+    # ensure coffea behaviors are loaded
+    events = self[attach_coffea_behavior](events, **kwargs)
+
+    # prepare the selection results that are updated at every step
+    results = SelectionResult()
+
+    # add the mc weight --> need to move to calibration main?
+    if self.dataset_inst.is_mc:
+        events = self[scale_mc_weight](events, **kwargs)
+
+    ##################################### NEW ######################################
+    results += SelectionResult(steps={"starts_with": np.ones(len(events), dtype=bool)})
+    ##################################### NEW ######################################
+        
+    # filter bad data events according to golden lumi mask
+    if self.dataset_inst.is_data:
+        events, json_filter_results = self[json_filter](events, **kwargs)
+        results += json_filter_results
+    else:
+        results += SelectionResult(steps={"json": np.ones(len(events), dtype=bool)})
+
+    # met filter selection
+    events, met_filter_results = self[met_filters](events, **kwargs)
+    results += met_filter_results
+
+    # trigger selection
+    events, trigger_results = self[trigger_selection](events, **kwargs)
+    results += trigger_results
+
+    # Get genZ collection for Zpt reweighting
+    if self.dataset_inst.has_tag("is_dy"):
+        events = self[genZ_selection](events, **kwargs)
+        
+    # object, pair and hcand stages
+    # in staged mode, only on the events passing the event level steps with at least two leptons
+    start = time.perf_counter()
+    if self.staged:
+        events, results, n_processed = staged_object_selection(self, events, results, trigger_results, **kwargs)
+    else:
+        events, results = object_selection(self, events, results, trigger_results, **kwargs)
+        n_processed = len(events)
+    timing_metric("selection_object_stages", start,
+                  verbose=self.config_inst.x.verbose.selection.main,
+                  staged=self.staged, n_events=len(events), n_processed=n_processed)
 
     # combined event selection after all steps
     event_sel = reduce(and_, results.steps.values())
@@ -548,3 +670,8 @@ def main_init(self: Selector) -> None:
 
                     # stop after the first match
                     break
+
+
+# same selection, with the object, pair and hcand stages on the prefiltered events only
+# (same event mask, columns and objects of the selected events, see staged_object_selection)
+main_staged = main.derive("main_staged", cls_dict={"staged": True})
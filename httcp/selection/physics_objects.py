@@ -14,7 +14,7 @@ from columnflow.util import maybe_import, DotDict
 from columnflow.columnar_util import EMPTY_FLOAT, Route, set_ak_column
 from columnflow.columnar_util import optional_column as optional
 
-from httcp.util import IF_NANO_V9, IF_NANO_V11, IF_RUN2, IF_RUN3, getGenTauDecayMode
+from httcp.util import IF_NANO_V9, IF_NANO_V11, IF_RUN2, IF_RUN3, getGenTauDecayMode, as_plain_array
 
 np = maybe_import("numpy")
 ak = maybe_import("awkward")
@@ -298,6 +298,22 @@ def electron_selection(
 #   https://cms.cern.ch/iCMS/analysisadmin/cadilines?id=2325&ancode=HIG-20-006&tp=an&line=HIG-20-006
 #   http://cms.cern.ch/iCMS/jsp/openfile.jsp?tp=draft&files=AN2019_192_v15.pdf
 # ------------------------------------------------------------------------------------------------------- #
+def _sorted_order_by_event(event_idx: np.ndarray, pt: np.ndarray) -> np.ndarray:
+    """
+    Order of a flat tau buffer grouped by event and sorted by descending pt inside each event,
+    the same as ak.argsort(pt, ascending=False) (stable, nan first) but with a single argsort
+    on a uint64 key: event index in the upper 32 bits, the order preserving bit pattern of -pt
+    in the lower ones. Non float32 pt falls back to np.lexsort.
+    """
+    if pt.dtype != np.float32:
+        return np.lexsort((np.nan_to_num(-pt, nan=0.0), ~np.isnan(pt), event_idx))
+    # + 0.0 turns -0.0 into 0.0, the two are a tie for ak.argsort
+    bits = np.ascontiguousarray(-pt + np.float32(0.0)).view(np.uint32)
+    bits = np.where(bits >> 31, ~bits, bits | np.uint32(0x80000000))
+    key = (event_idx.astype(np.uint64) << np.uint64(32)) | bits.astype(np.uint64)
+    return np.argsort(key, kind="stable")
+
+
 @selector(
     uses={
         f"Tau.{var}" for var in [
@@ -317,16 +333,23 @@ def electron_selection(
 def tau_selection(
         self: Selector,
         events: ak.Array,
-        channel_: Optional[str] = "",
+        channel_: Optional[str | tuple[str, ...]] = "",
         electron_indices: Optional[ak.Array]=None,
         muon_indices    : Optional[ak.Array]=None,
         **kwargs
-) -> tuple[ak.Array, SelectionResult, ak.Array]:
+) -> tuple[ak.Array, SelectionResult, ak.Array | dict[str, ak.Array]]:
     """
-    Tau selection returning two sets of indidces for default and veto muons.    
+    Tau selection returning the good tau indices, sorted by the channel specific pt
+    (Tau.pt_etau, Tau.pt_mutau, Tau.pt_tautau or Tau.pt if channel_ is empty).
+    None of the cuts depend on the channel pt, so channel_ can also be a sequence of channels:
+    the masks are then evaluated once on the flat tau buffer and only the pt ordering is done
+    per channel. The last item is a dict channel -> good tau indices in that case, the
+    SelectionResult always belongs to the first channel.
     References:
       - 
     """
+    channels = (channel_,) if isinstance(channel_, str) else tuple(channel_)
+    
     tau_local_indices = ak.local_index(events.Tau)
 
     events = set_ak_column(events, "Tau.rawIdx", tau_local_indices)
@@ -346,74 +369,75 @@ def tau_selection(
     if "decayModeHPS" not in events.Tau.fields:
         events = set_ak_column(events, "Tau.decayModeHPS", events.Tau.decayMode)      # explicitly renaming decayMode to decayModeHPS
         events = set_ak_column(events, "Tau.decayMode",    events.Tau.decayModePNet)  # set decayModePNet as decayMode
-    
-    tau_pt = None
-    if channel_ == "mutau":
-        tau_pt = events.Tau.pt_mutau
-    elif channel_ == "etau":
-        tau_pt = events.Tau.pt_etau
-    elif channel_ == "tautau":
-        tau_pt = events.Tau.pt_tautau
-    else:
-        tau_pt = events.Tau.pt
-        
+
     # [20.6] [19.4] [19.7]
 
-    sorted_indices = ak.argsort(tau_pt, axis=-1, ascending=False)
-    taus = events.Tau[sorted_indices]
+    # all cuts are evaluated once on the unsorted flat buffer, the channel pt is only used for the ordering
+    taus      = events.Tau
+    counts    = ak.to_numpy(ak.num(taus, axis=1))
+    event_idx = np.repeat(np.arange(len(counts)), counts)
+    flat      = lambda arr: ak.to_numpy(ak.flatten(arr, axis=1))
 
-    IPsig_1p25 = ak.where(taus.decayMode ==  0, np.abs(taus.IPsig) >= 1.25, False)
+    tau_pt    = flat(taus.pt)
+    tau_eta   = flat(taus.eta)
+    tau_dm    = flat(taus.decayMode)
+    tau_ipsig = flat(taus.IPsig)
     
     good_selections = {
-        "tau_pt_20"     : taus.pt > 20,
-        "tau_eta_2p5"   : abs(taus.eta) < 2.5, # 2.3
-        "tau_dz_0p2"    : abs(taus.dz) < 0.2,
+        "tau_pt_20"     : tau_pt > 20,
+        "tau_eta_2p5"   : np.abs(tau_eta) < 2.5, # 2.3
+        "tau_dz_0p2"    : np.abs(flat(taus.dz)) < 0.2,
         # have to make them channel-specific later
         #                  e-tau  mu-tau  tau-tau     SafeHere
         #   DeepTauVSjet : Tight  Medium  Medium  --> Medium  
         #   DeepTauVSe   : Tight  VVLoose VVLoose --> VVLoose 
         #   DeepTauVSmu  : Loose  Tight   VLoose  --> VLoose  
-        "tau_DeepTauVSjet"  : taus.idDeepTau2018v2p5VSjet >= tau_tagger_wps.vs_j.VVVLoose, # for tautau fake region
-        "tau_DeepTauVSe"    : taus.idDeepTau2018v2p5VSe   >= tau_tagger_wps.vs_e.VVLoose,
-        "tau_DeepTauVSmu"   : taus.idDeepTau2018v2p5VSmu  >= tau_tagger_wps.vs_m.VLoose,
+        "tau_DeepTauVSjet"  : flat(taus.idDeepTau2018v2p5VSjet) >= tau_tagger_wps.vs_j.VVVLoose, # for tautau fake region
+        "tau_DeepTauVSe"    : flat(taus.idDeepTau2018v2p5VSe)   >= tau_tagger_wps.vs_e.VVLoose,
+        "tau_DeepTauVSmu"   : flat(taus.idDeepTau2018v2p5VSmu)  >= tau_tagger_wps.vs_m.VLoose,
         #"tau_DecayMode_IP" : (((taus.decayMode == 0) & (np.abs(taus.IPsig) >= 1.25)) 
         #                       | (taus.decayMode == 1)
         #                       | (taus.decayMode == 10)
         #                       | (taus.decayMode == 11)),
-        "tau_ipsig_safe"    : taus.IPsig > ipsig_dummy,
+        "tau_ipsig_safe"    : tau_ipsig > ipsig_dummy,
         "tau_DecayMode_IP"  : (
-            (  ((taus.decayMode ==  0) & (np.abs(taus.IPsig) >= 1.25))
-               | (((taus.decayMode ==  1)
-                   | (taus.decayMode ==  2)
-                   | (taus.decayMode == 10)
-                   | (taus.decayMode == 11))
-                  & (taus.decayModeHPS != 0)))), # decayMode is now decayModePNet
+            (  ((tau_dm ==  0) & (np.abs(tau_ipsig) >= 1.25))
+               | (np.isin(tau_dm, [1, 2, 10, 11])
+                  & (flat(taus.decayModeHPS) != 0)))), # decayMode is now decayModePNet
     }
     
-    tau_mask = ak.local_index(taus) >= 0
-    
-    good_tau_mask = tau_mask
+    good_tau_mask = np.ones(len(tau_pt), dtype=bool)
     selection_steps = {}
 
     selection_steps = {"tau_starts_with": good_tau_mask}
     for cut in good_selections.keys():
-        good_tau_mask = good_tau_mask & ak.fill_none(good_selections[cut], False)
+        good_tau_mask = good_tau_mask & good_selections[cut]
         selection_steps[cut] = good_tau_mask
         
     if electron_indices is not None:
-        good_tau_mask = good_tau_mask & ak.all(taus.metric_table(events.Electron[electron_indices]) > 0.2, axis=2)
+        good_tau_mask = good_tau_mask & flat(ak.all(taus.metric_table(events.Electron[electron_indices]) > 0.2, axis=2))
         selection_steps["tau_clean_against_electrons"] = good_tau_mask 
 
     if muon_indices is not None:
-        good_tau_mask = good_tau_mask & ak.all(taus.metric_table(events.Muon[muon_indices]) > 0.2, axis=2)
+        good_tau_mask = good_tau_mask & flat(ak.all(taus.metric_table(events.Muon[muon_indices]) > 0.2, axis=2))
         selection_steps["tau_clean_against_muons"] = good_tau_mask
 
-    good_taus = taus[good_tau_mask]
-
-    # indices
+    # one argsort per channel over the shared flat buffer
+    channel_pt_columns = {"mutau": "pt_mutau", "etau": "pt_etau", "tautau": "pt_tautau"}
+    raw_idx = flat(tau_local_indices)
+    good_counts = np.bincount(event_idx[good_tau_mask], minlength=len(counts))
+    sorted_orders = {}
+    good_tau_indices = {}
+    for channel in channels:
+        order = _sorted_order_by_event(event_idx, flat(taus[channel_pt_columns.get(channel, "pt")]))
+        sorted_orders[channel] = order
+        good_tau_indices[channel] = ak.unflatten(raw_idx[order][good_tau_mask[order]], good_counts)
+
+    # indices and steps, sorted by the pt of the first channel
+    order = sorted_orders[channels[0]]
     raw_tau_indices = events.Tau.rawIdx
-    sorted_tau_indices = taus.rawIdx
-    good_tau_indices = good_taus.rawIdx
+    sorted_tau_indices = ak.unflatten(raw_idx[order], counts)
+    selection_steps = {cut: ak.unflatten(mask[order], counts) for cut, mask in selection_steps.items()}
     
     
     return events, SelectionResult(
@@ -421,11 +445,11 @@ def tau_selection(
             "Tau": {
                 "RawTau": raw_tau_indices,
                 "SortedTau": sorted_tau_indices,
-                "GoodTau": good_tau_indices,
+                "GoodTau": good_tau_indices[channels[0]],
             },
         },
         aux=selection_steps,
-    ), good_tau_indices
+    ), good_tau_indices[channel_] if isinstance(channel_, str) else good_tau_indices
 
 
 @tau_selection.init
@@ -688,9 +712,9 @@ def gentau_selection(
     decay_2             = decay_gentaus[:,1:2]
     decay_gentaus       = ak.concatenate([decay_1, decay_2], axis=1)
     
-    # WARNING: Not a smart way to convert ak.Array -> List -> ak.Array
-    # Must use ak.enforce_type: NOT WORKING here, but it was good for hcand selection
-    events = set_ak_column(events, "GenTau",           ak.Array(ak.to_list(matched_gentaus)))
+    # plain records (no GenParticle behavior, int64 / float64 fields, no option), same type
+    # as the former ak.Array(ak.to_list(...)) but without the python round-trip
+    events = set_ak_column(events, "GenTau",           as_plain_array(matched_gentaus))
     events = set_ak_column(events, "GenTau.decayMode", gentaus_dm)
     events = set_ak_column(events, "GenTau.mass",      ak.ones_like(events.GenTau.mass) * 1.777)
     events = set_ak_column(events, "GenTau.charge",    ak.where(events.GenTau.pdgId > 0,
@@ -698,7 +722,7 @@ def gentau_selection(
                                                                 ak.where(events.GenTau.pdgId < 0, 
                                                                          1, 
                                                                          0)))
-    events = set_ak_column(events, "GenTauProd",       ak.Array(ak.to_list(decay_gentaus)))
+    events = set_ak_column(events, "GenTauProd",       as_plain_array(decay_gentaus))
     events = set_ak_column(events, "GenTauProd.charge",ak.where(events.GenTauProd.pdgId > 0,
                                                                 -1,
                                                                 ak.where(events.GenTauProd.pdgId < 0,
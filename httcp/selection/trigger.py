@@ -15,6 +15,72 @@ ak = maybe_import("awkward")
 coffea = maybe_import("coffea")
 
 
+# trigger types, the position is the code stored in "trigger_types" and the bit in "trigger_type_bits"
+# (the first matching tag in this order defines the type of a trigger)
+TRIGGER_TYPES = ("single_e", "cross_e_tau", "single_mu", "cross_mu_tau", "cross_tau_tau", "cross_tau_tau_jet")
+TRIGGER_TYPE_CODES = {name: code for code, name in enumerate(TRIGGER_TYPES)}
+
+
+def trigger_type_mask(*types: str) -> np.uint64:
+    """
+    Bit mask of the trigger *types* to test against "trigger_type_bits"
+    """
+    return np.uint64(sum(1 << TRIGGER_TYPE_CODES[t] for t in set(types)))
+
+
+def trigger_type_bits(trigger_types: ak.Array) -> np.ndarray:
+    """
+    Per event uint64 bit mask of the type codes in the (jagged, possibly missing) *trigger_types*
+    """
+    bits = np.zeros(len(trigger_types), dtype=np.uint64)
+    for code in range(len(TRIGGER_TYPES)):
+        has_type = ak.fill_none(ak.any(trigger_types == code, axis=-1), False)
+        bits[np.asarray(has_type)] |= np.uint64(1 << code)
+    return bits
+
+
+def build_trigger_table(triggers: list) -> dict:
+    """
+    Static per trigger table, indexed by the bit of the trigger in "trigger_bits":
+    id, type code and the min pt / max abs eta of both legs. The second leg of single triggers
+    gets -1, a leg without pt or eta requirement 0 / inf.
+    """
+    if len(triggers) > 64:
+        raise ValueError(f"{len(triggers)} triggers do not fit into the uint64 trigger bits")
+
+    def leg_value(trigger, ileg, attr, missing):
+        if ileg >= len(trigger.legs):
+            return -1.0
+        value = getattr(trigger.legs[ileg], attr)
+        return missing if value is None else value
+
+    return {
+        "name"        : np.array([trigger.name for trigger in triggers]),
+        "id"          : np.array([trigger.id for trigger in triggers], dtype=np.uint64),
+        "type"        : np.array([next((code for code, t in enumerate(TRIGGER_TYPES) if trigger.has_tag(t)), -1)
+                                  for trigger in triggers], dtype=np.int8),
+        "leg1_minpt"  : np.array([leg_value(trigger, 0, "min_pt", 0.0) for trigger in triggers]),
+        "leg2_minpt"  : np.array([leg_value(trigger, 1, "min_pt", 0.0) for trigger in triggers]),
+        "leg1_maxeta" : np.array([leg_value(trigger, 0, "max_abseta", np.inf) for trigger in triggers]),
+        "leg2_maxeta" : np.array([leg_value(trigger, 1, "max_abseta", np.inf) for trigger in triggers]),
+    }
+
+
+def trigger_names_from_ids(trigger_ids: ak.Array, trigger_table: dict) -> ak.Array:
+    """
+    Decode the (jagged) trigger ids into trigger names, for printouts and debugging only
+    """
+    order = np.argsort(trigger_table["id"], kind="stable")
+    ids = trigger_table["id"][order]
+    flat = ak.to_numpy(ak.flatten(trigger_ids, axis=None)).astype(ids.dtype)
+    pos = np.minimum(np.searchsorted(ids, flat), len(ids) - 1)
+    unknown = ids[pos] != flat
+    if np.any(unknown):
+        raise KeyError(f"trigger ids {np.unique(flat[unknown])} are not in the trigger table")
+    names = trigger_table["name"][order][pos]
+    return ak.unflatten(names, ak.num(trigger_ids, axis=1))
+
+
 @selector(
     uses={
         "run",
@@ -29,56 +95,25 @@ def trigger_selection(
 ) -> tuple[ak.Array, SelectionResult]:
     """
     HLT trigger path selection.
+
+    Instead of per trigger string arrays, the fired triggers (all legs matched) are stored as one
+    uint64 bit mask per event ("trigger_bits", bit i = trigger i of "trigger_table") together with
+    the mask of their types ("trigger_type_bits", see TRIGGER_TYPES). The per fired trigger lists
+    (ids, type codes and leg thresholds) are looked up in the static "trigger_table".
     """
+    trigger_table = self.trigger_table
+
     any_fired = False
-    any_fired_all_legs_match = False
 
-    trigger_names                    = []
-    trigger_types                    = []
-    trigger_ids                      = []
     leg_matched_trigobj_idxs_concat  = []
     leg_matched_trigobjs_concat      = []
-    leg_min_pt_concat                = []
-    leg_max_eta_concat               = []
 
     fired_and_all_legs_match_concat  = []
     
     # index of TrigObj's to repeatedly convert masks to indices
     index = ak.local_index(events.TrigObj)
     
-    for trigger in self.config_inst.x.triggers:
-        # skip the trigger if it does not apply to the dataset
-        if not trigger.applies_to_dataset(self.dataset_inst):
-            continue
-
-        is_single_e  = trigger.has_tag("single_e")
-        is_cross_e   = trigger.has_tag("cross_e_tau")
-        is_single_mu = trigger.has_tag("single_mu")
-        is_cross_mu  = trigger.has_tag("cross_mu_tau")
-        is_cross_tau = trigger.has_tag("cross_tau_tau")
-        is_cross_tau_jet = trigger.has_tag("cross_tau_tau_jet")
-
-        trigger_type_temp = ak.Array([""])
-        if is_single_e:
-            trigger_type_temp = ak.Array(["single_e"])
-        elif is_cross_e:
-            trigger_type_temp = ak.Array(["cross_e_tau"])
-        elif is_single_mu:
-            trigger_type_temp =	ak.Array(["single_mu"])
-        elif is_cross_mu:
-            trigger_type_temp = ak.Array(["cross_mu_tau"])
-        elif is_cross_tau:
-            trigger_type_temp = ak.Array(["cross_tau_tau"])
-        elif is_cross_tau_jet:
-            trigger_type_temp = ak.Array(["cross_tau_tau_jet"])
-            
-        trigger_name_temp = ak.Array([trigger.name])
-        trigger_name_array, _ = ak.broadcast_arrays(trigger_name_temp, events.event)
-        trigger_names.append(trigger_name_array[:,None])
-
-        trigger_type_array, _ = ak.broadcast_arrays(trigger_type_temp, events.event)
-        trigger_types.append(trigger_type_array[:,None])
-        
+    for trigger in self.triggers:
         # get bare decisions
         fired = events.HLT[trigger.hlt_field] == 1
 
@@ -96,13 +131,8 @@ def trigger_selection(
 
         
         # get trigger objects for fired events per leg
-        #leg_matched_trigobj_idxs_shallow = []
         leg_matched_trigobj_idxs         = []
         leg_matched_trigobjs             = []
-        leg_min_pt                       = []
-        leg_max_eta                      = []
-        leg_matched_trigobj_idxs_concat_legs  = None
-        leg_matched_trigobjs_concat_legs      = None
         all_legs_match = True
 
         for leg in trigger.legs:
@@ -113,13 +143,9 @@ def trigger_selection(
                 leg_mask = leg_mask & (abs(events.TrigObj.id) == leg.pdg_id)
             # pt cut
             if leg.min_pt is not None:
-                min_pt = leg.min_pt * ak.ones_like(events.event)
-                leg_min_pt.append(min_pt[:,None])
                 leg_mask = leg_mask & (events.TrigObj.pt >= leg.min_pt)
             # eta cut
             if leg.max_abseta is not None:
-                max_eta = leg.max_abseta * ak.ones_like(events.event)
-                leg_max_eta.append(max_eta[:,None])
                 leg_mask = leg_mask & (np.abs(events.TrigObj.eta) <= leg.max_abseta)
             # trigger bits match
             if leg.trigger_bits is not None:
@@ -128,8 +154,7 @@ def trigger_selection(
                     # https://github.com/uhh-cms/hh2bbww/blob/master/hbw/selection/trigger.py#L94
                     leg_mask = leg_mask & ((events.TrigObj.filterBits & bits) == bits)
 
-            #leg_matched_trigobj_idxs_shallow.append(index[leg_mask])         # O L D
-            leg_matched_trigobj_idxs.append(index[leg_mask][:,None])         # N E W
+            leg_matched_trigobj_idxs.append(index[leg_mask][:,None])
             leg_matched_trigobjs.append(get_objs_p4(events.TrigObj[index[leg_mask]])[:,None])
 
             # at least one object must match this leg
@@ -137,18 +162,8 @@ def trigger_selection(
 
         # final trigger decision
         fired_and_all_legs_match = fired & all_legs_match
-        fired_and_all_legs_match_concat.append(fired_and_all_legs_match[:,None])
-
-        # store all intermediate results for subsequent selectors
-        #trigger_data.append((trigger, fired_and_all_legs_match, leg_matched_trigobj_idxs_shallow))
+        fired_and_all_legs_match_concat.append(np.asarray(fired_and_all_legs_match, dtype=bool))
 
-        # store the trigger id
-        #ids = ak.where(fired_and_all_legs_match, np.float32(trigger.id), np.float32(np.nan))
-        #trigger_ids.append(ak.singletons(ak.nan_to_none(ids)))
-        ids = trigger.id * ak.ones_like(events.event)
-        ids = ids[:,None]
-        trigger_ids.append(ids)
-        
         # store the trigger obj indices matched to the trigger legs
         leg_matched_trigobj_idxs_concat_legs = ak.concatenate([*leg_matched_trigobj_idxs], axis=1)
         leg_matched_trigobj_idxs_concat.append(leg_matched_trigobj_idxs_concat_legs[:,None])
@@ -156,81 +171,70 @@ def trigger_selection(
         # store the corresponding trigger obj p4s matched to the trigger legs
         leg_matched_trigobjs_concat_legs = ak.concatenate([*leg_matched_trigobjs], axis=1)
         leg_matched_trigobjs_concat.append(leg_matched_trigobjs_concat_legs[:,None])
+
         
-        # store the trigger legs pt threshold mentioned in the triggers description [probably redundant]
-        leg_min_pt_concat_legs = ak.concatenate([*leg_min_pt], axis=1)
-        leg_min_pt_concat.append(leg_min_pt_concat_legs[:,None])
+    # events * triggers decision matrix
+    passed = np.stack(fired_and_all_legs_match_concat, axis=1)
+    # trigger_bits:
+    # e.g. with the triggers [ 'HLT_Ele30_WPTight_Gsf', 'HLT_IsoMu24', 'HLT_Ele24_..._CrossL1' ]
+    # [ 0b001, 0b101, 0b010 ]
+    trigger_bits = np.bitwise_or.reduce(
+        passed.astype(np.uint64) << np.arange(passed.shape[1], dtype=np.uint64),
+        axis=1,
+    )
+    # trigger_type_bits: same for the types of the fired triggers
+    # [ 1 << single_e, 1 << single_e | 1 << cross_e_tau, 1 << single_mu ]
+    type_bits_per_trigger = np.left_shift(np.uint64(1), trigger_table["type"].astype(np.uint64))
+    type_bits_per_trigger[trigger_table["type"] < 0] = 0
+    trigger_type_bits = np.bitwise_or.reduce(
+        np.where(passed, type_bits_per_trigger, np.uint64(0)),
+        axis=1,
+    )
 
-        # store the trigger legs pt threshold mentioned in the triggers description [probably redundant]
-        leg_max_eta_concat_legs = ak.concatenate([*leg_max_eta], axis=1)
-        leg_max_eta_concat.append(leg_max_eta_concat_legs[:,None])
+    # per event lists of the fired triggers, in the order of the config
+    # trigger index:
+    # [
+    #  [ 0 ],
+    #  [ 0, 2 ],
+    #  [ 1 ]
+    # ]
+    n_fired = passed.sum(axis=1)
+    fired_trigger_index = np.nonzero(passed)[1]
+
+    def per_fired_trigger(column):
+        return ak.unflatten(trigger_table[column][fired_trigger_index], n_fired)
 
-        
-    fired_and_all_legs_match_concat = ak.concatenate([*fired_and_all_legs_match_concat], axis=1)
-    trigger_ids              = ak.concatenate(trigger_ids, axis=1)    
-    trigger_names            = ak.concatenate(trigger_names, axis=1)
-    trigger_types            = ak.concatenate(trigger_types, axis=1)
-    leg_min_pt_concat        = ak.concatenate([*leg_min_pt_concat], axis=1)
-    leg_max_eta_concat       = ak.concatenate([*leg_max_eta_concat], axis=1)
     leg_matched_trigobj_idxs = ak.concatenate([*leg_matched_trigobj_idxs_concat], axis=1)
     leg_matched_trigobjs     = ak.concatenate([*leg_matched_trigobjs_concat], axis=1)
-    
+    fired_and_all_legs_match_concat = ak.Array(passed)
 
-    # applying the main mask: fired_and_all_legs_match_concat
-    # comments: considering 3 events
-    # names:
-    # [
-    #  [ 'HLT_Ele27_WPTight_Gsf' ],
-    #  [ 'HLT_Ele27_WPTight_Gsf','HLT_Ele32_WPTight_Gsf','HLT_Ele24_eta2p1_WPTight_Gsf_LooseDeepTauPFTauHPS30_eta2p1_CrossL1','HLT_DoubleMediumDeepTauPFTauHPS35_L2NN_eta2p1' ],
-    #  [ 'HLT_IsoMu27', 'HLT_IsoMu24' ]
-    # ]
-    trigger_names_filtered = ak.drop_none(ak.mask(trigger_names,      fired_and_all_legs_match_concat))
-    # types:
-    # [
-    #  [ 'single_e' ],
-    #  [ 'single_e','single_e','cross_e_tau','cross_tau_tau' ],
-    #  [ 'single_mu','single_mu' ]
-    # ]
-    trigger_types_filtered = ak.drop_none(ak.mask(trigger_types,      fired_and_all_legs_match_concat))
     # ids:
     # [
     #  [ 111000 ],
-    #  [ 111000, 112000, 11151, 15153 ],
-    #  [ 131000, 132000 ]
-    # ]
-    trigger_ids_filtered   = ak.drop_none(ak.mask(trigger_ids,        fired_and_all_legs_match_concat))
-    # minpt of both legs combined
-    # leg_minpt:
-    # [
-    #  [ [28.0] ],
-    #  [ [28.0], [33.0], [25.0, 35.0], [40.0, 40.0] ], # -- because, last two triggers are cross-triggers
-    #  [ [25.0], [25.0] ]
+    #  [ 111000, 11151 ],
+    #  [ 131000 ]
     # ]
-    leg_minpt_filtered     = ak.drop_none(ak.mask(leg_min_pt_concat,  fired_and_all_legs_match_concat))
-    # for simplicity, save the minpt separated for two legs
-    # leg1_minpt:
+    trigger_ids_filtered   = per_fired_trigger("id")
+    # type codes, see TRIGGER_TYPES
+    trigger_types_filtered = per_fired_trigger("type")
+    # minpt of the first leg:
     # [
     #  [ 28.0 ],
-    #  [ 28.0, 33.0, 25.0, 40.0 ],
-    #  [ 25.0, 25.0 ]
+    #  [ 28.0, 25.0 ],
+    #  [ 25.0 ]
     # ]
-    leg1_minpt_filtered    = ak.firsts(leg_minpt_filtered[:,:,0:1], axis=-1) # 
+    leg1_minpt_filtered    = per_fired_trigger("leg1_minpt")
     # leg2_minpt:
-    # will contain None because, single triggers do not have 2nd leg
-    # so fill all the None with -1.0
+    # single triggers do not have 2nd leg, so they get -1.0
     # [
     #  [ -1.0 ],
-    #  [ -1.0, -1.0, 35.0, 40.0 ],
-    #  [ -1.0, -1.0 ]
+    #  [ -1.0, 35.0 ],
+    #  [ -1.0 ]
     # ]
-    leg2_minpt_filtered    = ak.fill_none(ak.firsts(leg_minpt_filtered[:,:,1:2], axis=-1), -1.0)
-
-
-    leg_maxeta_filtered     = ak.drop_none(ak.mask(leg_max_eta_concat,  fired_and_all_legs_match_concat))
-    leg1_maxeta_filtered    = ak.firsts(leg_maxeta_filtered[:,:,0:1], axis=-1) # 
-    leg2_maxeta_filtered    = ak.fill_none(ak.firsts(leg_maxeta_filtered[:,:,1:2], axis=-1), -1.0)
+    leg2_minpt_filtered    = per_fired_trigger("leg2_minpt")
+    leg1_maxeta_filtered   = per_fired_trigger("leg1_maxeta")
+    leg2_maxeta_filtered   = per_fired_trigger("leg2_maxeta")
 
-        
     # leg mathced trig obj indices:
     # [
     #  [ [[0]] ],
@@ -282,8 +286,9 @@ def trigger_selection(
     
     # store the fired trigger ids and others
     # e.g.
-    #   trigger_names             = [ ['HLT_Ele27_WPTight_Gsf'], [], ['HLT_Ele27_WPTight_Gsf', 'HLT_Ele32_WPTight_Gsf'], ['HLT_Ele24_eta2p1_WPTight_Gsf_LooseDeepTauPFTauHPS30_eta2p1_CrossL1] ]
-    #   trigger_types             = [ [      'single_e'       ], [], [        'single_e'     ,        'single_e'      ], [                          'cross_e_tau'                            ] ]
+    #   trigger_bits              = [          0b0001,         0,                      0b0011,                                               0b0100                                  ]
+    #   trigger_type_bits         = [    1 << single_e,        0,                1 << single_e,                                         1 << cross_e_tau                           ]
+    #   trigger_types             = [ [      single_e         ], [], [         single_e      ,         single_e       ], [                           cross_e_tau                             ] ]
     #   trigger_ids               = [ [        111000         ], [], [          111000       ,          112000        ], [                              11151                                ] ]
     ##  leg_minpt                 = [ [        [28.0]         ], [], [          [28.0]       ,          [33.0]        ], [                          [25.0, 35.0]                             ] ]
     #   leg1_minpt                = [ [         28.0          ], [], [           28.0        ,           33.0         ], [                               25.0                                ] ]
@@ -296,7 +301,9 @@ def trigger_selection(
     #   leg2_matched_trigobjs     = [ [         None          ], [], [           None        ,           None         ], [                             [p4, p4]                              ] ]
 
     trigger_data = {
-        "trigger_names"  : trigger_names_filtered,
+        "trigger_table"  : trigger_table,
+        "trigger_bits"   : trigger_bits,
+        "trigger_type_bits" : trigger_type_bits,
         "trigger_types"  : trigger_types_filtered,
         "trigger_ids"    : trigger_ids_filtered,
         "leg1_minpt"     : leg1_minpt_filtered,
@@ -322,9 +329,13 @@ def trigger_selection_init(self: Selector) -> None:
     if getattr(self, "dataset_inst", None) is None:
         return
 
-    # full used columns
-    self.uses |= {
-        opt(trigger.name)
+    # triggers applying to the dataset, their position is their bit in "trigger_bits"
+    self.triggers = [
+        trigger
         for trigger in self.config_inst.x.triggers
         if trigger.applies_to_dataset(self.dataset_inst)
-    }
+    ]
+    self.trigger_table = build_trigger_table(self.triggers)
+
+    # full used columns
+    self.uses |= {opt(trigger.name) for trigger in self.triggers}
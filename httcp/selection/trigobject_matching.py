@@ -12,7 +12,8 @@ from columnflow.selection import Selector, SelectionResult, selector
 from columnflow.util import maybe_import
 from columnflow.columnar_util import set_ak_column
 
-from httcp.util import filter_by_triggers, get_objs_p4, trigger_object_matching_deep
+from httcp.util import filter_by_triggers, get_objs_p4, trigger_object_matching_sparse
+from httcp.selection.trigger import TRIGGER_TYPE_CODES, trigger_names_from_ids
 
 np = maybe_import("numpy")
 ak = maybe_import("awkward")
@@ -43,9 +44,9 @@ def match_trigobj(
     start = time.time()
 
     # extract the trigger names, types & others from trigger_results.x (aux)
-    trigger_names         = trigger_results.x.trigger_names
     trigger_types         = trigger_results.x.trigger_types
     trigger_ids           = trigger_results.x.trigger_ids
+    trigger_names         = trigger_names_from_ids(trigger_ids, trigger_results.x.trigger_table)
     leg1_minpt            = trigger_results.x.leg1_minpt
     leg2_minpt            = trigger_results.x.leg2_minpt
     leg1_maxeta           = trigger_results.x.leg1_maxeta
@@ -67,19 +68,19 @@ def match_trigobj(
     # Make sure that events with etau pair are fired by single or cross ele triggers
     # and filter_by_triggers func is basically checking if an event has any of the ele triggers
     # Finally, etau_pair will exist in those events only that has any of the single/cross ele triggers
-    has_single_e_triggers = trigger_types == "single_e"
-    has_cross_e_triggers  = trigger_types == "cross_e_tau"
+    has_single_e_triggers = trigger_types == TRIGGER_TYPE_CODES["single_e"]
+    has_cross_e_triggers  = trigger_types == TRIGGER_TYPE_CODES["cross_e_tau"]
     has_e_triggers = (has_single_e_triggers | has_cross_e_triggers)
     etau_pair  = filter_by_triggers(etau_pair, has_e_triggers)
 
     # same for mutau pairs
-    has_single_mu_triggers  = trigger_types == "single_mu"
-    has_cross_mu_triggers   = trigger_types == "cross_mu_tau"
+    has_single_mu_triggers  = trigger_types == TRIGGER_TYPE_CODES["single_mu"]
+    has_cross_mu_triggers   = trigger_types == TRIGGER_TYPE_CODES["cross_mu_tau"]
     has_mu_triggers     = (has_single_mu_triggers | has_cross_mu_triggers)
     mutau_pair  = filter_by_triggers(mutau_pair, has_mu_triggers)
 
     # same for tautau pairs
-    has_tau_triggers     = ((trigger_types == "cross_tau_tau") | (trigger_types == "cross_tau_tau_jet"))
+    has_tau_triggers     = ((trigger_types == TRIGGER_TYPE_CODES["cross_tau_tau"]) | (trigger_types == TRIGGER_TYPE_CODES["cross_tau_tau_jet"]))
     tautau_pair  = filter_by_triggers(tautau_pair, has_tau_triggers)
 
     # Event level masks
@@ -225,27 +226,27 @@ def match_trigobj(
         #   for tautau, match both legs
         #print("ee")
         single_el_trigobj_matched_mask = ak.where(mask_has_single_e_triggers_and_has_e_evt_level,
-                                                  trigger_object_matching_deep(p4_ele,
-                                                                               single_etau_leg_1_matched_trigobjs,
-                                                                               single_etau_leg_1_minpt,
-                                                                               single_etau_leg_1_maxeta,
-                                                                               True),
+                                                  trigger_object_matching_sparse(p4_ele,
+                                                                                 single_etau_leg_1_matched_trigobjs,
+                                                                                 single_etau_leg_1_minpt,
+                                                                                 single_etau_leg_1_maxeta,
+                                                                                 True),
                                                   trigobj_matched_mask_dummy)
         #print("ff")
         cross_el_trigobj_matched_mask_leg1 = ak.where(mask_has_cross_e_triggers_and_has_e_evt_level,
-                                                      trigger_object_matching_deep(p4_ele,
-                                                                                   cross_etau_leg_1_matched_trigobjs,
-                                                                                   cross_etau_leg_1_minpt,
-                                                                                   cross_etau_leg_1_maxeta,
-                                                                                   True),
+                                                      trigger_object_matching_sparse(p4_ele,
+                                                                                     cross_etau_leg_1_matched_trigobjs,
+                                                                                     cross_etau_leg_1_minpt,
+                                                                                     cross_etau_leg_1_maxeta,
+                                                                                     True),
                                                       trigobj_matched_mask_dummy)
         #print("gg")
         cross_el_trigobj_matched_mask_leg2 = ak.where(mask_has_cross_e_triggers_and_has_e_evt_level,
-                                                      trigger_object_matching_deep(p4_tauele,
-                                                                                   cross_etau_leg_2_matched_trigobjs,
-                                                                                   cross_etau_leg_2_minpt,
-                                                                                   cross_etau_leg_2_maxeta,
-                                                                                   True),
+                                                      trigger_object_matching_sparse(p4_tauele,
+                                                                                     cross_etau_leg_2_matched_trigobjs,
+                                                                                     cross_etau_leg_2_minpt,
+                                                                                     cross_etau_leg_2_maxeta,
+                                                                                     True),
                                                       trigobj_matched_mask_dummy)
         #print("hh")
         # ensures that both legs are matched
@@ -263,27 +264,27 @@ def match_trigobj(
 
         # same for mutau
         single_mu_trigobj_matched_mask = ak.where(mask_has_single_mu_triggers_and_has_mu_evt_level,
-                                                  trigger_object_matching_deep(p4_muo,
-                                                                               single_mutau_leg_1_matched_trigobjs,
-                                                                               single_mutau_leg_1_minpt,
-                                                                               single_mutau_leg_1_maxeta,
-                                                                               True),
+                                                  trigger_object_matching_sparse(p4_muo,
+                                                                                 single_mutau_leg_1_matched_trigobjs,
+                                                                                 single_mutau_leg_1_minpt,
+                                                                                 single_mutau_leg_1_maxeta,
+                                                                                 True),
                                                   trigobj_matched_mask_dummy)
         #print("ll")
         cross_mu_trigobj_matched_mask_leg1 = ak.where(mask_has_cross_mu_triggers_and_has_mu_evt_level,
-                                                      trigger_object_matching_deep(p4_muo,
-                                                                                   cross_mutau_leg_1_matched_trigobjs,
-                                                                                   cross_mutau_leg_1_minpt,
-                                                                                   cross_mutau_leg_1_maxeta,
-                                                                                   True),
+                                                      trigger_object_matching_sparse(p4_muo,
+                                                                                     cross_mutau_leg_1_matched_trigobjs,
+                                                                                     cross_mutau_leg_1_minpt,
+                                                                                     cross_mutau_leg_1_maxeta,
+                                                                                     True),
                                                       trigobj_matched_mask_dummy)
         #print("mm")
         cross_mu_trigobj_matched_mask_leg2 = ak.where(mask_has_cross_mu_triggers_and_has_mu_evt_level,
-                                                      trigger_object_matching_deep(p4_taumuo,
-                                                                                   cross_mutau_leg_2_matched_trigobjs,
-                                                                                   cross_mutau_leg_2_minpt,
-                                                                                   cross_mutau_leg_2_maxeta,
-                                                                                   True),
+                                                      trigger_object_matching_sparse(p4_taumuo,
+                                                                                     cross_mutau_leg_2_matched_trigobjs,
+                                                                                     cross_mutau_leg_2_minpt,
+                                                                                     cross_mutau_leg_2_maxeta,
+                                                                                     True),
                                                       trigobj_matched_mask_dummy)
         #print("nn")
         cross_mu_trigobj_matched_mask = (cross_mu_trigobj_matched_mask_leg1 & cross_mu_trigobj_matched_mask_leg2)
@@ -299,41 +300,41 @@ def match_trigobj(
         # For tau-tau, it is a bit lengthy
         # matching tau1 to the passed triggers leg1
         tau1_trigobj_matched_mask_leg1 = ak.where(mask_has_tau_triggers_and_has_tau_evt_level,
-                                                  trigger_object_matching_deep(p4_tau1,
-                                                                               tautau_leg_1_matched_trigobjs,
-                                                                               tautau_leg_1_minpt,
-                                                                               tautau_leg_1_maxeta,
-                                                                               True),
+                                                  trigger_object_matching_sparse(p4_tau1,
+                                                                                 tautau_leg_1_matched_trigobjs,
+                                                                                 tautau_leg_1_minpt,
+                                                                                 tautau_leg_1_maxeta,
+                                                                                 True),
                                                   trigobj_matched_mask_dummy)
         tau1_trigobj_matched_mask_leg1 = tau1_trigobj_matched_mask_leg1[:,0]
         #print("qq")
         # tau1 to leg2
         tau1_trigobj_matched_mask_leg2 = ak.where(mask_has_tau_triggers_and_has_tau_evt_level,
-                                                  trigger_object_matching_deep(p4_tau1,
-                                                                               tautau_leg_2_matched_trigobjs,
-                                                                               tautau_leg_2_minpt,
-                                                                               tautau_leg_2_maxeta,
-                                                                               True),
+                                                  trigger_object_matching_sparse(p4_tau1,
+                                                                                 tautau_leg_2_matched_trigobjs,
+                                                                                 tautau_leg_2_minpt,
+                                                                                 tautau_leg_2_maxeta,
+                                                                                 True),
                                                   trigobj_matched_mask_dummy)
         tau1_trigobj_matched_mask_leg2 = tau1_trigobj_matched_mask_leg2[:,0]
         #print("rr")
         # tau2 to leg1
         tau2_trigobj_matched_mask_leg1 = ak.where(mask_has_tau_triggers_and_has_tau_evt_level,
-                                                  trigger_object_matching_deep(p4_tau2,
-                                                                               tautau_leg_1_matched_trigobjs,
-                                                                               tautau_leg_1_minpt,
-                                                                               tautau_leg_1_maxeta,
-                                                                               True),
+                                                  trigger_object_matching_sparse(p4_tau2,
+                                                                                 tautau_leg_1_matched_trigobjs,
+                                                                                 tautau_leg_1_minpt,
+                                                                                 tautau_leg_1_maxeta,
+                                                                                 True),
                                                   trigobj_matched_mask_dummy)
         tau2_trigobj_matched_mask_leg1 = tau2_trigobj_matched_mask_leg1[:,0]
         #print("ss")
         # tau2 to leg2
         tau2_trigobj_matched_mask_leg2 = ak.where(mask_has_tau_triggers_and_has_tau_evt_level,
-                                                  trigger_object_matching_deep(p4_tau2,
-                                                                               tautau_leg_2_matched_trigobjs,
-                                                                               tautau_leg_2_minpt,
-                                                                               tautau_leg_2_maxeta,
-                                                                               True),
+                                                  trigger_object_matching_sparse(p4_tau2,
+                                                                                 tautau_leg_2_matched_trigobjs,
+                                                                                 tautau_leg_2_minpt,
+                                                                                 tautau_leg_2_maxeta,
+                                                                                 True),
                                                   trigobj_matched_mask_dummy)
         tau2_trigobj_matched_mask_leg2 = tau2_trigobj_matched_mask_leg2[:,0]
         #print("tt")
@@ -7,6 +7,10 @@ Collection of helpers
 from __future__ import annotations
 
 
+import json
+import time
+import logging
+
 import law
 import order as od
 from typing import Any, Optional
@@ -18,6 +22,8 @@ from columnflow.columnar_util import ArrayFunction, deferred_column
 from columnflow.selection import Selector, SelectionResult, selector
 from columnflow.columnar_util import optional_column as optional
 
+from httcp.kinematics import LorentzVectorArray, pair_indices
+
 np = maybe_import("numpy")
 ak = maybe_import("awkward")
 coffea = maybe_import("coffea")
@@ -26,7 +32,10 @@ maybe_import("coffea.nanoevents.methods.nanoaod")
 logger = law.logger.get_logger(__name__)
 
 
-def get_objs_p4(collobj):
+def get_objs_p4(collobj, flat: Optional[bool] = False):
+    if flat:
+        # struct-of-arrays float64 four-vectors on the flat buffer, see httcp.kinematics
+        return LorentzVectorArray.from_awkward(collobj)
     return ak.zip(
         {
             "pt"  : collobj.pt,
@@ -41,7 +50,8 @@ def get_objs_p4(collobj):
 
 def filter_by_triggers(lep_pair, mask):
     dummy = lep_pair[:,:0]
-    any_mask = ak.any(mask, axis=1)
+    # per trigger masks are reduced to the event level, event level masks (e.g. from the trigger type bits) are taken as they are
+    any_mask = ak.any(mask, axis=1) if mask.ndim > 1 else mask
     out_pair = ak.where(any_mask, lep_pair, dummy)
     return out_pair
 
@@ -284,6 +294,144 @@ def trigger_object_matching_deep(
 
 
 
+def _flat_lists(array: ak.Array) -> tuple:
+    """
+    Offsets of the axis=1 lists of *array* (missing lists count as empty) and the flat
+    numpy content together with a mask of the valid (not None) entries
+    """
+    counts = np.asarray(ak.fill_none(ak.num(array, axis=1), 0), dtype=np.int64)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    flat = ak.to_numpy(ak.flatten(array, axis=1), allow_missing=True)
+    return offsets, np.ma.getdata(flat), ~np.ma.getmaskarray(flat)
+
+
+def _delta_r_flat(eta1, phi1, eta2, phi2):
+    # dR of flat (eta, phi) pairs with coffea's own delta_r, the metric of metric_table in
+    # trigger_object_matching_deep: the float32 rounding differs between coffea versions and
+    # decides both dR == threshold and ties of the closest object
+    def vec(eta, phi):
+        return ak.zip(
+            {"pt": np.ones_like(eta), "eta": eta, "phi": phi, "mass": np.zeros_like(eta)},
+            with_name="PtEtaPhiMLorentzVector",
+            behavior=coffea.nanoevents.methods.nanoaod.behavior,
+        )
+    return ak.to_numpy(vec(eta1, phi1).delta_r(vec(eta2, phi2)))
+
+
+def trigger_object_matching_sparse(
+        vectors1: ak.Array,
+        vectors2: ak.Array,
+        legminpt: ak.Array,
+        legmaxeta: ak.Array,
+        checkdr: bool = True,
+        threshold: float = 0.5,
+        return_index: bool = False,
+):
+    """
+    Same decision as trigger_object_matching_deep, i.e. per e/mu/tau of *vectors1* and per trigger
+    (events * var * var * bool): pt >= leg min pt, |eta| <= leg max eta and at least one of the
+    trigger objects of that trigger leg in *vectors2* (events * var * ?var) within dR < threshold.
+
+    Instead of the full events * leptons * triggers * trigobjs metric table, it works on the flat
+    buffers: the trigger objects are sorted by eta within each (event, trigger) and each lepton
+    only looks at the objects inside its [eta - threshold, eta + threshold] window, so the memory
+    stays linear in (lepton-trigger pairs + trigger objects + candidates in the window).
+    With *return_index*, the local index of the closest matched trigger object (-1 if none)
+    is returned as well, with the same layout.
+    """
+    lep_offsets, lep_pt, lep_valid = _flat_lists(vectors1.pt)
+    _, lep_eta, _ = _flat_lists(vectors1.eta)
+    trig_offsets, minpt, minpt_valid = _flat_lists(legminpt)
+    _, maxeta, maxeta_valid = _flat_lists(legmaxeta)
+
+    # all (lepton, trigger) pairs of the same event, ordered as the output
+    il, it, inner_offsets = pair_indices(lep_offsets, trig_offsets)
+    match = (
+        lep_valid[il] & minpt_valid[it] & maxeta_valid[it]
+        & (lep_pt[il] >= minpt[it])
+        & (np.abs(lep_eta[il]) <= maxeta[it])
+    )
+    best = np.full(len(match), -1, dtype=np.int64)
+
+    # events which are missing as a whole stay missing (and option type is kept), as with the
+    # broadcasting of the deep version
+    evt_inputs = [vectors1, legminpt, legmaxeta] + ([vectors2] if checkdr else [])
+    evt_option = any(x.layout.is_option for x in evt_inputs)
+    evt_missing = np.zeros(len(lep_offsets) - 1, dtype=bool)
+    for x in evt_inputs:
+        evt_missing |= np.asarray(ak.is_none(x, axis=0))
+
+    if checkdr:
+        _, lep_phi, _ = _flat_lists(vectors1.phi)
+        obj_counts = ak.flatten(ak.num(vectors2, axis=2), axis=1)
+        obj_counts = ak.to_numpy(obj_counts, allow_missing=True)
+        # missing trigger leg (e.g. leg2 of a single lepton trigger) -> no objects -> no match
+        nobj = np.ma.filled(obj_counts, 0).astype(np.int64)
+        if len(nobj) != len(minpt):
+            raise ValueError(f"trigger object lists ({len(nobj)}) do not match the trigger legs ({len(minpt)})")
+        obj_offsets = np.zeros(len(nobj) + 1, dtype=np.int64)
+        np.cumsum(nobj, out=obj_offsets[1:])
+        obj_eta = ak.to_numpy(ak.flatten(vectors2.eta, axis=None))
+        obj_phi = ak.to_numpy(ak.flatten(vectors2.phi, axis=None))
+
+        query = np.flatnonzero(match)
+        match[:] = False
+        if len(query) and len(obj_eta):
+            # eta-sorted objects per trigger; the trigger index times a stride larger than the
+            # eta range makes one globally sorted key, searched once per (lepton, trigger)
+            eta_min = float(np.min(obj_eta))
+            stride = float(np.max(obj_eta)) - eta_min + 1.0
+            key = np.repeat(np.arange(len(nobj), dtype=np.float64) * stride - eta_min, nobj)
+            key += obj_eta
+            # already grouped, so the stable sort only reorders within each trigger
+            order = np.argsort(key, kind="stable")
+            key = key[order]
+            # margin only widens the window, the decision is taken on the dR below
+            width = threshold + 1e-3
+
+            q_trig = it[query]
+            center = q_trig * stride + (lep_eta[il[query]].astype(np.float64) - eta_min)
+            lo = np.maximum(np.searchsorted(key, center - width, side="left"), obj_offsets[q_trig])
+            hi = np.minimum(np.searchsorted(key, center + width, side="right"), obj_offsets[q_trig + 1])
+            ncand = np.maximum(hi - lo, 0)
+
+            cand_start = np.zeros(len(ncand) + 1, dtype=np.int64)
+            np.cumsum(ncand, out=cand_start[1:])
+            cand_query = np.repeat(query, ncand)
+            cand_obj = order[np.repeat(lo - cand_start[:-1], ncand) + np.arange(cand_start[-1], dtype=np.int64)]
+
+            cand_lep = il[cand_query]
+            dr = _delta_r_flat(lep_eta[cand_lep], lep_phi[cand_lep], obj_eta[cand_obj], obj_phi[cand_obj])
+            hit = dr < threshold
+            match[cand_query[hit]] = True
+
+            if return_index:
+                hit_query, hit_obj = cand_query[hit], cand_obj[hit]
+                # closest object first, lowest index on ties
+                first = np.lexsort((hit_obj, dr[hit], hit_query))
+                hit_query, hit_obj = hit_query[first], hit_obj[first]
+                uniq, pos = np.unique(hit_query, return_index=True)
+                best[uniq] = hit_obj[pos] - obj_offsets[it[uniq]]
+
+    def _to_ak(values):
+        out = ak.Array(
+            ak.contents.ListOffsetArray(
+                ak.index.Index64(lep_offsets),
+                ak.contents.ListOffsetArray(
+                    ak.index.Index64(inner_offsets),
+                    ak.contents.NumpyArray(values),
+                ),
+            ),
+        )
+        return ak.mask(out, ~evt_missing) if evt_option else out
+
+    if return_index:
+        return _to_ak(match), _to_ak(best)
+    return _to_ak(match)
+
+
+
 def get_dataset_lfns(
         dataset_inst: od.Dataset,
         shift_inst: od.Shift,
@@ -351,7 +499,167 @@ def enforce_hcand_type(hcand_pair_concat, field_type_dict):
         
     hcand_array = ak.zip(temp)
     return hcand_array
-    
+
+
+def _plain_layout(layout):
+    # ak.from_iter type inference: no empty content (-> unknown), option only where a None is
+    # present, no record names, var lists, int64 / float64 numbers
+    if layout.length == 0:
+        return ak.contents.EmptyArray()
+    if layout.is_option:
+        valid = np.asarray(layout.mask_as_bool(valid_when=True))
+        content = _plain_layout(layout.project()) if valid.any() else ak.contents.EmptyArray()
+        if valid.all():
+            return content
+        index = np.where(valid, np.cumsum(valid) - 1, -1)
+        return ak.contents.IndexedOptionArray(ak.index.Index64(index), content)
+    if layout.is_indexed:
+        return _plain_layout(layout.project())
+    if layout.is_union:
+        raise TypeError(f"cannot make a plain array from the union type {layout.form.type}, merge the branches first")
+    if layout.is_list:
+        if layout.parameter("__array__") in ("string", "bytestring"):
+            return ak.to_packed(layout, highlevel=False)
+        layout = layout.to_ListOffsetArray64(True)
+        offsets = np.asarray(layout.offsets)
+        return ak.contents.ListOffsetArray(
+            ak.index.Index64(offsets),
+            _plain_layout(layout.content[:offsets[-1]]),
+        )
+    if layout.is_record:
+        return ak.contents.RecordArray(
+            [_plain_layout(content[:layout.length]) for content in layout.contents],
+            None if layout.is_tuple else layout.fields,
+            length=layout.length,
+        )
+    if layout.is_numpy:
+        if layout.data.ndim > 1:
+            return _plain_layout(layout.to_RegularArray())
+        kind = layout.data.dtype.kind
+        dtype = {"b": np.bool_, "i": np.int64, "u": np.int64, "f": np.float64, "c": np.complex128}.get(kind)
+        return ak.contents.NumpyArray(np.asarray(layout.data, dtype=dtype))
+    if isinstance(layout, ak.contents.EmptyArray):
+        return layout
+    raise TypeError(f"unsupported layout {type(layout).__name__}")
+
+
+def as_plain_array(array: ak.Array) -> ak.Array:
+    """
+    Same values and same type as ak.Array(ak.to_list(array)), i.e. without behaviors / record names,
+    with int64 / float64 numbers, var lists and option types only where a None is present, but
+    built on the buffers instead of the round-trip through python objects
+    """
+    return ak.Array(_plain_layout(ak.to_layout(array)))
+
+
+def take_events(value: Any, index: np.ndarray, n: int) -> Any:
+    """
+    *value* restricted to the events *index*: arrays of length *n* are sliced, (nested) dicts such as
+    the aux of a SelectionResult are traversed, everything else is returned as it is
+    """
+    if isinstance(value, dict):
+        return type(value)((key, take_events(val, index, n)) for key, val in value.items())
+    if isinstance(value, (ak.Array, np.ndarray)) and len(value) == n:
+        return value[index]
+    return value
+
+
+def _zeros_like_lists(like: ak.Array, form) -> ak.Array:
+    while not isinstance(form, ak.forms.NumpyForm):
+        form = form.content
+    return ak.values_astype(ak.zeros_like(ak.local_index(like, axis=1)), np.dtype(form.primitive))
+
+
+def scatter_events(
+    value: Any,
+    index: np.ndarray,
+    n: int,
+    fill_like: Optional[ak.Array] = None,
+) -> Any:
+    """
+    Inverse of take_events: the full length (*n*) version of *value*, whose first len(index) entries
+    belong to the (sorted) events *index*. The other events get zeros (False), or empty lists for
+    jagged values, unless *fill_like* (one entry per other event) provides their list structure.
+    *value* may have entries beyond len(index), e.g. a single carrier event that was only processed
+    to know the output types when *index* is empty, they are dropped. Dicts are traversed.
+    """
+    if isinstance(value, dict):
+        return type(value)((key, scatter_events(val, index, n)) for key, val in value.items())
+    if not isinstance(value, (ak.Array, np.ndarray)) or len(value) < len(index) or len(value) == 0:
+        return value
+
+    n_sel = len(index)
+    rest = np.ones(n, dtype=bool)
+    rest[index] = False
+
+    if isinstance(value, np.ndarray):
+        full = np.zeros((n,) + value.shape[1:], dtype=value.dtype)
+        full[index] = value[:n_sel]
+        return full
+
+    if n_sel == n:
+        return value[:n]
+    n_rest = n - n_sel
+    if value.ndim == 1:
+        # taking the first event keeps the exact type, records included
+        fill = ak.zeros_like(value[np.zeros(n_rest, dtype=np.int64)])
+    elif fill_like is not None and value.ndim == 2:
+        fill = _zeros_like_lists(fill_like, value.layout.form)
+    else:
+        fill = value[np.zeros(n_rest, dtype=np.int64)][:, :0]
+
+    order = np.empty(n, dtype=np.int64)
+    order[index] = np.arange(n_sel)
+    order[rest] = n_sel + np.arange(n_rest)
+    return ak.to_packed(ak.concatenate([value[:n_sel], fill], axis=0)[order])
+
+
+def find_to_list_calls(func, _seen: set | None = None) -> list[str]:
+    """
+    Static guard against python object round-trips in the selection: walks the call graph of *func*
+    (a plain function or an ArrayFunction class, following its call_func and the ArrayFunctions in
+    its uses / produces, and the functions of this package it calls by name) and returns the
+    locations of all to_list / tolist calls, e.g.
+
+      assert not find_to_list_calls(main_selector), "to_list in the selection"
+    """
+    import ast
+    import inspect
+    import textwrap
+
+    seen = set() if _seen is None else _seen
+    found = []
+
+    if inspect.isclass(func):
+        if func in seen:
+            return found
+        seen.add(func)
+        for attr in ("call_func", "init_func"):
+            if getattr(func, attr, None) is not None:
+                found += find_to_list_calls(getattr(func, attr), seen)
+        for dep in list(getattr(func, "uses", ())) + list(getattr(func, "produces", ())):
+            if inspect.isclass(dep) and issubclass(dep, ArrayFunction):
+                found += find_to_list_calls(dep, seen)
+        return found
+
+    func = inspect.unwrap(func)
+    if not inspect.isfunction(func) or func in seen or not func.__module__.startswith("httcp"):
+        return found
+    seen.add(func)
+    try:
+        source = textwrap.dedent(inspect.getsource(func))
+    except (OSError, TypeError):
+        return found
+    first_line = func.__code__.co_firstlineno
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, ast.Call):
+            continue
+        if isinstance(node.func, ast.Attribute) and node.func.attr in ("to_list", "tolist"):
+            found.append(f"{inspect.getsourcefile(func)}:{first_line + node.lineno - 1} ({func.__qualname__})")
+        elif isinstance(node.func, ast.Name) and node.func.id in func.__globals__:
+            found += find_to_list_calls(func.__globals__[node.func.id], seen)
+    return found
+
 
 @selector(
     uses={
@@ -413,6 +721,17 @@ def get_trigger_id_map(triggers):
     return tmap
 
 
+def timing_metric(name: str, start: float, verbose: Optional[bool] = False, **fields) -> dict:
+    """
+    Structured timing record replacing the "... takes : x min" prints:
+    one json line {"metric": "timing", "name": ..., "seconds": ..., **fields} per call, logged at
+    info level if verbose and at debug level otherwise. start is a time.perf_counter() value.
+    """
+    record = {"metric": "timing", "name": name, "seconds": round(time.perf_counter() - start, 6), **fields}
+    logger.log(logging.INFO if verbose else logging.DEBUG, json.dumps(record))
+    return record
+
+
 def call_once_on_config(include_hash=False):
     """
     Parametrized decorator to ensure that function *func* is only called once for the config *config*
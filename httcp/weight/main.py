@@ -5,7 +5,7 @@ Default event weight definitions.
 """
 import law
 from columnflow.weight import WeightProducer, weight_producer
-from columnflow.columnar_util import Route
+from columnflow.columnar_util import Route, set_ak_column
 from columnflow.util import maybe_import, pattern_matcher
 
 ak = maybe_import("awkward")
@@ -14,25 +14,73 @@ np = maybe_import("numpy")
 
 logger = law.logger.get_logger(__name__)
 
+
+def weight_block(events: ak.Array, columns: list[str]) -> np.ndarray:
+    """
+    Contiguous (weights, events) float64 block of the weight *columns*, each column is converted
+    from its own dtype once
+    """
+    block = np.empty((len(columns), len(events)), dtype=np.float64)
+    for i, column in enumerate(columns):
+        block[i] = np.asarray(ak.to_numpy(Route(column).apply(events)), dtype=np.float64)
+    return block
+
+
+def leave_one_out_products(block: np.ndarray) -> np.ndarray:
+    """
+    Row i is the product of all rows of *block* but row i, from the running products from both
+    sides (no division, so weights of zero are fine)
+    """
+    if not len(block):
+        return np.ones_like(block)
+    ones = np.ones((1, block.shape[1]), dtype=block.dtype)
+    before = np.cumprod(np.concatenate([ones, block[:-1]]), axis=0)
+    after = np.cumprod(np.concatenate([ones, block[:0:-1]]), axis=0)[::-1]
+    return before * after
+
+
+def shifted_weights(events: ak.Array, block: np.ndarray, shifted_weight_rows: dict) -> dict:
+    """
+    Event weight per shift of *shifted_weight_rows* ({shift: {row: shifted column}}), the product
+    of the nominal *block* with the rows of the shifted columns swapped in. Shifts of a single
+    weight multiply the shifted column into the leave-one-out product of the nominal block
+    """
+    weights = {}
+    loo = None
+    for shift_name, rows in shifted_weight_rows.items():
+        if len(rows) == 1:
+            # single weight column varied, no need to recompute the product
+            if loo is None:
+                loo = leave_one_out_products(block)
+            (row, column), = rows.items()
+            weights[shift_name] = loo[row] * weight_block(events, [column])[0]
+        else:
+            shifted_block = block.copy()
+            shifted_block[list(rows)] = weight_block(events, list(rows.values()))
+            weights[shift_name] = np.prod(shifted_block, axis=0)
+    return weights
+
+
 @weight_producer(
-    #uses={"channel_id", "is_os", "is_low_mt", "is_b_veto", "is_real_2", "is_fake_2", "is_iso_2", "hcand.*"},
+    #uses={"channel_id", "region_bits", "hcand.*"},
     # both produced columns and dependent shifts are defined in init below
     # only run on mc
     mc_only=False,
     # options to keep or drop specific weights
     keep_weights=None,
     drop_weights=None,
+    # also produce the event weight of each weight shift as weight_{shift}, from the nominal
+    # product with the rows of the shifted weight columns swapped in
+    produce_shifted_weights=False,
 )
 def main(self: WeightProducer, events: ak.Array, **kwargs) -> ak.Array:
-    # build the full event weight
-    weight = ak.Array(np.ones(len(events), dtype=np.float32))
-    logger.warning("The following weights will be applied for this dataset")
-    for column in self.weight_columns:
-        logger.info(column)
-        weight = weight * Route(column).apply(events)
+    # build the full event weight, product over the (weights, events) block
+    block = weight_block(events, self.weight_columns)
+    weight = np.prod(block, axis=0)
 
-    logger.warning("And, these are the shifts")
-    logger.info(self.shifts)
+    if self.produce_shifted_weights:
+        for shift_name, shifted in shifted_weights(events, block, self.shifted_weight_rows).items():
+            events = set_ak_column(events, f"weight_{shift_name}", shifted)
 
     return events, weight
 
@@ -100,6 +148,27 @@ def main_init(self: WeightProducer) -> None:
             for shift_inst in self.config_inst.x.event_weights[weight_name]
         }
 
+    # rows of the weight block to swap per shift, and the shifted weight column of each
+    self.shifted_weight_rows = {}
+    if self.produce_shifted_weights:
+        for weight_name in self.weight_columns:
+            for shift_inst in self.config_inst.x.event_weights[weight_name]:
+                rows = {
+                    self.weight_columns.index(src): dst
+                    for src, dst in shift_inst.x("column_aliases", {}).items()
+                    if src in self.weight_columns
+                }
+                if not rows or shift_inst.name in self.shifted_weight_rows:
+                    continue
+                self.shifted_weight_rows[shift_inst.name] = rows
+                self.uses |= set(rows.values())
+                self.produces.add(f"weight_{shift_inst.name}")
+
+    # once per task instead of every chunk
+    dataset_name = getattr(getattr(self, "dataset_inst", None), "name", None)
+    logger.info(f"weights applied for dataset {dataset_name}: {', '.join(self.weight_columns)}")
+    logger.info(f"weight shifts: {', '.join(sorted(self.shifts))}")
+
 
 normalization_only = main.derive(
     "normalization_only",
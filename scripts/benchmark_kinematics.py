@@ -0,0 +1,104 @@
+"""
+Compare the coffea vector behaviors with the flat struct-of-arrays four-vectors of httcp.kinematics
+on synthetic hcand pairs (2 per event) and trigger objects (0-5 per event).
+For each step, reports the time of both paths and the largest absolute difference of the outputs.
+
+  python scripts/benchmark_kinematics.py -n 1000000
+"""
+import time
+import argparse
+import numpy as np
+import awkward as ak
+from coffea.nanoevents.methods import vector
+
+from httcp.kinematics import LorentzVectorArray, metric_table
+
+
+def jagged(rng, counts, low, high):
+    return ak.unflatten(rng.uniform(low, high, int(np.sum(counts))), counts)
+
+
+def collection(rng, counts):
+    return ak.zip({
+        "pt"   : jagged(rng, counts, 20.0, 100.0),
+        "eta"  : jagged(rng, counts, -2.5, 2.5),
+        "phi"  : jagged(rng, counts, -np.pi, np.pi),
+        "mass" : jagged(rng, counts, 0.0, 1.5),
+    })
+
+
+# -- coffea path -- #
+def coffea_pair(hcand):
+    p4 = ak.zip({f: hcand[f] for f in hcand.fields}, with_name="PtEtaPhiMLorentzVector", behavior=vector.behavior)
+    h1, h2 = p4[:, 0], p4[:, 1]
+    return h1, h2, (h1 + h2).mass, h1.delta_r(h2)
+
+
+def coffea_zmf(h1, h2):
+    b = (h1 + h2).boostvec
+    p1, p2 = h1.boost(b.negative()).pvec, h2.boost(b.negative()).pvec
+    return p1.unit.cross(p2.unit).dot(p1.unit)
+
+
+def coffea_match(hcand, trigobj):
+    p4 = ak.zip({f: hcand[f] for f in hcand.fields}, with_name="PtEtaPhiMLorentzVector", behavior=vector.behavior)
+    to = ak.zip({f: trigobj[f] for f in trigobj.fields}, with_name="PtEtaPhiMLorentzVector", behavior=vector.behavior)
+    return ak.any(p4.metric_table(to) < 0.5, axis=-1)
+
+
+# -- httcp.kinematics path -- #
+def flat_pair(hcand):
+    p4 = LorentzVectorArray.from_awkward(hcand)
+    h1, h2 = p4.take(p4.offsets[:-1]), p4.take(p4.offsets[:-1] + 1)
+    return h1, h2, (h1 + h2).mass, h1.delta_r(h2)
+
+
+def flat_zmf(h1, h2):
+    b = (h1 + h2).boostvec
+    p1, p2 = h1.boost(-b).pvec, h2.boost(-b).pvec
+    return p1.unit.cross(p2.unit).dot(p1.unit)
+
+
+def flat_match(hcand, trigobj):
+    dr = metric_table(LorentzVectorArray.from_awkward(hcand), LorentzVectorArray.from_awkward(trigobj))
+    return ak.any(dr < 0.5, axis=-1)
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    out = func(*args)
+    return time.perf_counter() - t0, out
+
+
+def maxdiff(a, b):
+    a = np.asarray(ak.flatten(a, axis=None), dtype=np.float64)
+    b = np.asarray(ak.flatten(b, axis=None), dtype=np.float64)
+    return np.max(np.abs(a - b)) if len(a) else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--npairs", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    hcand = collection(rng, np.full(args.npairs, 2))
+    trigobj = collection(rng, rng.integers(0, 6, args.npairs))
+
+    print(f"{'step':>16s} | {'coffea [s]':>10s} {'flat [s]':>10s} | {'max |diff|':>10s}")
+
+    t_c, (c1, c2, c_mass, c_dr) = timed(coffea_pair, hcand)
+    t_f, (f1, f2, f_mass, f_dr) = timed(flat_pair, hcand)
+    print(f"{'p4, mass, dR':>16s} | {t_c:10.3f} {t_f:10.3f} | {max(maxdiff(c_mass, f_mass), maxdiff(c_dr, f_dr)):10.2e}")
+
+    t_c, c_zmf = timed(coffea_zmf, c1, c2)
+    t_f, f_zmf = timed(flat_zmf, f1, f2)
+    print(f"{'ZMF boost, cross':>16s} | {t_c:10.3f} {t_f:10.3f} | {maxdiff(c_zmf, f_zmf):10.2e}")
+
+    t_c, c_match = timed(coffea_match, hcand, trigobj)
+    t_f, f_match = timed(flat_match, hcand, trigobj)
+    print(f"{'dR metric table':>16s} | {t_c:10.3f} {t_f:10.3f} | {maxdiff(c_match, f_match):10.2e}")
+
+
+if __name__ == "__main__":
+    main()
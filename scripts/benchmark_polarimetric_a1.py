@@ -0,0 +1,65 @@
+"""
+Throughput of the CLEO 3-pion form factor used in PolarimetricA1
+for the "awkward" (TComplex), "numpy" and "numba" backends on synthetic 3-prong kinematics.
+
+  python scripts/benchmark_polarimetric_a1.py -n 1000000
+"""
+import time
+import argparse
+import numpy as np
+import awkward as ak
+
+from httcp.production.PolarimetricA1 import PolarimetricA1
+from httcp.production.PolarimetricA1Kernels import HAS_NUMBA
+
+
+MPI = 0.13957018
+MTAU = 1.776
+
+
+def three_prong_invariants(n, seed=42):
+    """
+    a1 -> rho pi -> 3 pi with flat a1 and rho masses, returns QQ, s1, s2, s3
+    """
+    rng = np.random.default_rng(seed)
+    ma1 = rng.uniform(3*MPI + 0.05, MTAU, n)
+    mrho = rng.uniform(2*MPI + 0.01, ma1 - MPI - 0.01)
+    s3 = mrho**2
+    # s1 + s2 + s3 = QQ + 3 mpi^2, split s1 and s2 uniformly within the kinematic range
+    rest = ma1**2 + 3*MPI**2 - s3
+    s1 = rng.uniform(4*MPI**2, rest - 4*MPI**2)
+    s2 = rest - s1
+    return ma1**2, s1, s2, s3
+
+
+def run(backend, QQ, s1, s2, s3, repeat):
+    pa = PolarimetricA1(None, None, None, None, ak.Array([1]), backend=backend)
+    if backend == "awkward":
+        QQ, s1, s2, s3 = (ak.Array(x) for x in (QQ, s1, s2, s3))
+        func = lambda: [pa.F3PI(1, QQ, s1, s2), pa.F3PI(2, QQ, s2, s1), pa.F3PI(3, QQ, s3, s1)]
+    else:
+        func = lambda: pa.F3PIFactors(QQ, s1, s2, s3)
+    # warm up, includes the jit compilation
+    func()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return repeat * len(QQ) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--nevents", type=int, default=1_000_000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    QQ, s1, s2, s3 = three_prong_invariants(args.nevents)
+
+    print(f"numba available: {HAS_NUMBA}")
+    for backend in ["awkward", "numpy", "numba"]:
+        rate = run(backend, QQ, s1, s2, s3, args.repeat)
+        print(f"{backend:>8s} : {rate:12.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Wall time of cf.SelectEvents with the main selector against main_staged (object, pair and hcand
+stages on the events passing json, met filters and trigger with at least two leptons only) on one
+chunk of a dataset, a DY one by default, and a check that both give the same selection:
+
+  - the same event mask and the same cumulative cutflow (step order included),
+  - the same objects and produced columns for the selected events.
+
+Single step and n-1 counts are not compared, main_staged sets the later steps of skipped events to
+False. Both outputs of the branch are removed and recomputed in each run, its inputs (calibration,
+external files) are produced by the first run if needed, so it is not timed.
+
+  python scripts/benchmark_selection_prefilter.py --config run3_2022_preEE_nano_tau_v12 --dataset dy_lep_m50_madgraph --branch 0
+"""
+import re
+import sys
+import time
+import json
+import argparse
+import subprocess
+
+import numpy as np
+import awkward as ak
+
+
+SELECTORS = ["main", "main_staged"]
+
+
+def law_args(args, selector):
+    return [
+        "--config", args.config, "--dataset", args.dataset, "--version", args.version,
+        "--selector", selector, "--branch", str(args.branch), "--workflow", "local",
+    ] + args.law_args
+
+
+def run_select_events(args, selector, remove=True):
+    # the object stage timings are logged at debug level unless verbose.selection.main is set
+    cmd = ["law", "run", "cf.SelectEvents"] + law_args(args, selector) + ["--log-level", "DEBUG"]
+    if remove:
+        cmd += ["--remove-output", "0,a,y"]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    seconds = time.perf_counter() - t0
+    if proc.returncode != 0:
+        sys.stdout.write(proc.stdout)
+        raise RuntimeError(f"cf.SelectEvents with selector {selector} failed")
+    # object stage timings of the main selector, one record per chunk
+    stages = [
+        json.loads(m.group(0))
+        for m in re.finditer(r"\{\"metric\": \"timing\", \"name\": \"selection_object_stages\".*?\}", proc.stdout)
+    ]
+    return seconds, stages
+
+
+def load_outputs(args, selector):
+    from columnflow.tasks.selection import SelectEvents
+
+    task = SelectEvents(
+        config=args.config, dataset=args.dataset, version=args.version, selector=selector,
+        branch=args.branch, workflow="local",
+    )
+    outputs = task.output()
+    return outputs["results"].load(formatter="awkward"), outputs["columns"].load(formatter="awkward")
+
+
+def leaves(array, prefix=()):
+    fields = ak.fields(array)
+    if not fields:
+        yield ".".join(prefix), array
+        return
+    for field in fields:
+        yield from leaves(array[field], prefix + (field,))
+
+
+def compare(full, staged):
+    (res_full, cols_full), (res_staged, cols_staged) = full, staged
+    problems = []
+
+    event = ak.to_numpy(res_full.event)
+    if not np.array_equal(event, ak.to_numpy(res_staged.event)):
+        problems.append("event masks differ")
+    steps = ak.fields(res_full.steps)
+    if steps != ak.fields(res_staged.steps):
+        problems.append(f"steps differ: {steps} / {ak.fields(res_staged.steps)}")
+    else:
+        cumulative = lambda res: np.logical_and.accumulate(
+            np.stack([ak.to_numpy(res.steps[step]) for step in steps], axis=1), axis=1,
+        ).sum(axis=0)
+        if not np.array_equal(cumulative(res_full), cumulative(res_staged)):
+            problems.append("cumulative cutflows differ")
+
+    for kind, a, b in [("objects", res_full.objects, res_staged.objects), ("columns", cols_full, cols_staged)]:
+        leaves_a, leaves_b = dict(leaves(a[event])), dict(leaves(b[event]))
+        if set(leaves_a) != set(leaves_b):
+            problems.append(f"{kind} differ: {sorted(set(leaves_a) ^ set(leaves_b))}")
+        for name in sorted(set(leaves_a) & set(leaves_b)):
+            if str(ak.type(leaves_a[name])) != str(ak.type(leaves_b[name])):
+                problems.append(f"{kind} {name}: types differ")
+            elif not ak.all(ak.ravel(leaves_a[name] == leaves_b[name])):
+                problems.append(f"{kind} {name}: values differ")
+    return int(event.sum()), len(event), problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="run3_2022_preEE_nano_tau_v12")
+    parser.add_argument("--dataset", default="dy_lep_m50_madgraph")
+    parser.add_argument("--branch", type=int, default=0, help="branch, i.e. chunk of the dataset")
+    parser.add_argument("--version", default="bench_prefilter")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="runs per selector, the median is shown")
+    parser.add_argument("law_args", nargs="*", help="further cf.SelectEvents parameters, after --")
+    args = parser.parse_args()
+
+    # produce the inputs once, outside of the timing
+    run_select_events(args, SELECTORS[0], remove=False)
+
+    timings = {}
+    for selector in SELECTORS:
+        runs = [run_select_events(args, selector) for _ in range(args.repeat)]
+        seconds = float(np.median([run[0] for run in runs]))
+        stages = [stage for run in runs for stage in run[1]]
+        timings[selector] = seconds
+        line = f"{selector:<12s}: {seconds:8.1f} s per task"
+        if stages:
+            line += (f", object stages {np.median([s['seconds'] for s in stages]):.1f} s on "
+                     f"{stages[-1]['n_processed']} / {stages[-1]['n_events']} events")
+        print(line)
+    print(f"speedup     : {timings['main'] / timings['main_staged']:.2f}")
+
+    n_selected, n_events, problems = compare(*(load_outputs(args, selector) for selector in SELECTORS))
+    print(f"selected    : {n_selected} / {n_events} events")
+    for problem in problems:
+        print(f"MISMATCH    : {problem}")
+    if not problems:
+        print("outputs     : identical event masks, cutflows, objects and columns of the selected events")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Count the correctionlib calls and the wall time per chunk of httcp.production.tau_weights for the
+working tree and a reference revision, on synthetic tau-channel events with counting mock correctors
+(inputs -> deterministic float64 values, so the produced weights can be compared as well).
+The reference httcp package is extracted with git archive and both versions run in their own
+subprocess, so their producers never share an interpreter.
+
+  python scripts/benchmark_tau_weights.py --ref HEAD~1 -n 200000 -c 5
+"""
+import os
+import sys
+import zlib
+import json
+import time
+import argparse
+import tarfile
+import tempfile
+import subprocess
+from types import SimpleNamespace
+from collections import Counter
+
+import numpy as np
+import awkward as ak
+
+
+WEIGHT_COLUMNS = ["tau_weight", "tau_weight_up", "tau_weight_down"] + [
+    f"tau_weight_{unc}_{direction}"
+    for direction in ["up", "down"]
+    for unc in [
+        "jet_dm0", "jet_dm1", "jet_dm10", "e_barrel", "e_endcap",
+        "mu_0p0To0p4", "mu_0p4To0p8", "mu_0p8To1p2", "mu_1p2To1p7", "mu_1p7To2p3",
+    ]
+]
+
+
+class MockCorrector:
+
+    def __init__(self, name, calls, version=1):
+        self.name = name
+        self.calls = calls
+        self.version = version
+
+    def evaluate(self, *args):
+        self.calls[self.name] += 1
+        value = np.ones(len(args[0]), dtype=np.float64)
+        for i, arg in enumerate(args):
+            if isinstance(arg, np.ndarray):
+                value += 0.01 * (i + 1) * np.sin(np.asarray(arg, dtype=np.float64))
+            else:
+                value += 0.001 * (zlib.crc32(str(arg).encode()) % 97)
+        return value
+
+
+def make_events(rng, nevents):
+    ntau = rng.integers(0, 4, nevents)
+    njet = rng.integers(0, 5, nevents)
+    n = int(ntau.sum())
+    m = int(njet.sum())
+    flag = lambda p: rng.uniform(size=nevents) < p
+    return ak.Array({
+        "channel_id": rng.choice([0, 1, 2, 4], nevents).astype(np.uint8),
+        "single_triggered": flag(0.5), "cross_triggered": flag(0.3),
+        "single_e_triggered": flag(0.3), "cross_e_triggered": flag(0.2),
+        "single_mu_triggered": flag(0.3), "cross_mu_triggered": flag(0.2),
+        "cross_tau_triggered": flag(0.3), "cross_tau_jet_triggered": flag(0.1),
+        "Tau": ak.zip({
+            "pt": ak.unflatten(rng.uniform(20.0, 120.0, n).astype(np.float32), ntau),
+            "eta": ak.unflatten(rng.uniform(-2.3, 2.3, n).astype(np.float32), ntau),
+            "genPartFlav": ak.unflatten(rng.choice([0, 1, 2, 3, 4, 5], n).astype(np.uint8), ntau),
+            "decayModeHPS": ak.unflatten(rng.choice([0, 1, 2, 5, 6, 10, 11], n).astype(np.int32), ntau),
+        }),
+        "Jet": ak.zip({
+            "pt": ak.unflatten(rng.uniform(20.0, 200.0, m).astype(np.float32), njet),
+            "eta": ak.unflatten(rng.uniform(-4.7, 4.7, m).astype(np.float32), njet),
+        }),
+    })
+
+
+def make_producer_self(calls):
+    import order as od
+    from columnflow.util import DotDict
+
+    campaign = od.Campaign(name="bench_campaign", id=1, aux={"run": 3})
+    config = od.Config(name="bench_config", id=1, campaign=campaign)
+    for name, channel_id in [("etau", 1), ("mutau", 2), ("tautau", 4)]:
+        config.add_channel(name=name, id=channel_id)
+    config.x.deep_tau_tagger = "DeepTau2018v2p5"
+    config.x.deep_tau_info = DotDict.wrap({
+        "DeepTau2018v2p5": {
+            "vs_e": {"etau": "Tight", "mutau": "VVLoose", "tautau": "VVLoose"},
+            "vs_m": {"etau": "Loose", "mutau": "Tight", "tautau": "VLoose"},
+            "vs_j": {"etau": "Tight", "mutau": "Medium", "tautau": "VTight"},
+        },
+    })
+    return SimpleNamespace(
+        config_inst=config,
+        id_vs_jet_corrector=MockCorrector("id_vs_jet", calls),
+        id_vs_e_corrector=MockCorrector("id_vs_e", calls),
+        id_vs_mu_corrector=MockCorrector("id_vs_mu", calls),
+        trig_corrector=MockCorrector("trigger", calls),
+        trig_jetleg_corrector=MockCorrector("trigger_jetleg", calls),
+    )
+
+
+def measure(args):
+    """
+    Runs in the subprocess, with the httcp package to measure first on sys.path.
+    """
+    from httcp.production.tau_weights import tau_weights
+    call_func = getattr(tau_weights, "call_func", tau_weights)
+
+    calls = Counter()
+    producer_self = make_producer_self(calls)
+    rng = np.random.default_rng(args.seed)
+    chunks = [make_events(rng, args.nevents) for _ in range(args.chunks)]
+
+    times = []
+    weights = {}
+    for events in chunks:
+        t0 = time.perf_counter()
+        events, *_ = call_func(producer_self, events, do_syst=True)
+        times.append(time.perf_counter() - t0)
+        for column in WEIGHT_COLUMNS:
+            weights.setdefault(column, []).append(ak.to_numpy(events[column]))
+    np.savez(args.output, **{column: np.concatenate(values) for column, values in weights.items()})
+    print(json.dumps({
+        "calls_per_chunk": {name: n / args.chunks for name, n in sorted(calls.items())},
+        "seconds_per_chunk": float(np.median(times)),
+    }))
+
+
+def run(pythonpath, args, output):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([pythonpath, os.environ.get("PYTHONPATH", "")]))
+    cmd = [
+        sys.executable, __file__, "--measure", "-n", str(args.nevents), "-c", str(args.chunks),
+        "-s", str(args.seed), "--output", output,
+    ]
+    out = subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", default="HEAD~1", help="git revision to compare against")
+    parser.add_argument("-n", "--nevents", type=int, default=200_000, help="events per chunk")
+    parser.add_argument("-c", "--chunks", type=int, default=5)
+    parser.add_argument("-s", "--seed", type=int, default=42)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        return measure(args)
+
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        ref_dir = os.path.join(tmp, "ref")
+        os.makedirs(ref_dir)
+        archive = os.path.join(tmp, "ref.tar")
+        subprocess.run(["git", "-C", repo, "archive", "-o", archive, args.ref, "httcp"], check=True)
+        with tarfile.open(archive) as tar:
+            tar.extractall(ref_dir)
+
+        before = run(ref_dir, args, os.path.join(tmp, "before.npz"))
+        after = run(repo, args, os.path.join(tmp, "after.npz"))
+        w_before = np.load(os.path.join(tmp, "before.npz"))
+        w_after = np.load(os.path.join(tmp, "after.npz"))
+
+    print(f"{args.chunks} chunks of {args.nevents} events, do_syst=True, reference {args.ref}")
+    print(f"{'corrector':>16s} | {'before':>8s} {'after':>8s}   (calls per chunk)")
+    for name in sorted(set(before["calls_per_chunk"]) | set(after["calls_per_chunk"])):
+        print(f"{name:>16s} | {before['calls_per_chunk'].get(name, 0):8.1f} {after['calls_per_chunk'].get(name, 0):8.1f}")
+    print(f"{'total':>16s} | {sum(before['calls_per_chunk'].values()):8.1f} {sum(after['calls_per_chunk'].values()):8.1f}")
+    print(f"{'time [s]':>16s} | {before['seconds_per_chunk']:8.3f} {after['seconds_per_chunk']:8.3f}")
+
+    maxdiff = max(float(np.max(np.abs(w_before[c] - w_after[c]), initial=0.0)) for c in WEIGHT_COLUMNS)
+    print(f"max |diff| of the weight columns: {maxdiff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Micro-benchmark of TComplex arithmetic per million taus (var * 1 layout as for the hcand legs)
+comparing the previous awkward re / im implementation with the complex128 one in httcp.production.TComplex.
+Reports wall time and peak of the traced (numpy / awkward buffer) memory for
+multiply, divide and Breit-Wigner chains.
+
+  python scripts/benchmark_tcomplex.py -n 1000000
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import awkward as ak
+
+from httcp.production.TComplex import TComplex
+
+
+class LegacyTComplex:
+    """
+    The arithmetic of the previous TComplex: separate awkward arrays for the real and imaginary parts
+    """
+    def __init__(self, re=0, im=0):
+        if isinstance(re, ak.Array) and isinstance(im, (int, float)):
+            im = im * ak.ones_like(re)
+        self.fRe = re
+        self.fIm = im
+
+    def Re(self):
+        return self.fRe
+
+    def Im(self):
+        return self.fIm
+
+    def Rho2(self):
+        return self.fRe**2 + self.fIm**2
+
+    def __mul__(self, other):
+        if isinstance(other, LegacyTComplex):
+            return LegacyTComplex(self.fRe * other.fRe - self.fIm * other.fIm, self.fRe * other.fIm + self.fIm * other.fRe)
+        return LegacyTComplex(self.fRe * other, self.fIm * other)
+
+    def __add__(self, other):
+        return LegacyTComplex(self.fRe + other.fRe, self.fIm + other.fIm)
+
+    def __truediv__(self, other):
+        rho2 = other.Rho2()
+        return LegacyTComplex((self.fRe * other.fRe + self.fIm * other.fIm) / rho2,
+                              (-self.fRe * other.fIm + self.fIm * other.fRe) / rho2)
+
+
+def breit_wigner(cls, S, M, G):
+    # same structure as PolarimetricA1.BWIGML
+    MSQ = M*M
+    WGS = G * (MSQ / np.sqrt(S)) * (S / MSQ)
+    return cls(MSQ, 0.) / cls(MSQ - S, -1. * WGS)
+
+
+def chains(cls, a, b):
+    return {
+        "multiply"     : lambda: ((cls(a, b) * cls(b, a)) * cls(a, a)).Re(),
+        "divide"       : lambda: ((cls(a, b) / cls(b, a)) / cls(a, 1.0)).Re(),
+        "Breit-Wigner" : lambda: (breit_wigner(cls, a, 0.7743, 0.1491)
+                                  + breit_wigner(cls, a, 1.370, 0.386)
+                                  + breit_wigner(cls, b, 1.275, 0.185)).Re(),
+    }
+
+
+def measure(func, repeat):
+    func()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    dt = (time.perf_counter() - t0) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dt, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--ntaus", type=int, default=1_000_000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    counts = np.ones(args.ntaus, dtype=np.int64)
+    a = ak.unflatten(rng.uniform(0.1, 3.0, args.ntaus), counts)
+    b = ak.unflatten(rng.uniform(0.1, 3.0, args.ntaus), counts)
+
+    scale = 1e6 / args.ntaus
+    legacy = chains(LegacyTComplex, a, b)
+    current = chains(TComplex, a, b)
+    print(f"{'chain':>14s} | {'legacy [s]':>10s} {'new [s]':>10s} | {'legacy [MB]':>11s} {'new [MB]':>10s}   (per 1M taus)")
+    for name in legacy:
+        t_old, m_old = measure(legacy[name], args.repeat)
+        t_new, m_new = measure(current[name], args.repeat)
+        print(f"{name:>14s} | {t_old*scale:10.3f} {t_new*scale:10.3f} | "
+              f"{m_old*scale/2**20:11.1f} {m_new*scale/2**20:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Throughput of the trigger object matching: trigger_object_matching_deep (full metric table) against
+trigger_object_matching_sparse (eta-sorted window on the flat buffers) for growing trigger object
+multiplicities. Inputs are generated as in tests/test_trigobj_matching.py.
+Reports events/s and the peak of the traced (numpy / awkward buffer) memory.
+
+  python scripts/benchmark_trigobj_matching.py -n 200000
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import awkward as ak
+from coffea.nanoevents.methods import vector
+
+from httcp.util import trigger_object_matching_deep, trigger_object_matching_sparse
+
+
+def make_inputs(rng, nevents, maxobj):
+    nlep = rng.integers(1, 4, nevents)
+    ntrig = rng.integers(1, 4, nevents)
+    ntrig_tot = int(np.sum(ntrig))
+    nobj = rng.integers(0, maxobj + 1, ntrig_tot)
+
+    def p4(counts):
+        n = int(np.sum(counts))
+        return {
+            "pt"   : rng.uniform(15.0, 80.0, n).astype(np.float32),
+            "eta"  : rng.uniform(-2.5, 2.5, n).astype(np.float32),
+            "phi"  : rng.uniform(-np.pi, np.pi, n).astype(np.float32),
+            "mass" : np.zeros(n, dtype=np.float32),
+        }
+
+    leps = ak.zip({k: ak.unflatten(v, nlep) for k, v in p4(nlep).items()},
+                  with_name="PtEtaPhiMLorentzVector", behavior=vector.behavior)
+    objs = ak.zip({k: ak.unflatten(ak.unflatten(v, nobj), ntrig) for k, v in p4(nobj).items()},
+                  with_name="PtEtaPhiMLorentzVector", behavior=vector.behavior)
+    minpt = ak.unflatten(rng.choice([20.0, 30.0, 40.0], ntrig_tot), ntrig)
+    maxeta = ak.unflatten(np.full(ntrig_tot, 2.1), ntrig)
+    return leps, objs, minpt, maxeta
+
+
+def measure(func, args, repeat):
+    func(*args)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    dt = (time.perf_counter() - t0) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dt, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--nevents", type=int, default=200_000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'max objs':>8s} | {'deep [evt/s]':>12s} {'sparse [evt/s]':>14s} | {'deep [MB]':>9s} {'sparse [MB]':>11s}")
+    for maxobj in (2, 5, 10, 20):
+        inputs = make_inputs(np.random.default_rng(42), args.nevents, maxobj)
+        t_old, m_old = measure(trigger_object_matching_deep, inputs, args.repeat)
+        t_new, m_new = measure(trigger_object_matching_sparse, inputs, args.repeat)
+        print(f"{maxobj:8d} | {args.nevents/t_old:12.3g} {args.nevents/t_new:14.3g} | "
+              f"{m_old/2**20:9.1f} {m_new/2**20:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Dense, memory-mappable cache of MergeHistograms / CreateCutflowHistograms outputs, and plots from it.
+
+  build    load the pickled hists matching a glob in a process pool and store their values (and
+           variances) as .npy files plus an index.json, which is updated while the inputs are
+           converted; inputs whose size and mtime did not change are skipped, so the command can be
+           rerun after new outputs arrive or an interrupted build, unreadable pickles are reported
+           and skipped
+  plot     data to data comparison of one or more variables (former make_joint_hist*.py): the hists
+           of each group are summed and normalized to unit area, the ratio of the shapes is shown
+           for the first two groups
+  cutflow  selection efficiency per step (former make_cutflow_hist.py)
+
+Groups are NAME=REGEX pairs matched against "<config>/<dataset>" of each input, the default is one
+group per config. The plot commands only memory-map the cached arrays and never touch the pickles.
+Axes that are not plotted are summed, except "shift", for which the first bin (nominal) is taken;
+--select AXIS=VALUE picks single bins instead.
+
+  python scripts/hist_cache.py build "$CF_STORE_LOCAL/analysis_httcp/cf.MergeHistograms/*/data_mu_*/nominal/*/*/*/dev1/hist__*.pickle" -c hcache -j 8
+  python scripts/hist_cache.py plot -c hcache -v muon_pt tau_pt -g UL2018=run2_UL2018 -g 2022_postEE=run3_2022_postEE
+  python scripts/hist_cache.py cutflow -c hcache -g 2022_preEE=run3_2022_preEE --rel
+"""
+import os
+import re
+import sys
+import glob
+import json
+import pickle
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+INDEX = "index.json"
+
+# number of converted inputs after which the index is written during a build
+INDEX_WRITE_EVERY = 50
+
+
+def describe_path(path):
+    """
+    task, config, dataset and variable of a columnflow output path
+    .../cf.<Task>/<config>/<dataset>/.../<prefix>__<variable>.pickle
+    """
+    parts = os.path.normpath(os.path.abspath(path)).split(os.sep)
+    task_idx = max((i for i, p in enumerate(parts) if p.startswith("cf.")), default=None)
+    if task_idx is None or len(parts) < task_idx + 3:
+        task, config, dataset = None, None, None
+    else:
+        task, config, dataset = parts[task_idx][3:], parts[task_idx + 1], parts[task_idx + 2]
+    m = re.match(r"^(?:.*__)?(.+?)\.pickle$", parts[-1])
+    return {"task": task, "config": config, "dataset": dataset, "variable": m.group(1) if m else parts[-1]}
+
+
+def describe_axis(ax):
+    import hist
+
+    desc = {"name": ax.name, "label": ax.label}
+    if isinstance(ax, (hist.axis.IntCategory, hist.axis.StrCategory)):
+        desc["categories"] = list(ax)
+    else:
+        desc["edges"] = np.asarray(ax.edges, dtype=np.float64).tolist()
+    return desc
+
+
+def save_npy(path, array):
+    # write to a temporary file first, readers must never see partial arrays
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+def load_dense(args):
+    """
+    Runs in the pool: unpickles one hist, stores its dense values / variances, returns its entry,
+    or None and the error if the pickle cannot be read
+    """
+    path, stat, cache_dir, key = args
+    try:
+        with open(path, "rb") as f:
+            h = pickle.load(f)
+    except Exception as e:
+        return key, None, f"{type(e).__name__}: {e}"
+    values = h.values()
+    variances = h.variances()
+    save_npy(os.path.join(cache_dir, f"{key}.values.npy"), values)
+    if variances is not None:
+        save_npy(os.path.join(cache_dir, f"{key}.variances.npy"), variances)
+    return key, dict(
+        describe_path(path),
+        source=path,
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        shape=list(values.shape),
+        has_variances=variances is not None,
+        axes=[describe_axis(ax) for ax in h.axes],
+    ), None
+
+
+def read_index(cache_dir):
+    path = os.path.join(cache_dir, INDEX)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_index(cache_dir, index):
+    path = os.path.join(cache_dir, INDEX)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(f"{path}.tmp", path)
+
+
+def build(args):
+    os.makedirs(args.cache, exist_ok=True)
+    index = read_index(args.cache)
+
+    todo = []
+    n_inputs = 0
+    for pattern in args.inputs:
+        for path in sorted(glob.glob(os.path.expandvars(os.path.expanduser(pattern)), recursive=True)):
+            n_inputs += 1
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            key = hashlib.sha1(path.encode()).hexdigest()
+            entry = index.get(key)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            todo.append((path, stat, args.cache, key))
+
+    n_failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for i, (key, entry, error) in enumerate(pool.map(load_dense, todo), 1):
+                if entry is None:
+                    n_failed += 1
+                    print(f"[{i}/{len(todo)}] skipping unreadable {todo[i - 1][0]}: {error}", file=sys.stderr)
+                    continue
+                index[key] = entry
+                print(f"[{i}/{len(todo)}] {entry['config']}/{entry['dataset']} {entry['variable']}")
+                if i % INDEX_WRITE_EVERY == 0:
+                    write_index(args.cache, index)
+    finally:
+        # keep what was converted so far, also when interrupted
+        write_index(args.cache, index)
+    print(f"{len(todo) - n_failed} of {n_inputs} inputs converted, {n_failed} unreadable, "
+          f"{len(index)} entries in {args.cache}")
+
+
+def parse_groups(groups, index):
+    if groups:
+        return [(name, re.compile(regex)) for name, regex in (g.split("=", 1) for g in groups)]
+    configs = sorted({entry["config"] for entry in index.values()})
+    return [(config, re.compile(f"^{re.escape(config)}/")) for config in configs]
+
+
+def parse_selects(selects):
+    return dict(s.split("=", 1) for s in selects or [])
+
+
+def select_index(axis, value):
+    categories = axis["categories"]
+    for i, cat in enumerate(categories):
+        if str(cat) == value:
+            return i
+    raise ValueError(f"{value} not found on axis {axis['name']} with bins {categories}")
+
+
+def project(cache_dir, entry, key, keep, selects):
+    """
+    Memory-maps the values / variances of *entry* and reduces all axes but *keep* in one go
+    """
+    arrays = [np.load(os.path.join(cache_dir, f"{key}.values.npy"), mmap_mode="r")]
+    if entry["has_variances"]:
+        arrays.append(np.load(os.path.join(cache_dir, f"{key}.variances.npy"), mmap_mode="r"))
+
+    index = []
+    sum_axes = []
+    for i, axis in enumerate(entry["axes"]):
+        if axis["name"] == keep:
+            index.append(slice(None))
+        elif axis["name"] in selects:
+            index.append(select_index(axis, selects[axis["name"]]))
+        elif axis["name"] == "shift":
+            index.append(0)
+        else:
+            index.append(slice(None))
+            sum_axes.append(i)
+    # integer indices drop their axes, shift the summed ones accordingly
+    dropped = [i for i, idx in enumerate(index) if not isinstance(idx, slice)]
+    sum_axes = tuple(i - sum(d < i for d in dropped) for i in sum_axes)
+    reduced = [np.asarray(a[tuple(index)]).sum(axis=sum_axes) for a in arrays]
+    return reduced[0], (reduced[1] if len(reduced) > 1 else reduced[0])
+
+
+def sum_groups(args, index, variable, keep):
+    """
+    group name -> summed (values, variances) along axis *keep*, plus the axis description
+    """
+    groups = parse_groups(args.groups, index)
+    selects = parse_selects(args.select)
+    sums = {}
+    axis = None
+    for key, entry in sorted(index.items(), key=lambda item: item[1]["source"]):
+        if entry["variable"] != variable or keep not in [ax["name"] for ax in entry["axes"]]:
+            continue
+        name = f"{entry['config']}/{entry['dataset']}"
+        for group, regex in groups:
+            if not regex.search(name):
+                continue
+            values, variances = project(args.cache, entry, key, keep, selects)
+            if group in sums:
+                np.add(sums[group][0], values, out=sums[group][0])
+                np.add(sums[group][1], variances, out=sums[group][1])
+            else:
+                sums[group] = (values.astype(np.float64), variances.astype(np.float64))
+            axis = axis or next(ax for ax in entry["axes"] if ax["name"] == keep)
+    # keep the order of the groups given on the command line
+    return {group: sums[group] for group, _ in groups if group in sums}, axis
+
+
+def cms_label(ax, **kwargs):
+    import mplhep
+
+    mplhep.cms.label(ax=ax, llabel="Private work", fontsize=22, data=True, rlabel="Data to Data", **kwargs)
+
+
+def plot_variable(args, index, variable):
+    import matplotlib.pyplot as plt
+    import mplhep
+
+    # the variable axis is the last one of the MergeHistograms outputs
+    entry = next((e for e in index.values() if e["variable"] == variable), None)
+    if entry is None:
+        print(f"no cached hists for variable {variable}")
+        return
+    keep = entry["axes"][-1]["name"]
+    sums, axis = sum_groups(args, index, variable, keep)
+    if not sums:
+        print(f"no group matches the hists of variable {variable}")
+        return
+
+    edges = np.asarray(axis["edges"])
+    x_vals = (edges[:-1] + edges[1:]) / 2
+    x_err = (edges[1:] - edges[:-1]) / 2
+
+    plt.style.use(mplhep.style.CMS)
+    fig, (ax, ax_ratio) = plt.subplots(2, 1, gridspec_kw={"height_ratios": [3, 1]}, sharex=True)
+    colors = ["red", "black", "green", "cyan"]
+    # shapes normalized to unit area, the groups usually differ in luminosity
+    norms = []
+    for i, (name, (values, variances)) in enumerate(sums.items()):
+        norm, sigma = values / np.sum(values), np.sqrt(variances) / np.sum(values)
+        ax.errorbar(x_vals, norm, xerr=x_err, yerr=sigma, fmt="o", color=colors[i % len(colors)],
+                    alpha=0.8, label=f"Data {name}")
+        norms.append((norm, sigma))
+    ax.set_ylim(0, 1.5 * max(np.max(norm) for norm, _ in norms))
+    ax.set_ylabel("Event density")
+
+    # ratio of the normalized first two groups
+    if len(norms) > 1:
+        (nom, sigma_nom), (den, sigma_den) = norms[:2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            y_vals = nom / den
+            y_err = (sigma_nom / nom + sigma_den / den) * y_vals
+        ax_ratio.errorbar(x_vals, y_vals, yerr=y_err, xerr=x_err, fmt="o", color="black", alpha=0.8)
+        if args.adaptive_ratio:
+            ax_ratio.set_ylim(0.5 * np.nanmin(y_vals), 1.2 * np.nanmax(y_vals))
+        else:
+            ax_ratio.set_ylim(0.5, 1.5)
+    ax_ratio.set_ylabel("Ratio")
+    ax_ratio.set_xlabel(axis["label"])
+    ax_ratio.grid(True)
+    ax.legend()
+    ax.grid(True)
+    cms_label(ax)
+    plt.tight_layout()
+
+    os.makedirs(args.output, exist_ok=True)
+    plot_name = os.path.join(args.output, f"tau_joint_plot_{variable}.{args.ext}")
+    fig.savefig(plot_name, bbox_inches="tight")
+    plt.close(fig)
+    print(f"Plot saved to {plot_name}")
+
+
+def plot(args):
+    index = read_index(args.cache)
+    variables = args.variables or sorted({e["variable"] for e in index.values() if e["task"] == "MergeHistograms"})
+    for variable in variables:
+        print(f"plotting {variable}...")
+        plot_variable(args, index, variable)
+
+
+def cutflow(args):
+    import matplotlib.pyplot as plt
+    import mplhep
+
+    index = read_index(args.cache)
+    sums, axis = sum_groups(args, index, args.variable, "step")
+    if not sums:
+        print(f"no cached cutflow hists for variable {args.variable}")
+        return
+    cuts = [str(cut) for cut in axis["categories"]]
+
+    plt.style.use(mplhep.style.CMS)
+    fig, ax = plt.subplots()
+    if args.log:
+        plt.yscale("log")
+        ax.set_ylim(1e-2, 2)
+    colors = ["black", "red", "green", "cyan"]
+    for i, (name, (n_evt, _)) in enumerate(sums.items()):
+        for cut_name, the_n_evt in zip(cuts, n_evt):
+            print(f"{name} {cut_name}: {the_n_evt}")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x, y = (cuts[1:], n_evt[1:] / n_evt[:-1]) if args.rel else (cuts, n_evt / n_evt[0])
+        ax.scatter(x, y, color=colors[i % len(colors)], marker="o", alpha=0.8, label=f"Data {name}")
+    ax.set_xlabel("Selections")
+    ax.set_ylabel("Selection efficiency")
+    ax.set_xticks(range(len(x)))
+    ax.set_xticklabels(x, rotation=45, ha="right")
+    ax.legend()
+    ax.grid(True, which="both", axis="y")
+    ax.grid(True, which="major", axis="x")
+    cms_label(ax)
+    plt.tight_layout()
+
+    os.makedirs(args.output, exist_ok=True)
+    plot_name = os.path.join(args.output, f"cutflow_histogram.{args.ext}")
+    fig.savefig(plot_name, bbox_inches="tight")
+    plt.close(fig)
+    print(f"Plot saved to {plot_name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="convert pickled hists into the cache")
+    build_parser.add_argument("inputs", nargs="+", help="globs of pickled hists")
+    build_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    build_parser.set_defaults(func=build)
+
+    plot_parser = subparsers.add_parser("plot", help="data to data comparison of variables")
+    plot_parser.add_argument("-v", "--variables", nargs="+", help="default: all cached MergeHistograms variables")
+    plot_parser.add_argument("--adaptive-ratio", action="store_true")
+    plot_parser.set_defaults(func=plot)
+
+    cutflow_parser = subparsers.add_parser("cutflow", help="selection efficiency per step")
+    cutflow_parser.add_argument("-v", "--variable", default="event")
+    cutflow_parser.add_argument("--rel", action="store_true", help="efficiency relative to the previous step")
+    cutflow_parser.add_argument("--log", action="store_true")
+    cutflow_parser.set_defaults(func=cutflow)
+
+    for sub in [build_parser, plot_parser, cutflow_parser]:
+        sub.add_argument("-c", "--cache", default="hist_cache", help="cache directory")
+    for sub in [plot_parser, cutflow_parser]:
+        sub.add_argument("-g", "--groups", action="append", metavar="NAME=REGEX",
+                         help="sum the hists whose <config>/<dataset> matches REGEX into group NAME")
+        sub.add_argument("-s", "--select", action="append", metavar="AXIS=VALUE",
+                         help="take a single bin of a categorical axis instead of summing it")
+        sub.add_argument("-o", "--output", default="plots")
+        sub.add_argument("--ext", default="pdf")
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
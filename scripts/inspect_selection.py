@@ -1,94 +1,178 @@
+"""
+Cutflow of the SelectEvents outputs of one or more datasets, read from the results_*.parquet files
+(and optionally columns_*.parquet for the channel split). Only the "steps" and "event" columns are
+read, one row group at a time, and all step counts are accumulated in a single pass per dataset:
+
+  cumulative  events passing all steps up to this one (abs eff w.r.t. the initial events, rel eff
+              w.r.t. the previous step)
+  single      events passing this step alone
+  n-1 eff     events passing all steps / events passing all steps but this one
+
+Datasets are processed in parallel. Each input is a directory containing the parquet files of one
+dataset, e.g. a local copy of .../cf.SelectEvents/<config>/<dataset>/nominal/calib__main/sel__main/<version>,
+globs are expanded; the dataset name is taken from the path after the config if it is a columnflow
+store path, otherwise from the directory name.
+
+  python scripts/inspect_selection.py "$CF_STORE_LOCAL/analysis_httcp/cf.SelectEvents/run2_UL2018_nano_cp_tau_v09_limited/*/nominal/calib__main/sel__main/v3" --channels --json cutflow.json
+"""
 import os
 import re
-import sys
-import pickle
-import awkward as ak
+import glob
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import pyarrow.parquet as pq
 from tabulate import tabulate
-from IPython import embed
-
-basepath = "/eos/user/g/gsaha/cf_store/analysis_httcp/cf.SelectEvents"
-#dataset = "h_ggf_tautau_prod_cp_even_sm"
-datasets = ["h_ggf_tautau_prod_cp_even_sm", "dy_lep_m50_madgraph"]
-version = "v3"
-campaign = "run2_UL2018_nano_cp_tau_v09_limited"
-
-#file = f"{basepath}/{campaign}/{dataset}/nominal/calib__main/sel__main/{version}/results_0.parquet"
-#cols = f"{basepath}/{campaign}/{dataset}/nominal/calib__main/sel__main/{version}/columns_0.parquet"
-
-
-#files = [f"{basepath}/{campaign}/{dataset}/nominal/calib__main/sel__main/{version}/results_0.parquet" for dataset in datasets]
-#cols  = [f"{basepath}/{campaign}/{dataset}/nominal/calib__main/sel__main/{version}/columns_0.parquet" for dataset in datasets]
-
-selections = [
-    'json',
-    'trigger',
-    'met_filter',
-    'b_veto',
-    'dilepton_veto',
-    'has_2_or_more_leps_with_at_least_1_tau',
-    'has_at_least_1_pair_before_trigobj_matching',
-    'has_at_least_1_pair_after_trigobj_matching',
-    'extra_lepton_veto',
-    'One_higgs_cand_per_event',
-    'has_proper_tau_decay_products',
-]
-
-
-
-
-for dataset in datasets:
-    print(f"dataset: {dataset}")
-    file = f"{basepath}/{campaign}/{dataset}/nominal/calib__main/sel__main/{version}/results_0.parquet"
-    cols = f"{basepath}/{campaign}/{dataset}/nominal/calib__main/sel__main/{version}/columns_0.parquet"
-
-    results = ak.from_parquet(file)
-    columns = ak.from_parquet(cols)
-    
-    steps = results.steps
-    events = results.event
-    objects = results.objects
-    
-    nselevnents = ak.sum(events)
-    
-    initial = len(objects.Muon)
-    count = ak.Array(np.ones(initial, dtype=bool))
-    initial = ak.sum(count)
-    headers = ["selections", "nevents", "abs eff"]
-    rows = []
-    rows.append(["Initial", initial, 1.0])
-    for i in range(len(selections)):
-        sel = selections[i]
-        count = count & steps[sel]
-        nsel = ak.sum(count)
-        abseff = round(nsel/initial, 3)
-        rows.append([sel, nsel, abseff])
-        
-    rows = np.array(rows)
-    evts = rows[:,1]
-    evts_den = np.array([initial] + evts[:-1].tolist())
-    rel_eff = np.round(np.asarray(evts, float)/np.asarray(evts_den, float), decimals=3)
-    
-    rows = np.concatenate([rows, rel_eff[:,None]], axis=1).tolist()
-    headers.append("rel eff")
-    
-    table = tabulate(rows, headers, tablefmt="pretty")
-    print(f"CutFlow :\n{table}")
-    print(f"Events selected at the end (all categories) : {nselevnents} [ {round(100*nselevnents/initial,6)}% ]")
-    
-    etau_mask = columns.channel_id == 1
-    mutau_mask = columns.channel_id == 2
-    tautau_mask = columns.channel_id == 4
-    other_ch_mask = ~(etau_mask | mutau_mask | tautau_mask)
-    
-    etau_ev = ak.sum(events[etau_mask])
-    mutau_ev = ak.sum(events[mutau_mask])
-    tautau_ev = ak.sum(events[tautau_mask])
-    total = etau_ev + mutau_ev + tautau_ev
-    print(f"Channel wise nEvents ===>")
-    print(f"etau   : {etau_ev}\t[ {round(100*etau_ev/initial,6)}% ]")
-    print(f"mutau  : {mutau_ev}\t[ {round(100*mutau_ev/initial,6)}% ]")
-    print(f"tautau : {tautau_ev}\t[ {round(100*tautau_ev/initial,6)}% ]")
-    print(f"etau + mutau + tautau : {etau_ev + mutau_ev + tautau_ev}")
-    print(f"In other channels  : {ak.sum(events[other_ch_mask])}\n\n")
-    
+
+
+CHANNELS = {"etau": 1, "mutau": 2, "tautau": 4}
+
+
+def dataset_name(path):
+    parts = os.path.normpath(os.path.abspath(path)).split(os.sep)
+    for i, part in enumerate(parts[:-2]):
+        if part == "cf.SelectEvents":
+            return parts[i + 2]
+    return parts[-1]
+
+
+def file_index(path):
+    m = re.search(r"_(\d+)\.parquet$", path)
+    return int(m.group(1)) if m else -1
+
+
+def list_files(directory, prefix):
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}_*.parquet")), key=file_index)
+
+
+def inspect_dataset(directory, steps=None, channels=False):
+    """
+    Runs in the pool: accumulates the step counts over all results files of *directory*
+    """
+    n_initial = 0
+    n_selected = 0
+    n_cumulative = n_single = n_only_failing = None
+    n_all = 0
+    channel_counts = dict.fromkeys(CHANNELS, 0)
+    n_other = 0
+
+    results_files = list_files(directory, "results")
+    if not results_files:
+        raise FileNotFoundError(f"no results_*.parquet files in {directory}")
+    for results_file in results_files:
+        pf = pq.ParquetFile(results_file)
+        if steps is None:
+            steps = [field.name for field in pf.schema_arrow.field("steps").type]
+        if n_cumulative is None:
+            n_cumulative = np.zeros(len(steps), dtype=np.int64)
+            n_single = np.zeros(len(steps), dtype=np.int64)
+            n_only_failing = np.zeros(len(steps), dtype=np.int64)
+
+        # channel ids are only needed for the selected events, a single small column per file
+        channel_id = None
+        if channels:
+            columns_file = os.path.join(directory, f"columns_{file_index(results_file)}.parquet")
+            channel_id = pq.read_table(columns_file, columns=["channel_id"]).column("channel_id").to_numpy()
+
+        offset = 0
+        for row_group in range(pf.num_row_groups):
+            table = pf.read_row_group(row_group, columns=["steps", "event"])
+            steps_col = table.column("steps").combine_chunks()
+            # (EVENT, STEP) pass matrix
+            passed = np.stack([
+                steps_col.field(step).to_numpy(zero_copy_only=False)
+                for step in steps
+            ], axis=1)
+            event = table.column("event").to_numpy()
+
+            n_initial += len(event)
+            n_selected += int(event.sum())
+            n_cumulative += np.logical_and.accumulate(passed, axis=1).sum(axis=0)
+            n_single += passed.sum(axis=0)
+            failed = ~passed
+            n_failed = failed.sum(axis=1)
+            n_all += int((n_failed == 0).sum())
+            n_only_failing += failed[n_failed == 1].sum(axis=0)
+
+            if channel_id is not None:
+                selected_channels = channel_id[offset:offset + len(event)][event]
+                for name, ch_id in CHANNELS.items():
+                    channel_counts[name] += int((selected_channels == ch_id).sum())
+                n_other += int(np.isin(selected_channels, list(CHANNELS.values()), invert=True).sum())
+            offset += len(event)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        den = np.concatenate([[n_initial], n_cumulative[:-1]])
+        result = {
+            "dataset": dataset_name(directory),
+            "path": directory,
+            "initial": n_initial,
+            "selected": n_selected,
+            "steps": [
+                {
+                    "step": step,
+                    "cumulative": int(n_cumulative[i]),
+                    "abs_eff": float(n_cumulative[i] / n_initial),
+                    "rel_eff": float(n_cumulative[i] / den[i]),
+                    "single": int(n_single[i]),
+                    "single_eff": float(n_single[i] / n_initial),
+                    "n_minus_1_eff": float(n_all / (n_all + n_only_failing[i])),
+                }
+                for i, step in enumerate(steps)
+            ],
+        }
+    if channels:
+        result["channels"] = dict(channel_counts, other=n_other)
+    return result
+
+
+def print_result(result, digits):
+    headers = ["selections", "nevents", "abs eff", "rel eff", "single", "single eff", "n-1 eff"]
+    rows = [["Initial", result["initial"], 1.0, 1.0, result["initial"], 1.0, ""]]
+    for step in result["steps"]:
+        rows.append([
+            step["step"], step["cumulative"], round(step["abs_eff"], digits), round(step["rel_eff"], digits),
+            step["single"], round(step["single_eff"], digits), round(step["n_minus_1_eff"], digits),
+        ])
+    initial = result["initial"]
+    print(f"dataset: {result['dataset']}")
+    print(f"CutFlow :\n{tabulate(rows, headers, tablefmt='pretty')}")
+    print(f"Events selected at the end (all categories) : {result['selected']} [ {round(100 * result['selected'] / initial, 6)}% ]")
+    if "channels" in result:
+        print("Channel wise nEvents ===>")
+        for name, n in result["channels"].items():
+            print(f"{name:<7s}: {n}\t[ {round(100 * n / initial, 6)}% ]")
+    print("")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="dataset directories (or globs) with results_*.parquet files")
+    parser.add_argument("--steps", nargs="+", help="steps in cutflow order, default: order in the files")
+    parser.add_argument("--channels", action="store_true", help="split the selected events by channel_id")
+    parser.add_argument("--json", help="write the results of all datasets to this file")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-d", "--digits", type=int, default=3)
+    args = parser.parse_args()
+
+    directories = [
+        directory
+        for pattern in args.inputs
+        for directory in sorted(glob.glob(os.path.expandvars(os.path.expanduser(pattern)))) or [pattern]
+    ]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(inspect_dataset, d, args.steps, args.channels) for d in directories]
+        results = [future.result() for future in futures]
+
+    for result in results:
+        print_result(result, args.digits)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,4 +15,10 @@ sys.path.append(base)
 import httcp  # noqa
 
 # import all tests
-# ...
+from .test_polarimetric_a1 import *
+from .test_trigobj_matching import *
+from .test_to_list_calls import *
+from .test_hist_hooks import *
+from .test_pi0_strip import *
+from .test_weight_block import *
+from .test_stitching_index import *
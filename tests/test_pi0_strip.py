@@ -0,0 +1,283 @@
+# coding: utf-8
+
+"""
+Tests of the "simpleMB" pi0 reconstruction (reconstructPi0Strip) against the former implementation
+of reconstructPi0 on randomized float32 photons around the hcand: photons with equal pt (ties of the
+pt ordering and of the pair masses), photons outside of the strip, pairs inside and outside of the
+pi0 mass window and pairs with a negative mass squared. The former functions below are copied from
+ReArrangeHcandProds.py before the flat photon kernel, with only the mass window mask fixed.
+"""
+
+__all__ = ["Pi0StripTest"]
+
+import unittest
+from typing import Optional
+
+import numpy as np
+import awkward as ak
+import coffea
+from coffea.nanoevents.methods import vector
+
+from httcp.production import ReArrangeHcandProds as rearrange
+
+
+# the pair masses are those of the coffea vectors: cartesian float32 sums with the coffea of the
+# sandbox (numba kernels, up to 2024), the scikit-hep vector backend of later versions rounds
+# differently, also in the former implementation
+CARTESIAN_COFFEA = hasattr(vector, "_mass2_kernel")
+
+# former implementation, verbatim but for the mass window mask
+
+def convert_to_coffea_p4(zipped_item, typetag : Optional[str]="PtEtaPhiMLorentzVector"):
+    return ak.zip(
+        zipped_item,
+        with_name = typetag,
+        behavior  = coffea.nanoevents.methods.vector.behavior,
+    )
+
+def getMaxEtaTauStrip(pt):
+    temp = 0.20 * np.power(pt, -0.66)
+    ref1 = ak.where(temp > 0.15, 0.15, temp)
+    ref2 = ak.where(ref1 > 0.05, ref1, 0.05)
+    return ref2
+
+def getMaxPhiTauStrip(pt):
+    temp = 0.35 * np.power(pt, -0.71)
+    ref1 = ak.where(temp > 0.30, 0.30, temp)
+    ref2 = ak.where(ref1 > 0.05, ref1, 0.05)
+    return ref2
+
+
+def reconstructPi0(
+        hcandp4,
+        photons,
+        method: Optional[str] = "simpleIC"
+):
+    photons = ak.with_name(photons, "PtEtaPhiMLorentzVector")
+    photons_sorted_pt_indices = ak.argsort(photons.pt, ascending=False)
+    photons = photons[photons_sorted_pt_indices]
+
+    p4_pi0 = None
+
+
+    if method == "simpleIC":
+        photons_px = ak.sum(photons.px, axis=1)
+        photons_py = ak.sum(photons.py, axis=1)
+        photons_pt = np.sqrt(photons_px ** 2 + photons_py ** 2)
+
+        #pt_pi0    = photons[:, 0:1].pt
+        pt_pi0     = photons_pt
+        eta_pi0    = photons[:, 0:1].eta
+        phi_pi0    = photons[:, 0:1].phi
+        pdgid_pi0  = ak.values_astype(111 * ak.ones_like(eta_pi0), "int64")
+        mass_pi0   = 0.135 * ak.ones_like(eta_pi0)
+        charge_pi0 = ak.values_astype(ak.zeros_like(eta_pi0), "int32")
+        tauidx_pi0 = photons.tauIdx[:,:1]
+        
+        
+        p4_pi0 = convert_to_coffea_p4({
+            "pt"    : pt_pi0,
+            "eta"   : eta_pi0,
+            "phi"   : phi_pi0,
+            "mass"  : mass_pi0,
+            "pdgId" : pdgid_pi0,
+            "charge": charge_pi0,
+            "tauIdx": tauidx_pi0,
+        })
+        
+    elif method == "simpleMB":
+        pi0RecoM = 0.136 #approximate pi0 peak from fits in PF paper
+        pi0RecoW = 0.013 
+
+        pdgid_pi0  = ak.values_astype(111 * ak.ones_like(photons.pt), "int64")
+        mass_pi0   = 0.135 * ak.ones_like(photons.pt)
+        charge_pi0 = ak.values_astype(ak.zeros_like(photons.pt), "int32")
+        tauidx_pi0 = photons.tauIdx
+
+        #has_atleast_one_photon = ak.num(photons.pt, axis=1) > 0
+        #hcandp4 = ak.where(has_atleast_one_photon, hcandp4, hcandp4[:,:0])
+        
+        #photons_p4 = ak.where(has_atleast_one_photon,
+        #                      photons[:,0:1],
+        #                      photons[:,:0])
+        
+        #deta_photons_hcand = (photons_p4).metric_table(hcandp4, metric = lambda a,b: np.abs(a.eta - b.eta))
+        #dphi_photons_hcand = (photons_p4).metric_table(hcandp4, metric = lambda a,b: np.abs(a.delta_phi(b)))
+
+        deta_photons_hcand = ak.firsts((photons).metric_table(hcandp4, metric = lambda a,b: np.abs(a.eta - b.eta)), axis=-1)
+        dphi_photons_hcand = ak.firsts((photons).metric_table(hcandp4, metric = lambda a,b: np.abs(a.delta_phi(b))), axis=-1)
+        
+        #maxeta_photons = getMaxEtaTauStrip(photons_p4.pt)
+        #maxphi_photons = getMaxPhiTauStrip(photons_p4.pt)
+
+        maxeta_photons = getMaxEtaTauStrip(photons.pt)
+        maxphi_photons = getMaxPhiTauStrip(photons.pt)
+
+        mask_photons = ((np.abs(deta_photons_hcand) < maxeta_photons)
+                        & (np.abs(dphi_photons_hcand) < maxphi_photons))
+
+        mass_pi0 = mass_pi0[mask_photons][:,:1]
+        charge_pi0 = charge_pi0[mask_photons][:,:1]
+        tauidx_pi0 = tauidx_pi0[mask_photons][:,:1]
+        pdgid_pi0  = pdgid_pi0[mask_photons][:,:1]
+        
+        strip_photons_p4 = convert_to_coffea_p4(
+            {
+                "pt"   : photons.pt[mask_photons],
+                "eta"  : photons.eta[mask_photons],
+                "phi"  : photons.phi[mask_photons],
+                "mass" : photons.mass[mask_photons],
+            }
+        )
+
+
+        has_one_photon = ak.num(strip_photons_p4.pt, axis=1) == 1
+        
+        strip_photons_p4_pair = ak.combinations(strip_photons_p4, 2, axis=1)
+        strip_photons_p4_pair_0, strip_photons_p4_pair_1 = ak.unzip(strip_photons_p4_pair)
+        strip_photons_mass = (strip_photons_p4_pair_0 + strip_photons_p4_pair_1).mass
+        mass_val = np.abs(strip_photons_mass - pi0RecoM)
+        mass_sorted_idx = ak.argsort(mass_val, axis=1)
+        strip_photons_p4_pair_sorted = strip_photons_p4_pair[mass_sorted_idx]
+        mass_mask = mass_val < 2 * pi0RecoW
+        evt_mask_no_pair = ak.sum(mass_mask, axis=1) == 0
+        # fixed: the mask in the mass sorted order of the pairs, it was applied in combinations order
+        strip_photons_p4_pair_sorted_pass_mass = strip_photons_p4_pair_sorted[mass_mask[mass_sorted_idx]]
+        strip_photons_p4_mass_selected = ak.concatenate([strip_photons_p4_pair_sorted_pass_mass["0"][:,:1],
+                                                         strip_photons_p4_pair_sorted_pass_mass["1"][:,:1]], axis=1)
+
+        sel_strip_photons_p4 = ak.where(has_one_photon,
+                                        strip_photons_p4,
+                                        ak.where(evt_mask_no_pair,
+                                                 strip_photons_p4[:,:1],
+                                                 strip_photons_p4_mass_selected)
+                                    )
+        
+        #from IPython import embed; embed()
+        #sel_strip_pizero_p4 = ak.from_regular(ak.sum(sel_strip_photons_p4, axis=-1)[:,None])
+
+        
+        dummy = sel_strip_photons_p4.px[:,:0]
+        _mask = ak.num(sel_strip_photons_p4.px, axis=1) > 0
+        
+        px = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.px, axis=1), 0.0)[:,None])
+        px = ak.where(_mask, px, dummy)
+        py = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.py, axis=1), 0.0)[:,None])
+        py = ak.where(_mask, py, dummy)
+        pz = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.pz, axis=1), 0.0)[:,None])
+        pz = ak.where(_mask, pz, dummy)
+        energy = ak.from_regular(ak.fill_none(ak.sum(sel_strip_photons_p4.energy, axis=1), 0.0)[:,None])
+        energy = ak.where(_mask, energy, dummy)
+        
+        p4 = convert_to_coffea_p4(
+            {
+                "x": px, "y": py, "z": pz, "t": energy,
+            },
+            typetag = "LorentzVector",
+        )
+        
+        p4_pi0 = convert_to_coffea_p4(
+            {
+                "pt": p4.pt,
+                "eta": p4.eta,
+                "phi": p4.phi,
+                "mass": mass_pi0,
+                "pdgId": pdgid_pi0,
+                "charge": charge_pi0,
+                "tauIdx": tauidx_pi0,
+            }
+        )
+
+    return p4_pi0
+
+
+def make_inputs(rng, nevents):
+    """
+    hcand (0 or 1 per event) and float32 photons of one tau per event, also in some events without
+    an hcand
+    """
+    n_hcand = (rng.uniform(size=nevents) < 0.9).astype(np.int64)
+    hcand = ak.zip({
+        "pt"   : ak.unflatten(rng.uniform(20, 100, n_hcand.sum()).astype(np.float32), n_hcand),
+        "eta"  : ak.unflatten(rng.uniform(-2, 2, n_hcand.sum()).astype(np.float32), n_hcand),
+        "phi"  : ak.unflatten(rng.uniform(-3.1, 3.1, n_hcand.sum()).astype(np.float32), n_hcand),
+        "mass" : ak.unflatten(np.ones(n_hcand.sum(), dtype=np.float32), n_hcand),
+    }, with_name="PtEtaPhiMLorentzVector", behavior=vector.behavior)
+
+    counts = rng.choice([0, 0, 1, 2, 3, 4, 6, 9], nevents)
+    n = counts.sum()
+    evt = np.repeat(np.arange(nevents), counts)
+    hcand_eta = ak.to_numpy(ak.fill_none(ak.firsts(hcand.eta), 0.0))[evt]
+    hcand_phi = ak.to_numpy(ak.fill_none(ak.firsts(hcand.phi), 0.0))[evt]
+    # discrete pt values give ties, the spread around the hcand puts some photons out of the strip
+    pt = (rng.choice([1.0, 2.0, 3.0], n) + rng.choice([0, 0, 0.37], n) * rng.uniform(size=n)).astype(np.float32)
+    eta = (hcand_eta + rng.normal(0, 0.08, n)).astype(np.float32)
+    phi = ((hcand_phi + rng.normal(0, 0.15, n) + np.pi) % (2 * np.pi) - np.pi).astype(np.float32)
+    # copies of the previous photon of the event give pairs of equal mass
+    copy = np.flatnonzero((rng.uniform(size=n) < 0.2) & (np.arange(n) > 0))
+    copy = copy[evt[copy] == evt[copy - 1]]
+    for values in [pt, eta, phi]:
+        values[copy] = values[copy - 1]
+    photons = ak.zip({
+        "pt"     : ak.unflatten(pt, counts),
+        "eta"    : ak.unflatten(eta, counts),
+        "phi"    : ak.unflatten(phi, counts),
+        "mass"   : ak.unflatten(np.zeros(n, dtype=np.float32), counts),
+        "pdgId"  : ak.unflatten(np.full(n, 22, dtype=np.int64), counts),
+        "charge" : ak.unflatten(np.zeros(n, dtype=np.int32), counts),
+        "tauIdx" : ak.unflatten(rng.integers(0, 2, nevents).astype(np.int32)[evt], counts),
+    }, behavior=vector.behavior)
+    return hcand, photons
+
+
+class Pi0StripTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.hcand, self.photons = make_inputs(rng, 10000)
+        with np.errstate(invalid="ignore"):
+            self.expected = reconstructPi0(self.hcand, self.photons, method="simpleMB")
+            self.result = rearrange.reconstructPi0(self.hcand, self.photons, method="simpleMB")
+        self.has_hcand = ak.to_numpy(ak.num(self.hcand, axis=1) > 0)
+
+    @unittest.skipUnless(CARTESIAN_COFFEA, "coffea with the vector backend")
+    def test_former_implementation(self):
+        # identical values and dtypes for the events with an hcand
+        expected, result = self.expected[self.has_hcand], self.result[self.has_hcand]
+        self.assertTrue(ak.any(ak.num(result, axis=1) > 0))
+        np.testing.assert_array_equal(ak.num(result, axis=1), ak.num(expected, axis=1))
+        for field in ak.fields(expected):
+            a = ak.to_numpy(ak.flatten(result[field]))
+            b = ak.to_numpy(ak.flatten(ak.drop_none(expected[field])))
+            self.assertEqual(a.dtype, b.dtype, field)
+            np.testing.assert_array_equal(a, b, err_msg=field)
+
+    def test_photons_without_hcand(self):
+        # intended difference: the former code gave events without an hcand but with photons a pi0
+        # without momentum (pt 0 or nan), there is no pi0 now
+        no_hcand = ~self.has_hcand & ak.to_numpy(ak.num(self.photons, axis=1) > 0)
+        self.assertTrue(no_hcand.any())
+        self.assertTrue(ak.all(ak.num(self.expected[no_hcand], axis=1) == 1))
+        self.assertFalse(ak.any(ak.flatten(self.expected[no_hcand]).pt > 0))
+        self.assertTrue(ak.all(ak.num(self.result[~self.has_hcand], axis=1) == 0))
+
+    def test_numpy_kernel(self):
+        # the numpy fallback of the pair search finds the same pairs
+        rng = np.random.default_rng(2)
+        counts = rng.choice([0, 1, 2, 3, 5, 8], 2000)
+        offsets = np.append(0, np.cumsum(counts))
+        p4 = rearrange.convert_to_coffea_p4({
+            "pt"   : rng.choice([1.0, 2.0], offsets[-1]).astype(np.float32),
+            "eta"  : rng.normal(0, 0.05, offsets[-1]).astype(np.float32),
+            "phi"  : rng.normal(0, 0.1, offsets[-1]).astype(np.float32),
+            "mass" : np.zeros(offsets[-1], dtype=np.float32),
+        })
+        x, y, z, t = (ak.to_numpy(getattr(p4, f)) for f in ["px", "py", "pz", "energy"])
+        results = [
+            kernel(offsets, x, y, z, t, np.float32(0.136), np.float32(0.026),
+                   np.full(len(counts), -1, dtype=np.int64), np.full(len(counts), -1, dtype=np.int64))
+            for kernel in [rearrange._best_pi0_pairs, rearrange._best_pi0_pairs_np]
+        ]
+        self.assertTrue((results[0][0] >= 0).any())
+        for a, b in zip(*results):
+            np.testing.assert_array_equal(a, b)
@@ -0,0 +1,85 @@
+# coding: utf-8
+
+"""
+Tests of the vectorised CV a1 polarimetric vector against the TComplex implementation.
+"""
+
+__all__ = ["PolarimetricA1VectorizedTest"]
+
+import unittest
+
+import numpy as np
+import awkward as ak
+from coffea.nanoevents.methods import vector
+
+from httcp.production.PolarimetricA1CV import PolarimetricA1, PolarimetricA1Vectorized
+
+
+M_TAU = 1.77686
+M_PI = 0.13957
+
+
+def _two_body(m, m1, m2, rng):
+    # isotropic two body decay at rest, (N, 4) arrays in (x, y, z, t) ordering
+    p = np.sqrt(np.clip((m**2 - (m1 + m2)**2) * (m**2 - (m1 - m2)**2), 0, None)) / (2 * m)
+    cos_theta = rng.uniform(-1, 1, len(m))
+    sin_theta = np.sqrt(1 - cos_theta**2)
+    phi = rng.uniform(0, 2 * np.pi, len(m))
+    v = np.stack([p * sin_theta * np.cos(phi), p * sin_theta * np.sin(phi), p * cos_theta], axis=-1)
+    return (
+        np.concatenate([v, np.sqrt(p**2 + m1**2)[:, None]], axis=-1),
+        np.concatenate([-v, np.sqrt(p**2 + m2**2)[:, None]], axis=-1),
+    )
+
+
+def _boost(p, beta):
+    b2 = (beta**2).sum(axis=-1)
+    gamma = 1 / np.sqrt(1 - b2)
+    bp = (beta * p[:, :3]).sum(axis=-1)
+    g2 = np.where(b2 > 0, (gamma - 1) / np.where(b2 > 0, b2, 1), 0)
+    xyz = p[:, :3] + (g2 * bp)[:, None] * beta + (gamma * p[:, 3])[:, None] * beta
+    return np.concatenate([xyz, (gamma * (p[:, 3] + bp))[:, None]], axis=-1)
+
+
+def random_a1_decays(n, seed=42):
+    """
+    tau -> a1 nu, a1 -> rho pi, rho -> pi pi with random masses, boosted to a random lab frame,
+    returns (tau, os pion, ss1 pion, ss2 pion) as (N, 4) arrays and the tau charges
+    """
+    rng = np.random.default_rng(seed)
+    m_a1 = rng.uniform(0.7, 1.6, n)
+    a1, _ = _two_body(np.full(n, M_TAU), m_a1, 0.0, rng)
+    m_rho = rng.uniform(2 * M_PI + 0.01, m_a1 - M_PI - 0.01)
+    rho, p_os = _two_body(m_a1, m_rho, M_PI, rng)
+    p_ss1, p_ss2 = _two_body(m_rho, M_PI, M_PI, rng)
+    p_ss1, p_ss2 = (_boost(p, rho[:, :3] / rho[:, 3:]) for p in (p_ss1, p_ss2))
+    p_os, p_ss1, p_ss2 = (_boost(p, a1[:, :3] / a1[:, 3:]) for p in (p_os, p_ss1, p_ss2))
+    tau = np.tile([0.0, 0.0, 0.0, M_TAU], (n, 1))
+    beta = rng.normal(0, 0.5, (n, 3))
+    beta = beta / np.maximum(1, 1.05 * np.linalg.norm(beta, axis=1))[:, None]
+    vecs = [_boost(p, beta) for p in (tau, p_os, p_ss1, p_ss2)]
+    return vecs, rng.choice([-1, 1], n)
+
+
+def _to_ak(p):
+    # one tau per event, as in the PhiCP producer
+    return ak.zip(
+        {c: ak.Array(p[:, i])[:, None] for i, c in enumerate("xyzt")},
+        with_name="LorentzVector",
+        behavior=vector.behavior,
+    )
+
+
+class PolarimetricA1VectorizedTest(unittest.TestCase):
+
+    def test_same_as_tcomplex_engine(self):
+        for channel in ["k3ChargedPi", "kChargedPi2NeutralPi"]:
+            vecs, charge = random_a1_decays(200, seed=42)
+            args = [_to_ak(p) for p in vecs] + [ak.Array(charge)[:, None], channel]
+
+            h_ref = PolarimetricA1(*args).PVC()
+            h_ref = np.stack([ak.to_numpy(ak.flatten(h_ref[c])) for c in "xyz"], axis=-1)
+            h_vec = PolarimetricA1Vectorized(*args).PVC()
+
+            self.assertEqual(h_vec.shape, (200, 3))
+            np.testing.assert_allclose(h_vec, h_ref, rtol=1e-9, atol=1e-12, err_msg=channel)
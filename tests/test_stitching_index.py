@@ -0,0 +1,165 @@
+# coding: utf-8
+
+"""
+Property test of httcp.production.stitching.StitchingIndex against the scipy.sparse id table of the
+former DY / W process id producers, on randomized leaf process configurations: njets ranges (also
+overlapping and duplicated ones), ptll ranges per njets range (also open ended, overlapping and
+missing for some leaves) and events with njets / pt values on and around all range edges.
+The process ids and the outlier masks of a random leaf (or inclusive) process are compared.
+"""
+
+__all__ = ["StitchingIndexTest"]
+
+import unittest
+
+import numpy as np
+import scipy.sparse
+
+from httcp.production.stitching import StitchingIndex
+
+
+def sparse_table_nlo(leaves):
+    """
+    Former process_ids_dy setup of stitching_NLO.py (njets and ptll), returns the lookup function
+    """
+    stitching_ranges = {}
+    for njets, ptll, _ in leaves:
+        stitching_ranges.setdefault(njets, [])
+        if ptll is not None:
+            stitching_ranges[njets].append(ptll)
+    sorted_stitching_ranges = [
+        (nj_range, sorted(stitching_ranges[nj_range], key=lambda ptll_range: ptll_range[0]))
+        for nj_range in sorted(stitching_ranges.keys(), key=lambda nj_range: nj_range[0])
+    ]
+
+    def key_func(njets, pt):
+        single = False
+        if isinstance(njets, int):
+            njets = np.array([njets], dtype=np.int32)
+            pt = np.array([pt], dtype=np.float32)
+            single = True
+        nj_bins = np.zeros(len(njets), dtype=np.int32)
+        pt_bins = np.zeros(len(pt), dtype=np.int32)
+        for nj_bin, (nj_range, pt_ranges) in enumerate(sorted_stitching_ranges, 1):
+            nj_mask = (nj_range[0] <= njets) & (njets < nj_range[1])
+            nj_bins[nj_mask] = nj_bin
+            for pt_bin, (pt_min, pt_max) in enumerate(pt_ranges, 1):
+                pt_mask = (pt_min <= pt) & (pt < pt_max)
+                pt_bins[nj_mask & pt_mask] = pt_bin
+        return (nj_bins[0], pt_bins[0]) if single else (nj_bins, pt_bins)
+
+    max_nj_bin = len(sorted_stitching_ranges)
+    max_pt_bin = max(map(len, stitching_ranges.values()))
+    id_table = scipy.sparse.lil_matrix((max_nj_bin + 1, max_pt_bin + 1), dtype=np.int64)
+    for njets, ptll, process_id in leaves:
+        id_table[key_func(njets[0], (ptll or [-1])[0])] = process_id
+
+    return lambda njets, pt: np.asarray(id_table[key_func(njets, pt)].todense()).reshape(-1)
+
+
+def sparse_table_lo(leaves):
+    """
+    Former process_ids_dy / process_ids_w setup of stitching_LO.py (njets only)
+    """
+    sorted_stitching_ranges = sorted([njets for njets, _, _ in leaves], key=lambda nj_range: nj_range[0])
+
+    def key_func(njets):
+        single = False
+        if isinstance(njets, int):
+            njets = np.array([njets], dtype=np.int32)
+            single = True
+        nj_bins = np.zeros(len(njets), dtype=np.int32)
+        for nj_bin, nj_range in enumerate(sorted_stitching_ranges, 1):
+            nj_mask = (nj_range[0] <= njets) & (njets < nj_range[1])
+            nj_bins[nj_mask] = nj_bin
+        return nj_bins[0] if single else nj_bins
+
+    id_table = scipy.sparse.lil_matrix((len(sorted_stitching_ranges) + 1, 1), dtype=np.int64)
+    for njets, _, process_id in leaves:
+        id_table[key_func(njets[0])] = process_id
+
+    return lambda njets, pt: np.asarray(id_table[key_func(njets)].todense()).reshape(-1)
+
+
+def random_leaves(rng, use_pt):
+    """
+    Leaves (njets range, ptll range or None, id), mostly a clean binning, sometimes overlapping or
+    duplicated ranges
+    """
+    nj_edges = np.sort(rng.choice(np.arange(0, 6), rng.integers(2, 5), replace=False))
+    nj_ranges = [(int(lo), int(hi)) for lo, hi in zip(nj_edges[:-1], nj_edges[1:])]
+    if rng.uniform() < 0.3:
+        nj_ranges.append((int(nj_edges[0]), int(nj_edges[-1]) + 1))
+    if rng.uniform() < 0.2:
+        nj_ranges.append(nj_ranges[rng.integers(len(nj_ranges))])
+    leaves = []
+    for nj_range in nj_ranges:
+        if use_pt and rng.uniform() < 0.8:
+            pt_edges = list(np.sort(rng.choice([0.0, 40.0, 100.0, 200.0, 400.0, 600.0], rng.integers(2, 5), replace=False)))
+            if rng.uniform() < 0.5:
+                pt_edges.append(np.inf)
+            pt_ranges = [(float(lo), float(hi)) for lo, hi in zip(pt_edges[:-1], pt_edges[1:])]
+            if rng.uniform() < 0.2:
+                pt_ranges.append((pt_edges[0], pt_edges[-1]))
+            if rng.uniform() < 0.3:
+                # inclusive leaf of this njets bin as well
+                leaves.append((nj_range, None))
+            leaves.extend((nj_range, pt_range) for pt_range in pt_ranges)
+        else:
+            leaves.append((nj_range, None))
+    rng.shuffle(leaves)
+    return [(nj, pt, 100 + i) for i, (nj, pt) in enumerate(leaves)]
+
+
+def random_events(rng, leaves, n):
+    nj_values = np.array(sorted({e + d for nj, _, _ in leaves for e in nj for d in (-1, 0, 1)}))
+    pt_values = np.array(sorted({e + d for _, pt, _ in leaves if pt for e in pt for d in (-0.5, 0.0, 0.5)} | {-1.0}))
+    pt_values = pt_values[np.isfinite(pt_values)]
+    njets = rng.choice(nj_values[nj_values >= 0], n).astype(np.uint8)
+    pt = np.where(
+        rng.uniform(size=n) < 0.5,
+        rng.choice(pt_values, n),
+        rng.uniform(0.0, 800.0, n),
+    ).astype(np.float32)
+    return njets, pt
+
+
+def check(rng, n, use_pt):
+    leaves = random_leaves(rng, use_pt)
+    reference = (sparse_table_nlo if use_pt else sparse_table_lo)(leaves)
+
+    # process of the dataset: inclusive or one of the leaves
+    process = None if rng.uniform() < 0.3 else leaves[rng.integers(len(leaves))]
+    njets_range = process[0] if process else None
+    pt_range = process[1] if process and use_pt else None
+    index = StitchingIndex(leaves, njets_range, pt_range, use_pt=use_pt)
+
+    njets, pt = random_events(rng, leaves, n)
+    process_ids, njets_outliers, pt_outliers = index(njets, pt if use_pt else None)
+
+    problems = []
+    if not np.array_equal(process_ids, reference(njets, pt)):
+        problems.append(f"process ids differ for {np.count_nonzero(process_ids != reference(njets, pt))} events")
+    expected = np.zeros(n, dtype=bool) if njets_range is None else (njets < njets_range[0]) | (njets >= njets_range[1])
+    if not np.array_equal(njets_outliers, expected):
+        problems.append("njets outliers differ")
+    expected = np.zeros(n, dtype=bool) if pt_range is None else (pt < pt_range[0]) | (pt >= pt_range[1])
+    if not np.array_equal(pt_outliers, expected):
+        problems.append("pt outliers differ")
+    return leaves, problems
+
+
+# random leaf configurations per mode and events per configuration, with a fixed seed
+N_CONFIGS = 200
+N_EVENTS = 2000
+
+
+class StitchingIndexTest(unittest.TestCase):
+
+    def test_former_sparse_table(self):
+        rng = np.random.default_rng(1)
+        for use_pt in (True, False):
+            for i in range(N_CONFIGS):
+                leaves, problems = check(rng, N_EVENTS, use_pt)
+                with self.subTest(use_pt=use_pt, config=i):
+                    self.assertFalse(problems, f"leaves: {leaves}")
@@ -0,0 +1,26 @@
+# coding: utf-8
+
+"""
+Tests that the selectors and producers have no to_list / tolist round-trips in their call graph.
+"""
+
+__all__ = ["ToListCallsTest"]
+
+import unittest
+
+from httcp.util import find_to_list_calls
+
+
+class ToListCallsTest(unittest.TestCase):
+
+    def assert_no_to_list(self, func):
+        found = find_to_list_calls(func)
+        self.assertFalse(found, "to_list / tolist calls:\n" + "\n".join(found))
+
+    def test_selection(self):
+        from httcp.selection.main import main
+        self.assert_no_to_list(main)
+
+    def test_production(self):
+        from httcp.production.main import main
+        self.assert_no_to_list(main)
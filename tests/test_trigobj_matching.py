@@ -0,0 +1,87 @@
+# coding: utf-8
+
+"""
+Tests of httcp.util.trigger_object_matching_sparse against trigger_object_matching_deep on randomized
+jagged inputs shaped as the trigger_selection aux data: leptons (events * var, some events missing),
+per trigger leg min pt / max eta (events * var) and the matched trigger objects (events * var * ?var,
+missing for the second leg of single lepton triggers). Objects are also placed on the dR = threshold
+boundary and at phi = +-pi, which gives ties of the closest object. The closest-object index is
+checked against argmin of the metric table.
+"""
+
+__all__ = ["TriggerObjectMatchingTest"]
+
+import unittest
+
+import numpy as np
+import awkward as ak
+from coffea.nanoevents.methods import vector
+
+from httcp.util import trigger_object_matching_deep, trigger_object_matching_sparse
+
+
+def p4(rng, counts, eta_range):
+    n = int(np.sum(counts))
+    return {
+        "pt"   : rng.uniform(15.0, 80.0, n).astype(np.float32),
+        "eta"  : rng.uniform(*eta_range, n).astype(np.float32),
+        "phi"  : rng.uniform(-np.pi, np.pi, n).astype(np.float32),
+        "mass" : np.zeros(n, dtype=np.float32),
+    }
+
+
+def zip_p4(fields):
+    return ak.zip(fields, with_name="PtEtaPhiMLorentzVector", behavior=vector.behavior)
+
+
+def make_inputs(rng, nevents):
+    nlep = rng.integers(0, 4, nevents)
+    ntrig = rng.integers(0, 4, nevents)
+    leps = p4(rng, nlep, (-1.0, 1.0))
+    leps = zip_p4({k: ak.unflatten(v, nlep) for k, v in leps.items()})
+    leps = ak.mask(leps, rng.uniform(size=nevents) > 0.05)
+
+    ntrig_tot = int(np.sum(ntrig))
+    nobj = rng.integers(0, 5, ntrig_tot)
+    objs = p4(rng, nobj, (-1.2, 1.2))
+    # put some objects exactly on the dR window edge and across the phi boundary
+    edge = rng.uniform(size=len(objs["eta"])) < 0.2
+    objs["eta"][edge] = np.float32(0.5) * np.round(objs["eta"][edge] / np.float32(0.5))
+    objs["phi"][edge] = np.float32(np.pi) * np.sign(objs["phi"][edge])
+    objs = zip_p4({k: ak.unflatten(ak.unflatten(v, nobj), ntrig) for k, v in objs.items()})
+    leg_present = ak.unflatten(rng.uniform(size=ntrig_tot) > 0.3, ntrig)
+    objs = ak.mask(objs, leg_present)
+
+    minpt = ak.unflatten(rng.choice([-1.0, 20.0, 30.0, 40.0], ntrig_tot), ntrig)
+    maxeta = ak.unflatten(rng.choice([2.1, 2.3, 0.8], ntrig_tot), ntrig)
+    return leps, objs, minpt, maxeta
+
+
+def compare(rng, nevents, threshold, checkdr):
+    leps, objs, minpt, maxeta = make_inputs(rng, nevents)
+    old = trigger_object_matching_deep(leps, objs, minpt, maxeta, checkdr, threshold)
+    new, idx = trigger_object_matching_sparse(leps, objs, minpt, maxeta, checkdr, threshold, return_index=True)
+
+    same_type = str(old.type) == str(new.type)
+    same = ak.to_list(old) == ak.to_list(new)
+    if not checkdr:
+        return same_type, same, True
+    # same structure checked above, so the flat buffers line up
+    closest = ak.to_numpy(ak.flatten(ak.fill_none(ak.argmin(leps.metric_table(objs), axis=-1), -1), axis=None))
+    matched = ak.to_numpy(ak.flatten(new, axis=None))
+    same_idx = np.array_equal(np.where(matched, closest, -1), ak.to_numpy(ak.flatten(idx, axis=None)))
+    return same_type, same, same_idx
+
+
+class TriggerObjectMatchingTest(unittest.TestCase):
+
+    def test_sparse_same_as_deep(self):
+        for seed in range(5):
+            rng = np.random.default_rng(seed)
+            for threshold in (0.5, 0.3):
+                for checkdr in (True, False):
+                    with self.subTest(seed=seed, threshold=threshold, checkdr=checkdr):
+                        same_type, same, same_idx = compare(rng, 5000, threshold, checkdr)
+                        self.assertTrue(same_type, "type")
+                        self.assertTrue(same, "decision")
+                        self.assertTrue(same_idx, "closest index")
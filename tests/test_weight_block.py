@@ -0,0 +1,99 @@
+# coding: utf-8
+
+"""
+Tests of the float64 weight block of the main weight producer, of its leave-one-out products and of
+the shifted event weights, with weights of zero and blocks of zero or one weight.
+"""
+
+__all__ = ["WeightBlockTest"]
+
+import unittest
+
+import numpy as np
+import awkward as ak
+
+from httcp.weight.main import leave_one_out_products, shifted_weights, weight_block
+
+
+def leave_one_out_products_reference(block):
+    return np.array([np.prod(np.delete(block, i, axis=0), axis=0) for i in range(len(block))])
+
+
+class WeightBlockTest(unittest.TestCase):
+
+    def test_weight_block(self):
+        events = ak.Array({
+            "normalization_weight": np.array([1.5, 0.0, 2.0], dtype=np.float64),
+            "tau_weight": np.array([0.9, 1.1, 0.0], dtype=np.float32),
+            "sf": {"mu": np.array([1, 2, 3], dtype=np.int32)},
+        })
+        block = weight_block(events, ["normalization_weight", "tau_weight", "sf.mu"])
+        self.assertEqual(block.dtype, np.float64)
+        self.assertEqual(block.shape, (3, 3))
+        self.assertTrue(block.flags.c_contiguous)
+        np.testing.assert_array_equal(block[0], [1.5, 0.0, 2.0])
+        # float32 values converted once, not rounded again
+        np.testing.assert_array_equal(block[1], np.array([0.9, 1.1, 0.0], dtype=np.float32).astype(np.float64))
+        np.testing.assert_array_equal(block[2], [1.0, 2.0, 3.0])
+
+        # no weights: empty block, event weights of one
+        block = weight_block(events, [])
+        self.assertEqual(block.shape, (0, 3))
+        np.testing.assert_array_equal(np.prod(block, axis=0), np.ones(3))
+
+    def test_leave_one_out_products(self):
+        rng = np.random.default_rng(1)
+        for n_weights in range(5):
+            with self.subTest(n_weights=n_weights):
+                block = rng.uniform(0.5, 1.5, (n_weights, 100))
+                # zero weights, also two in the same event
+                block[:, :10] = 0.0
+                if n_weights:
+                    block[rng.integers(0, n_weights, 20), rng.integers(10, 100, 20)] = 0.0
+
+                loo = leave_one_out_products(block)
+                self.assertEqual(loo.shape, block.shape)
+                np.testing.assert_allclose(loo, leave_one_out_products_reference(block).reshape(block.shape), rtol=1e-12)
+                if n_weights:
+                    # the product with the left out row is the full product
+                    np.testing.assert_allclose(loo * block, np.broadcast_to(np.prod(block, axis=0), block.shape), rtol=1e-12)
+
+        # a single weight leaves a product of one
+        np.testing.assert_array_equal(leave_one_out_products(np.array([[0.0, 2.0]])), [[1.0, 1.0]])
+
+    def test_shifted_weights(self):
+        rng = np.random.default_rng(2)
+        n = 500
+        columns = ["normalization_weight", "pu_weight", "tau_weight", "mu_weight"]
+        fields = {}
+        for column in columns:
+            for postfix in ["", "_up", "_down"]:
+                values = rng.uniform(0.5, 1.5, n)
+                values[rng.uniform(size=n) < 0.1] = 0.0
+                fields[f"{column}{postfix}"] = values.astype(np.float32 if column == "tau_weight" else np.float64)
+        events = ak.Array(fields)
+
+        shifted_weight_rows = {
+            # single weights, from the leave-one-out products
+            "pu_up": {1: "pu_weight_up"},
+            "tau_down": {2: "tau_weight_down"},
+            "mu_up": {3: "mu_weight_up"},
+            # several weights at once, swapped in and reduced again
+            "pu_tau_up": {1: "pu_weight_up", 2: "tau_weight_up"},
+        }
+        for n_columns in [1, len(columns)]:
+            with self.subTest(n_columns=n_columns):
+                block = weight_block(events, columns[:n_columns])
+                rows = {
+                    shift: swap for shift, swap in shifted_weight_rows.items()
+                    if all(row < n_columns for row in swap)
+                } or {"norm_up": {0: "normalization_weight_up"}}
+                weights = shifted_weights(events, block, rows)
+                self.assertEqual(set(weights), set(rows))
+                for shift, swap in rows.items():
+                    # full recompute with the shifted columns in place of the nominal ones
+                    shifted_columns = [swap.get(i, column) for i, column in enumerate(columns[:n_columns])]
+                    expected = np.prod(weight_block(events, shifted_columns), axis=0)
+                    self.assertEqual(weights[shift].dtype, np.float64)
+                    np.testing.assert_allclose(weights[shift], expected, rtol=1e-14, atol=0, err_msg=shift)
+                    np.testing.assert_array_equal(weights[shift] == 0, expected == 0)